@@ -0,0 +1,62 @@
+"""Conteos por (categoría, etapa) para los KPIs y el gráfico de carga.
+
+Dos fuentes con el mismo resultado: en pandas sobre el DataFrame cargado,
+o en Postgres con la función conteo_etapas (sql/002_conteo_etapas.sql),
+que aplica las mismas reglas que etapas.codigos_etapa() y solo devuelve
+unas pocas decenas de filas.
+"""
+import numpy as np
+import pandas as pd
+
+from etapas import ETAPAS
+
+COLUMNAS_CONTEO = ["Categoria", "etapa_codigo", "Cantidad"]
+
+
+def columna_categoria(df_in: pd.DataFrame, por_subsector: bool) -> np.ndarray:
+    """Categoría del gráfico: subsector (o sector si está vacío), o sector (o 'Sin dato')."""
+    sector = df_in['sector'].fillna('').astype(str).str.strip() if 'sector' in df_in.columns else pd.Series([''] * len(df_in))
+    if por_subsector and 'subsector' in df_in.columns:
+        cat = df_in['subsector'].fillna('').astype(str).str.strip()
+        return np.where(cat != '', cat, sector)
+    return np.where(sector != '', sector, 'Sin dato')
+
+
+def conteo_etapas_local(df_in: pd.DataFrame, por_subsector: bool) -> pd.DataFrame:
+    """Conteo por (Categoria, etapa_codigo) sobre un DataFrame ya clasificado.
+
+    Primero agrupa por las columnas crudas (categóricas: agrupa por código)
+    y recién sobre esas pocas filas arma el texto de Categoria.
+    """
+    if df_in.empty:
+        return pd.DataFrame(columns=COLUMNAS_CONTEO)
+    claves = [c for c in ['sector', 'subsector'] if c in df_in.columns and (c == 'sector' or por_subsector)]
+    grupos = df_in.groupby(claves + ['etapa_codigo'], observed=True).size().reset_index(name='Cantidad')
+    grupos['Categoria'] = columna_categoria(grupos, por_subsector)
+    conteo = grupos.groupby(['Categoria', 'etapa_codigo'], as_index=False)['Cantidad'].sum()
+    return conteo[COLUMNAS_CONTEO].astype({'etapa_codigo': 'int64', 'Cantidad': 'int64'})
+
+
+def conteo_etapas_servidor(cliente, sector=None, etapa_codigo=None) -> pd.DataFrame:
+    """Mismo conteo calculado en Postgres (RPC conteo_etapas), filtrado por sector/etapa."""
+    respuesta = cliente.rpc('conteo_etapas', {'p_sector': sector, 'p_etapa': etapa_codigo}).execute()
+    conteo = pd.DataFrame(respuesta.data, columns=['categoria', 'etapa_codigo', 'cantidad'])
+    return conteo.rename(columns={'categoria': 'Categoria', 'cantidad': 'Cantidad'}).astype(
+        {'etapa_codigo': 'int64', 'Cantidad': 'int64'}
+    )
+
+
+def sumar_conteos(*conteos: pd.DataFrame) -> pd.DataFrame:
+    """Suma conteos (Categoria, etapa_codigo, Cantidad) de distintas fuentes."""
+    partes = [c for c in conteos if not c.empty]
+    if not partes:
+        return pd.DataFrame(columns=COLUMNAS_CONTEO)
+    return pd.concat(partes).groupby(['Categoria', 'etapa_codigo'], as_index=False)['Cantidad'].sum()
+
+
+def resumen_grafico(conteo: pd.DataFrame) -> pd.DataFrame:
+    """Agrega nombre de etapa y total por categoría (lo que consume el gráfico apilado)."""
+    resumen = conteo.assign(
+        Etapa=np.asarray(ETAPAS, dtype=object)[conteo['etapa_codigo'].to_numpy(dtype=np.int64)]
+    )
+    return resumen.assign(TotalCategoria=resumen.groupby('Categoria')['Cantidad'].transform('sum'))
@@ -1,186 +1,219 @@
 import streamlit as st
 import pandas as pd
 from supabase import create_client
-from datetime import datetime
-import altair as alt
-import numpy as np
+from datetime import datetime, timedelta, timezone
+
+# graficos (Altair) se importa recién en la pestaña que dibuja: es la importación más lenta
+from agregacion import conteo_etapas_servidor, resumen_grafico, sumar_conteos
+from archivo import (
+    archivar, cargar_archivo, conteo_archivo, leer_resumen, periodos_archivables, periodos_terminados, restaurar,
+)
+from busqueda import FiltrosBusqueda, IndiceBusqueda, filtro_busqueda
+from calidad import RevisorCalidad, pedidos_en_base
+from cache_datos import CacheDataFrames
+from cargador import cargar_pagina, contar_filas, filtro_vista, paginas_dataframe
+from conflictos import USAR, guardar_resolviendo, resolver
+from escritura import MAX_CONCURRENCIA
+from esquema import (
+    AREAS, COLUMNA_MODIFICACION, COLUMNAS_CARGA, COLUMNAS_CATALOGO, COLUMNAS_FECHAS, PERIODOS, SECTORES,
+    SUBSECTORES, VISTA,
+)
+from exportacion import FORMATOS, exportar, trozos_dataframe
+from guardado import calcular_diferencias
+from importacion import EXTENSIONES, importar
+from instrumentacion import ClienteMedido, Medidor, activar, configurar_log, tramo
+from normalizacion import normalizar_datos
+from sincronizacion import INTERVALO_DISCO, Sincronizador
+from snapshots import Materializador, leer_tendencia, materializar, materializar_servidor
+from tablero import codigo_estado, conteo_tablero, filtrar_tablero, kpis_etapas, pagina_editor, preparar_datos
+from tarjetas import CSS_PIPELINE, html_pipeline
+from tiempo_real import Escucha
+from tiempos import GRUPOS, TRAMOS, antiguedad_por_etapa, cuello_de_botella, percentiles_tramos, tiempos_ciclo
 
 # =========================
 # 1) PAGE CONFIG
 # =========================
 st.set_page_config(page_title="PREFACTURAS", layout="wide")
 
+# Tiempos del rerun por sección y requests a Supabase: se registran solo con el panel ⏱️
+# (?perf=1 o secreto PANEL_TIEMPOS) o el log (LOG_TIEMPOS); si no, marcar() no mide requests
+PANEL_TIEMPOS = st.query_params.get("perf") == "1" or st.secrets.get("PANEL_TIEMPOS", False)
+LOG_TIEMPOS = st.secrets.get("LOG_TIEMPOS", False)
+medidor = Medidor()
+# La ContextVar sigue puesta entre reruns del mismo hilo: se limpia explícitamente
+activar(medidor if PANEL_TIEMPOS or LOG_TIEMPOS else None)
+
 # =========================
 # 2) SUPABASE CONNECTION
 # =========================
+medidor.marcar("2) conexión")
 URL = st.secrets["SUPABASE_URL"]
 KEY = st.secrets["SUPABASE_KEY"]
 
 @st.cache_resource
 def init_connection():
-    return create_client(URL, KEY)
+    # Proxy que cuenta filas/bytes/tiempo de cada request cuando hay un medidor activo
+    return ClienteMedido(create_client(URL, KEY))
 
 supabase = init_connection()
 
+@st.cache_resource
+def init_sincronizador():
+    # Snapshot compartido entre sesiones; cada rerun solo baja el delta.
+    # Con SNAPSHOT_DISCO (ruta de archivo) también se guarda en disco y tras un reinicio se parte de ahí.
+    return Sincronizador(
+        supabase, preparar=preparar_medido,
+        ruta_disco=st.secrets.get("SNAPSHOT_DISCO"),
+        intervalo_disco=float(st.secrets.get("SNAPSHOT_DISCO_SEGUNDOS", INTERVALO_DISCO)),
+    )
+
+def preparar_medido(df_crudo: pd.DataFrame) -> pd.DataFrame:
+    with tramo("normalizar + clasificar"):
+        return preparar_datos(df_crudo)
+
 # =========================
 # 3) UI HEADER
 # =========================
+medidor.marcar("3) encabezado")
 st.title("⚡ PREFACTURAS")
-from datetime import datetime, timezone, timedelta
 
 tz_nic = timezone(timedelta(hours=-6))
 st.caption(f"Última actualización: {datetime.now(tz_nic).strftime('%d/%m/%Y %H:%M')}")
 
 
 # --- CSS para KPIs tipo pipeline ---
-st.markdown("""
-<style>
-.pipe-wrap{display:flex; gap:14px; align-items:stretch; margin:12px 0 8px 0; flex-wrap:wrap;}
-.pipe-card{
-  flex:1; min-width:210px;
-  padding:16px 18px; border-radius:16px;
-  border:1px solid rgba(49,51,63,0.15);
-  background: rgba(255,255,255,0.70);
-  box-shadow: 0 1px 2px rgba(0,0,0,0.04);
-}
-.pipe-title{font-size:.85rem; color:#6b7280; font-weight:800; display:flex; gap:8px; align-items:center; flex-wrap:wrap;}
-.pipe-value{font-size:2.0rem; font-weight:900; color:#111827; line-height:1.05; margin-top:6px;}
-.pipe-sub{font-size:.82rem; color:#6b7280; margin-top:6px;}
-.pipe-bar{height:8px; background:rgba(15,23,42,0.08); border-radius:999px; overflow:hidden; margin-top:10px;}
-.pipe-bar span{display:block; height:100%; border-radius:999px;}
-.badge{display:inline-block; padding:2px 10px; border-radius:999px; font-size:.75rem; font-weight:900;}
-.small-muted{color:#6b7280; font-size:.82rem; margin-top:4px;}
-</style>
-""", unsafe_allow_html=True)
+st.markdown(CSS_PIPELINE, unsafe_allow_html=True)
 
 # =========================
 # 4) LOAD DATA
 # =========================
+medidor.marcar("4) carga")
+@st.cache_resource
+def init_cache():
+    # Un solo DataFrame normalizado para todas las sesiones, hasta que venza o se guarde.
+    # Con tiempo real los cambios llegan solos: el refresco por vencimiento es solo la red de seguridad.
+    ttl_defecto = 600 if st.secrets.get("TIEMPO_REAL", False) else 60
+    return CacheDataFrames(
+        ttl_segundos=float(st.secrets.get("CACHE_TTL_SEGUNDOS", ttl_defecto)),
+        max_bytes=int(float(st.secrets.get("CACHE_MAX_MB", 512)) * 1024 * 1024),
+    )
+
 def cargar_datos():
-    response = supabase.table('prefacturas_pedidos').select("*").order('id').execute()
-    return pd.DataFrame(response.data)
-
-df = cargar_datos()
-
-if df.empty:
-    st.warning("⚠️ No se han cargado datos. Revisa tu conexión a Supabase.")
-    st.stop()
-
-# --- Normalizar nombres de columnas ---
-rename_map = {}
-if 'Sector' in df.columns and 'sector' not in df.columns:
-    rename_map['Sector'] = 'sector'
-if 'Subsector' in df.columns and 'subsector' not in df.columns:
-    rename_map['Subsector'] = 'subsector'
-if rename_map:
-    df = df.rename(columns=rename_map)
-
-# --- Validaciones mínimas ---
-if 'sector' not in df.columns:
-    st.error("❌ No encuentro la columna 'sector'. Columnas detectadas: " + str(df.columns.tolist()))
-    st.stop()
-
-# --- Convertir texto a fechas reales ---
-columnas_fechas = [
-    "fecha_elaboracion",
-    "fecha_formato",
-    "fecha_solicitud_modificacion",
-    "fecha_entrega_post_modificacion",
-    "fecha_conciliacion",
-    "fecha_firma_ingenica",
-    "fecha_entrega_final_ingenica_central",
-    "fecha_firma_dnds",
-    "fecha_edicion_pedido"
-]
-for col in columnas_fechas:
-    if col in df.columns:
-        df[col] = pd.to_datetime(df[col], errors='coerce').dt.date
-
-# --- Normalizar columnas tipo catálogo para que calcen con los combobox ---
-for col in ["sector", "subsector", "periodo", "area"]:
-    if col in df.columns:
-        df[col] = (
-            df[col]
-            .fillna("")
-            .astype(str)
-            .str.strip()
-            .str.upper()
-        )
+    # Paginado por id, solo las columnas usadas y solo lo cambiado desde el último refresco
+    with tramo("cargar_datos"):
+        return init_sincronizador().refrescar()
+
+cache = init_cache()
+
+# "local": se descarga la tabla (delta) y todo se filtra en memoria.
+# "servidor": KPIs/gráfico por RPC y el editor trae solo la página visible.
+MODO_SERVIDOR = st.secrets.get("MODO_DATOS", "local") == "servidor"
+
+# Prefacturas cerradas movidas a prefacturas_archivo (sql/007_archivo.sql): no se cargan,
+# pero los totales las suman desde su resumen
+ARCHIVO = st.secrets.get("ARCHIVO", False)
+# Filas archivadas que se muestran en pantalla (la descarga trae todas)
+MAX_FILAS_ARCHIVO = 1000
+
+@st.cache_resource
+def init_materializador():
+    # Snapshots diarios de la tendencia en un hilo por proceso; la pestaña solo lee la tabla.
+    # Con archivo, en la base: el snapshot local ya no tiene las filas archivadas.
+    if MODO_SERVIDOR or ARCHIVO:
+        return Materializador(lambda: materializar_servidor(supabase))
+    return Materializador(lambda: materializar(supabase, init_sincronizador().df))
+
+materializador = init_materializador()
+
+# Cambios de otros usuarios empujados por Supabase Realtime (secreto TIEMPO_REAL)
+@st.cache_resource
+def init_escucha():
+    # Un solo canal por proceso, compartido por todas las sesiones
+    return Escucha.iniciar(supabase, URL, KEY)
+
+escucha = init_escucha() if st.secrets.get("TIEMPO_REAL", False) else None
+if escucha is not None:
+    st.session_state["version_tiempo_real"] = escucha.version
+    if MODO_SERVIDOR:
+        hubo_cambios = bool(escucha.tomar())
+    else:
+        with tramo("tiempo real"):
+            hubo_cambios = escucha.aplicar(init_sincronizador()) > 0
+    if escucha.requiere_refresco():
+        # Hubo un corte: el próximo refresco pide el delta a la base
+        cache.invalidar()
+    elif hubo_cambios:
+        # Conteos, páginas y derivados se recalculan (la tendencia es diaria: se conserva);
+        # en modo local el snapshot ya viene parchado
+        cache.invalidar(conservar=[("tendencia", materializador.version)])
+        if not MODO_SERVIDOR:
+            cache.guardar("prefacturas", init_sincronizador().df)
+    st.sidebar.caption(f"🔴 Tiempo real: {escucha.resumen()}")
+
+if MODO_SERVIDOR:
+    df = None
+    version_snapshot = None
+else:
+    df = cache.obtener("prefacturas", cargar_datos)
+    sincronizador = init_sincronizador()
+    origen = " · arranque desde disco" if sincronizador.arranque == "disco" else ""
+    st.sidebar.caption(f"📡 Carga: {sincronizador.ultima_stats.resumen()}{origen}")
+
+    if df.empty:
+        st.warning("⚠️ No se han cargado datos. Revisa tu conexión a Supabase.")
+        st.stop()
+
+    # Versión de este snapshot: clave de sus derivados en caché (id(df) puede repetirse con otro DataFrame)
+    version_snapshot = sincronizador.version_de(df)
+
+    # --- Validaciones mínimas ---
+    if 'sector' not in df.columns:
+        st.error("❌ No encuentro la columna 'sector'. Columnas detectadas: " + str(df.columns.tolist()))
+        st.stop()
+
+st.sidebar.caption(f"🗃️ Caché: {cache.resumen()}")
+
+# Completa los snapshots que falten sin esperar (en local, recién con el snapshot cargado)
+materializador.pedir()
+
+def derivado_snapshot(clave: tuple, construir):
+    # Derivados de df en caché por versión del snapshot; si df ya no es el vigente
+    # (otra sesión lo reemplazó a mitad del rerun) se arman sin cachear
+    if version_snapshot is None:
+        return construir()
+    return cache.obtener((*clave, version_snapshot), construir)
 
 
 # =========================
 # 5) HELPERS (CYCLE LOGIC)
 # =========================
-def serie_pedido_lleno(df_in: pd.DataFrame) -> pd.Series:
-    """True si pedido NO está vacío (maneja None, '', '   ')."""
-    if 'pedido' not in df_in.columns:
-        return pd.Series([False] * len(df_in), index=df_in.index)
-    return df_in['pedido'].fillna('').astype(str).str.strip().ne('')
-
-def aplicar_filtro_estado(df_in: pd.DataFrame, estado: str) -> pd.DataFrame:
-    """Filtra el dataframe según el estado seleccionado del ciclo."""
-    if estado == "Ver Todo":
-        return df_in
+medidor.marcar("5) helpers")
+# Opciones del radio -> código de etapa (columna etapa_codigo precalculada al cargar)
+def estado_aplicable(df_in: pd.DataFrame, estado: str) -> str:
+    """Devuelve el estado a filtrar, o "Ver Todo" (con aviso) si faltan columnas del ciclo."""
+    if codigo_estado(estado) is None:
+        return estado
 
     # Si faltan columnas críticas, no filtre y avise
     for c in ["fecha_elaboracion", "fecha_conciliacion"]:
         if c not in df_in.columns:
             st.warning(f"⚠️ Falta la columna '{c}'. No se aplicó el filtro de estado.")
-            return df_in
-
-    pedido_lleno = serie_pedido_lleno(df_in)
-
-    if estado == "Pendientes de Elaborar":
-        return df_in[df_in['fecha_elaboracion'].isnull()]
-
-    if estado == "Pendientes de Conciliar":
-        return df_in[
-            df_in['fecha_elaboracion'].notnull() &
-            df_in['fecha_conciliacion'].isnull()
-        ]
-
-    if estado == "Pendientes de Pedido":
-        return df_in[
-            df_in['fecha_conciliacion'].notnull() &
-            (~pedido_lleno)
-        ]
-
-    if estado == "Pedidos Recibidos":
-        return df_in[
-            df_in['fecha_conciliacion'].notnull() &
-            (pedido_lleno)
-        ]
-
-    return df_in
-
-def etapa_excluyente(df_in: pd.DataFrame) -> pd.Series:
-    """Devuelve etapa por fila (excluyente) según ciclo."""
-    pedido_lleno = serie_pedido_lleno(df_in)
-
-    # Si faltan columnas, no romper
-    if 'fecha_elaboracion' not in df_in.columns or 'fecha_conciliacion' not in df_in.columns:
-        return pd.Series(["Sin clasificar"] * len(df_in), index=df_in.index)
-
-    conds = [
-        df_in['fecha_elaboracion'].isnull(),
-        df_in['fecha_elaboracion'].notnull() & df_in['fecha_conciliacion'].isnull(),
-        df_in['fecha_conciliacion'].notnull() & (~pedido_lleno),
-        df_in['fecha_conciliacion'].notnull() & (pedido_lleno),
-    ]
-    etapas = [
-        "Por Elaborar",
-        "Por Conciliar",
-        "Pendiente de Pedido",
-        "Pedido Recibido",
-    ]
-    return pd.Series(np.select(conds, etapas, default="Sin clasificar"), index=df_in.index)
+            return "Ver Todo"
+    return estado
 
 # =========================
 # 6) SIDEBAR FILTERS
 # =========================
+medidor.marcar("6) filtros")
 st.sidebar.header("🎯 Filtros de Gestión")
 
-lista_sectores = ["Todos"] + sorted(df['sector'].dropna().unique().tolist())
+if MODO_SERVIDOR:
+    # Los sectores salen del conteo sin filtros (sector vacío llega como 'Sin dato')
+    conteo_total = cache.obtener(("conteo", "Todos", "Ver Todo"), lambda: conteo_etapas_servidor(supabase))
+    sectores = conteo_total['Categoria'].replace({'Sin dato': ''}).unique().tolist()
+else:
+    sectores = df['sector'].dropna().unique().tolist()
+lista_sectores = ["Todos"] + sorted(sectores)
 filtro_sector = st.sidebar.selectbox("Seleccionar Sector:", lista_sectores)
 
 filtro_estado = st.sidebar.radio(
@@ -191,344 +224,496 @@ filtro_estado = st.sidebar.radio(
 # =========================
 # 7) DATASETS (IMPORTANT!)
 # =========================
-# df_sector: SOLO filtro de sector
-df_sector = df.copy()
-if filtro_sector != "Todos":
-    df_sector = df_sector[df_sector["sector"] == filtro_sector]
-
-# df_vista: sector + estado (lo que seleccionó el usuario)
-df_vista = aplicar_filtro_estado(df_sector, filtro_estado)
-
-# df_tablero: lo que usan KPIs + gráfico (aquí SÍ cambian con el radio)
-df_tablero = df_vista
-
-# df_filtrado: lo que usa la tabla (igual df_vista)
-df_filtrado = df_vista
+medidor.marcar("7) datasets")
+if not MODO_SERVIDOR:
+    # df_vista: sector + estado (lo que seleccionó el usuario; selección por máscara, sin copiar la tabla)
+    df_vista = filtrar_tablero(df, filtro_sector, estado_aplicable(df, filtro_estado))
+
+    # df_tablero: lo que usan KPIs + gráfico (aquí SÍ cambian con el radio)
+    df_tablero = df_vista
+
+    # df_filtrado: lo que usa la tabla (df_vista; la búsqueda de la sección 10 lo acota)
+    df_filtrado = df_vista
+
+# conteo: (Categoria, etapa_codigo, Cantidad) para KPIs + gráfico.
+# En modo servidor lo calcula Postgres (RPC conteo_etapas).
+por_subsector = filtro_sector != "Todos" and (MODO_SERVIDOR or 'subsector' in df.columns)
+if MODO_SERVIDOR:
+    conteo = cache.obtener(
+        ("conteo", filtro_sector, filtro_estado),
+        lambda: conteo_etapas_servidor(
+            supabase,
+            sector=None if filtro_sector == "Todos" else filtro_sector,
+            etapa_codigo=codigo_estado(filtro_estado),
+        ),
+    )
+else:
+    conteo = conteo_tablero(df_tablero, filtro_sector)
+
+# El editor pagina lo abierto (conteo_activo); KPIs y gráfico suman además lo archivado
+conteo_activo = conteo
+if ARCHIVO:
+    resumen_archivo = cache.obtener(("archivo_resumen",), lambda: leer_resumen(supabase))
+    conteo = sumar_conteos(conteo_activo, conteo_archivo(
+        resumen_archivo,
+        sector=None if filtro_sector == "Todos" else filtro_sector,
+        etapa_codigo=codigo_estado(filtro_estado),
+    ))
 
 # =========================
 # 8) KPIs / PIPELINE (df_tablero)
 # =========================
+medidor.marcar("8) KPIs")
 st.header(f"Tablero de Control: {filtro_sector}")
-st.caption(f"Vista: {filtro_estado} | Registros: {len(df_tablero)}")
-
-kpi_total = len(df_tablero)
-pedido_lleno = serie_pedido_lleno(df_tablero)
-
-por_elaborar = df_tablero['fecha_elaboracion'].isnull().sum() if 'fecha_elaboracion' in df_tablero.columns else 0
-por_conciliar = (
-    df_tablero['fecha_elaboracion'].notnull() &
-    df_tablero['fecha_conciliacion'].isnull()
-).sum() if ('fecha_elaboracion' in df_tablero.columns and 'fecha_conciliacion' in df_tablero.columns) else 0
-
-pendiente_pedido = (
-    df_tablero['fecha_conciliacion'].notnull() &
-    (~pedido_lleno)
-).sum() if 'fecha_conciliacion' in df_tablero.columns else 0
-
-pedido_recibido = (
-    df_tablero['fecha_conciliacion'].notnull() &
-    (pedido_lleno)
-).sum() if 'fecha_conciliacion' in df_tablero.columns else 0
-
-sin_clasificar = max(0, kpi_total - (por_elaborar + por_conciliar + pendiente_pedido + pedido_recibido))
-
-def pct(n, d):
-    return (n / d) if d else 0
-
-p1, p2, p3, p4 = (
-    pct(por_elaborar, kpi_total),
-    pct(por_conciliar, kpi_total),
-    pct(pendiente_pedido, kpi_total),
-    pct(pedido_recibido, kpi_total),
+archivadas_vista = int(conteo['Cantidad'].sum()) - int(conteo_activo['Cantidad'].sum())
+st.caption(
+    f"Vista: {filtro_estado} | Registros: {int(conteo['Cantidad'].sum())}"
+    + (f" ({archivadas_vista} archivadas)" if archivadas_vista else "")
 )
 
-st.markdown(f"""
-<div class="pipe-wrap">
-
-  <div class="pipe-card">
-    <div class="pipe-title">📦 Total Prefacturas
-      <span class="badge" style="background:rgba(37,99,235,0.12); color:rgb(37,99,235);">Base</span>
-    </div>
-    <div class="pipe-value">{kpi_total}</div>
-    <div class="pipe-sub">Registros (según filtros)</div>
-    <div class="pipe-bar"><span style="width:100%; background:rgb(37,99,235)"></span></div>
-  </div>
-
-  <div class="pipe-card">
-    <div class="pipe-title">🧾 Etapa 1 · Por Elaborar
-      <span class="badge" style="background:rgba(245,158,11,0.14); color:rgb(161,98,7);">{p1:.0%}</span>
-    </div>
-    <div class="pipe-value">{por_elaborar}</div>
-    <div class="pipe-sub">Sin Elaborar</div>
-    <div class="pipe-bar"><span style="width:{p1*100:.0f}%; background:rgb(245,158,11)"></span></div>
-  </div>
-
-  <div class="pipe-card">
-    <div class="pipe-title">✅ Etapa 2 · Por Conciliar
-      <span class="badge" style="background:rgba(59,130,246,0.14); color:rgb(29,78,216);">{p2:.0%}</span>
-    </div>
-    <div class="pipe-value">{por_conciliar}</div>
-    <div class="pipe-sub">Elaborada y sin Conciliar</div>
-    <div class="pipe-bar"><span style="width:{p2*100:.0f}%; background:rgb(59,130,246)"></span></div>
-  </div>
-
-  <div class="pipe-card">
-    <div class="pipe-title">🧩 Etapa 3 · Pendiente de Pedido
-      <span class="badge" style="background:rgba(168,85,247,0.14); color:rgb(126,34,206);">{p3:.0%}</span>
-    </div>
-    <div class="pipe-value">{pendiente_pedido}</div>
-    <div class="pipe-sub">Conciliada y sin <b>pedido</b></div>
-    <div class="pipe-bar"><span style="width:{p3*100:.0f}%; background:rgb(168,85,247)"></span></div>
-  </div>
-
-  <div class="pipe-card">
-    <div class="pipe-title">📩 Etapa 4 · Pedido Recibido (Final)
-      <span class="badge" style="background:rgba(16,185,129,0.14); color:rgb(4,120,87);">{p4:.0%}</span>
-    </div>
-    <div class="pipe-value">{pedido_recibido}</div>
-    <div class="pipe-sub">Conciliada y con <b>pedido</b></div>
-    <div class="pipe-bar"><span style="width:{p4*100:.0f}%; background:rgb(16,185,129)"></span></div>
-  </div>
-
-</div>
-""", unsafe_allow_html=True)
+# Un solo conteo por etapa (mismo orden que ETAPAS)
+kpis = kpis_etapas(conteo)
+sin_clasificar = kpis[-1]
+
+st.markdown(html_pipeline(kpis), unsafe_allow_html=True)
 
 if sin_clasificar > 0:
     st.warning(f"⚠️ Hay {sin_clasificar} registros 'Sin clasificar' (revisa fechas/pedido).")
 
+@st.cache_resource
+def init_revisor():
+    # Reglas de calidad (calidad.py) del último snapshot, compartidas entre sesiones;
+    # con cada snapshot nuevo solo se revisan las filas nuevas o modificadas
+    return RevisorCalidad()
+
+# Hitos fuera de orden, catálogos fuera de lista y pedidos repetidos (en modo servidor, por página: sección 10)
+if not MODO_SERVIDOR:
+    with tramo("calidad"):
+        calidad_df = init_revisor().revisar(df)
+    con_problemas = calidad_df.en(df_tablero.index).filas
+    if con_problemas:
+        st.warning(
+            f"⚠️ Hay {con_problemas} registros con datos inconsistentes "
+            "(fechas fuera de orden, catálogos o pedidos repetidos): revisa «🧪 Calidad de datos»."
+        )
+
 st.divider()
 
 # =========================
-# 9) STACKED CHART (df_tablero)
+# 9) GRÁFICOS (df_tablero) — pestañas diferidas: solo corre la abierta
 # =========================
-st.subheader("📊 Distribución de la Carga (por etapa)")
-
-df_g = df_tablero.copy()
-df_g['Etapa'] = etapa_excluyente(df_g)
-
-# Cuando hay sector seleccionado => SIEMPRE por subsector (para visualizar Managua DN/DS)
-if filtro_sector != "Todos" and 'subsector' in df_g.columns:
-    col_categoria = 'subsector'
-    etiqueta = 'Subsector'
-else:
-    col_categoria = 'sector'
-    etiqueta = 'Sector'
-
-# Categoria limpia (fallback: si subsector vacío, usa sector)
-cat = df_g[col_categoria].fillna('').astype(str).str.strip() if col_categoria in df_g.columns else pd.Series([''] * len(df_g))
-if col_categoria == 'subsector':
-    cat_sector = df_g['sector'].fillna('Sin dato').astype(str).str.strip()
-    df_g['Categoria'] = np.where(cat != '', cat, cat_sector)
-else:
-    df_g['Categoria'] = np.where(cat != '', cat, 'Sin dato')
-
-resumen = (
-    df_g.groupby(['Categoria', 'Etapa'], as_index=False)
-        .size()
-        .rename(columns={'size': 'Cantidad'})
+medidor.marcar("9) gráfico")
+tab_distribucion, tab_ciclo, tab_tendencia = st.tabs(
+    ["📊 Distribución de la Carga", "⏱️ Tiempos de ciclo", "📈 Evolución"],
+    key="pestana_graficos",
+    on_change="rerun",
 )
 
-tot_cat = resumen.groupby('Categoria', as_index=False)['Cantidad'].sum().rename(columns={'Cantidad': 'TotalCategoria'})
-resumen = resumen.merge(tot_cat, on='Categoria', how='left')
-
-orden_etapas = ["1. Por Elaborar", "2. Por Conciliar", "3. Pendiente de Pedido", "4. Pedido Recibido"]
+with tab_distribucion:
+    if tab_distribucion.open:
+        from graficos import grafico_distribucion
 
-if (resumen['Etapa'] == "Sin clasificar").any():
-    orden_etapas = orden_etapas + ["Sin clasificar"]
+        # Cuando hay sector seleccionado => SIEMPRE por subsector (para visualizar Managua DN/DS)
+        etiqueta = 'Subsector' if por_subsector else 'Sector'
 
-h = max(260, min(520, 60 + 30 * resumen['Categoria'].nunique()))
+        # Categoria limpia (fallback: si subsector vacío, usa sector) ya viene en el conteo
+        resumen = resumen_grafico(conteo)
 
-base = alt.Chart(resumen).encode(
-    y=alt.Y('Categoria:N', sort=alt.SortField(field='TotalCategoria', order='descending'), title=etiqueta),
-    x=alt.X('Cantidad:Q', stack='zero', title='Nº Prefacturas'),
-    color=alt.Color(
-    'Etapa:N',
-    sort=orden_etapas,
-    title='Etapas',
-    scale=alt.Scale(
-        domain=["Por Elaborar", "Por Conciliar", "Pendiente de Pedido", "Pedido Recibido", "Sin clasificar"],
-        range=["#60A5FA", "#1D4ED8", "#EF4444", "#86EFAC", "#9CA3AF"]  # rojo pendiente, verde claro recibido
-    )
-),
-
-    tooltip=[
-        alt.Tooltip('Categoria:N', title=etiqueta),
-        alt.Tooltip('Etapa:N', title='Etapa'),
-        alt.Tooltip('Cantidad:Q', title='Cantidad'),
-        alt.Tooltip('TotalCategoria:Q', title='Total categoría'),
-    ]
-)
-
-barras = base.mark_bar(size=26, cornerRadius=6, stroke='rgba(0,0,0,0.25)', strokeWidth=1)
-labels = base.transform_filter(alt.datum.Cantidad > 0).mark_text(
-    align='left', baseline='middle', dx=6, fontSize=12
-).encode(text='Cantidad:Q')
-
-st.altair_chart((barras + labels).properties(height=h), use_container_width=True)
+        with tramo("altair_chart"):
+            st.altair_chart(grafico_distribucion(resumen, etiqueta), use_container_width=True)
 
 # =========================
-# LISTAS PARA COMBOBOX
+# 9b) TIEMPOS DE CICLO (df_tablero)
 # =========================
-SECTORES = ["MANAGUA", "NORTE", "OCCIDENTE", "ORIENTE", "SUR"]
+medidor.marcar("9b) tiempos de ciclo")
+with tab_ciclo:
+    if tab_ciclo.open and MODO_SERVIDOR:
+        st.info("Disponible en modo local (necesita las fechas de toda la tabla).")
+    elif tab_ciclo.open:
+        from graficos import grafico_tramos
+
+        # Matriz de días por fila: una pasada por snapshot; los filtros solo seleccionan filas
+        tiempos_df = derivado_snapshot(("tiempos",), lambda: tiempos_ciclo(df))
+        tiempos_vista = tiempos_df.loc[df_tablero.index]
+
+        agrupar_por = st.selectbox("Agrupar por", GRUPOS, index=1 if por_subsector else 0)
+        global_tramos = derivado_snapshot(
+            ("tiempos_global", filtro_sector, filtro_estado),
+            lambda: percentiles_tramos(tiempos_vista),
+        )
+        por_grupo = derivado_snapshot(
+            ("tiempos_grupo", filtro_sector, filtro_estado, agrupar_por),
+            lambda: percentiles_tramos(tiempos_vista, df_tablero[agrupar_por]),
+        )
+
+        cuello = cuello_de_botella(global_tramos)
+        if cuello is not None:
+            st.markdown(
+                f"**Cuello de botella:** hasta *{cuello['tramo']}* · mediana {cuello['p50']:.0f} días "
+                f"· p90 {cuello['p90']:.0f} días ({cuello['n']} prefacturas)"
+            )
 
-SUBSECTORES = ["MANAGUA DN", "MANAGUA DS", "NORTE", "OCCIDENTE", "ORIENTE", "SUR"]
+        st.altair_chart(grafico_tramos(global_tramos, TRAMOS), use_container_width=True)
 
-MESES = ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO",
-         "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
-PERIODOS = [f"{m} 1Q" for m in MESES] + [f"{m} 2Q" for m in MESES]
+        st.caption(f"Percentiles (días) por {agrupar_por}")
+        st.dataframe(
+            por_grupo.pivot(index='grupo', columns='tramo', values='p50'),
+            use_container_width=True,
+        )
+        st.dataframe(por_grupo, hide_index=True, use_container_width=True)
 
-AREAS = ["MANTENIMIENTO", "DESARROLLO", "PROYECTOS", "PNESER", "CAMPAÑA", "PSSEN"]
+        st.caption("Antigüedad de lo que sigue abierto (días en la etapa actual)")
+        st.dataframe(
+            antiguedad_por_etapa(tiempos_vista, df_tablero['etapa_codigo']),
+            hide_index=True, use_container_width=True,
+        )
 
+# =========================
+# 9c) TENDENCIA (snapshots diarios)
+# =========================
+medidor.marcar("9c) tendencia")
+with tab_tendencia:
+    tendencia = None
+    if tab_tendencia.open:
+        from graficos import grafico_tendencia
+
+        # Solo lee la tabla de snapshots (días × sectores × etapas); la clave cambia al materializar
+        try:
+            tendencia = cache.obtener(("tendencia", materializador.version), lambda: leer_tendencia(supabase))
+        except Exception as e:
+            st.info(f"Sin snapshots disponibles (¿aplicaste sql/004_snapshots_etapas.sql?): {e}")
+        if materializador.en_curso:
+            st.caption("⏳ Actualizando los snapshots diarios…")
+        elif materializador.error is not None:
+            st.caption(f"⚠️ No se pudieron actualizar los snapshots: {materializador.error}")
+
+    if tendencia is not None:
+        dias_tendencia = st.select_slider("Días", options=[30, 90, 180, 365], value=90)
+        desde_tendencia = pd.Timestamp.now().normalize() - pd.Timedelta(days=dias_tendencia)
+        serie = tendencia[tendencia['dia'] >= desde_tendencia]
+        if filtro_sector != "Todos":
+            serie = serie[serie['sector'] == filtro_sector]
+        codigo_filtro = codigo_estado(filtro_estado)
+        if codigo_filtro is not None:
+            serie = serie[serie['etapa_codigo'] == codigo_filtro]
+        serie = serie.groupby(['dia', 'Etapa'], as_index=False)['cantidad'].sum()
+
+        st.altair_chart(grafico_tendencia(serie), use_container_width=True)
 
 # =========================
 # 10) TABLE (df_filtrado)
 # =========================
+medidor.marcar("10) tabla")
 st.subheader("📝 Gestión de Datos")
 
-configuracion_columnas = {
-    "created_at": None,
-    "id": None,
-
-    "sector": st.column_config.SelectboxColumn(
-        "Sector",
-        options=[""] + SECTORES,
-        help="Selecciona el sector"
-    ),
-    "subsector": st.column_config.SelectboxColumn(
-        "Subsector",
-        options=[""] + SUBSECTORES,
-        help="Selecciona el subsector"
-    ),
-    "periodo": st.column_config.SelectboxColumn(
-        "Periodo",
-        options=[""] + PERIODOS,
-        help="Selecciona el periodo (mes + quincena)"
-    ),
-
-    "sub_area": st.column_config.TextColumn("Sub Área"),
-
-    "fecha_elaboracion": st.column_config.DateColumn("Fecha Elaboración", format="DD/MM/YYYY"),
-    "fecha_formato": st.column_config.DateColumn("Fecha Formato", format="DD/MM/YYYY"),
-    "fecha_solicitud_modificacion": st.column_config.DateColumn("Fecha Sol. Modif.", format="DD/MM/YYYY"),
-    "fecha_entrega_post_modificacion": st.column_config.DateColumn("Fecha Entrega Post Modif.", format="DD/MM/YYYY"),
-    "fecha_conciliacion": st.column_config.DateColumn("Fecha Conciliación", format="DD/MM/YYYY"),
-    "fecha_firma_ingenica": st.column_config.DateColumn("Firma Ingenica", format="DD/MM/YYYY"),
-    "fecha_entrega_final_ingenica_central": st.column_config.DateColumn("Entrega Final Central", format="DD/MM/YYYY"),
-    "fecha_firma_dnds": st.column_config.DateColumn("Firma DNDS", format="DD/MM/YYYY", help="(Opcional)"),
-    "fecha_edicion_pedido": st.column_config.DateColumn("Fecha Edición Pedido", format="DD/MM/YYYY"),
-
-    "area": st.column_config.SelectboxColumn(
-        "Área",
-        options=[""] + AREAS
+@st.cache_resource
+def configuracion_columnas():
+    # Se arma una vez por proceso (data_editor copia lo que modifica)
+    return {
+        "created_at": None,
+        "updated_at": None,
+        "id": None,
+        "calidad": st.column_config.TextColumn(
+            "⚠️ Calidad",
+            disabled=True,
+            help="Reglas de calidad que no cumple la fila (se recalcula al guardar)"
+        ),
+
+        "sector": st.column_config.SelectboxColumn(
+            "Sector",
+            options=[""] + SECTORES,
+            help="Selecciona el sector"
+        ),
+        "subsector": st.column_config.SelectboxColumn(
+            "Subsector",
+            options=[""] + SUBSECTORES,
+            help="Selecciona el subsector"
+        ),
+        "periodo": st.column_config.SelectboxColumn(
+            "Periodo",
+            options=[""] + PERIODOS,
+            help="Selecciona el periodo (mes + quincena)"
+        ),
+
+        "sub_area": st.column_config.TextColumn("Sub Área"),
+
+        "fecha_elaboracion": st.column_config.DateColumn("Fecha Elaboración", format="DD/MM/YYYY"),
+        "fecha_formato": st.column_config.DateColumn("Fecha Formato", format="DD/MM/YYYY"),
+        "fecha_solicitud_modificacion": st.column_config.DateColumn("Fecha Sol. Modif.", format="DD/MM/YYYY"),
+        "fecha_entrega_post_modificacion": st.column_config.DateColumn("Fecha Entrega Post Modif.", format="DD/MM/YYYY"),
+        "fecha_conciliacion": st.column_config.DateColumn("Fecha Conciliación", format="DD/MM/YYYY"),
+        "fecha_firma_ingenica": st.column_config.DateColumn("Firma Ingenica", format="DD/MM/YYYY"),
+        "fecha_entrega_final_ingenica_central": st.column_config.DateColumn("Entrega Final Central", format="DD/MM/YYYY"),
+        "fecha_firma_dnds": st.column_config.DateColumn("Firma DNDS", format="DD/MM/YYYY", help="(Opcional)"),
+        "fecha_edicion_pedido": st.column_config.DateColumn("Fecha Edición Pedido", format="DD/MM/YYYY"),
+
+        "area": st.column_config.SelectboxColumn(
+            "Área",
+            options=[""] + AREAS
+        )
+    }
+
+
+# --- Búsqueda y filtros de la tabla (solo el editor y la exportación; KPIs y gráficos siguen con sector/estado) ---
+col_buscar, col_periodo, col_area, col_subsector = st.columns([2, 1, 1, 1])
+texto_busqueda = col_buscar.text_input("🔎 Buscar pedido o sub área", placeholder="Ej.: PED-12 o SUB-3")
+periodos_busqueda = col_periodo.multiselect("Periodo", PERIODOS)
+areas_busqueda = col_area.multiselect("Área", AREAS)
+subsectores_busqueda = col_subsector.multiselect("Subsector", SUBSECTORES)
+col_fecha, col_rango, _ = st.columns([1, 1, 2])
+fecha_busqueda = col_fecha.selectbox(
+    "Rango de fecha en",
+    [None] + COLUMNAS_FECHAS,
+    format_func=lambda c: "(sin filtro de fecha)" if c is None else configuracion_columnas()[c]["label"],
+)
+rango_busqueda = col_rango.date_input("Entre", value=(), format="DD/MM/YYYY", disabled=fecha_busqueda is None)
+
+filtros_tabla = FiltrosBusqueda(
+    texto=texto_busqueda.strip(),
+    periodos=tuple(periodos_busqueda),
+    areas=tuple(areas_busqueda),
+    subsectores=tuple(subsectores_busqueda),
+    fecha_columna=fecha_busqueda,
+    fecha_desde=rango_busqueda[0] if fecha_busqueda and len(rango_busqueda) > 0 else None,
+    fecha_hasta=rango_busqueda[1] if fecha_busqueda and len(rango_busqueda) > 1 else None,
+)
+
+if MODO_SERVIDOR:
+    # Sector y etapa + búsqueda se filtran en Supabase (vista prefacturas_vista, índices de sql/008)
+    filtros_pagina = filtro_busqueda(filtros_tabla, base=filtro_vista(
+        sector=None if filtro_sector == "Todos" else filtro_sector,
+        etapa_codigo=codigo_estado(filtro_estado),
+    ))
+elif filtros_tabla.activos:
+    # Índice en memoria del snapshot (uno por versión del DataFrame): búsquedas sin recorrer la tabla
+    with tramo("búsqueda"):
+        indice = derivado_snapshot(("indice_busqueda",), lambda: IndiceBusqueda(df))
+        if indice.df is not df:
+            # Un índice armado sobre otro DataFrame devolvería posiciones de otras filas
+            indice = IndiceBusqueda(df)
+        df_filtrado = filtrar_tablero(indice.filtrar(filtros_tabla), filtro_sector, estado_aplicable(df, filtro_estado))
+
+# --- Paginación: solo se trae y se manda al navegador la página visible ---
+if not filtros_tabla.activos:
+    total_filas = int(conteo_activo['Cantidad'].sum())
+elif MODO_SERVIDOR:
+    total_filas = cache.obtener(
+        ("total", filtro_sector, filtro_estado, filtros_tabla),
+        lambda: contar_filas(supabase, filtros=filtros_pagina),
+    )
+else:
+    total_filas = len(df_filtrado)
+col_tam, col_pag, col_info = st.columns([1, 1, 2])
+tam_pagina = col_tam.selectbox("Filas por página", [50, 100, 250, 500, 1000], index=1)
+n_paginas = max(1, -(-total_filas // tam_pagina))
+pagina = int(col_pag.number_input("Página", min_value=1, max_value=n_paginas, value=1, step=1))
+desde = (pagina - 1) * tam_pagina
+
+if MODO_SERVIDOR:
+    df_pagina = cache.obtener(
+        ("pagina", filtro_sector, filtro_estado, filtros_tabla, pagina, tam_pagina),
+        lambda: preparar_datos(cargar_pagina(
+            supabase, pagina - 1, tam_pagina,
+            columnas=COLUMNAS_CARGA + [COLUMNA_MODIFICACION],
+            filtros=filtros_pagina,
+        )[0]),
     )
-}
-
-
-# --- Dataframe para el editor (sin índice visible) ---
-df_editor = df_filtrado.copy().reset_index(drop=True)
-
-# Asegurar columnas existen y normalizar para que calcen con los combobox
-for col in ["sector", "subsector", "periodo", "area"]:
-    if col not in df_editor.columns:
-        df_editor[col] = ""
-    df_editor[col] = (
-        df_editor[col]
-        .fillna("")
-        .astype(str)
-        .str.strip()
-        .str.upper()
+else:
+    df_pagina = df_filtrado.iloc[desde:desde + tam_pagina]
+
+col_info.caption(f"Filas {min(desde + 1, total_filas)}–{min(desde + tam_pagina, total_filas)} de {total_filas}")
+
+# --- Dataframe para el editor (sin índice visible; catálogos ya vienen como categorías) ---
+df_editor = pagina_editor(df_pagina)
+
+# Calidad de la página: en modo local sale del resultado por fila del snapshot;
+# en modo servidor se revisa la página (pedidos repetidos contra la base)
+if MODO_SERVIDOR:
+    calidad_pagina = cache.obtener(
+        ("calidad_pagina", filtro_sector, filtro_estado, filtros_tabla, pagina, tam_pagina),
+        lambda: init_revisor().revisar_filas(df_pagina, en_base=pedidos_en_base(supabase, df_pagina)),
     )
+else:
+    calidad_pagina = calidad_df.en(df_pagina.index)
+# Columna de solo lectura con las reglas que no cumple cada fila; se quita antes de comparar para guardar
+df_editor_vista = df_editor.copy(deep=False)
+df_editor_vista.insert(0, "calidad", calidad_pagina.etiquetas().to_numpy())
+
+# El key cambia con filtros y página para que las ediciones no se apliquen a otras filas
+clave_editor = f"editor_principal_v2_{filtro_sector}_{filtro_estado}_{filtros_tabla.clave()}_{pagina}_{tam_pagina}"
 
+medidor.marcar("10) data_editor")
 df_editado = st.data_editor(
-    df_editor,
-    column_config=configuracion_columnas,
+    df_editor_vista,
+    column_config=configuracion_columnas(),
     hide_index=True,              # ✅ quita el índice (esa era tu “primera columna”)
     use_container_width=True,
     num_rows="dynamic",
-    key="editor_principal_v2"     # ✅ cambia el key para forzar refresh y que aparezcan combos
-)
+    key=clave_editor
+).drop(columns="calidad")
+
+if escucha is not None:
+    @st.fragment(run_every=float(st.secrets.get("TIEMPO_REAL_SEGUNDOS", 3)))
+    def vigilar_cambios():
+        # Solo compara la versión en memoria (no consulta la base); si llegó algo, rerun completo
+        if escucha.version == st.session_state.get("version_tiempo_real"):
+            return
+        ediciones = st.session_state.get(clave_editor, {})
+        if any(ediciones.get(k) for k in ("edited_rows", "added_rows", "deleted_rows")):
+            st.caption("🔔 Otros usuarios hicieron cambios: se verán cuando guardes o descartes tus ediciones.")
+        else:
+            st.rerun(scope="app")
+
+    vigilar_cambios()
+
+# --- Calidad de datos: filas por regla y filas con problemas (celdas resaltadas) ---
+# Filas con problemas que se muestran (el resumen por regla cuenta todas)
+MAX_FILAS_CALIDAD = 1000
+seccion_calidad = st.expander("🧪 Calidad de datos", key="seccion_calidad", on_change="rerun")
+with seccion_calidad:
+    if seccion_calidad.open:
+        if MODO_SERVIDOR:
+            st.caption("En modo servidor se revisa la página visible (pedidos repetidos contra toda la base).")
+            calidad_tabla, filas_calidad = calidad_pagina, df_pagina
+        else:
+            st.caption("Filas de la tabla (sector, estado y búsqueda).")
+            calidad_tabla, filas_calidad = calidad_df.en(df_filtrado.index), df_filtrado
+
+        resumen_calidad = calidad_tabla.resumen()
+        if resumen_calidad.empty:
+            st.success("Sin inconsistencias en estas filas.")
+        else:
+            st.dataframe(
+                resumen_calidad.rename(columns={"regla": "Regla", "filas": "Filas"}),
+                hide_index=True, use_container_width=True,
+            )
+            problemas = calidad_tabla.con_problemas(limite=MAX_FILAS_CALIDAD)
+            columnas_calidad = [
+                c for c in ["id", "pedido"] + COLUMNAS_CATALOGO + COLUMNAS_FECHAS if c in filas_calidad.columns
+            ]
+            tabla_calidad = filas_calidad.loc[problemas.bits.index, columnas_calidad]
+            tabla_calidad.insert(0, "problemas", problemas.etiquetas())
+            st.dataframe(
+                tabla_calidad.style.apply(lambda _: problemas.estilos(tabla_calidad.columns), axis=None),
+                hide_index=True, use_container_width=True,
+            )
+            if calidad_tabla.filas > MAX_FILAS_CALIDAD:
+                st.caption(f"Se muestran las primeras {MAX_FILAS_CALIDAD} de {calidad_tabla.filas} filas con problemas.")
 
 # =========================
 
 # =========================
-# 11) SAVE CHANGES (CORREGIDO)
+# 11) SAVE CHANGES (solo diferencias)
 # =========================
+medidor.marcar("11) guardado")
+# Mensaje del último guardado (sobrevive al st.rerun que refresca los datos)
+if "resultado_guardado" in st.session_state:
+    resumen_guardado, informe_guardado = st.session_state.pop("resultado_guardado")
+    if "conflictos_guardado" in st.session_state:
+        st.info(f"Se guardó lo que no chocaba con otros usuarios ({resumen_guardado}).")
+    else:
+        st.success(f"¡Cambios guardados correctamente! ({resumen_guardado})")
+        st.balloons()
+    st.caption(f"✍️ Escritura: {informe_guardado}")
+
+# Inconsistencias de las filas recién guardadas (se avisa, no se bloquea el guardado)
+if "calidad_guardado" in st.session_state:
+    calidad_guardado = st.session_state.pop("calidad_guardado")
+    st.warning(f"⚠️ {len(calidad_guardado)} de las filas guardadas tienen datos inconsistentes:")
+    st.dataframe(calidad_guardado, hide_index=True, use_container_width=True)
+
+def guardar(diferencias):
+    # Condicionado a la versión (updated_at) cargada: solo se releen las filas rechazadas
+    with tramo("aplicar_diferencias"):
+        resultado = guardar_resolviendo(
+            supabase, diferencias,
+            max_concurrencia=int(st.secrets.get("ESCRITURA_CONCURRENCIA", MAX_CONCURRENCIA)),
+            condicional=st.secrets.get("GUARDADO_CONDICIONAL", True),
+        )
+    # Lo que hay en caché ya no refleja la base: que el próximo rerun lo reconstruya
+    cache.invalidar()
+    if resultado.borradas:
+        st.session_state["borradas_guardado"] = resultado.borradas
+    if not resultado.conflictos.empty:
+        st.session_state["conflictos_guardado"] = resultado.conflictos
+    return resultado
+
+if "borradas_guardado" in st.session_state:
+    st.warning(
+        "⚠️ Otro usuario borró filas que editaste; esos cambios no se guardaron (ids: "
+        + ", ".join(map(str, st.session_state.pop("borradas_guardado"))) + ")."
+    )
+
+if "conflictos_guardado" in st.session_state:
+    conflictos = st.session_state["conflictos_guardado"]
+    st.warning(
+        f"⚠️ {conflictos['id'].nunique()} filas las cambió otro usuario mientras editabas. "
+        "Elige en cada celda qué valor queda: el actual de la base o el tuyo."
+    )
+    resolucion = st.data_editor(
+        conflictos,
+        column_config={
+            "id": st.column_config.NumberColumn("id", disabled=True),
+            "columna": st.column_config.TextColumn("Columna", disabled=True),
+            "cargado": st.column_config.TextColumn("Al cargar", disabled=True),
+            "actual": st.column_config.TextColumn("Base ahora", disabled=True),
+            "mio": st.column_config.TextColumn("Tu valor", disabled=True),
+            "usar": st.column_config.SelectboxColumn("Usar", options=USAR, required=True),
+            "version": None,
+        },
+        hide_index=True,
+        use_container_width=True,
+        key=f"resolucion_conflictos_{id(conflictos)}",
+    )
+    col_aplicar, col_descartar = st.columns(2)
+    if col_aplicar.button("Aplicar resolución"):
+        st.session_state.pop("conflictos_guardado")
+        resultado = guardar(resolver(resolucion))
+        st.session_state["resultado_guardado"] = ("resolución de conflictos", resultado.resumen())
+        st.rerun()
+    if col_descartar.button("Descartar mis cambios en conflicto"):
+        st.session_state.pop("conflictos_guardado")
+        st.rerun()
+
 if st.button("Guardar Cambios en Supabase"):
     try:
-        datos_a_enviar = df_editado.copy()
-
-        # --- 1) Limpiar fechas ---
-        columnas_fechas_guardar = [
-            "fecha_elaboracion", "fecha_formato", "fecha_solicitud_modificacion",
-            "fecha_entrega_post_modificacion", "fecha_conciliacion",
-            "fecha_firma_ingenica", "fecha_entrega_final_ingenica_central",
-            "fecha_firma_dnds", "fecha_edicion_pedido"
-        ]
-
-        for col in columnas_fechas_guardar:
-            if col in datos_a_enviar.columns:
-                datos_a_enviar[col] = pd.to_datetime(datos_a_enviar[col], dayfirst=True, errors='coerce').dt.strftime('%Y-%m-%d')
-
-        # --- 2) CORRECCIÓN PRINCIPAL: Limpiar TODOS los NaN/NaT/inf del DataFrame ---
-        # Reemplazar NaN, NaT, inf, -inf por None en TODO el dataframe
-        datos_a_enviar = datos_a_enviar.replace({
-            np.nan: None, 
-            pd.NaT: None, 
-            float('inf'): None, 
-            float('-inf'): None
-        })
-        
-        # También asegurar que cualquier string 'nan', 'NaT', 'None' quede como None
-        datos_a_enviar = datos_a_enviar.replace(['nan', 'NaT', 'None', '<NA>', ''], None)
-
-        # --- 3) Convertir a diccionario (ahora sin valores nan) ---
-        registros = datos_a_enviar.to_dict('records')
-
-        registros_actualizar = []
-        registros_crear = []
-
-        for reg in registros:
-            nuevo_reg = {}
-            
-            # Limpiar campo por campo para asegurar que no quede ningún nan
-            for key, value in reg.items():
-                # Si es nan (float), convertir a None
-                if isinstance(value, float) and np.isnan(value):
-                    nuevo_reg[key] = None
-                # Si es lista o dict, verificar recursivamente (por si acaso)
-                else:
-                    nuevo_reg[key] = value
-
-            # Manejar el ID para distinguir insert vs update
-            id_val = nuevo_reg.get('id')
-            
-            # Limpiar created_at si está vacío
-            if 'created_at' in nuevo_reg and (nuevo_reg['created_at'] is None or nuevo_reg['created_at'] == ''):
-                del nuevo_reg['created_at']
-
-            # Clasificar
-            if id_val is None or id_val == '' or (isinstance(id_val, float) and np.isnan(id_val)):
-                if 'id' in nuevo_reg:
-                    del nuevo_reg['id']
-                registros_crear.append(nuevo_reg)
+        # Comparar contra el snapshot con que se armó el editor: solo se envía lo que cambió
+        diferencias = calcular_diferencias(df_editor, df_editado)
+
+        if diferencias.vacio:
+            st.info("No hay cambios para guardar.")
+        else:
+            # Solo se revisan las filas nuevas o modificadas (pedidos repetidos contra el resto)
+            ids_editados = [i for grupo in diferencias.modificados for i in grupo["id"]]
+            filas_editadas = df_editado[df_editado["id"].isna() | df_editado["id"].isin(ids_editados)]
+            revision = init_revisor().revisar_filas(
+                filas_editadas,
+                en_base=pedidos_en_base(supabase, filas_editadas) if MODO_SERVIDOR else None,
+            ).con_problemas()
+            if revision.filas:
+                st.session_state["calidad_guardado"] = (
+                    filas_editadas.loc[revision.bits.index, ["id", "pedido"]]
+                    .assign(problemas=revision.etiquetas())
+                )
+
+            informe = guardar(diferencias)
+
+            if informe.fallidos:
+                # Sin rerun: que se vea qué lotes fallaron (los demás ya están en la base)
+                st.error(
+                    f"Se guardaron {informe.filas_ok} filas, pero {len(informe.fallidos)} lotes fallaron. "
+                    "Recarga la página antes de volver a editar esas filas."
+                )
+                st.dataframe(
+                    pd.DataFrame([vars(r) for r in informe.fallidos]),
+                    hide_index=True, use_container_width=True,
+                )
+                st.caption(f"✍️ Escritura: {informe.resumen()}")
             else:
-                # Asegurar que el ID sea entero (no float)
-                if isinstance(id_val, float):
-                    nuevo_reg['id'] = int(id_val)
-                registros_actualizar.append(nuevo_reg)
-
-        # --- 4) Ejecutar operaciones en Supabase ---
-        if len(registros_actualizar) > 0:
-            supabase.table('prefacturas_pedidos').upsert(registros_actualizar).execute()
-
-        if len(registros_crear) > 0:
-            supabase.table('prefacturas_pedidos').insert(registros_crear).execute()
-
-        st.success("¡Cambios guardados correctamente!")
-        st.balloons()
-        import time
-        time.sleep(2)  # Espera 2 segundos para que se vean los globos
-        st.rerun()
+                st.session_state["resultado_guardado"] = (diferencias.resumen(), informe.resumen())
+                # El editor se rearma con lo que quedó en la base (no re-aplica ediciones en conflicto)
+                st.session_state.pop(clave_editor, None)
+                st.rerun()
 
     except Exception as e:
         st.error(f"Error al guardar: {e}")
@@ -536,79 +721,196 @@ if st.button("Guardar Cambios en Supabase"):
         st.code(traceback.format_exc())  # Muestra el detalle completo del error para debug
 
 # =========================
-# 12) EXPORT CSV
+# 12) EXPORT (bajo demanda, en streaming)
 # =========================
+medidor.marcar("12) exportación")
 st.divider()
-csv = df_editado.to_csv(index=False).encode('utf-8')
-st.download_button(
-    label="📥 Descargar Tabla (CSV)",
-    data=csv,
-    file_name='control_entregas_ingenica.csv',
-    mime='text/csv',
-)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+seccion_exportacion = st.expander("📥 Exportar tabla", key="seccion_exportacion", on_change="rerun")
+with seccion_exportacion:
+    if seccion_exportacion.open:
+        col_formato, col_alcance = st.columns(2)
+        formato_export = col_formato.selectbox("Formato de exportación", list(FORMATOS))
+        alcance_export = col_alcance.radio("Exportar", ["Vista filtrada", "Tabla completa"], horizontal=True)
+
+        def generar_exportacion():
+            # Corre solo al hacer clic (en otro hilo); los datos se escriben por trozos
+            if alcance_export == "Tabla completa":
+                trozos = (normalizar_datos(t) for t in paginas_dataframe(supabase, COLUMNAS_CARGA))
+            elif MODO_SERVIDOR:
+                trozos = (
+                    normalizar_datos(t)
+                    for t in paginas_dataframe(supabase, COLUMNAS_CARGA, filtros=filtros_pagina, tabla=VISTA)
+                )
+            else:
+                trozos = trozos_dataframe(df_filtrado)
+            return exportar(trozos, formato_export)
+
+        extension, mime = FORMATOS[formato_export]
+        st.download_button(
+            label=f"📥 Descargar Tabla ({formato_export})",
+            data=generar_exportacion,
+            file_name=f'control_entregas_ingenica{extension}',
+            mime=mime,
+        )
 
+# =========================
+# 13) IMPORT (CSV/XLSX por trozos)
+# =========================
+medidor.marcar("13) importación")
+seccion_importacion = st.expander("📤 Importar prefacturas desde CSV / Excel", key="seccion_importacion", on_change="rerun")
+with seccion_importacion:
+    if seccion_importacion.open:
+        st.caption(
+            "Columnas con los mismos nombres de la tabla (p. ej. sector, subsector, periodo, area, "
+            "pedido, fecha_elaboracion…). Fechas como aaaa-mm-dd o dd/mm/aaaa. "
+            "Las filas con valores fuera de catálogo o fechas inválidas no se importan."
+        )
+        archivo_import = st.file_uploader("Archivo", type=EXTENSIONES, key="archivo_importacion")
+
+        if archivo_import is not None and st.button("Importar archivo"):
+            barra = st.progress(0.0, text="Importando…")
+            es_csv = archivo_import.name.lower().endswith(".csv")
+
+            def al_avanzar(resultado):
+                # En CSV el avance se mide por bytes leídos; en Excel solo se informa el conteo
+                avance = min(archivo_import.tell() / max(archivo_import.size, 1), 1.0) if es_csv else 0.0
+                barra.progress(avance, text=f"Importando… {resultado.resumen()}")
+
+            resultado = None
+            try:
+                resultado = importar(supabase, archivo_import, archivo_import.name, al_avanzar=al_avanzar)
+                barra.progress(1.0, text="Importación terminada")
+                st.success(f"Importación terminada: {resultado.resumen()}")
+            except Exception as e:
+                st.error(f"Error al importar: {e}")
+            finally:
+                # Aunque falle a medias, lo ya insertado está en la base
+                cache.invalidar()
+
+            if resultado is not None:
+                if resultado.columnas_ignoradas:
+                    st.caption("Columnas ignoradas: " + ", ".join(resultado.columnas_ignoradas))
+                if resultado.errores:
+                    errores = resultado.errores_dataframe()
+                    st.warning(f"{resultado.filas_rechazadas} filas rechazadas.")
+                    st.dataframe(errores.head(200), hide_index=True, use_container_width=True)
+                    st.download_button(
+                        "📥 Descargar errores (CSV)",
+                        data=errores.to_csv(index=False).encode("utf-8"),
+                        file_name="errores_importacion.csv",
+                        mime="text/csv",
+                        on_click="ignore",
+                    )
 
+# =========================
+# 13b) ARCHIVO (opt-in: secreto ARCHIVO)
+# =========================
+if ARCHIVO:
+    medidor.marcar("13b) archivo")
+    seccion_archivo = st.expander("🗄️ Archivo de prefacturas cerradas", key="seccion_archivo", on_change="rerun")
+    with seccion_archivo:
+        if "resultado_archivo" in st.session_state:
+            st.success(st.session_state.pop("resultado_archivo"))
+
+        if seccion_archivo.open:
+            por_periodo = resumen_archivo.groupby('periodo')['cantidad'].sum()
+            st.caption(
+                f"{int(por_periodo.sum())} prefacturas archivadas (Pedido Recibido de periodos terminados). "
+                "Los totales del tablero ya las incluyen; aquí se consultan a pedido."
+            )
+
+            # --- Consulta a pedido (solo lo pedido: sector actual + periodos elegidos) ---
+            periodos_ver = st.multiselect(
+                "Ver periodos archivados", por_periodo.index.tolist(),
+                format_func=lambda p: f"{p} ({por_periodo[p]})",
+            )
+            if periodos_ver:
+                archivadas = cache.obtener(
+                    ("archivo", filtro_sector, tuple(sorted(periodos_ver))),
+                    lambda: preparar_datos(cargar_archivo(
+                        supabase,
+                        sector=None if filtro_sector == "Todos" else filtro_sector,
+                        periodos=periodos_ver,
+                    )),
+                )
+                vista_archivo = pagina_editor(archivadas)
+                st.dataframe(
+                    vista_archivo.head(MAX_FILAS_ARCHIVO),
+                    column_config=configuracion_columnas(), hide_index=True, use_container_width=True,
+                )
+                if len(vista_archivo) > MAX_FILAS_ARCHIVO:
+                    st.caption(f"Se muestran {MAX_FILAS_ARCHIVO} de {len(vista_archivo)}; la descarga las trae todas.")
+                st.download_button(
+                    "📥 Descargar archivadas (CSV)",
+                    data=lambda: exportar(trozos_dataframe(vista_archivo), "CSV"),
+                    file_name="prefacturas_archivadas.csv",
+                    mime="text/csv",
+                )
+
+            # --- Mover / devolver ---
+            col_archivar, col_restaurar = st.columns(2)
+            # Solo periodos terminados, con su año (el periodo solo no dice de qué año es)
+            if MODO_SERVIDOR:
+                hoy_archivo = datetime.now(tz_nic).date()
+                anio_archivar = col_archivar.selectbox("Año", list(range(hoy_archivo.year, hoy_archivo.year - 6, -1)))
+                opciones_archivar = periodos_terminados(anio_archivar, hoy_archivo)
+                formato_periodo = lambda p: f"{p[1]} {p[0]}"
+            else:
+                cerradas = periodos_archivables(df, datetime.now(tz_nic).date())
+                opciones_archivar = cerradas.index.tolist()
+                formato_periodo = lambda p: f"{p[1]} {p[0]} ({cerradas[p]} cerradas)"
+            periodos_archivar = col_archivar.multiselect(
+                "Archivar periodos terminados", opciones_archivar, format_func=formato_periodo,
+                help="Solo se mueven las filas conciliadas y con pedido; las abiertas se quedan.",
+            )
+            ids_restaurar = col_restaurar.text_input("Restaurar ids (separados por coma)")
+
+            try:
+                if periodos_archivar and col_archivar.button("Archivar filas cerradas"):
+                    movidas = archivar(supabase, periodos_archivar)
+                    cache.invalidar()
+                    st.session_state["resultado_archivo"] = f"{movidas} prefacturas archivadas."
+                    st.rerun()
+                if ids_restaurar.strip() and col_restaurar.button("Restaurar"):
+                    try:
+                        ids = [int(i) for i in ids_restaurar.replace(" ", "").split(",") if i]
+                    except ValueError:
+                        raise ValueError("Los ids a restaurar tienen que ser números separados por coma.") from None
+                    devueltas = restaurar(supabase, ids)
+                    cache.invalidar()
+                    st.session_state["resultado_archivo"] = f"{devueltas} prefacturas devueltas a la tabla."
+                    st.rerun()
+            except ValueError as e:
+                st.error(str(e))
+            except Exception as e:
+                st.error(f"Error en el archivo: {e}")
 
+# =========================
+# 14) TIEMPOS POR RERUN (opt-in: ?perf=1 o secreto PANEL_TIEMPOS)
+# =========================
+medidor.terminar()
+
+if LOG_TIEMPOS:
+    # Una línea JSON por rerun (logger prefacturas.tiempos)
+    configurar_log()
+    medidor.log()
+
+if PANEL_TIEMPOS:
+    historial = st.session_state.setdefault("historial_tiempos", [])
+    numero = historial[-1]["rerun"] + 1 if historial else 1
+    historial.append({"rerun": numero, **medidor.fila()})
+    del historial[:-int(st.secrets.get("TIEMPOS_RERUNS", 20))]
+
+    with st.sidebar.expander("⏱️ Tiempos por rerun", expanded=True):
+        ultimo = historial[-1]
+        st.caption(
+            f"Último: {ultimo['total ms']:.0f} ms · {ultimo['requests']} requests · "
+            f"{ultimo['filas']} filas · {ultimo['KB']} KB"
+        )
+        # Una columna por rerun (el más reciente primero), una fila por tramo
+        tabla_tiempos = pd.DataFrame(historial[::-1]).set_index("rerun").T
+        tabla_tiempos.columns = [f"#{n}" for n in tabla_tiempos.columns]
+        st.dataframe(tabla_tiempos.fillna("").astype(str), use_container_width=True)
+        if medidor.llamadas:
+            st.caption("Requests del último rerun")
+            st.dataframe(medidor.llamadas_dataframe(), hide_index=True, use_container_width=True)
@@ -0,0 +1,138 @@
+"""Archivo de prefacturas cerradas (sql/007_archivo.sql).
+
+Las filas en Pedido Recibido de periodos terminados se mueven a
+prefacturas_archivo: la carga, el editor y los KPIs trabajan solo con lo
+abierto. Los totales del tablero les suman el resumen precalculado
+(sector × subsector × periodo, unas pocas filas) y las filas archivadas
+se leen solo a pedido.
+
+El periodo ("ENERO 1Q") no trae año: el de cada fila se deduce de
+created_at (el año que deja el mes del periodo a menos de medio año de la
+creación, así DICIEMBRE 2Q creada en enero es del año anterior). Se
+archiva por (año, periodo) y solo si el periodo ya terminó; la función
+de la base vuelve a comprobarlo (sql/007_archivo.sql).
+"""
+import calendar
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from agregacion import COLUMNAS_CONTEO, columna_categoria
+from cargador import leer_paginas, paginas_dataframe
+from esquema import COLUMNAS_CARGA, MESES, PERIODOS, TABLA_RESUMEN_ARCHIVO, VISTA_ARCHIVO
+from etapas import PEDIDO_RECIBIDO
+
+COLUMNAS_RESUMEN = ["sector", "subsector", "periodo", "cantidad"]
+
+
+def _normalizar(periodos) -> list:
+    return sorted({str(p).strip().upper() for p in periodos})
+
+
+def _mes(periodo) -> int:
+    """Mes (1-12) de un periodo "ENERO 1Q"; 0 si no es un periodo."""
+    nombre = str(periodo).strip().upper().split(" ")[0]
+    return MESES.index(nombre) + 1 if nombre in MESES else 0
+
+
+def fin_periodo(anio: int, periodo: str) -> date:
+    """Último día del periodo: el 15 para la 1Q, fin de mes para la 2Q (None si no es un periodo)."""
+    mes = _mes(periodo)
+    if not mes:
+        return None
+    if str(periodo).strip().upper().endswith("1Q"):
+        return date(anio, mes, 15)
+    return date(anio, mes, calendar.monthrange(anio, mes)[1])
+
+
+def terminado(anio: int, periodo: str, hoy: date = None) -> bool:
+    fin = fin_periodo(anio, periodo)
+    return fin is not None and fin < (hoy or date.today())
+
+
+def periodos_terminados(anio: int, hoy: date = None) -> list:
+    """(año, periodo) de ese año que ya terminaron, en orden del calendario."""
+    return [(anio, p) for p in sorted(PERIODOS, key=lambda p: (_mes(p), p)) if terminado(anio, p, hoy)]
+
+
+def anios_periodo(df: pd.DataFrame) -> np.ndarray:
+    """Año del periodo de cada fila según created_at (float, NaN sin fecha o sin periodo)."""
+    creada = pd.to_datetime(df["created_at"], format="ISO8601", errors="coerce", utc=True)
+    mes_creada = creada.dt.month.to_numpy(dtype=np.float64)
+    anio = creada.dt.year.to_numpy(dtype=np.float64)
+    codigos, periodos = pd.factorize(df["periodo"].astype(str))
+    mes = np.append(np.array([_mes(p) for p in periodos], dtype=np.float64), 0)[codigos]
+    anio = anio - (mes - mes_creada > 6) + (mes - mes_creada < -6)
+    return np.where(mes > 0, anio, np.nan)
+
+
+def periodos_archivables(df: pd.DataFrame, hoy: date = None) -> pd.Series:
+    """Filas cerradas por (año, periodo) terminado en el snapshot cargado (lo que archivar() movería)."""
+    cerradas = df[(df["etapa_codigo"] == PEDIDO_RECIBIDO).to_numpy()]
+    claves = pd.DataFrame({
+        "anio": anios_periodo(cerradas),
+        "periodo": cerradas["periodo"].astype(str).to_numpy(),
+    }).dropna()
+    conteo = claves.astype({"anio": "int64"}).value_counts()
+    conteo = conteo[[terminado(a, p, hoy) for a, p in conteo.index]]
+    # Por año y en orden del calendario
+    orden = sorted(range(len(conteo)), key=lambda i: (conteo.index[i][0], _mes(conteo.index[i][1]), conteo.index[i][1]))
+    return conteo.iloc[orden]
+
+
+def archivar(cliente, periodos, hoy: date = None) -> int:
+    """Mueve al archivo las filas cerradas de esos (año, periodo); devuelve cuántas se movieron.
+
+    Un periodo que no terminó es un error (la base tampoco lo movería).
+    """
+    elegidos = sorted({(int(a), str(p).strip().upper()) for a, p in periodos})
+    abiertos = [f"{p} {a}" for a, p in elegidos if not terminado(a, p, hoy)]
+    if abiertos:
+        raise ValueError(f"Periodos sin terminar: {', '.join(abiertos)}")
+    parametros = [{"anio": a, "periodo": p} for a, p in elegidos]
+    return cliente.rpc("archivar_prefacturas", {"p_periodos": parametros}).execute().data
+
+
+def restaurar(cliente, ids) -> int:
+    """Devuelve filas archivadas a la tabla de trabajo (mismo id)."""
+    return cliente.rpc("restaurar_prefacturas", {"p_ids": sorted({int(i) for i in ids})}).execute().data
+
+
+def leer_resumen(cliente) -> pd.DataFrame:
+    """Conteo de lo archivado por (sector, subsector, periodo)."""
+    filas = [
+        fila
+        for pagina in leer_paginas(cliente, ["id"] + COLUMNAS_RESUMEN, tabla=TABLA_RESUMEN_ARCHIVO)
+        for fila in pagina
+    ]
+    return pd.DataFrame(filas, columns=["id"] + COLUMNAS_RESUMEN).drop(columns="id").astype({"cantidad": "int64"})
+
+
+def conteo_archivo(resumen: pd.DataFrame, sector=None, etapa_codigo=None) -> pd.DataFrame:
+    """Lo archivado con la forma de conteo_etapas_* (todo en Pedido Recibido), para sumarlo a los KPIs."""
+    if etapa_codigo is not None and etapa_codigo != PEDIDO_RECIBIDO:
+        return pd.DataFrame(columns=COLUMNAS_CONTEO)
+    if sector is not None:
+        resumen = resumen[resumen["sector"] == sector]
+    if resumen.empty:
+        return pd.DataFrame(columns=COLUMNAS_CONTEO)
+    conteo = (
+        resumen.assign(Categoria=columna_categoria(resumen, sector is not None), etapa_codigo=PEDIDO_RECIBIDO)
+        .groupby(["Categoria", "etapa_codigo"], as_index=False)["cantidad"].sum()
+        .rename(columns={"cantidad": "Cantidad"})
+    )
+    return conteo[COLUMNAS_CONTEO].astype({"etapa_codigo": "int64", "Cantidad": "int64"})
+
+
+def cargar_archivo(cliente, sector=None, periodos=None) -> pd.DataFrame:
+    """Filas archivadas (crudas, por páginas), filtradas en la base por sector y periodos."""
+    def filtros(consulta):
+        if sector is not None:
+            consulta = consulta.eq("sector_norm", sector)
+        if periodos:
+            consulta = consulta.in_("periodo_norm", _normalizar(periodos))
+        return consulta
+
+    trozos = list(paginas_dataframe(cliente, COLUMNAS_CARGA, filtros=filtros, tabla=VISTA_ARCHIVO))
+    return pd.concat(trozos, ignore_index=True) if trozos else pd.DataFrame(columns=COLUMNAS_CARGA)
@@ -0,0 +1,163 @@
+"""Arranque en frío: importaciones y primer rerun de una sesión nueva de app.py.
+
+Cada medición corre en un proceso nuevo (nada importado ni en caché):
+importa los módulos que app.py importa arriba, corre el primer rerun con
+AppTest contra el cliente local y lee los tramos del panel de tiempos.
+"Hasta KPIs" es importar + secciones 2) a 8), lo que tarda en verse el
+tablero. Después abre, una por una, las secciones diferidas (pestañas y
+expanders) para medir lo que cuesta cada una cuando se pide.
+
+Con --altair-al-inicio se importa Altair antes que el resto, como hacía
+app.py antes de diferir los gráficos. Con --snapshot-disco RUTA la app
+guarda el snapshot en disco: una corrida previa (no medida) lo escribe y
+las medidas son arranques en tibio (disco + delta).
+
+Uso: python -m benchmarks.bench_arranque [--filas N] [--repeticiones R] [--altair-al-inicio] [--snapshot-disco RUTA]
+"""
+import argparse
+import ast
+import importlib
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "app.py")
+
+# (clave en session_state, valor que la abre, nombre del tramo que la mide)
+SECCIONES_DIFERIDAS = [
+    ("pestana_graficos", "⏱️ Tiempos de ciclo", "9b) tiempos de ciclo"),
+    ("pestana_graficos", "📈 Evolución", "9c) tendencia"),
+    ("seccion_exportacion", True, "12) exportación"),
+    ("seccion_importacion", True, "13) importación"),
+]
+
+# Tramos de sección de app.py ("2) conexión", "9b) tiempos de ciclo", ...)
+_SECCION = re.compile(r"^(\d+)[a-z]?\) ")
+
+
+def _modulos_app() -> list:
+    """Módulos que app.py importa a nivel superior (los diferidos quedan fuera)."""
+    with open(APP, encoding="utf-8") as f:
+        arbol = ast.parse(f.read())
+    modulos = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Import):
+            modulos += [alias.name for alias in nodo.names]
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module:
+            modulos.append(nodo.module)
+    return list(dict.fromkeys(modulos))
+
+
+def _secciones(fila: dict, hasta: int = None) -> dict:
+    """{tramo: ms} de las secciones de app.py (sin los tramos anidados), opcionalmente hasta la N."""
+    secciones = {}
+    for columna, valor in fila.items():
+        nombre = columna.removesuffix(" ms")
+        coincide = _SECCION.match(nombre)
+        if coincide and (hasta is None or int(coincide.group(1)) <= hasta):
+            secciones[nombre] = valor
+    return secciones
+
+
+def medir_sesion(filas: int, altair_al_inicio: bool, ruta_disco: str = None) -> dict:
+    """Una sesión nueva en este proceso (llamar en un proceso recién creado)."""
+    sys.path.insert(0, RAIZ)
+    inicio = time.perf_counter()
+    if altair_al_inicio:
+        importlib.import_module("altair")
+    for modulo in _modulos_app():
+        importlib.import_module(modulo)
+    importar_ms = (time.perf_counter() - inicio) * 1000
+
+    import supabase
+    from streamlit.testing.v1 import AppTest
+
+    from benchmarks.sintetico import generar_prefacturas
+    from cliente_local import ClienteLocal
+
+    cliente = ClienteLocal(generar_prefacturas(filas))
+    supabase.create_client = lambda url, key: cliente
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.secrets["SUPABASE_URL"] = "local"
+    at.secrets["SUPABASE_KEY"] = "local"
+    at.secrets["PANEL_TIEMPOS"] = True
+    if ruta_disco:
+        at.secrets["SNAPSHOT_DISCO"] = ruta_disco
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    primero = at.session_state["historial_tiempos"][-1]
+
+    diferidas = {}
+    for clave, valor, nombre in SECCIONES_DIFERIDAS:
+        at.session_state[clave] = valor
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        diferidas[nombre] = at.session_state["historial_tiempos"][-1].get(f"{nombre} ms", 0.0)
+        if valor is True:
+            at.session_state[clave] = False
+
+    return {
+        "importar ms": round(importar_ms, 1),
+        "altair cargado": "altair" in sys.modules,
+        "primer rerun ms": primero["total ms"],
+        "hasta KPIs ms": round(importar_ms + sum(_secciones(primero, hasta=8).values()), 1),
+        "secciones": _secciones(primero),
+        "diferidas": diferidas,
+    }
+
+
+def _en_proceso_nuevo(filas: int, altair_al_inicio: bool, ruta_disco: str = None) -> dict:
+    comando = [sys.executable, "-m", "benchmarks.bench_arranque", "--sesion", "--filas", str(filas)]
+    if altair_al_inicio:
+        comando.append("--altair-al-inicio")
+    if ruta_disco:
+        comando += ["--snapshot-disco", ruta_disco]
+    salida = subprocess.run(comando, cwd=RAIZ, capture_output=True, text=True, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main(filas: int, repeticiones: int, altair_al_inicio: bool, ruta_disco: str = None):
+    if ruta_disco:
+        if os.path.exists(ruta_disco):
+            os.remove(ruta_disco)
+        _en_proceso_nuevo(filas, altair_al_inicio, ruta_disco)  # escribe el snapshot
+    corridas = [_en_proceso_nuevo(filas, altair_al_inicio, ruta_disco) for _ in range(repeticiones)]
+    mediana = lambda valores: statistics.median(valores)
+
+    print(f"Sesión nueva en proceso nuevo: {filas:,} filas, mediana de {repeticiones} corridas"
+          + (" (Altair importado al inicio)" if altair_al_inicio else "")
+          + (" (arranque desde snapshot en disco)" if ruta_disco else ""))
+    for clave in ["importar ms", "hasta KPIs ms", "primer rerun ms"]:
+        print(f"  {clave:<28} {mediana(c[clave] for c in corridas):>9.1f}")
+    print(f"  {'Altair tras el primer rerun':<28} {corridas[0]['altair cargado']!s:>9}")
+
+    print("Primer rerun por sección (ms)")
+    for nombre in corridas[0]["secciones"]:
+        print(f"  {nombre:<28} {mediana(c['secciones'].get(nombre, 0.0) for c in corridas):>9.1f}")
+
+    print("Secciones diferidas al abrirlas (ms)")
+    for nombre in corridas[0]["diferidas"]:
+        print(f"  {nombre:<28} {mediana(c['diferidas'][nombre] for c in corridas):>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=20_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--altair-al-inicio", action="store_true")
+    parser.add_argument("--snapshot-disco", metavar="RUTA")
+    parser.add_argument("--sesion", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.sesion:
+        print(json.dumps(medir_sesion(args.filas, args.altair_al_inicio, args.snapshot_disco), ensure_ascii=False))
+    else:
+        main(args.filas, args.repeticiones, args.altair_al_inicio, args.snapshot_disco)
@@ -0,0 +1,87 @@
+"""Búsqueda de la tabla: índice en memoria (busqueda.IndiceBusqueda) contra recorrer el DataFrame.
+
+Para cada consulta compara una máscara de pandas sobre todas las filas
+(str.contains por palabra, isin, comparación de fechas) con el índice
+(prefijos en vocabulario ordenado, posiciones por categoría, fechas
+ordenadas) y comprueba que devuelvan las mismas filas. También mide lo que
+cuesta armar el índice, que se paga una vez por snapshot.
+
+Uso: python -m benchmarks.bench_busqueda [filas] [repeticiones]
+"""
+import statistics
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.sintetico import generar_prefacturas
+from busqueda import COLUMNAS_FILTRO, COLUMNAS_TEXTO, FiltrosBusqueda, IndiceBusqueda, normalizar_texto, palabras
+from tablero import preparar_datos
+
+CONSULTAS = {
+    "pedido exacto": FiltrosBusqueda(texto="PED-4711"),
+    "prefijo corto": FiltrosBusqueda(texto="sub 3"),
+    "periodo × 2": FiltrosBusqueda(periodos=("ENERO 1Q", "MARZO 2Q")),
+    "área + subsector": FiltrosBusqueda(areas=("PNESER",), subsectores=("MANAGUA DN", "NORTE")),
+    "rango de fecha": FiltrosBusqueda(
+        fecha_columna="fecha_conciliacion", fecha_desde=date(2024, 3, 1), fecha_hasta=date(2024, 3, 31),
+    ),
+    "todo junto": FiltrosBusqueda(
+        texto="ped", periodos=("ABRIL 1Q", "ABRIL 2Q"), areas=("MANTENIMIENTO",),
+        fecha_columna="fecha_elaboracion", fecha_desde=date(2024, 6, 1),
+    ),
+}
+
+
+def _recorrer(df: pd.DataFrame, filtros: FiltrosBusqueda) -> np.ndarray:
+    """Posiciones que cumplen los criterios con máscaras sobre todas las filas."""
+    mascara = np.ones(len(df), dtype=bool)
+    if palabras(filtros.texto):
+        texto = df[COLUMNAS_TEXTO[0]].fillna("").astype(str)
+        for columna in COLUMNAS_TEXTO[1:]:
+            texto = texto + " " + df[columna].fillna("").astype(str)
+        texto = texto.map(normalizar_texto)
+        for palabra in palabras(filtros.texto):
+            mascara &= texto.str.contains(rf"(?:^|[\W_]){palabra}", regex=True).to_numpy()
+    for campo, columna in COLUMNAS_FILTRO.items():
+        if getattr(filtros, campo):
+            mascara &= df[columna].isin(getattr(filtros, campo)).to_numpy()
+    if filtros.fecha_columna:
+        fechas = pd.to_datetime(df[filtros.fecha_columna])
+        if filtros.fecha_desde:
+            mascara &= (fechas >= pd.Timestamp(filtros.fecha_desde)).to_numpy()
+        if filtros.fecha_hasta:
+            mascara &= (fechas <= pd.Timestamp(filtros.fecha_hasta)).to_numpy()
+    return np.flatnonzero(mascara)
+
+
+def _medir(funcion, repeticiones: int) -> tuple:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+
+def main(filas: int, repeticiones: int):
+    df = preparar_datos(generar_prefacturas(filas))
+    construir_ms, indice = _medir(lambda: IndiceBusqueda(df), 3)
+
+    print(f"Búsqueda sobre {filas:,} filas (mediana de {repeticiones} corridas)")
+    print(f"  armar índice: {construir_ms:,.1f} ms · {indice.nbytes / 1024 ** 2:,.1f} MB")
+    print(f"  {'consulta':<18} {'filas':>7} {'recorrer ms':>12} {'índice ms':>10} {'x':>7}")
+    for nombre, filtros in CONSULTAS.items():
+        recorrer_ms, esperado = _medir(lambda: _recorrer(df, filtros), repeticiones)
+        indice_ms, obtenido = _medir(lambda: indice.buscar(filtros), repeticiones)
+        assert np.array_equal(esperado, obtenido), nombre
+        print(f"  {nombre:<18} {len(obtenido):>7,} {recorrer_ms:>12.2f} {indice_ms:>10.3f} {recorrer_ms / indice_ms:>7.0f}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 7,
+    )
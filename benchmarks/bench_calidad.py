@@ -0,0 +1,125 @@
+"""Reglas de calidad (calidad.py): máscaras por columna contra revisar fila por fila.
+
+Sobre una tabla sintética con fechas invertidas, catálogos fuera de lista
+y pedidos repetidos sembrados, compara una revisión fila por fila (un bucle
+de Python con las mismas reglas) con la evaluación por columnas de
+RevisorCalidad y comprueba que den los mismos bits. También mide lo que
+cuesta cada rerun (resultado ya calculado + vista y página), un snapshot
+con pocas filas modificadas (solo se evalúan esas) y la revisión de las
+filas editadas al guardar.
+
+Uso: python -m benchmarks.bench_calidad [filas] [repeticiones]
+"""
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.sintetico import generar_prefacturas
+from calidad import REGLAS, RevisorCalidad
+from esquema import CATALOGOS, COLUMNA_MODIFICACION, COLUMNAS_FECHAS
+from tablero import preparar_datos
+
+# Filas modificadas por snapshot y editadas por guardado
+CAMBIADAS = 100
+
+
+def _sembrar(crudo: pd.DataFrame, semilla: int = 1) -> pd.DataFrame:
+    """Inconsistencias en ~1% de las filas por tipo de regla."""
+    rng = np.random.default_rng(semilla)
+    crudo = crudo.copy()
+    n = len(crudo)
+    invertidas = rng.choice(n, n // 100, replace=False)
+    crudo.loc[invertidas, "fecha_conciliacion"] = "2023-01-01"
+    crudo.loc[rng.choice(n, n // 100, replace=False), "periodo"] = "TRECEAVO 1Q"
+    crudo.loc[rng.choice(n, n // 100, replace=False), "area"] = "otra área"
+    copiadas = rng.choice(n, n // 100, replace=False)
+    crudo.loc[copiadas, "pedido"] = [f" ped-{i} " for i in rng.integers(1, n, len(copiadas))]
+    return crudo
+
+
+def _fila_por_fila(df: pd.DataFrame) -> np.ndarray:
+    """Las mismas reglas revisando cada fila con Python (conteo de pedidos en un dict)."""
+    columnas = list(df.columns)
+    pedidos = {}
+    for pedido in df["pedido"]:
+        clave = "" if pd.isna(pedido) else str(pedido).strip().upper()
+        if clave:
+            pedidos[clave] = pedidos.get(clave, 0) + 1
+
+    bits = np.zeros(len(df), dtype=np.uint32)
+    for posicion, fila in enumerate(df.itertuples(index=False, name=None)):
+        valores = dict(zip(columnas, fila))
+        for i, regla in enumerate(REGLAS):
+            if regla.tipo == "orden":
+                anterior, posterior = (valores[c] for c in regla.columnas)
+                violada = pd.notna(anterior) and pd.notna(posterior) and posterior < anterior
+            elif regla.tipo == "catalogo":
+                valor = str(valores[regla.columnas[0]]).strip().upper()
+                violada = valor not in [""] + CATALOGOS[regla.columnas[0]]
+            else:
+                pedido = valores["pedido"]
+                clave = "" if pd.isna(pedido) else str(pedido).strip().upper()
+                violada = bool(clave) and pedidos[clave] > 1
+            if violada:
+                bits[posicion] |= np.uint32(1 << i)
+    return bits
+
+
+def _medir(funcion, repeticiones: int) -> tuple:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+
+def main(filas: int, repeticiones: int):
+    df = preparar_datos(_sembrar(generar_prefacturas(filas)))
+
+    fila_ms, esperado = _medir(lambda: _fila_por_fila(df), 1)
+    completo_ms, resultado = _medir(lambda: RevisorCalidad().revisar(df), repeticiones)
+    assert np.array_equal(esperado, resultado.bits.to_numpy())
+
+    revisor = RevisorCalidad()
+    revisor.revisar(df)
+    vista = df[df["sector"] == "MANAGUA"]
+    rerun_ms, _ = _medir(
+        lambda: (revisor.revisar(df).en(vista.index).filas, revisor.revisar(df).en(vista.index[:100]).etiquetas()),
+        repeticiones,
+    )
+
+    # Snapshot siguiente: CAMBIADAS filas con otra versión (una con una fecha invertida nueva)
+    modificadas = np.random.default_rng(2).choice(filas, CAMBIADAS, replace=False)
+    nuevo = df.copy()
+    nuevo.loc[modificadas, COLUMNA_MODIFICACION] = "2099-01-01T00:00:00+00:00"
+    nuevo.loc[modificadas[0], COLUMNAS_FECHAS[1]] = pd.Timestamp("2000-01-01").date()
+
+    def refrescar():
+        revisor.revisar(df)
+        inicio = time.perf_counter()
+        revisor.revisar(nuevo)
+        return (time.perf_counter() - inicio) * 1000
+    incremental_ms = statistics.median(refrescar() for _ in range(repeticiones))
+    assert revisor.evaluadas == CAMBIADAS
+    assert np.array_equal(revisor.revisar(nuevo).bits.to_numpy(), RevisorCalidad().revisar(nuevo).bits.to_numpy())
+
+    editadas = nuevo.iloc[modificadas]
+    guardado_ms, _ = _medir(lambda: revisor.revisar_filas(editadas), repeticiones)
+
+    print(f"Calidad sobre {filas:,} filas ({len(REGLAS)} reglas, {resultado.filas:,} filas con problemas)")
+    print(f"  fila por fila (Python):              {fila_ms:>10,.1f} ms")
+    print(f"  por columnas, snapshot completo:     {completo_ms:>10,.1f} ms  (x{fila_ms / completo_ms:,.0f})")
+    print(f"  rerun (resultado cacheado + vista):  {rerun_ms:>10,.2f} ms")
+    print(f"  snapshot con {CAMBIADAS} filas cambiadas:   {incremental_ms:>10,.1f} ms")
+    print(f"  guardado, {CAMBIADAS} filas editadas:       {guardado_ms:>10,.1f} ms")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 7,
+    )
@@ -0,0 +1,98 @@
+"""Tiempo y pico de memoria de cada etapa del camino de datos, por tamaño de tabla.
+
+Corre las mismas funciones que app.py (sin Streamlit) contra el cliente
+local en memoria: carga paginada, normalización, clasificación, filtro,
+conteo, página del editor, cálculo de diferencias y guardado.
+
+Uso: python -m benchmarks.bench_camino [filas ...]   (por defecto 1k 10k 100k 1M)
+"""
+import sys
+import time
+import tracemalloc
+
+from benchmarks.sintetico import generar_prefacturas
+from cargador import cargar_paginado
+from cliente_local import ClienteLocal
+from esquema import COLUMNA_MODIFICACION, COLUMNAS_CARGA
+from etapas import clasificar_etapas
+from guardado import aplicar_diferencias, calcular_diferencias
+from normalizacion import normalizar_datos
+from tablero import conteo_tablero, filtrar_tablero, kpis_etapas, pagina_editor
+
+TAM_PAGINA_EDITOR = 100
+SECTOR = "MANAGUA"
+ESTADO = "2. Pendientes de Conciliar"
+
+
+def _medir(funcion, repeticiones: int):
+    """(mejor tiempo en s, pico de memoria en bytes, resultado); el pico se mide en una corrida aparte."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return mejor, pico, resultado
+
+
+def _editar(df_editor):
+    """Simula una edición: cambia el pedido de 10 filas."""
+    editado = df_editor.copy()
+    editado.loc[:9, "pedido"] = "PED-EDITADO"
+    return editado
+
+
+def etapas(n: int):
+    """Lista de (nombre, función) encadenadas: cada una usa el resultado de la anterior."""
+    cliente = ClienteLocal(generar_prefacturas(n))
+    estado = {}
+
+    def cargar():
+        estado["crudo"], _ = cargar_paginado(cliente, COLUMNAS_CARGA + [COLUMNA_MODIFICACION])
+
+    def normalizar():
+        estado["normalizado"] = normalizar_datos(estado["crudo"])
+
+    def clasificar():
+        estado["df"] = clasificar_etapas(estado["normalizado"])
+
+    def filtrar_y_contar():
+        estado["vista"] = filtrar_tablero(estado["df"], SECTOR, ESTADO)
+        estado["conteo"] = conteo_tablero(estado["vista"], SECTOR)
+        kpis_etapas(estado["conteo"])
+
+    def pagina():
+        estado["editor"] = pagina_editor(estado["vista"].iloc[:TAM_PAGINA_EDITOR])
+
+    def diferencias():
+        estado["diferencias"] = calcular_diferencias(estado["editor"], _editar(estado["editor"]))
+
+    def guardar():
+        aplicar_diferencias(cliente, estado["diferencias"])
+
+    return [
+        ("carga paginada", cargar),
+        ("normalizar", normalizar),
+        ("clasificar etapas", clasificar),
+        ("filtro + conteo + KPIs", filtrar_y_contar),
+        ("página del editor", pagina),
+        ("calcular diferencias", diferencias),
+        ("guardar (10 filas)", guardar),
+    ]
+
+
+def main(tamanos):
+    for n in tamanos:
+        repeticiones = 1 if n >= 500_000 else 3
+        print(f"\nTabla sintética: {n:,} filas")
+        print(f"{'etapa':<24} {'ms':>10} {'pico MB':>9}")
+        for nombre, funcion in etapas(n):
+            tiempo, pico, _ = _medir(funcion, repeticiones)
+            print(f"{nombre:<24} {tiempo * 1000:>10.1f} {pico / 1024 ** 2:>9.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000, 1_000_000])
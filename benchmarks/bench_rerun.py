@@ -0,0 +1,91 @@
+"""Benchmark de memoria y latencia del camino de datos de un rerun (tabla sintética).
+
+Compara el camino anterior (catálogos como texto, df.copy() por rerun,
+Categoria armada con str.* sobre todas las filas y catálogos
+re-normalizados para el editor) con el actual (categorías normalizadas
+una sola vez, selección por máscara y conteo agrupado por código).
+
+Uso: python -m benchmarks.bench_rerun [filas]
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from agregacion import conteo_etapas_local
+from benchmarks.sintetico import generar_prefacturas
+from esquema import COLUMNAS_CATALOGO
+from etapas import COLUMNAS_ETAPA, clasificar_etapas
+from normalizacion import normalizar_datos
+
+TAM_PAGINA = 100
+
+
+def _normalizar_anterior(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalización previa: catálogos como texto (object)."""
+    df = normalizar_datos(df)
+    for col in COLUMNAS_CATALOGO:
+        df[col] = df[col].astype(object)
+    return df
+
+
+def _rerun_anterior(df: pd.DataFrame, sector: str):
+    df_sector = df.copy()
+    if sector != "Todos":
+        df_sector = df_sector[df_sector["sector"] == sector]
+    por_subsector = sector != "Todos"
+    col = 'subsector' if por_subsector else 'sector'
+    cat = df_sector[col].fillna('').astype(str).str.strip()
+    if por_subsector:
+        cat_sector = df_sector['sector'].fillna('Sin dato').astype(str).str.strip()
+        categoria = np.where(cat != '', cat, cat_sector)
+    else:
+        categoria = np.where(cat != '', cat, 'Sin dato')
+    conteo = pd.DataFrame({'Categoria': categoria, 'etapa_codigo': df_sector['etapa_codigo'].to_numpy()}) \
+        .groupby(['Categoria', 'etapa_codigo'], as_index=False).size()
+    df_editor = df_sector.copy().reset_index(drop=True).iloc[:TAM_PAGINA].drop(columns=COLUMNAS_ETAPA)
+    for c in COLUMNAS_CATALOGO:
+        df_editor[c] = df_editor[c].fillna("").astype(str).str.strip().str.upper()
+    return conteo, df_editor
+
+
+def _rerun_actual(df: pd.DataFrame, sector: str):
+    df_sector = df if sector == "Todos" else df[df["sector"] == sector]
+    conteo = conteo_etapas_local(df_sector, sector != "Todos")
+    df_editor = df_sector.iloc[:TAM_PAGINA].drop(columns=COLUMNAS_ETAPA).reset_index(drop=True)
+    return conteo, df_editor
+
+
+def _medir(funcion, *args, repeticiones: int = 5):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(*args)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    tracemalloc.start()
+    funcion(*args)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return mejor, pico
+
+
+def main(n: int):
+    crudo = generar_prefacturas(n)
+    df_anterior = clasificar_etapas(_normalizar_anterior(crudo))
+    df_actual = clasificar_etapas(normalizar_datos(crudo))
+    mb = lambda b: b / 1024 ** 2
+
+    print(f"Tabla sintética: {n:,} filas")
+    print(f"  DataFrame en memoria  anterior {mb(df_anterior.memory_usage(deep=True).sum()):8.1f} MB"
+          f" | actual {mb(df_actual.memory_usage(deep=True).sum()):8.1f} MB")
+    print(f"{'sector':>10} {'anterior ms':>12} {'pico MB':>8} {'actual ms':>10} {'pico MB':>8}")
+    for sector in ["Todos", "MANAGUA", "SUR"]:
+        t_a, m_a = _medir(_rerun_anterior, df_anterior, sector)
+        t_n, m_n = _medir(_rerun_actual, df_actual, sector)
+        print(f"{sector:>10} {t_a * 1000:>12.1f} {mb(m_a):>8.1f} {t_n * 1000:>10.1f} {mb(m_n):>8.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
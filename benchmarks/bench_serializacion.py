@@ -0,0 +1,58 @@
+"""Micro-benchmark: serialización vectorizada vs. el bucle celda por celda anterior.
+
+Uso: python -m benchmarks.bench_serializacion [filas ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.sintetico import generar_prefacturas
+from normalizacion import normalizar_datos
+from serializacion import serializar_registros
+
+
+def _preparar_registros_anterior(datos_a_enviar: pd.DataFrame) -> list:
+    """Copia del guardado original (sección 11 de app.py) como referencia."""
+    for col in [c for c in datos_a_enviar.columns if c.startswith("fecha_")]:
+        datos_a_enviar[col] = pd.to_datetime(datos_a_enviar[col], dayfirst=True, errors='coerce').dt.strftime('%Y-%m-%d')
+    datos_a_enviar = datos_a_enviar.replace({np.nan: None, pd.NaT: None, float('inf'): None, float('-inf'): None})
+    datos_a_enviar = datos_a_enviar.replace(['nan', 'NaT', 'None', '<NA>', ''], None)
+    registros = []
+    for reg in datos_a_enviar.to_dict('records'):
+        nuevo_reg = {}
+        for key, value in reg.items():
+            if isinstance(value, float) and np.isnan(value):
+                nuevo_reg[key] = None
+            else:
+                nuevo_reg[key] = value
+        if 'created_at' in nuevo_reg and (nuevo_reg['created_at'] is None or nuevo_reg['created_at'] == ''):
+            del nuevo_reg['created_at']
+        id_val = nuevo_reg.get('id')
+        if isinstance(id_val, float):
+            nuevo_reg['id'] = int(id_val)
+        registros.append(nuevo_reg)
+    return registros
+
+
+def _medir(funcion, repeticiones: int = 3) -> float:
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main(tamanos):
+    print(f"{'filas':>9} {'anterior (s)':>13} {'vectorizado (s)':>16} {'x':>6}")
+    for n in tamanos:
+        df = normalizar_datos(generar_prefacturas(n))
+        t_anterior = _medir(lambda: _preparar_registros_anterior(df.copy()))
+        t_nuevo = _medir(lambda: serializar_registros(df))
+        print(f"{n:>9} {t_anterior:>13.3f} {t_nuevo:>16.3f} {t_anterior / t_nuevo:>6.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000])
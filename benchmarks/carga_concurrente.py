@@ -0,0 +1,116 @@
+"""Prueba de carga: N sesiones concurrentes repitiendo el rerun del tablero.
+
+Cada sesión es un hilo (como en el servidor de Streamlit) que comparte,
+igual que app.py, un CacheDataFrames y un Sincronizador sobre el mismo
+cliente. Cada rerun elige sector y estado al azar, pide el snapshot a la
+caché, filtra, cuenta, arma la página del editor y, cada tanto, guarda
+una edición (lo que invalida la caché para todos). El cliente local
+simula la latencia de red de cada request.
+
+Uso: python -m benchmarks.carga_concurrente [sesiones ...] [--filas N] [--reruns R] [--latencia S] [--objetivo S]
+"""
+import argparse
+import random
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.sintetico import generar_prefacturas
+from cache_datos import CacheDataFrames
+from cliente_local import ClienteLocal
+from esquema import SECTORES
+from guardado import aplicar_diferencias, calcular_diferencias
+from sincronizacion import Sincronizador
+from tablero import conteo_tablero, filtrar_tablero, kpis_etapas, pagina_editor, preparar_datos
+
+ESTADOS = ["Ver Todo", "1. Pendientes de Elaborar", "2. Pendientes de Conciliar",
+           "3. Pendientes de Pedido", "4. Pedidos Recibidos"]
+TAM_PAGINA_EDITOR = 100
+
+# Uno de cada tantos reruns guarda una edición
+CADA_CUANTOS_GUARDA = 20
+
+
+def _rerun(cliente, cache, sincronizador, rng: random.Random, guarda: bool):
+    df = cache.obtener("prefacturas", sincronizador.refrescar)
+    sector = rng.choice(["Todos"] + SECTORES)
+    vista = filtrar_tablero(df, sector, rng.choice(ESTADOS))
+    kpis_etapas(conteo_tablero(vista, sector))
+    editor = pagina_editor(vista.iloc[:TAM_PAGINA_EDITOR])
+    if guarda and not editor.empty:
+        editado = editor.copy()
+        editado.loc[:4, "sub_area"] = f"SUB-{rng.randint(1, 999)}"
+        aplicar_diferencias(cliente, calcular_diferencias(editor, editado))
+        cache.invalidar()
+
+
+def simular(sesiones: int, filas: int, reruns: int, latencia: float, semilla: int = 0) -> dict:
+    """Corre `sesiones` hilos con `reruns` reruns cada uno; devuelve latencias y errores."""
+    cliente = ClienteLocal(generar_prefacturas(filas), latencia=latencia)
+    cache = CacheDataFrames(ttl_segundos=60)
+    sincronizador = Sincronizador(cliente, preparar=preparar_datos)
+    cache.obtener("prefacturas", sincronizador.refrescar)  # arranque en frío fuera de la medición
+
+    latencias, errores = [], []
+    lock = threading.Lock()
+    barrera = threading.Barrier(sesiones)
+
+    def sesion(numero: int):
+        rng = random.Random(semilla + numero)
+        barrera.wait()
+        for i in range(reruns):
+            inicio = time.perf_counter()
+            try:
+                _rerun(cliente, cache, sincronizador, rng, guarda=(i + numero) % CADA_CUANTOS_GUARDA == 0)
+            except Exception as e:
+                with lock:
+                    errores.append(repr(e))
+                continue
+            with lock:
+                latencias.append(time.perf_counter() - inicio)
+
+    hilos = [threading.Thread(target=sesion, args=(n,)) for n in range(sesiones)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.perf_counter() - inicio
+
+    valores = np.array(latencias) if latencias else np.array([np.nan])
+    return {
+        "sesiones": sesiones,
+        "reruns": len(latencias),
+        "errores": errores,
+        "reruns_por_s": len(latencias) / total if total else 0.0,
+        "p50": float(np.percentile(valores, 50)),
+        "p95": float(np.percentile(valores, 95)),
+        "max": float(np.max(valores)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sesiones", nargs="*", type=int, default=[1, 5, 10, 25, 50])
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--reruns", type=int, default=20, help="reruns por sesión")
+    parser.add_argument("--latencia", type=float, default=0.05, help="segundos por request")
+    parser.add_argument("--objetivo", type=float, default=2.0, help="p95 máximo aceptable (s)")
+    args = parser.parse_args()
+
+    print(f"Tabla sintética: {args.filas:,} filas · {args.reruns} reruns por sesión · latencia {args.latencia * 1000:.0f} ms")
+    print(f"{'sesiones':>8} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'máx ms':>8} {'errores':>8}")
+    for sesiones in args.sesiones:
+        r = simular(sesiones, args.filas, args.reruns, args.latencia)
+        aviso = "  ⚠ supera el objetivo" if r["p95"] > args.objetivo or r["errores"] else ""
+        print(
+            f"{r['sesiones']:>8} {r['reruns_por_s']:>9.1f} {r['p50'] * 1000:>8.0f} {r['p95'] * 1000:>8.0f} "
+            f"{r['max'] * 1000:>8.0f} {len(r['errores']):>8}{aviso}"
+        )
+        if r["errores"]:
+            print(f"         primer error: {r['errores'][0]}")
+
+
+if __name__ == "__main__":
+    main()
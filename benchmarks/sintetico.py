@@ -0,0 +1,43 @@
+"""Tablas sintéticas de prefacturas_pedidos para los benchmarks."""
+import numpy as np
+import pandas as pd
+
+from esquema import AREAS, COLUMNAS_FECHAS, PERIODOS, SECTORES
+
+
+def generar_prefacturas(n: int, semilla: int = 0) -> pd.DataFrame:
+    """DataFrame crudo como el que devuelve Supabase (fechas como texto ISO o None).
+
+    Los hitos avanzan en orden: cada fila llega hasta una etapa al azar y
+    las fechas posteriores quedan vacías; parte de los catálogos viene en
+    minúsculas o con espacios, como en los datos reales.
+    """
+    rng = np.random.default_rng(semilla)
+    sector = rng.choice(SECTORES, n)
+    subsector = np.where(
+        sector == "MANAGUA", rng.choice(["MANAGUA DN", "MANAGUA DS"], n), sector
+    ).astype(object)
+    sucio = rng.random(n) < 0.1
+    subsector[sucio] = [f" {s.lower()} " for s in subsector[sucio]]
+
+    inicio = np.datetime64("2024-01-01") + rng.integers(0, 540, n).astype("timedelta64[D]")
+    avance = rng.integers(0, len(COLUMNAS_FECHAS) + 1, n)
+    datos = {
+        "id": np.arange(1, n + 1),
+        "created_at": np.datetime_as_string(inicio, unit="s").astype(object) + "+00:00",
+        "sector": sector.astype(object),
+        "subsector": subsector,
+        "periodo": rng.choice(PERIODOS, n).astype(object),
+        "area": rng.choice(AREAS, n).astype(object),
+        "sub_area": np.char.add("SUB-", rng.integers(1, 400, n).astype(str)).astype(object),
+    }
+    dias = np.cumsum(rng.integers(0, 12, (n, len(COLUMNAS_FECHAS))), axis=1)
+    for i, col in enumerate(COLUMNAS_FECHAS):
+        fechas = np.datetime_as_string(inicio + dias[:, i].astype("timedelta64[D]")).astype(object)
+        fechas[avance <= i] = None
+        datos[col] = fechas
+    pedido = np.char.add("PED-", np.arange(1, n + 1).astype(str)).astype(object)
+    pedido[(avance < 5) | (rng.random(n) < 0.3)] = None
+    datos["pedido"] = pedido
+    datos["updated_at"] = datos["created_at"]
+    return pd.DataFrame(datos)
@@ -0,0 +1,240 @@
+"""Búsqueda y filtros de la tabla: pedido/sub área, periodo, área, subsector y rangos de fecha.
+
+Los mismos criterios se resuelven de dos formas:
+
+- en memoria (modo local), con un IndiceBusqueda armado una vez por
+  snapshot: posiciones agrupadas por código de categoría, fechas ordenadas
+  (búsqueda binaria por rango) y un índice de palabras de pedido y sub área
+  con vocabulario ordenado (búsqueda por prefijo). Cada consulta cuesta
+  O(log n) más lo que devuelve cada índice, sin recorrer la tabla;
+- en Supabase (modo servidor), como filtros sobre prefacturas_vista
+  cubiertos por los índices de sql/008_busqueda.sql.
+
+Texto: cada palabra buscada debe ser prefijo de alguna palabra del pedido
+o de la sub área ("ped 12" encuentra "PED-1203"), igual que
+to_tsquery('simple', 'ped:* & 12:*') en Postgres. Las palabras salen de
+normalizar_texto en los dos modos (public.texto_busqueda en la base): sin
+acentos, en minúsculas y separadas por cualquier signo, así "campana" y
+"ped-12" encuentran "CAMPAÑA" y "PED-1203" en memoria y en Supabase.
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from esquema import COLUMNAS_FECHAS
+from normalizacion import fechas_en_dias
+
+# Columnas de texto que cubre la búsqueda (columna busqueda de la vista)
+COLUMNAS_TEXTO = ["pedido", "sub_area"]
+
+# Catálogos filtrables: campo de FiltrosBusqueda -> columna
+COLUMNAS_FILTRO = {"periodos": "periodo", "areas": "area", "subsectores": "subsector"}
+
+# Acentos que se quitan antes de separar palabras: el mismo translate() de
+# public.texto_busqueda (sql/008_busqueda.sql), carácter por carácter
+CON_ACENTO = "ÁÀÂÄÃÉÈÊËÍÌÎÏÓÒÔÖÕÚÙÛÜÑÇáàâäãéèêëíìîïóòôöõúùûüñç"
+SIN_ACENTO = "AAAAAEEEEIIIIOOOOOUUUUNCaaaaaeeeeiiiiooooouuuunc"
+_SIN_ACENTOS = str.maketrans(CON_ACENTO, SIN_ACENTO)
+
+# Palabras: letras y dígitos; todo lo demás ("-", ".", "_", "/") separa, como
+# el regexp_replace('[^[:alnum:]]+', ' ') de public.texto_busqueda
+_PALABRA = re.compile(r"[^\W_]+")
+
+
+def normalizar_texto(texto) -> str:
+    """Texto sin acentos y en minúsculas (lower(translate(...)) de public.texto_busqueda)."""
+    return str(texto).translate(_SIN_ACENTOS).lower()
+
+
+def palabras(texto: str) -> list:
+    """Palabras normalizadas de un texto (tokens de la búsqueda)."""
+    return _PALABRA.findall(normalizar_texto(texto))
+
+
+@dataclass(frozen=True)
+class FiltrosBusqueda:
+    """Criterios de la tabla; vacíos = sin filtro. Inmutable para usarlo en claves de caché."""
+    texto: str = ""
+    periodos: tuple = ()
+    areas: tuple = ()
+    subsectores: tuple = ()
+    fecha_columna: str = None
+    fecha_desde: date = None
+    fecha_hasta: date = None
+
+    @property
+    def activos(self) -> bool:
+        return bool(
+            palabras(self.texto) or self.periodos or self.areas or self.subsectores
+            or (self.fecha_columna and (self.fecha_desde or self.fecha_hasta))
+        )
+
+    def clave(self) -> str:
+        """Texto corto y estable que identifica los criterios (p. ej. para el key del editor)."""
+        return hashlib.sha1(repr(self).encode()).hexdigest()[:10]
+
+
+def consulta_texto(texto: str) -> str:
+    """Consulta to_tsquery con prefijos: "ped 12" -> "ped:* & 12:*"."""
+    return " & ".join(f"{p}:*" for p in palabras(texto))
+
+
+def filtro_busqueda(filtros: FiltrosBusqueda, base=None):
+    """Los criterios como filtros de PostgREST sobre VISTA (compone con otro filtro, p. ej. filtro_vista)."""
+    def aplicar(consulta):
+        if base is not None:
+            consulta = base(consulta)
+        if palabras(filtros.texto):
+            consulta = consulta.filter("busqueda", "fts(simple)", consulta_texto(filtros.texto))
+        for campo, columna in COLUMNAS_FILTRO.items():
+            valores = getattr(filtros, campo)
+            if valores:
+                consulta = consulta.in_(f"{columna}_norm", list(valores))
+        if filtros.fecha_columna:
+            if filtros.fecha_desde:
+                consulta = consulta.gte(filtros.fecha_columna, filtros.fecha_desde.isoformat())
+            if filtros.fecha_hasta:
+                consulta = consulta.lte(filtros.fecha_columna, filtros.fecha_hasta.isoformat())
+        return consulta
+    return aplicar
+
+
+def _agrupar(codigos: np.ndarray, n_grupos: int):
+    """Posiciones ordenadas por código (estable: ascendentes dentro de cada grupo) y límites de cada grupo."""
+    orden = np.argsort(codigos, kind="stable")
+    limites = np.searchsorted(codigos[orden], np.arange(n_grupos + 1))
+    return orden, limites
+
+
+class IndiceBusqueda:
+    """Índices en memoria sobre un DataFrame preparado (el snapshot de la caché).
+
+    Devuelve posiciones (iloc) de ese DataFrame: se arma de nuevo cuando
+    cambia el snapshot (la app lo cachea por versión del snapshot). Guarda
+    la referencia al DataFrame y la app comprueba `indice.df is df` antes de
+    usarlo.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.n = len(df)
+        self._catalogos = {}
+        self._fechas = {}
+
+        for columna in COLUMNAS_FILTRO.values():
+            if columna in df.columns and isinstance(df[columna].dtype, pd.CategoricalDtype):
+                categorias = df[columna].cat.categories
+                codigos = df[columna].cat.codes.to_numpy()
+                self._catalogos[columna] = (categorias, *_agrupar(codigos, len(categorias)))
+
+        for columna in COLUMNAS_FECHAS:
+            if columna in df.columns:
+                valores = fechas_en_dias(df[columna])
+                presentes = np.flatnonzero(~np.isnat(valores))
+                orden = np.argsort(valores[presentes], kind="stable")
+                self._fechas[columna] = (valores[presentes][orden], presentes[orden])
+
+        self._vocabulario, self._posiciones_palabra, self._limites_palabra = self._indice_texto(df)
+
+    @staticmethod
+    def _indice_texto(df: pd.DataFrame):
+        """Vocabulario ordenado y, por palabra, las posiciones donde aparece (contiguas).
+
+        Se tokeniza cada valor distinto una vez (sub_area se repite mucho) y
+        los pares (fila, palabra) se arman con aritmética de arreglos.
+        """
+        filas, palabras_fila = [], []
+        for columna in [c for c in COLUMNAS_TEXTO if c in df.columns]:
+            codigos, valores = pd.factorize(df[columna].fillna("").astype(str))
+            tokens = pd.Series(valores.str.translate(_SIN_ACENTOS).str.lower().str.findall(_PALABRA.pattern))
+            tokens = tokens.explode().dropna()
+            # tokens del valor v: tokens.iloc[inicio[v]:inicio[v] + cantidad[v]] (explode conserva el orden)
+            cantidad = np.bincount(tokens.index.to_numpy(dtype=np.int64), minlength=len(valores))
+            inicio = np.concatenate([[0], np.cumsum(cantidad)[:-1]])
+            por_fila = cantidad[codigos]
+            fila = np.repeat(np.arange(len(df), dtype=np.int64), por_fila)
+            desplazamiento = np.arange(len(fila)) - np.repeat(np.cumsum(por_fila) - por_fila, por_fila)
+            filas.append(fila)
+            palabras_fila.append(tokens.to_numpy(dtype=object)[inicio[codigos[fila]] + desplazamiento])
+        if not filas:
+            return np.array([], dtype=object), np.array([], dtype=np.int64), np.zeros(1, dtype=np.int64)
+
+        codigos, vocabulario = pd.factorize(np.concatenate(palabras_fila), sort=True)
+        orden, limites = _agrupar(codigos, len(vocabulario))
+        return np.asarray(vocabulario, dtype=object), np.concatenate(filas)[orden], limites
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria de los arreglos del índice (sin contar el DataFrame)."""
+        arreglos = [self._posiciones_palabra, self._limites_palabra]
+        arreglos += [a for _, orden, limites in self._catalogos.values() for a in (orden, limites)]
+        arreglos += [a for par in self._fechas.values() for a in par]
+        texto = sum(len(p) for p in self._vocabulario) + 8 * len(self._vocabulario)
+        return int(sum(a.nbytes for a in arreglos) + texto)
+
+    # --- búsquedas ---
+    # Cada criterio da posiciones "crudas" (sin ordenar, quizá repetidas) sacadas
+    # de los índices sin recorrer la tabla; buscar() parte del más selectivo y
+    # descarta candidatos con una marca por criterio: O(resultado + crudas).
+    def _crudas_texto(self, palabra: str) -> np.ndarray:
+        """Filas con alguna palabra que empieza por `palabra` (un rango del vocabulario ordenado)."""
+        desde = np.searchsorted(self._vocabulario, palabra, side="left")
+        hasta = np.searchsorted(self._vocabulario, palabra + "\U0010ffff", side="left")
+        return self._posiciones_palabra[self._limites_palabra[desde]:self._limites_palabra[hasta]]
+
+    def _crudas_catalogo(self, columna: str, valores) -> np.ndarray:
+        """Filas cuya columna catálogo es alguno de los valores."""
+        if columna not in self._catalogos:
+            return np.array([], dtype=np.int64)
+        categorias, orden, limites = self._catalogos[columna]
+        codigos = [c for c in categorias.get_indexer(list(valores)) if c >= 0]
+        return np.concatenate([orden[limites[c]:limites[c + 1]] for c in codigos] or [np.array([], dtype=np.int64)])
+
+    def _crudas_fecha(self, columna: str, desde: date = None, hasta: date = None) -> np.ndarray:
+        """Filas con la fecha entre desde y hasta (inclusive; un extremo vacío no limita)."""
+        if columna not in self._fechas:
+            return np.array([], dtype=np.int64)
+        ordenadas, posiciones = self._fechas[columna]
+        inicio = 0 if desde is None else np.searchsorted(ordenadas, np.datetime64(desde, "D"), side="left")
+        fin = len(ordenadas) if hasta is None else np.searchsorted(ordenadas, np.datetime64(hasta, "D"), side="right")
+        return posiciones[inicio:fin]
+
+    def _marca(self, posiciones: np.ndarray) -> np.ndarray:
+        marca = np.zeros(self.n, dtype=bool)
+        marca[posiciones] = True
+        return marca
+
+    def _ordenadas(self, posiciones: np.ndarray) -> np.ndarray:
+        """Posiciones únicas y ordenadas: ordenar si son pocas, marcar si son muchas."""
+        if len(posiciones) * 32 < self.n:
+            return np.unique(posiciones)
+        return np.flatnonzero(self._marca(posiciones))
+
+    def buscar(self, filtros: FiltrosBusqueda) -> np.ndarray:
+        """Posiciones (ordenadas) que cumplen todos los criterios."""
+        criterios = [self._crudas_texto(p) for p in palabras(filtros.texto)]
+        for campo, columna in COLUMNAS_FILTRO.items():
+            valores = getattr(filtros, campo)
+            if valores:
+                criterios.append(self._crudas_catalogo(columna, valores))
+        if filtros.fecha_columna and (filtros.fecha_desde or filtros.fecha_hasta):
+            criterios.append(self._crudas_fecha(filtros.fecha_columna, filtros.fecha_desde, filtros.fecha_hasta))
+        if not criterios:
+            return np.arange(self.n)
+        criterios.sort(key=len)
+        resultado = self._ordenadas(criterios[0])
+        for crudas in criterios[1:]:
+            if not len(resultado):
+                break
+            resultado = resultado[self._marca(crudas)[resultado]]
+        return resultado
+
+    def filtrar(self, filtros: FiltrosBusqueda) -> pd.DataFrame:
+        """Filas del DataFrame indexado que cumplen los criterios (selección, sin copiar si no hay filtro)."""
+        if not filtros.activos:
+            return self.df
+        return self.df.iloc[self.buscar(filtros)]
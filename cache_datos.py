@@ -0,0 +1,117 @@
+"""Caché en memoria de DataFrames compartida entre sesiones, con TTL y tope de memoria."""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class CacheDataFrames:
+    """Caché LRU con vencimiento (TTL), límite de bytes y contadores de aciertos/fallos.
+
+    Si varias sesiones piden la misma clave vencida a la vez, solo una la
+    reconstruye; las demás esperan y reciben el mismo resultado. Si la clave
+    se invalida mientras se construye, el resultado se entrega pero no se
+    guarda (se armó con datos de antes de la invalidación).
+    Los DataFrames entregados son compartidos: no modificarlos in situ.
+    También guarda valores que no son DataFrames (índices, totales): se
+    miden por `nbytes` si lo tienen (p. ej. busqueda.IndiceBusqueda).
+    """
+
+    def __init__(self, ttl_segundos: float = 60, max_bytes: int = 512 * 1024 * 1024):
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes = max_bytes
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()  # clave -> (df, creado, bytes)
+        self._lock = threading.Lock()
+        # clave -> [lock, sesiones que lo usan, generación]; se borra al quedar sin uso (no crece con
+        # cada clave vista). invalidar() sube la generación de las claves que se están construyendo.
+        self._locks_clave = {}
+
+    def obtener(self, clave, construir) -> pd.DataFrame:
+        """Devuelve el DataFrame de la clave o lo construye con construir()."""
+        df = self._vigente(clave)
+        if df is not None:
+            return df
+
+        with self._lock:
+            uso = self._locks_clave.setdefault(clave, [threading.Lock(), 0, 0])
+            uso[1] += 1
+        try:
+            with uso[0]:
+                # Otra sesión pudo reconstruirla mientras esperábamos
+                df = self._vigente(clave)
+                if df is not None:
+                    return df
+                with self._lock:
+                    generacion = uso[2]
+                df = construir()
+                self._guardar(clave, df, uso=uso, generacion=generacion)
+                with self._lock:
+                    self.fallos += 1
+                return df
+        finally:
+            with self._lock:
+                uso[1] -= 1
+                if uso[1] == 0:
+                    del self._locks_clave[clave]
+
+    def guardar(self, clave, df: pd.DataFrame):
+        """Fija el valor de una clave sin construirlo (p. ej. un snapshot ya actualizado)."""
+        self._guardar(clave, df)
+
+    def invalidar(self, clave=None, conservar=()):
+        """Descarta una clave (o todas si clave es None, salvo las de `conservar`)."""
+        with self._lock:
+            if clave is None:
+                for otra in [c for c in self._entradas if c not in conservar]:
+                    del self._entradas[otra]
+                for otra, uso in self._locks_clave.items():
+                    if otra not in conservar:
+                        uso[2] += 1
+            else:
+                self._entradas.pop(clave, None)
+                if clave in self._locks_clave:
+                    self._locks_clave[clave][2] += 1
+
+    @property
+    def bytes_usados(self) -> int:
+        return sum(b for _, _, b in self._entradas.values())
+
+    def resumen(self) -> str:
+        total = self.aciertos + self.fallos
+        tasa = self.aciertos / total if total else 0
+        return (
+            f"{self.aciertos} aciertos · {self.fallos} fallos ({tasa:.0%}) · "
+            f"{len(self._entradas)} entradas · {self.bytes_usados / 1024 ** 2:,.1f} MB"
+        )
+
+    def _vigente(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            df, creado, _ = entrada
+            if time.monotonic() - creado > self.ttl_segundos:
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return df
+
+    def _guardar(self, clave, df: pd.DataFrame, uso=None, generacion=None):
+        if isinstance(df, pd.DataFrame):
+            tam = int(df.memory_usage(deep=True).sum())
+        else:
+            tam = int(getattr(df, "nbytes", sys.getsizeof(df)))
+        with self._lock:
+            # Invalidada durante la construcción: no guardar un valor viejo
+            if uso is not None and uso[2] != generacion:
+                return
+            self._entradas[clave] = (df, time.monotonic(), tam)
+            self._entradas.move_to_end(clave)
+            # Expulsar las menos usadas hasta caber (la recién creada siempre se queda)
+            while self.bytes_usados > self.max_bytes and len(self._entradas) > 1:
+                self._entradas.popitem(last=False)
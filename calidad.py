@@ -0,0 +1,323 @@
+"""Calidad de datos: hitos fuera de orden, catálogos fuera de lista y pedidos repetidos.
+
+Las reglas son datos (REGLAS: tipo + columnas) y se evalúan como máscaras
+por columna sobre toda la tabla en una pasada: cada columna de fecha se
+convierte una vez (cada fecha distinta una vez), los catálogos se revisan
+por código de categoría y los pedidos repetidos con un conteo por valor
+normalizado. El resultado es un entero por fila con un bit por regla
+violada.
+
+RevisorCalidad conserva ese resultado entre snapshots: tras un refresco
+solo se vuelven a evaluar las filas nuevas o con otro updated_at, y al
+guardar solo las filas editadas (los repetidos se cuentan contra el último
+snapshot, o contra la base en modo servidor).
+"""
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from esquema import CATALOGOS, COLUMNA_MODIFICACION, VISTA
+from normalizacion import fechas_en_dias
+
+# Pares (anterior, posterior) de hitos: el posterior no puede tener una fecha menor
+ORDEN_HITOS = [
+    ("fecha_elaboracion", "fecha_formato"),
+    ("fecha_elaboracion", "fecha_conciliacion"),
+    ("fecha_solicitud_modificacion", "fecha_entrega_post_modificacion"),
+    ("fecha_conciliacion", "fecha_firma_ingenica"),
+    ("fecha_firma_ingenica", "fecha_entrega_final_ingenica_central"),
+    ("fecha_firma_ingenica", "fecha_firma_dnds"),
+    ("fecha_conciliacion", "fecha_edicion_pedido"),
+]
+
+NOMBRES_HITO = {
+    "fecha_elaboracion": "elaboración",
+    "fecha_formato": "formato",
+    "fecha_solicitud_modificacion": "solicitud de modificación",
+    "fecha_entrega_post_modificacion": "entrega post modificación",
+    "fecha_conciliacion": "conciliación",
+    "fecha_firma_ingenica": "firma Ingenica",
+    "fecha_entrega_final_ingenica_central": "entrega final a central",
+    "fecha_firma_dnds": "firma DNDS",
+    "fecha_edicion_pedido": "edición del pedido",
+}
+
+NOMBRES_CATALOGO = {"sector": "Sector", "subsector": "Subsector", "periodo": "Periodo", "area": "Área"}
+
+# Fondo de las celdas que violan alguna regla (Styler)
+ESTILO_CELDA = "background-color: #fde2e1; color: #9b1c1c"
+
+
+@dataclass(frozen=True)
+class Regla:
+    """Condición que no debería darse; `columnas` son las celdas que se resaltan.
+
+    tipo "orden": columnas[1] tiene fecha anterior a columnas[0] (vacías no cuentan);
+    "catalogo": valor no vacío que no está en CATALOGOS[columnas[0]];
+    "repetido": el pedido (normalizado, no vacío) aparece en otra fila.
+    """
+    codigo: str
+    tipo: str
+    columnas: tuple
+    descripcion: str
+
+
+REGLAS = tuple(
+    [
+        Regla(
+            f"{posterior.removeprefix('fecha_')}_antes_de_{anterior.removeprefix('fecha_')}",
+            "orden",
+            (anterior, posterior),
+            f"{NOMBRES_HITO[posterior].capitalize()} antes de {NOMBRES_HITO[anterior]}",
+        )
+        for anterior, posterior in ORDEN_HITOS
+    ]
+    + [
+        Regla(f"{columna}_fuera_de_catalogo", "catalogo", (columna,), f"{NOMBRES_CATALOGO[columna]} fuera de catálogo")
+        for columna in CATALOGOS
+    ]
+    + [Regla("pedido_repetido", "repetido", ("pedido",), "Pedido repetido en otra fila")]
+)
+
+# Un bit por regla en un uint32
+assert len(REGLAS) <= 32
+
+
+def claves_pedido(pedidos: pd.Series) -> np.ndarray:
+    """upper(btrim(pedido)) por fila ("" si vacío); se limpia cada valor distinto una vez."""
+    codigos, valores = pd.factorize(pedidos)
+    limpios = pd.Index(valores).astype(str).str.strip().str.upper().to_numpy(dtype=object)
+    return np.append(limpios, "")[codigos]
+
+
+def _fuera_de_catalogo(serie: pd.Series, catalogo: list) -> np.ndarray:
+    """Máscara de valores no vacíos fuera del catálogo (se revisa cada categoría o valor distinto una vez)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, valores = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, valores = pd.factorize(serie)
+    limpios = pd.Index(valores).astype(str).str.strip().str.upper()
+    fuera = ~limpios.isin([""] + list(catalogo))
+    return np.append(fuera, False)[codigos]
+
+
+def bits_filas(df: pd.DataFrame, reglas: tuple = REGLAS) -> np.ndarray:
+    """Bits de las reglas que se resuelven mirando cada fila sola (orden y catálogo).
+
+    Una máscara por regla sobre columnas enteras; las reglas cuyas columnas
+    no están en df no se evalúan. Los repetidos dependen de toda la tabla y
+    van aparte (RevisorCalidad).
+    """
+    bits = np.zeros(len(df), dtype=np.uint32)
+    dias = {}
+    for i, regla in enumerate(reglas):
+        if not all(c in df.columns for c in regla.columnas):
+            continue
+        if regla.tipo == "orden":
+            for columna in regla.columnas:
+                if columna not in dias:
+                    dias[columna] = fechas_en_dias(df[columna])
+            # NaT nunca es menor: los hitos vacíos no cuentan
+            violada = dias[regla.columnas[1]] < dias[regla.columnas[0]]
+        elif regla.tipo == "catalogo":
+            violada = _fuera_de_catalogo(df[regla.columnas[0]], CATALOGOS[regla.columnas[0]])
+        else:
+            continue
+        bits |= violada.astype(np.uint32) << np.uint32(i)
+    return bits
+
+
+def _bit_repetido(reglas: tuple) -> np.uint32:
+    return np.uint32(sum(1 << i for i, r in enumerate(reglas) if r.tipo == "repetido"))
+
+
+@dataclass(frozen=True)
+class ResultadoCalidad:
+    """Bits de reglas violadas por fila (índice = el del DataFrame revisado)."""
+    bits: pd.Series
+    reglas: tuple = REGLAS
+
+    def en(self, indice: pd.Index) -> "ResultadoCalidad":
+        """Solo las filas de `indice` (p. ej. la vista o la página), en ese orden."""
+        if indice is self.bits.index:
+            return self
+        return ResultadoCalidad(self.bits.loc[indice], self.reglas)
+
+    @property
+    def filas(self) -> int:
+        """Filas con al menos una regla violada."""
+        return int(np.count_nonzero(self.bits.to_numpy()))
+
+    def con_problemas(self, limite: int = None) -> "ResultadoCalidad":
+        """Solo las filas con alguna regla violada (las primeras `limite`)."""
+        bits = self.bits[self.bits.to_numpy() != 0]
+        return ResultadoCalidad(bits if limite is None else bits.iloc[:limite], self.reglas)
+
+    def resumen(self) -> pd.DataFrame:
+        """Filas por regla violada (regla, filas), sin las reglas que se cumplen."""
+        bits = self.bits.to_numpy()
+        valores, cantidades = np.unique(bits[bits != 0], return_counts=True)
+        filas = [int(cantidades[(valores >> np.uint32(i)) & 1 == 1].sum()) for i in range(len(self.reglas))]
+        resumen = pd.DataFrame({"regla": [r.descripcion for r in self.reglas], "filas": filas})
+        return resumen[resumen["filas"] > 0].reset_index(drop=True)
+
+    def etiquetas(self) -> pd.Series:
+        """Texto por fila con las reglas violadas ("" si ninguna); se arma una vez por combinación."""
+        codigos, valores = pd.factorize(self.bits.to_numpy())
+        textos = np.array(
+            ["; ".join(r.descripcion for i, r in enumerate(self.reglas) if int(v) >> i & 1) for v in valores],
+            dtype=object,
+        )
+        return pd.Series(textos[codigos], index=self.bits.index, dtype=object)
+
+    def estilos(self, columnas) -> pd.DataFrame:
+        """CSS por celda (mismo índice que bits) para Styler.apply(axis=None): columnas de cada regla violada."""
+        bits = self.bits.to_numpy()
+        estilos = pd.DataFrame("", index=self.bits.index, columns=list(columnas))
+        for i, regla in enumerate(self.reglas):
+            violada = (bits >> np.uint32(i)) & 1 == 1
+            if not violada.any():
+                continue
+            for columna in regla.columnas:
+                if columna in estilos.columns:
+                    estilos.iloc[violada, estilos.columns.get_loc(columna)] = ESTILO_CELDA
+        return estilos
+
+
+def _mismas_versiones(anteriores, actuales) -> np.ndarray:
+    """Comparación elemento a elemento de marcas de versión (vacías = distintas)."""
+    iguales = anteriores == actuales
+    if isinstance(iguales, np.ndarray):
+        return iguales.astype(bool, copy=False)
+    return iguales.to_numpy(dtype=bool, na_value=False)
+
+
+class RevisorCalidad:
+    """Resultado de calidad del último snapshot, actualizado por diferencias (uno por proceso).
+
+    Guarda por fila (por id) los bits de orden y catálogo, la versión
+    (updated_at) y el código de su pedido normalizado, más cuántas filas usan
+    cada pedido: con un snapshot nuevo solo se evalúan las filas nuevas o con
+    otra versión, y los conteos de pedidos se corrigen con lo que entró y salió.
+    """
+
+    def __init__(self, reglas: tuple = REGLAS):
+        self.reglas = reglas
+        self._bit_repetido = _bit_repetido(reglas)
+        self._lock = threading.Lock()
+        self._df = None
+        self._resultado = None
+        # Por fila del último snapshot (alineado con _ids)
+        self._ids = None
+        self._versiones = None
+        self._bits = None
+        self._codigos = None
+        # Pedido normalizado -> código ("" = 0) y filas del último snapshot por código
+        self._vocabulario = {"": 0}
+        self._conteo = np.zeros(1, dtype=np.int64)
+        # Filas evaluadas en la última revisión (el resto se reutilizó)
+        self.evaluadas = 0
+
+    def _codificar(self, pedidos: pd.Series) -> np.ndarray:
+        """Código de cada pedido normalizado; los que no estaban se agregan al vocabulario."""
+        crudos, valores = pd.factorize(pedidos)
+        limpios = pd.Index(valores).astype(str).str.strip().str.upper()
+        vocabulario = self._vocabulario
+        codigos = np.fromiter(
+            (vocabulario.setdefault(c, len(vocabulario)) for c in limpios.tolist()), dtype=np.int64, count=len(limpios),
+        )
+        if len(vocabulario) > len(self._conteo):
+            self._conteo = np.append(self._conteo, np.zeros(len(vocabulario) - len(self._conteo), dtype=np.int64))
+        return np.append(codigos, 0)[crudos]
+
+    def revisar(self, df: pd.DataFrame) -> ResultadoCalidad:
+        """Resultado de todo el snapshot; el mismo objeto si df no cambió."""
+        with self._lock:
+            if df is self._df:
+                return self._resultado
+            n = len(df)
+            ids = pd.Index(df["id"]) if "id" in df.columns else None
+            versiones = df[COLUMNA_MODIFICACION].array if COLUMNA_MODIFICACION in df.columns else None
+            bits = np.zeros(n, dtype=np.uint32)
+            codigos = np.zeros(n, dtype=np.int64)
+
+            iguales = np.zeros(n, dtype=bool)
+            if self._ids is not None and ids is not None and versiones is not None and ids.is_unique:
+                posiciones = self._ids.get_indexer(ids)
+                iguales = posiciones >= 0
+                iguales[iguales] = _mismas_versiones(self._versiones.take(posiciones[iguales]), versiones[iguales])
+                bits[iguales] = self._bits[posiciones[iguales]]
+                codigos[iguales] = self._codigos[posiciones[iguales]]
+                # Las filas anteriores que no siguen iguales (cambiadas o borradas) dejan de contar
+                conservadas = np.zeros(len(self._ids), dtype=bool)
+                conservadas[posiciones[iguales]] = True
+                self._conteo -= np.bincount(self._codigos[~conservadas], minlength=len(self._conteo))
+            else:
+                self._conteo[:] = 0
+
+            filas = np.flatnonzero(~iguales)
+            if len(filas):
+                parte = df if len(filas) == n else df.iloc[filas]
+                bits[filas] = bits_filas(parte, self.reglas)
+                if "pedido" in df.columns:
+                    codigos[filas] = self._codificar(parte["pedido"])
+                self._conteo += np.bincount(codigos[filas], minlength=len(self._conteo))
+
+            repetidos = (self._conteo[codigos] > 1) & (codigos != 0)
+            total = bits | np.where(repetidos, self._bit_repetido, np.uint32(0)).astype(np.uint32)
+
+            reutilizable = ids is not None and versiones is not None and ids.is_unique
+            self._ids = ids if reutilizable else None
+            self._versiones, self._bits, self._codigos = versiones, bits, codigos
+            self._df = df
+            self._resultado = ResultadoCalidad(pd.Series(total, index=df.index), self.reglas)
+            self.evaluadas = len(filas)
+            return self._resultado
+
+    def _usados_fuera(self, ids: pd.Series, claves: np.ndarray) -> set:
+        """De `claves`, las que en el último snapshot usan filas distintas de `ids`."""
+        with self._lock:
+            if self._codigos is None:
+                return set()
+            unicas = [c for c in pd.unique(claves) if c]
+            codigos = pd.Series([self._vocabulario.get(c, -1) for c in unicas], index=unicas, dtype=np.int64)
+            usados = pd.Series(np.where(codigos >= 0, self._conteo[codigos.clip(lower=0)], 0), index=unicas)
+            if self._ids is not None:
+                posiciones = self._ids.get_indexer(ids.dropna().astype("int64"))
+                propios = pd.Series(self._codigos[posiciones[posiciones >= 0]]).value_counts()
+                usados -= propios.reindex(codigos.to_numpy(), fill_value=0).to_numpy()
+            return set(usados.index[usados.to_numpy() > 0])
+
+    def revisar_filas(self, filas: pd.DataFrame, en_base: set = None) -> ResultadoCalidad:
+        """Revisa solo `filas` (p. ej. las editadas): orden y catálogo, y pedidos repetidos
+        entre ellas o con otras filas.
+
+        `en_base`: pedidos normalizados que ya usan otras filas; sin él se
+        cuentan en el último snapshot, descontando las mismas filas (por id).
+        """
+        bits = bits_filas(filas, self.reglas)
+        if "pedido" in filas.columns and self._bit_repetido:
+            claves = claves_pedido(filas["pedido"])
+            if en_base is None:
+                ids = pd.to_numeric(filas["id"], errors="coerce") if "id" in filas.columns else pd.Series(dtype=float)
+                en_base = self._usados_fuera(ids, claves)
+            claves_serie = pd.Series(claves, dtype=object)
+            repetidos = (claves != "") & (
+                claves_serie.duplicated(keep=False).to_numpy() | claves_serie.isin(en_base).to_numpy()
+            )
+            bits |= np.where(repetidos, self._bit_repetido, np.uint32(0)).astype(np.uint32)
+        return ResultadoCalidad(pd.Series(bits, index=filas.index), self.reglas)
+
+
+def pedidos_en_base(cliente, filas: pd.DataFrame) -> set:
+    """Pedidos normalizados de `filas` que ya usan otras filas de la base (pedido_norm, sql/009_calidad.sql)."""
+    if "pedido" not in filas.columns:
+        return set()
+    claves = sorted(set(claves_pedido(filas["pedido"])) - {""})
+    if not claves:
+        return set()
+    ids = set(pd.to_numeric(filas["id"], errors="coerce").dropna().astype("int64")) if "id" in filas.columns else set()
+    datos = cliente.table(VISTA).select("id,pedido_norm").in_("pedido_norm", claves).execute().data or []
+    return {d["pedido_norm"] for d in datos if d["id"] not in ids}
@@ -0,0 +1,167 @@
+"""Carga paginada (keyset por id) y proyectada de prefacturas_pedidos."""
+import time
+from itertools import chain
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from postgrest.exceptions import APIError
+
+from esquema import COLUMNAS_CARGA, COLUMNAS_FECHAS, TABLA, VISTA
+from instrumentacion import bytes_respuesta, escuchar_respuestas, numero_respuesta
+
+# Tope por defecto de filas por respuesta en PostgREST/Supabase (max-rows)
+TAM_PAGINA = 1000
+
+
+@dataclass
+class EstadisticasCarga:
+    """Métricas de una carga: filas, páginas, bytes (de las respuestas HTTP) y tiempo."""
+    filas: int = 0
+    paginas: int = 0
+    bytes: int = 0
+    segundos: float = 0.0
+
+    @property
+    def filas_por_segundo(self) -> float:
+        return self.filas / self.segundos if self.segundos else 0.0
+
+    def resumen(self) -> str:
+        return (
+            f"{self.filas} filas · {self.paginas} páginas · "
+            f"{self.bytes / 1024:,.0f} KB · {self.filas_por_segundo:,.0f} filas/s"
+        )
+
+
+def leer_paginas(cliente, columnas=COLUMNAS_CARGA, tam_pagina: int = TAM_PAGINA, desde_id=None, filtros=None, tabla=TABLA):
+    """Itera páginas de filas ordenadas por id usando keyset (id > último visto), sin OFFSET.
+
+    Se detiene con la primera página vacía: así no importa si el servidor
+    recorta la página por debajo de tam_pagina (max-rows). `filtros` es una
+    función opcional consulta -> consulta para agregar condiciones.
+    """
+    for filas, _ in _respuestas(cliente, columnas, tam_pagina, desde_id, filtros, tabla):
+        yield filas
+
+
+def _respuestas(cliente, columnas, tam_pagina, desde_id, filtros, tabla):
+    """Lo mismo que leer_paginas, con el tamaño de cada respuesta: pares (filas, bytes)."""
+    seleccion = ",".join(columnas) if columnas else "*"
+    ultimo_id = desde_id
+    while True:
+        consulta = cliente.table(tabla).select(seleccion)
+        if ultimo_id is not None:
+            consulta = consulta.gt("id", ultimo_id)
+        if filtros is not None:
+            consulta = filtros(consulta)
+        numero = numero_respuesta()
+        respuesta = consulta.order("id").limit(tam_pagina).execute()
+        filas = respuesta.data
+        if not filas:
+            return
+        yield filas, bytes_respuesta(respuesta, numero)
+        ultimo_id = filas[-1]["id"]
+
+
+def _columna_tipada(nombre: str, valores: list) -> np.ndarray:
+    """Convierte los valores de una página en un arreglo con su tipo final."""
+    if nombre == "id":
+        return np.asarray(valores, dtype=np.int64)
+    if nombre in COLUMNAS_FECHAS:
+        return pd.to_datetime(pd.Series(valores, dtype=object), errors="coerce").to_numpy()
+    return np.asarray(valores, dtype=object)
+
+
+class _Acumulador:
+    """Junta las páginas columna por columna (no como una gran lista de dicts)."""
+
+    def __init__(self):
+        self.trozos = {}
+
+    def agregar(self, filas: list):
+        for nombre in filas[0].keys():
+            valores = [f.get(nombre) for f in filas]
+            self.trozos.setdefault(nombre, []).append(_columna_tipada(nombre, valores))
+
+    def a_dataframe(self) -> pd.DataFrame:
+        if not self.trozos:
+            return pd.DataFrame()
+        return pd.DataFrame({c: np.concatenate(t) for c, t in self.trozos.items()})
+
+
+def filas_dataframe(filas: list) -> pd.DataFrame:
+    """Filas JSON (lista de dicts) a DataFrame con los mismos tipos que la carga paginada."""
+    acumulador = _Acumulador()
+    if filas:
+        acumulador.agregar(filas)
+    return acumulador.a_dataframe()
+
+
+def paginas_dataframe(cliente, columnas=COLUMNAS_CARGA, tam_pagina: int = TAM_PAGINA, filtros=None, tabla=TABLA):
+    """Como leer_paginas, pero cada página llega ya como DataFrame tipado (para procesar en streaming)."""
+    for filas in leer_paginas(cliente, columnas, tam_pagina, filtros=filtros, tabla=tabla):
+        yield filas_dataframe(filas)
+
+
+def cargar_paginado(cliente, columnas=COLUMNAS_CARGA, tam_pagina: int = TAM_PAGINA, filtros=None):
+    """Descarga la tabla completa por páginas y devuelve (DataFrame, EstadisticasCarga).
+
+    Si la proyección falla (p. ej. tablas antiguas con 'Sector'/'Subsector'),
+    se reintenta con select("*").
+    """
+    inicio = time.perf_counter()
+    stats = EstadisticasCarga()
+    acumulador = _Acumulador()
+    # Los bytes salen de la respuesta HTTP (sin volver a serializar cada página)
+    escuchar_respuestas(cliente)
+    try:
+        paginas = _respuestas(cliente, columnas, tam_pagina, None, filtros, TABLA)
+        primera = next(paginas, None)
+    except APIError:
+        columnas = None
+        paginas = _respuestas(cliente, columnas, tam_pagina, None, filtros, TABLA)
+        primera = next(paginas, None)
+
+    if primera is not None:
+        for filas, tamano in chain([primera], paginas):
+            acumulador.agregar(filas)
+            stats.filas += len(filas)
+            stats.paginas += 1
+            stats.bytes += tamano
+
+    stats.segundos = time.perf_counter() - inicio
+    return acumulador.a_dataframe(), stats
+
+
+def filtro_vista(sector=None, etapa_codigo=None):
+    """Filtros de sector/etapa para consultar VISTA (se resuelven en la base)."""
+    def aplicar(consulta):
+        if sector is not None:
+            consulta = consulta.eq("sector_norm", sector)
+        if etapa_codigo is not None:
+            consulta = consulta.eq("etapa_codigo", etapa_codigo)
+        return consulta
+    return aplicar
+
+
+def cargar_pagina(
+    cliente, pagina: int, tam_pagina: int, columnas=COLUMNAS_CARGA, filtros=None, tabla=VISTA, contar: bool = False,
+):
+    """Trae solo una página (base 0, ordenada por id) y, con `contar`, el total de filas que cumplen los filtros.
+
+    El total es un COUNT exacto en la base: se pide solo si se usa (si no, vuelve None).
+    """
+    consulta = cliente.table(tabla).select(",".join(columnas), count="exact" if contar else None)
+    if filtros is not None:
+        consulta = filtros(consulta)
+    inicio = pagina * tam_pagina
+    respuesta = consulta.order("id").range(inicio, inicio + tam_pagina - 1).execute()
+    return filas_dataframe(respuesta.data), (respuesta.count or 0) if contar else None
+
+
+def contar_filas(cliente, filtros=None, tabla=VISTA) -> int:
+    """Total de filas que cumplen los filtros (count exacto, sin traer filas)."""
+    consulta = cliente.table(tabla).select("id", count="exact", head=True)
+    if filtros is not None:
+        consulta = filtros(consulta)
+    return consulta.execute().count or 0
@@ -0,0 +1,502 @@
+"""Sustituto en memoria del cliente de Supabase para pruebas locales y benchmarks.
+
+Implementa el subconjunto de PostgREST que usa la app: select con
+proyección, count, filtros (eq, neq, gt, gte, lt, lte, in_, is_, or_ y
+filter con fts por prefijo),
+order, limit, range, insert, upsert, update, delete, las rpc
+conteo_etapas, materializar_snapshots, actualizar_prefacturas,
+borrar_prefacturas, archivar_prefacturas y restaurar_prefacturas, y las
+vistas prefacturas_vista y prefacturas_archivo_vista.
+Los datos viven en un DataFrame ordenado por id con valores tipo JSON
+(texto ISO para fechas, None para vacíos). Cada escritura emite eventos
+con la forma de Supabase Realtime a quien se haya suscrito (suscribir()).
+"""
+import json
+import re
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from agregacion import conteo_etapas_local
+from archivo import anios_periodo, terminado
+from busqueda import palabras
+from esquema import (
+    COLUMNA_MODIFICACION, TABLA, TABLA_ARCHIVO, TABLA_RESUMEN_ARCHIVO, TABLA_SNAPSHOTS, VISTA, VISTA_ARCHIVO,
+)
+from etapas import PEDIDO_RECIBIDO, clasificar_etapas
+from normalizacion import normalizar_datos
+from snapshots import conteos_diarios
+
+_OPERADORES = {
+    'eq': lambda s, v: s == v,
+    'neq': lambda s, v: s != v,
+    'gt': lambda s, v: s > v,
+    'gte': lambda s, v: s >= v,
+    'lt': lambda s, v: s < v,
+    'lte': lambda s, v: s <= v,
+}
+
+
+class RespuestaLocal:
+    def __init__(self, data, count=None, bytes=None):
+        self.data = data
+        self.count = count
+        # Tamaño del JSON que habría mandado PostgREST (instrumentacion.bytes_respuesta)
+        self.bytes = bytes
+
+
+def _ahora() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _valor_literal(texto: str):
+    """Interpreta un valor escrito en sintaxis de filtro PostgREST."""
+    texto = texto.strip('"')
+    if texto == 'null':
+        return None
+    try:
+        return int(texto)
+    except ValueError:
+        return texto
+
+
+def _registro_json(registro: dict) -> dict:
+    """Fila como la manda Realtime: vacíos como None y enteros de Python."""
+    return {
+        k: None if v is None or (isinstance(v, float) and np.isnan(v)) else v.item() if isinstance(v, np.generic) else v
+        for k, v in registro.items()
+    }
+
+
+def _misma_version(actual, cargada) -> bool:
+    """Compara marcas updated_at como instantes (el texto puede variar en formato)."""
+    if actual is None or cargada is None or pd.isna(actual):
+        return False
+    return pd.Timestamp(actual) == pd.Timestamp(cargada)
+
+
+def _texto_normalizado(datos: pd.DataFrame, columna: str) -> pd.Series:
+    """upper(btrim(coalesce(columna, ''))) de SQL."""
+    if columna not in datos.columns:
+        return pd.Series('', index=datos.index)
+    return datos[columna].fillna('').astype(str).str.strip().str.upper()
+
+
+def _coincide_texto(columna: pd.Series, consulta: str) -> np.ndarray:
+    """busqueda @@ to_tsquery('simple', 'a:* & b:*'): cada término es prefijo de alguna palabra."""
+    terminos = re.findall(r'([^\W_]+):\*', consulta.lower())
+    tokens = columna.fillna('').map(palabras)
+    return tokens.map(lambda ts: all(any(t.startswith(p) for t in ts) for p in terminos)).to_numpy(dtype=bool)
+
+
+def _mascara(columna: pd.Series, operador: str, valor) -> np.ndarray:
+    if operador == 'fts':
+        return _coincide_texto(columna, valor)
+    if operador == 'in':
+        return columna.isin(list(valor)).to_numpy()
+    if operador == 'is':
+        return columna.isna().to_numpy() if valor is None else (columna == valor).to_numpy()
+    presentes = columna.notna().to_numpy()
+    if valor is None:
+        return np.zeros(len(columna), dtype=bool)
+    resultado = np.zeros(len(columna), dtype=bool)
+    resultado[presentes] = _OPERADORES[operador](columna[presentes], valor).to_numpy()
+    return resultado
+
+
+class ConsultaLocal:
+    """Constructor de consultas encadenable, al estilo de postgrest-py."""
+
+    def __init__(self, cliente, tabla: str):
+        self.cliente = cliente
+        self.tabla = tabla
+        self.accion = 'select'
+        self.columnas = None
+        self.contar = False
+        self.solo_cabecera = False
+        self.payload = None
+        self.clave_conflicto = ['id']
+        self.filtros = []  # (columna, operador, valor) o ('or', [(col, op, valor), ...])
+        self.orden = None
+        self.limite = None
+        self.desde = 0
+
+    # --- acciones ---
+    def select(self, *columnas, count=None, head=None):
+        seleccion = ",".join(columnas)
+        self.columnas = None if seleccion in ('', '*') else [c.strip() for c in seleccion.split(',')]
+        self.contar = count is not None
+        self.solo_cabecera = bool(head)
+        return self
+
+    def insert(self, json, **_):
+        self.accion, self.payload = 'insert', json
+        return self
+
+    def upsert(self, json, on_conflict='id', **_):
+        self.accion, self.payload = 'upsert', json
+        self.clave_conflicto = [c.strip() for c in on_conflict.split(',')]
+        return self
+
+    def update(self, json, **_):
+        self.accion, self.payload = 'update', json
+        return self
+
+    def delete(self, **_):
+        self.accion = 'delete'
+        return self
+
+    # --- filtros ---
+    def _filtro(self, columna, operador, valor):
+        self.filtros.append((columna, operador, valor))
+        return self
+
+    def eq(self, columna, valor):
+        return self._filtro(columna, 'eq', valor)
+
+    def neq(self, columna, valor):
+        return self._filtro(columna, 'neq', valor)
+
+    def gt(self, columna, valor):
+        return self._filtro(columna, 'gt', valor)
+
+    def gte(self, columna, valor):
+        return self._filtro(columna, 'gte', valor)
+
+    def lt(self, columna, valor):
+        return self._filtro(columna, 'lt', valor)
+
+    def lte(self, columna, valor):
+        return self._filtro(columna, 'lte', valor)
+
+    def in_(self, columna, valores):
+        return self._filtro(columna, 'in', list(valores))
+
+    def is_(self, columna, valor):
+        return self._filtro(columna, 'is', None if valor in (None, 'null') else valor)
+
+    def filter(self, columna, operador, valor):
+        # "fts(simple)" -> fts: la configuración de texto no cambia nada acá
+        return self._filtro(columna, operador.split('(')[0], valor)
+
+    def or_(self, condiciones: str):
+        partes = re.findall(r'(\w+)\.(\w+)\.("[^"]*"|[^,]*)', condiciones)
+        self.filtros.append(('or', [(c, op, _valor_literal(v)) for c, op, v in partes]))
+        return self
+
+    def order(self, columna, desc=False, **_):
+        self.orden = (columna, desc)
+        return self
+
+    def limit(self, n):
+        self.limite = n
+        return self
+
+    def range(self, inicio, fin):
+        self.desde, self.limite = inicio, fin - inicio + 1
+        return self
+
+    # --- ejecución ---
+    def _filas_filtradas(self, datos: pd.DataFrame) -> pd.DataFrame:
+        if datos.empty:
+            return datos  # tabla aún sin filas (y quizá sin esas columnas)
+        # Los rangos sobre id (paginación keyset) se resuelven con búsqueda binaria
+        ids = datos['id'].to_numpy(dtype=np.int64) if 'id' in datos.columns else np.array([], dtype=np.int64)
+        inicio, fin = 0, len(datos)
+        resto = []
+        for filtro in self.filtros:
+            columna, operador, valor = filtro if filtro[0] != 'or' else (None, None, None)
+            if columna == 'id' and operador in ('gt', 'gte', 'lt', 'lte') and valor is not None:
+                lado = 'right' if operador in ('gt', 'lte') else 'left'
+                pos = int(np.searchsorted(ids, int(valor), side=lado))
+                if operador in ('gt', 'gte'):
+                    inicio = max(inicio, pos)
+                else:
+                    fin = min(fin, pos)
+            else:
+                resto.append(filtro)
+        datos = datos.iloc[inicio:max(inicio, fin)]
+
+        mascara = np.ones(len(datos), dtype=bool)
+        for filtro in resto:
+            if filtro[0] == 'or':
+                alguna = np.zeros(len(datos), dtype=bool)
+                for columna, operador, valor in filtro[1]:
+                    if columna in datos.columns:
+                        alguna |= _mascara(datos[columna], operador, valor)
+                mascara &= alguna
+            else:
+                columna, operador, valor = filtro
+                mascara &= _mascara(datos[columna], operador, valor)
+        return datos[mascara]
+
+    def execute(self) -> RespuestaLocal:
+        self.cliente._esperar_red()
+        with self.cliente._lock:
+            if self.accion == 'select':
+                return self._ejecutar_select()
+            return self._ejecutar_escritura()
+
+    def _ejecutar_select(self) -> RespuestaLocal:
+        datos = self.cliente._datos(self.tabla)
+        filtradas = self._filas_filtradas(datos)
+        total = len(filtradas) if self.contar else None
+        if self.solo_cabecera:
+            return RespuestaLocal([], total)
+        if self.orden is not None and self.orden != ('id', False) and self.orden[0] in filtradas.columns:
+            filtradas = filtradas.sort_values(self.orden[0], ascending=not self.orden[1], na_position='last')
+        fin = None if self.limite is None else self.desde + self.limite
+        filtradas = filtradas.iloc[self.desde:fin]
+        if self.columnas is not None:
+            filtradas = filtradas.reindex(columns=self.columnas)
+        filas = filtradas.astype(object).where(filtradas.notna(), None).to_dict('records')
+        tamano = len(json.dumps(filas, default=str))
+        self.cliente.bytes_servidos += tamano
+        return RespuestaLocal(filas, total, tamano)
+
+    def _ejecutar_escritura(self) -> RespuestaLocal:
+        datos = self.cliente._datos(self.tabla)
+        registros = self.payload if isinstance(self.payload, list) else [self.payload] if self.payload else []
+        ahora = _ahora()
+
+        if self.accion == 'delete':
+            borradas = self._filas_filtradas(datos)
+            self.cliente._guardar(self.tabla, datos.drop(index=borradas.index))
+            self.cliente._emitir(self.tabla, 'DELETE', borradas.to_dict('records'))
+            return RespuestaLocal(borradas.to_dict('records'))
+
+        if self.accion == 'update':
+            afectadas = self._filas_filtradas(datos).index
+            for columna, valor in registros[0].items():
+                datos.loc[afectadas, columna] = valor
+            datos.loc[afectadas, COLUMNA_MODIFICACION] = ahora
+            self.cliente._guardar(self.tabla, datos)
+            self.cliente._emitir(self.tabla, 'UPDATE', datos.loc[afectadas].to_dict('records'))
+            return RespuestaLocal(datos.loc[afectadas].to_dict('records'))
+
+        nuevos, actualizados = [], []
+        # Fila existente por la clave de on_conflict (id, o p. ej. dia,sector,etapa_codigo)
+        clave = self.clave_conflicto
+        por_clave = (
+            dict(zip(zip(*(datos[c].tolist() for c in clave)), datos.index))
+            if len(datos) and all(c in datos.columns for c in clave) else {}
+        )
+        for registro in registros:
+            registro = dict(registro)
+            id_ = registro.get('id')
+            fila = por_clave.get(tuple(registro.get(c) for c in clave))
+            if self.accion == 'upsert' and fila is not None:
+                for columna, valor in registro.items():
+                    datos.loc[fila, columna] = valor
+                datos.loc[fila, COLUMNA_MODIFICACION] = ahora
+                actualizados.append(datos.loc[fila].to_dict())
+            else:
+                if id_ is None:
+                    registro['id'] = self.cliente._siguiente_id(self.tabla)
+                registro.setdefault('created_at', ahora)
+                registro[COLUMNA_MODIFICACION] = ahora
+                nuevos.append(registro)
+        if nuevos:
+            datos = pd.concat([datos, pd.DataFrame(nuevos)], ignore_index=True)
+        self.cliente._guardar(self.tabla, datos)
+        self.cliente._emitir(self.tabla, 'UPDATE', actualizados)
+        self.cliente._emitir(self.tabla, 'INSERT', nuevos)
+        return RespuestaLocal(actualizados + nuevos)
+
+
+class RpcLocal:
+    def __init__(self, cliente, funcion: str, params: dict):
+        self.cliente = cliente
+        self.funcion = funcion
+        self.params = params or {}
+
+    def execute(self) -> RespuestaLocal:
+        self.cliente._esperar_red()
+        if self.funcion == 'materializar_snapshots':
+            return self._materializar_snapshots()
+        if self.funcion in ('actualizar_prefacturas', 'borrar_prefacturas'):
+            return self._escritura_condicional(borrar=self.funcion == 'borrar_prefacturas')
+        if self.funcion == 'archivar_prefacturas':
+            return self._archivar()
+        if self.funcion == 'restaurar_prefacturas':
+            return self._restaurar()
+        if self.funcion != 'conteo_etapas':
+            raise NotImplementedError(f"RPC no soportada en el cliente local: {self.funcion}")
+        with self.cliente._lock:
+            df = clasificar_etapas(normalizar_datos(self.cliente._datos(TABLA)))
+        sector, etapa = self.params.get('p_sector'), self.params.get('p_etapa')
+        if sector is not None:
+            df = df[df['sector'] == sector.strip().upper()]
+        if etapa is not None:
+            df = df[df['etapa_codigo'] == etapa]
+        conteo = conteo_etapas_local(df, por_subsector=sector is not None)
+        conteo = conteo.rename(columns={'Categoria': 'categoria', 'Cantidad': 'cantidad'})
+        return RespuestaLocal(conteo.astype(object).to_dict('records'))
+
+    def _escritura_condicional(self, borrar: bool) -> RespuestaLocal:
+        """Como sql/006_guardado_condicional.sql: solo filas cuyo updated_at sigue siendo "_version"."""
+        filas = self.params.get('p_filas') or []
+        with self.cliente._lock:
+            datos = self.cliente._datos(TABLA)
+            versiones = dict(zip(datos['id'].tolist(), datos[COLUMNA_MODIFICACION])) if len(datos) else {}
+            vigentes = [f for f in filas if _misma_version(versiones.get(f['id']), f.get('_version'))]
+            if not vigentes:
+                return RespuestaLocal([])
+            if borrar:
+                ids = [f['id'] for f in vigentes]
+                ConsultaLocal(self.cliente, TABLA).delete().in_('id', ids)._ejecutar_escritura()
+                return RespuestaLocal([{'id': i} for i in ids])
+            registros = [{k: v for k, v in f.items() if k != '_version'} for f in vigentes]
+            aplicadas = ConsultaLocal(self.cliente, TABLA).upsert(registros)._ejecutar_escritura().data
+        return RespuestaLocal([{'id': f['id'], COLUMNA_MODIFICACION: f[COLUMNA_MODIFICACION]} for f in aplicadas])
+
+    def _archivar(self) -> RespuestaLocal:
+        """Como sql/007_archivo.sql: mueve las filas cerradas de esos (año, periodo) terminados al archivo."""
+        pedidos = [(int(e['anio']), str(e['periodo']).strip().upper()) for e in self.params.get('p_periodos') or []]
+        elegidos = {(a, p) for a, p in pedidos if terminado(a, p)}
+        periodos = {p for _, p in pedidos}
+        with self.cliente._lock:
+            datos = self.cliente._datos(TABLA)
+            if datos.empty:
+                return RespuestaLocal(0)
+            clasificadas = clasificar_etapas(normalizar_datos(datos))
+            claves = zip(anios_periodo(datos).tolist(), _texto_normalizado(datos, 'periodo').tolist())
+            mover = (
+                (clasificadas['etapa_codigo'] == PEDIDO_RECIBIDO).to_numpy()
+                & np.array([(a, p) in elegidos for a, p in claves], dtype=bool)
+            )
+            movidas = datos[mover]
+            if len(movidas):
+                ConsultaLocal(self.cliente, TABLA).delete().in_('id', movidas['id'].tolist())._ejecutar_escritura()
+                archivo = self.cliente._datos(TABLA_ARCHIVO)
+                nuevas = movidas.assign(archivado_at=_ahora())
+                self.cliente._guardar(TABLA_ARCHIVO, pd.concat([archivo, nuevas], ignore_index=True) if len(archivo) else nuevas)
+            self._recalcular_resumen(periodos)
+        return RespuestaLocal(int(mover.sum()))
+
+    def _restaurar(self) -> RespuestaLocal:
+        """Devuelve filas del archivo a la tabla (mismo id, updated_at nuevo)."""
+        ids = set(self.params.get('p_ids') or [])
+        with self.cliente._lock:
+            archivo = self.cliente._datos(TABLA_ARCHIVO)
+            if archivo.empty:
+                return RespuestaLocal(0)
+            devueltas = archivo[archivo['id'].isin(ids)]
+            self.cliente._guardar(TABLA_ARCHIVO, archivo[~archivo['id'].isin(ids)])
+            registros = devueltas.drop(columns=['archivado_at', COLUMNA_MODIFICACION], errors='ignore')
+            registros = registros.astype(object).where(registros.notna(), None).to_dict('records')
+            ConsultaLocal(self.cliente, TABLA).insert(registros)._ejecutar_escritura()
+            self._recalcular_resumen(set(_texto_normalizado(devueltas, 'periodo')))
+        return RespuestaLocal(len(devueltas))
+
+    def _recalcular_resumen(self, periodos: set):
+        archivo = self.cliente._datos(TABLA_ARCHIVO)
+        resumen = self.cliente._datos(TABLA_RESUMEN_ARCHIVO)
+        if len(resumen):
+            self.cliente._guardar(TABLA_RESUMEN_ARCHIVO, resumen[~resumen['periodo'].isin(periodos)])
+        if archivo.empty:
+            return
+        claves = pd.DataFrame({c: _texto_normalizado(archivo, c) for c in ['sector', 'subsector', 'periodo']})
+        nuevos = claves[claves['periodo'].isin(periodos)].value_counts().reset_index(name='cantidad')
+        if len(nuevos):
+            ConsultaLocal(self.cliente, TABLA_RESUMEN_ARCHIVO).insert(nuevos.to_dict('records'))._ejecutar_escritura()
+
+    def _materializar_snapshots(self) -> RespuestaLocal:
+        hoy = date.today()
+        desde = date.fromisoformat(self.params['p_desde']) if self.params.get('p_desde') else hoy
+        with self.cliente._lock:
+            # Lo archivado también cuenta para la tendencia (sql/007_archivo.sql)
+            partes = [d for d in (self.cliente._datos(TABLA), self.cliente._datos(TABLA_ARCHIVO)) if len(d)]
+            nuevos = conteos_diarios(pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(), desde, hoy)
+            self.cliente.table(TABLA_SNAPSHOTS).delete().gte('dia', desde.isoformat()).execute()
+            self.cliente.table(TABLA_SNAPSHOTS).insert(nuevos.to_dict('records')).execute()
+        return RespuestaLocal(len(nuevos))
+
+
+class ClienteLocal:
+    """Cliente en memoria con la misma interfaz que supabase.Client (subconjunto).
+
+    `latencia` (segundos) simula la ida y vuelta de cada request, sin
+    bloquear a los demás hilos.
+    """
+
+    def __init__(self, filas=None, latencia: float = 0.0):
+        self.latencia = latencia
+        self._tablas = {}
+        self._lock = threading.RLock()
+        self.bytes_servidos = 0
+        self._proximos = {}
+        self._suscriptores = {}  # tabla -> [callback]
+        if filas is not None:
+            self._guardar(TABLA, pd.DataFrame(filas))
+
+    def table(self, nombre: str) -> ConsultaLocal:
+        return ConsultaLocal(self, nombre)
+
+    def rpc(self, funcion: str, params: dict = None) -> RpcLocal:
+        return RpcLocal(self, funcion, params)
+
+    def suscribir(self, tabla: str, callback):
+        """Como un canal postgres_changes: callback(payload) por cada fila escrita en la tabla."""
+        with self._lock:
+            self._suscriptores.setdefault(tabla, []).append(callback)
+
+    def _emitir(self, tabla: str, tipo: str, registros: list):
+        for registro in registros:
+            registro = _registro_json(registro)
+            datos = {
+                'type': tipo,
+                'table': tabla,
+                'record': {} if tipo == 'DELETE' else registro,
+                # Sin REPLICA IDENTITY FULL, Postgres solo manda la clave de lo borrado
+                'old_record': {'id': registro.get('id')} if tipo != 'INSERT' else {},
+            }
+            for callback in self._suscriptores.get(tabla, []):
+                callback({'data': datos, 'ids': []})
+
+    def _esperar_red(self):
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def _datos(self, tabla: str) -> pd.DataFrame:
+        if tabla == VISTA:
+            return self._vista()
+        if tabla == VISTA_ARCHIVO:
+            archivo = self._datos(TABLA_ARCHIVO)
+            if archivo.empty:
+                return archivo
+            return archivo.assign(
+                sector_norm=_texto_normalizado(archivo, 'sector'),
+                periodo_norm=_texto_normalizado(archivo, 'periodo'),
+            )
+        return self._tablas.get(tabla, pd.DataFrame({'id': pd.Series([], dtype='int64')}))
+
+    def _vista(self) -> pd.DataFrame:
+        """Equivalente de prefacturas_vista: filas crudas + sector_norm + etapa_codigo + columnas de búsqueda y pedido_norm."""
+        datos = self._datos(TABLA)
+        clasificadas = clasificar_etapas(normalizar_datos(datos))
+        texto = {c: datos[c].fillna('').astype(str) if c in datos.columns else '' for c in ('pedido', 'sub_area')}
+        return datos.assign(
+            sector_norm=clasificadas['sector'].to_numpy(),
+            etapa_codigo=clasificadas['etapa_codigo'].to_numpy().astype(np.int64),
+            periodo_norm=_texto_normalizado(datos, 'periodo'),
+            subsector_norm=_texto_normalizado(datos, 'subsector'),
+            area_norm=_texto_normalizado(datos, 'area'),
+            busqueda=texto['pedido'] + ' ' + texto['sub_area'],
+            pedido_norm=_texto_normalizado(datos, 'pedido'),
+        )
+
+    def _guardar(self, tabla: str, datos: pd.DataFrame):
+        if len(datos):
+            datos = datos.astype({'id': 'int64'}).sort_values('id', ignore_index=True)
+            self._proximos[tabla] = max(self._proximos.get(tabla, 1), int(datos['id'].iloc[-1]) + 1)
+        self._tablas[tabla] = datos
+
+    def _siguiente_id(self, tabla: str = TABLA) -> int:
+        # Como una secuencia: nunca reutiliza ids, aunque se borren filas
+        siguiente = self._proximos.get(tabla, 1)
+        self._proximos[tabla] = siguiente + 1
+        return siguiente
@@ -0,0 +1,160 @@
+"""Conflictos de guardado: filas que otro usuario cambió entre la carga y el guardado.
+
+Solo se releen las filas que rechazó la escritura condicional. Lo que el
+otro usuario no tocó se vuelve a aplicar solo, con la versión nueva; las
+celdas que ambos cambiaron distinto quedan para que el usuario elija.
+"""
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from cargador import filas_dataframe
+from escritura import InformeEscritura
+from esquema import COLUMNA_MODIFICACION, COLUMNAS_CARGA, COLUMNAS_FECHAS, TABLA
+from guardado import Diferencias, aplicar_diferencias, en_lotes, valores_comparables
+
+# Columnas de la tabla de resolución ("version": updated_at actual, oculta)
+COLUMNAS_CONFLICTO = ["id", "columna", "cargado", "actual", "mio", "usar", "version"]
+USAR = ["base", "mía"]
+
+# Pseudo-columna de un borrado rechazado (la fila cambió después de la carga)
+BORRAR = "(borrar fila)"
+
+# Rondas de releer + reaplicar antes de dejarle el resto al usuario
+MAX_RONDAS = 3
+
+
+@dataclass
+class ResultadoGuardado:
+    """Informes de cada ronda, celdas en conflicto y filas editadas que otro usuario borró."""
+    informes: list = field(default_factory=list)
+    conflictos: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=COLUMNAS_CONFLICTO))
+    borradas: list = field(default_factory=list)
+
+    @property
+    def fallidos(self) -> list:
+        return [r for informe in self.informes for r in informe.fallidos]
+
+    @property
+    def filas_ok(self) -> int:
+        return sum(informe.filas_ok for informe in self.informes)
+
+    def resumen(self) -> str:
+        partes = [informe.resumen() for informe in self.informes]
+        if len(partes) > 1:
+            partes[1:] = [f"reintento: {p}" for p in partes[1:]]
+        return " | ".join(partes) or "sin lotes"
+
+
+def releer(cliente, ids, columnas=None) -> pd.DataFrame:
+    """Estado actual de esas filas (índice id); las que ya no existen no aparecen."""
+    columnas = columnas or COLUMNAS_CARGA + [COLUMNA_MODIFICACION]
+    filas = []
+    for lote in en_lotes(sorted(set(ids))):
+        filas += cliente.table(TABLA).select(",".join(columnas)).in_("id", lote).execute().data
+    actuales = filas_dataframe(filas)
+    return actuales.set_index("id") if not actuales.empty else pd.DataFrame(columns=columnas).set_index("id")
+
+
+def _texto(valor, col: str) -> str:
+    return valores_comparables(pd.Series([valor], dtype=object), col)[0]
+
+
+def _diferencias(cambios: dict, versiones: dict, cargados: pd.DataFrame, borrar=()) -> Diferencias:
+    """Diferencias a partir de {id: {columna: valor}}, agrupando filas con las mismas columnas."""
+    por_columnas = {}
+    for id_, valores in cambios.items():
+        por_columnas.setdefault(tuple(sorted(valores)), []).append({"id": id_, **valores})
+    return Diferencias(
+        nuevos=pd.DataFrame(),
+        modificados=[pd.DataFrame(filas) for filas in por_columnas.values()],
+        ids_borrados=list(borrar),
+        versiones=pd.Series(versiones, dtype=object),
+        cargados=cargados,
+    )
+
+
+def clasificar_rechazos(diferencias: Diferencias, rechazados, actuales: pd.DataFrame):
+    """Separa lo rechazado en (reintento, conflictos, borradas).
+
+    Por cada celda que el usuario cambió: si la base sigue con el valor
+    cargado, se reaplica; si ya tiene el valor del usuario, no hay nada que
+    hacer; si tiene otro, es conflicto. Una fila con algún conflicto va
+    entera a resolución (sus celdas libres, marcadas "mía").
+    """
+    rechazados = set(rechazados)
+    reintento, versiones, conflictos, borradas = {}, {}, [], []
+
+    for grupo in diferencias.modificados:
+        for fila in grupo[grupo["id"].isin(rechazados)].to_dict("records"):
+            id_ = fila.pop("id")
+            if id_ not in actuales.index:
+                borradas.append(id_)
+                continue
+            version = actuales.at[id_, COLUMNA_MODIFICACION]
+            libres, celdas = {}, []
+            for col, mio in fila.items():
+                cargado = _texto(diferencias.cargados.at[id_, col], col)
+                actual = _texto(actuales.at[id_, col], col)
+                mio_texto = _texto(mio, col)
+                if actual == mio_texto:
+                    continue
+                if actual == cargado:
+                    libres[col] = mio
+                celdas.append([id_, col, cargado, actual, mio_texto, "mía" if actual == cargado else "base", version])
+            if any(celda[5] == "base" for celda in celdas):
+                conflictos += celdas
+            elif libres:
+                reintento[id_], versiones[id_] = libres, version
+
+    for id_ in diferencias.ids_borrados:
+        if id_ in rechazados and id_ in actuales.index:
+            conflictos.append([id_, BORRAR, "", "modificada por otro usuario", "borrar", "base",
+                               actuales.at[id_, COLUMNA_MODIFICACION]])
+
+    cargados = actuales.loc[list(reintento)]
+    return (
+        _diferencias(reintento, versiones, cargados),
+        pd.DataFrame(conflictos, columns=COLUMNAS_CONFLICTO),
+        borradas,
+    )
+
+
+def guardar_resolviendo(cliente, diferencias: Diferencias, max_rondas: int = MAX_RONDAS, **opciones) -> ResultadoGuardado:
+    """aplicar_diferencias() y, si algo choca, releer solo eso y reaplicar lo que no está en conflicto."""
+    resultado = ResultadoGuardado()
+    pendiente = diferencias
+    for _ in range(max_rondas):
+        informe: InformeEscritura = aplicar_diferencias(cliente, pendiente, **opciones)
+        resultado.informes.append(informe)
+        if not informe.rechazados:
+            break
+        actuales = releer(cliente, informe.rechazados)
+        pendiente, conflictos, borradas = clasificar_rechazos(pendiente, informe.rechazados, actuales)
+        resultado.conflictos = pd.concat([resultado.conflictos, conflictos], ignore_index=True)
+        resultado.borradas += borradas
+        if pendiente.vacio:
+            break
+    return resultado
+
+
+def _valor(texto: str, col: str):
+    """Texto de la tabla de resolución al tipo que espera serializar_registros."""
+    if texto == "":
+        return None
+    if col in COLUMNAS_FECHAS:
+        return pd.to_datetime(texto, format="%Y-%m-%d")
+    return texto
+
+
+def resolver(conflictos: pd.DataFrame) -> Diferencias:
+    """Diferencias con las celdas marcadas "mía", condicionadas a la versión que se mostró."""
+    elegidos = conflictos[conflictos["usar"] == "mía"]
+    borrar = elegidos.loc[elegidos["columna"] == BORRAR, "id"].astype("int64").tolist()
+    cambios, cargados = {}, {}
+    for fila in elegidos[elegidos["columna"] != BORRAR].itertuples(index=False):
+        id_ = int(fila.id)
+        cambios.setdefault(id_, {})[fila.columna] = _valor(fila.mio, fila.columna)
+        cargados.setdefault(id_, {})[fila.columna] = fila.actual
+    versiones = dict(zip(conflictos["id"].astype("int64"), conflictos["version"]))
+    return _diferencias(cambios, versiones, pd.DataFrame.from_dict(cargados, orient="index"), borrar)
@@ -0,0 +1,224 @@
+"""Envío concurrente de escrituras a Supabase: lotes acotados, reintentos y métricas por lote.
+
+Los lotes se ejecutan en un pool de hilos con un máximo de requests en
+vuelo; quien encola se bloquea cuando hay demasiados pendientes
+(contrapresión), así un archivo o un guardado enorme no se arma entero en
+memoria. Un lote que falla no detiene a los demás: queda en el informe.
+"""
+import contextvars
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import httpx
+from postgrest.exceptions import APIError
+
+from esquema import TABLA
+
+# Requests simultáneos contra PostgREST
+MAX_CONCURRENCIA = 4
+
+# Tope de cada lote: filas y bytes JSON (lo que antes ocurra)
+MAX_FILAS_LOTE = 500
+MAX_BYTES_LOTE = 1024 * 1024
+
+# Reintentos por lote ante errores transitorios, con espera exponencial
+REINTENTOS = 3
+ESPERA_BASE = 0.5
+
+# Códigos que vale la pena reintentar: HTTP 429/5xx, conexión (08xxx),
+# serialización (40001) y statement timeout (57014)
+_CODIGOS_TRANSITORIOS = {"429", "500", "502", "503", "504", "40001", "57014"}
+
+# Errores en que el request seguro no llegó a la base (se puede reintentar un insert)
+_CODIGOS_NO_PROCESADOS = {"429", "503"}
+
+# Escrituras condicionadas a la versión cargada (sql/006_guardado_condicional.sql):
+# operación -> función RPC. Devuelven los ids que sí se aplicaron.
+CONDICIONALES = {"actualizar": "actualizar_prefacturas", "borrar": "borrar_prefacturas"}
+
+
+def es_transitorio(error: Exception) -> bool:
+    """True si vale la pena reintentar (red, saturación o conflicto pasajero)."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, APIError):
+        codigo = str(error.code or "")
+        return codigo in _CODIGOS_TRANSITORIOS or codigo.startswith("08")
+    return False
+
+
+def _reintentable(operacion: str, error: Exception) -> bool:
+    """upsert/delete por id son idempotentes; un insert solo se repite si no pudo haberse aplicado.
+
+    Las condicionales tampoco: si la primera llegó, la versión ya cambió y
+    el reintento se vería como conflicto.
+    """
+    if not es_transitorio(error):
+        return False
+    if operacion != "insert" and operacion not in CONDICIONALES:
+        return True
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    return isinstance(error, APIError) and str(error.code or "") in _CODIGOS_NO_PROCESADOS
+
+
+def lotes_acotados(registros, max_filas: int = MAX_FILAS_LOTE, max_bytes: int = MAX_BYTES_LOTE):
+    """Parte registros en lotes de a lo sumo max_filas filas y ~max_bytes de JSON."""
+    lote, tamano = [], 0
+    for registro in registros:
+        peso = len(json.dumps(registro, default=str))
+        if lote and (len(lote) >= max_filas or tamano + peso > max_bytes):
+            yield lote
+            lote, tamano = [], 0
+        lote.append(registro)
+        tamano += peso
+    if lote:
+        yield lote
+
+
+@dataclass
+class ResultadoLote:
+    """Lo que pasó con un lote: operación, filas, intentos, latencia y error final (si hubo).
+
+    `rechazados`: ids de una escritura condicional cuya versión ya no era la cargada.
+    """
+    operacion: str
+    filas: int
+    intentos: int = 0
+    segundos: float = 0.0
+    error: str = None
+    rechazados: list = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class InformeEscritura:
+    """Resultados de todos los lotes enviados por un EjecutorEscrituras."""
+    lotes: list = field(default_factory=list)
+    segundos: float = 0.0
+
+    @property
+    def fallidos(self) -> list:
+        return [r for r in self.lotes if not r.ok]
+
+    @property
+    def filas_ok(self) -> int:
+        return sum(r.filas - len(r.rechazados) for r in self.lotes if r.ok)
+
+    @property
+    def rechazados(self) -> list:
+        return sorted(i for r in self.lotes for i in r.rechazados)
+
+    @property
+    def reintentos(self) -> int:
+        return sum(max(r.intentos - 1, 0) for r in self.lotes)
+
+    def resumen(self) -> str:
+        latencias = sorted(r.segundos for r in self.lotes)
+        if not latencias:
+            return "sin lotes"
+        mediana = latencias[len(latencias) // 2]
+        conflictos = f" · {len(self.rechazados)} en conflicto" if self.rechazados else ""
+        return (
+            f"{len(self.lotes)} lotes · {len(self.fallidos)} fallidos · {self.reintentos} reintentos{conflictos} · "
+            f"mediana {mediana * 1000:,.0f} ms · máx {latencias[-1] * 1000:,.0f} ms · total {self.segundos:,.1f} s"
+        )
+
+
+class EjecutorEscrituras:
+    """Pool de escrituras con concurrencia limitada, reintentos y contrapresión.
+
+    Uso:
+        with EjecutorEscrituras(cliente) as ejecutor:
+            ejecutor.enviar("upsert", registros)
+        informe = ejecutor.informe
+    """
+
+    def __init__(self, cliente, max_concurrencia: int = MAX_CONCURRENCIA, reintentos: int = REINTENTOS,
+                 espera: float = ESPERA_BASE, tabla: str = TABLA):
+        self.cliente = cliente
+        self.reintentos = reintentos
+        self.espera = espera
+        self.tabla = tabla
+        self.informe = InformeEscritura()
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix="escritura")
+        # Como mucho 2 lotes esperando por cada hilo; enviar() se bloquea si hay más
+        self._cupos = threading.BoundedSemaphore(2 * max_concurrencia)
+        self._lock = threading.Lock()
+        self._pendientes = []
+        self._inicio = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.esperar()
+
+    def _request(self, operacion: str, lote: list):
+        if operacion in CONDICIONALES:
+            return self.cliente.rpc(CONDICIONALES[operacion], {"p_filas": lote}).execute()
+        tabla = self.cliente.table(self.tabla)
+        if operacion == "upsert":
+            return tabla.upsert(lote, on_conflict="id").execute()
+        if operacion == "insert":
+            return tabla.insert(lote).execute()
+        if operacion == "delete":
+            return tabla.delete().in_("id", lote).execute()
+        raise ValueError(f"Operación desconocida: {operacion}")
+
+    def _ejecutar(self, operacion: str, lote: list) -> ResultadoLote:
+        resultado = ResultadoLote(operacion, len(lote))
+        inicio = time.perf_counter()
+        try:
+            while True:
+                resultado.intentos += 1
+                try:
+                    respuesta = self._request(operacion, lote)
+                    if operacion in CONDICIONALES:
+                        aplicados = {fila["id"] for fila in respuesta.data or []}
+                        resultado.rechazados = [f["id"] for f in lote if f["id"] not in aplicados]
+                    break
+                except Exception as e:
+                    if resultado.intentos > self.reintentos or not _reintentable(operacion, e):
+                        resultado.error = getattr(e, "message", None) or str(e) or type(e).__name__
+                        break
+                    time.sleep(self.espera * 2 ** (resultado.intentos - 1))
+        finally:
+            resultado.segundos = time.perf_counter() - inicio
+            with self._lock:
+                self.informe.lotes.append(resultado)
+            self._cupos.release()
+        return resultado
+
+    def enviar(self, operacion: str, lote: list):
+        """Encola un lote; bloquea si hay demasiados en vuelo.
+
+        "upsert"/"insert" llevan registros, "delete" una lista de ids y
+        "actualizar"/"borrar" registros con id y "_version" (updated_at cargado).
+        """
+        if not lote:
+            return
+        self._cupos.acquire()
+        # El hilo del pool corre con el contexto de quien encola (p. ej. el medidor de tiempos del rerun)
+        self._pendientes.append(self._pool.submit(contextvars.copy_context().run, self._ejecutar, operacion, lote))
+
+    def enviar_registros(self, operacion: str, registros, max_filas: int = MAX_FILAS_LOTE,
+                         max_bytes: int = MAX_BYTES_LOTE):
+        """Parte registros en lotes acotados y los encola."""
+        for lote in lotes_acotados(registros, max_filas, max_bytes):
+            self.enviar(operacion, lote)
+
+    def esperar(self) -> InformeEscritura:
+        """Espera a que terminen todos los lotes encolados y devuelve el informe."""
+        for futuro in self._pendientes:
+            futuro.result()
+        self._pendientes = []
+        self._pool.shutdown(wait=True)
+        self.informe.segundos = time.perf_counter() - self._inicio
+        return self.informe
@@ -0,0 +1,65 @@
+"""Esquema de la tabla prefacturas_pedidos compartido por la app y los módulos de datos."""
+
+TABLA = "prefacturas_pedidos"
+
+# Hitos del ciclo (columnas tipo date en Supabase)
+COLUMNAS_FECHAS = [
+    "fecha_elaboracion",
+    "fecha_formato",
+    "fecha_solicitud_modificacion",
+    "fecha_entrega_post_modificacion",
+    "fecha_conciliacion",
+    "fecha_firma_ingenica",
+    "fecha_entrega_final_ingenica_central",
+    "fecha_firma_dnds",
+    "fecha_edicion_pedido",
+]
+
+# Columnas tipo catálogo (deben calzar con los combobox del editor)
+COLUMNAS_CATALOGO = ["sector", "subsector", "periodo", "area"]
+
+# =========================
+# LISTAS PARA COMBOBOX
+# =========================
+SECTORES = ["MANAGUA", "NORTE", "OCCIDENTE", "ORIENTE", "SUR"]
+
+SUBSECTORES = ["MANAGUA DN", "MANAGUA DS", "NORTE", "OCCIDENTE", "ORIENTE", "SUR"]
+
+MESES = ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO",
+         "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
+PERIODOS = [f"{m} 1Q" for m in MESES] + [f"{m} 2Q" for m in MESES]
+
+AREAS = ["MANTENIMIENTO", "DESARROLLO", "PROYECTOS", "PNESER", "CAMPAÑA", "PSSEN"]
+
+# Valores válidos de cada columna catálogo ("" = sin dato)
+CATALOGOS = {
+    "sector": SECTORES,
+    "subsector": SUBSECTORES,
+    "periodo": PERIODOS,
+    "area": AREAS,
+}
+
+# Columnas que realmente usan el tablero y el editor (proyección del SELECT)
+COLUMNAS_CARGA = (
+    ["id", "created_at"]
+    + COLUMNAS_CATALOGO
+    + ["sub_area", "pedido"]
+    + COLUMNAS_FECHAS
+)
+
+# Marca de modificación mantenida por trigger (sql/001_updated_at.sql)
+COLUMNA_MODIFICACION = "updated_at"
+
+# Columnas que administra la base (no se editan ni se comparan al guardar)
+COLUMNAS_SISTEMA = ["id", "created_at", COLUMNA_MODIFICACION]
+
+# Vista con sector normalizado y etapa (sql/003_prefacturas_vista.sql)
+VISTA = "prefacturas_vista"
+
+# Conteos diarios por sector y etapa (sql/004_snapshots_etapas.sql)
+TABLA_SNAPSHOTS = "prefacturas_snapshots"
+
+# Prefacturas cerradas archivadas, su conteo y su vista filtrable (sql/007_archivo.sql)
+TABLA_ARCHIVO = "prefacturas_archivo"
+TABLA_RESUMEN_ARCHIVO = "prefacturas_archivo_resumen"
+VISTA_ARCHIVO = "prefacturas_archivo_vista"
@@ -0,0 +1,63 @@
+"""Clasificación de cada prefactura en su etapa del ciclo (una sola pasada)."""
+import numpy as np
+import pandas as pd
+
+# El orden define el código entero de cada etapa (etapa_codigo)
+ETAPAS = [
+    "Por Elaborar",
+    "Por Conciliar",
+    "Pendiente de Pedido",
+    "Pedido Recibido",
+    "Sin clasificar",
+]
+PEDIDO_RECIBIDO = ETAPAS.index("Pedido Recibido")
+SIN_CLASIFICAR = ETAPAS.index("Sin clasificar")
+
+# Columnas derivadas que agrega clasificar_etapas() (no se editan ni se guardan)
+COLUMNAS_ETAPA = ["pedido_lleno", "etapa_codigo", "etapa"]
+
+
+def serie_pedido_lleno(df_in: pd.DataFrame) -> pd.Series:
+    """True si pedido NO está vacío (maneja None, '', '   ')."""
+    if 'pedido' not in df_in.columns:
+        return pd.Series([False] * len(df_in), index=df_in.index)
+    return df_in['pedido'].fillna('').astype(str).str.strip().ne('')
+
+
+def codigos_etapa(df_in: pd.DataFrame) -> np.ndarray:
+    """Código de etapa por fila (excluyente, primera condición que calce)."""
+    # Si faltan columnas, no romper
+    if 'fecha_elaboracion' not in df_in.columns or 'fecha_conciliacion' not in df_in.columns:
+        return np.full(len(df_in), SIN_CLASIFICAR, dtype=np.int8)
+
+    pedido_lleno = serie_pedido_lleno(df_in).to_numpy()
+    elaborada = df_in['fecha_elaboracion'].notnull().to_numpy()
+    conciliada = df_in['fecha_conciliacion'].notnull().to_numpy()
+    conds = [
+        ~elaborada,
+        elaborada & ~conciliada,
+        conciliada & ~pedido_lleno,
+        conciliada & pedido_lleno,
+    ]
+    return np.select(conds, [0, 1, 2, 3], default=SIN_CLASIFICAR).astype(np.int8)
+
+
+def etapa_excluyente(df_in: pd.DataFrame) -> pd.Series:
+    """Devuelve etapa por fila (excluyente) según ciclo."""
+    return pd.Series(np.asarray(ETAPAS, dtype=object)[codigos_etapa(df_in)], index=df_in.index)
+
+
+def clasificar_etapas(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrega pedido_lleno, etapa_codigo (int8) y etapa (categórica) calculadas una sola vez."""
+    codigos = codigos_etapa(df)
+    return df.assign(
+        pedido_lleno=serie_pedido_lleno(df).to_numpy(),
+        etapa_codigo=codigos,
+        etapa=pd.Categorical.from_codes(codigos, categories=ETAPAS),
+    )
+
+
+def contar_etapas(codigos, pesos=None) -> np.ndarray:
+    """Cantidad de filas por etapa, en el orden de ETAPAS (pesos: conteos ya agregados)."""
+    conteo = np.bincount(np.asarray(codigos, dtype=np.int64), weights=pesos, minlength=len(ETAPAS))
+    return conteo.astype(np.int64)
@@ -0,0 +1,90 @@
+"""Exportación en streaming (CSV, CSV gzip o Parquet) sin armar el archivo entero en memoria.
+
+Los datos llegan como un iterable de DataFrames (trozos) y se escriben uno
+a uno sobre un archivo temporal que pasa a disco si crece.
+"""
+import gzip
+import io
+import tempfile
+
+import pandas as pd
+
+from esquema import COLUMNAS_FECHAS
+from etapas import COLUMNAS_ETAPA
+
+# Filas por trozo al recorrer un DataFrame en memoria
+TAM_TROZO = 20_000
+
+# Hasta este tamaño el archivo temporal vive en memoria; después, en disco
+MAX_EN_MEMORIA = 32 * 1024 * 1024
+
+# nombre -> (extensión, mime)
+FORMATOS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV comprimido (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def trozos_dataframe(df: pd.DataFrame, tam_trozo: int = TAM_TROZO):
+    """Recorre un DataFrame en vistas de tam_trozo filas (sin copiarlo entero).
+
+    Sin filas igual da un trozo vacío: el archivo sale con encabezado/esquema.
+    """
+    for inicio in range(0, max(len(df), 1), tam_trozo):
+        yield df.iloc[inicio:inicio + tam_trozo]
+
+
+def _limpiar(trozo: pd.DataFrame) -> pd.DataFrame:
+    """Quita columnas derivadas y pasa categorías a texto (esquema estable entre trozos)."""
+    trozo = trozo.drop(columns=[c for c in COLUMNAS_ETAPA if c in trozo.columns])
+    categoricas = [c for c in trozo.columns if isinstance(trozo[c].dtype, pd.CategoricalDtype)]
+    return trozo.astype({c: object for c in categoricas}) if categoricas else trozo
+
+
+def escribir_csv(trozos, destino, comprimir: bool = False):
+    """Escribe los trozos como un único CSV UTF-8 (encabezado solo en el primero)."""
+    binario = gzip.GzipFile(fileobj=destino, mode="wb") if comprimir else destino
+    texto = io.TextIOWrapper(binario, encoding="utf-8", newline="")
+    primero = True
+    for trozo in trozos:
+        _limpiar(trozo).to_csv(texto, header=primero, index=False)
+        primero = False
+    texto.flush()
+    texto.detach()
+    if comprimir:
+        binario.close()  # cierra el gzip (escribe el pie), no el destino
+
+
+def _esquema_parquet(columnas):
+    import pyarrow as pa
+
+    tipos = {"id": pa.int64(), **{c: pa.date32() for c in COLUMNAS_FECHAS}}
+    return pa.schema([(c, tipos.get(c, pa.string())) for c in columnas])
+
+
+def escribir_parquet(trozos, destino):
+    """Escribe los trozos como row groups de un único archivo Parquet."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    for trozo in trozos:
+        trozo = _limpiar(trozo)
+        if escritor is None:
+            esquema = _esquema_parquet(trozo.columns)
+            escritor = pq.ParquetWriter(destino, esquema, compression="zstd")
+        escritor.write_table(pa.Table.from_pandas(trozo, schema=esquema, preserve_index=False))
+    if escritor is not None:
+        escritor.close()
+
+
+def exportar(trozos, formato: str):
+    """Genera el archivo en el formato pedido y lo devuelve como archivo abierto al inicio."""
+    destino = tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+    if formato == "Parquet":
+        escribir_parquet(trozos, destino)
+    else:
+        escribir_csv(trozos, destino, comprimir=formato == "CSV comprimido (gzip)")
+    destino.seek(0)
+    return destino
@@ -0,0 +1,78 @@
+"""Gráficos Altair del tablero.
+
+Altair es la importación más pesada de la app (~0,3 s en frío): app.py
+importa este módulo recién dentro de la pestaña que dibuja un gráfico, así
+los KPIs salen antes y quien solo usa el editor no la paga. reportes.py
+usa los mismos gráficos para los reportes offline.
+"""
+import altair as alt
+import pandas as pd
+
+ORDEN_ETAPAS = ["1. Por Elaborar", "2. Por Conciliar", "3. Pendiente de Pedido", "4. Pedido Recibido"]
+
+# Colores por etapa: rojo pendiente, verde claro recibido
+DOMINIO_ETAPAS = ["Por Elaborar", "Por Conciliar", "Pendiente de Pedido", "Pedido Recibido", "Sin clasificar"]
+COLORES_ETAPAS = ["#60A5FA", "#1D4ED8", "#EF4444", "#86EFAC", "#9CA3AF"]
+
+
+def grafico_distribucion(resumen: pd.DataFrame, etiqueta: str) -> alt.LayerChart:
+    """Barras apiladas por categoría y etapa (salida de resumen_grafico), con etiquetas."""
+    orden_etapas = ORDEN_ETAPAS
+    if (resumen['Etapa'] == "Sin clasificar").any():
+        orden_etapas = orden_etapas + ["Sin clasificar"]
+
+    h = max(260, min(520, 60 + 30 * resumen['Categoria'].nunique()))
+
+    base = alt.Chart(resumen).encode(
+        y=alt.Y('Categoria:N', sort=alt.SortField(field='TotalCategoria', order='descending'), title=etiqueta),
+        x=alt.X('Cantidad:Q', stack='zero', title='Nº Prefacturas'),
+        color=alt.Color(
+            'Etapa:N',
+            sort=orden_etapas,
+            title='Etapas',
+            scale=alt.Scale(domain=DOMINIO_ETAPAS, range=COLORES_ETAPAS),
+        ),
+        tooltip=[
+            alt.Tooltip('Categoria:N', title=etiqueta),
+            alt.Tooltip('Etapa:N', title='Etapa'),
+            alt.Tooltip('Cantidad:Q', title='Cantidad'),
+            alt.Tooltip('TotalCategoria:Q', title='Total categoría'),
+        ]
+    )
+
+    barras = base.mark_bar(size=26, cornerRadius=6, stroke='rgba(0,0,0,0.25)', strokeWidth=1)
+    labels = base.transform_filter(alt.datum.Cantidad > 0).mark_text(
+        align='left', baseline='middle', dx=6, fontSize=12
+    ).encode(text='Cantidad:Q')
+    return (barras + labels).properties(height=h)
+
+
+def grafico_tramos(global_tramos: pd.DataFrame, orden_tramos: list) -> alt.Chart:
+    """Mediana de días por tramo del ciclo (salida de percentiles_tramos)."""
+    return alt.Chart(global_tramos).mark_bar(cornerRadius=4).encode(
+        y=alt.Y('tramo:N', sort=orden_tramos, title='Días hasta'),
+        x=alt.X('p50:Q', title='Mediana (días)'),
+        tooltip=['tramo', 'n', 'p50', 'p90', 'p99'],
+    ).properties(height=260)
+
+
+def grafico_tendencia(serie: pd.DataFrame) -> alt.Chart:
+    """Líneas por etapa de la tendencia diaria (columnas dia, Etapa, cantidad)."""
+    return alt.Chart(serie).mark_line(point=False, strokeWidth=2).encode(
+        x=alt.X('dia:T', title='Día'),
+        y=alt.Y('cantidad:Q', title='Nº Prefacturas'),
+        color=alt.Color(
+            'Etapa:N',
+            title='Etapas',
+            scale=alt.Scale(domain=DOMINIO_ETAPAS[:4], range=COLORES_ETAPAS[:4]),
+        ),
+        tooltip=[alt.Tooltip('dia:T', title='Día'), 'Etapa:N', alt.Tooltip('cantidad:Q', title='Cantidad')],
+    ).properties(height=300)
+
+
+def titulado(grafico, titulo: str, subtitulo=None):
+    """El gráfico con título, subtítulo y ancho fijo, para exportarlo fuera de la app (reportes.py)."""
+    return grafico.properties(
+        title=alt.TitleParams(titulo, subtitle=subtitulo or [], anchor='start'),
+        width=640,
+    )
@@ -0,0 +1,148 @@
+"""Guardado por diferencias: solo las filas y columnas que cambiaron en el editor.
+
+Con versión (updated_at) cargada, modificaciones y bajas se aplican solo si
+la fila sigue en esa versión; lo rechazado lo resuelve conflictos.py.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from escritura import MAX_CONCURRENCIA, MAX_FILAS_LOTE, EjecutorEscrituras, InformeEscritura
+from esquema import COLUMNA_MODIFICACION, COLUMNAS_FECHAS, COLUMNAS_SISTEMA
+from serializacion import serializar_registros
+
+# Filas por request (insert/upsert/delete) para no armar payloads gigantes
+TAM_LOTE = MAX_FILAS_LOTE
+
+
+@dataclass
+class Diferencias:
+    """Cambios del editor respecto al snapshot con que se construyó."""
+    nuevos: pd.DataFrame
+    # Un DataFrame (id + columnas cambiadas) por cada combinación de columnas cambiadas
+    modificados: list = field(default_factory=list)
+    ids_borrados: list = field(default_factory=list)
+    # id -> updated_at con que se cargó la fila (vacío si la tabla no lo tiene)
+    versiones: pd.Series = field(default_factory=lambda: pd.Series(dtype=object))
+    # Valores cargados (índice id) de las filas modificadas o borradas, para resolver conflictos
+    cargados: pd.DataFrame = field(default_factory=pd.DataFrame)
+
+    @property
+    def vacio(self) -> bool:
+        return self.nuevos.empty and not self.modificados and not self.ids_borrados
+
+    @property
+    def versionado(self) -> bool:
+        return not self.versiones.empty
+
+    @property
+    def n_modificados(self) -> int:
+        return sum(len(g) for g in self.modificados)
+
+    def resumen(self) -> str:
+        celdas = sum(g.size - len(g) for g in self.modificados)
+        return (
+            f"{len(self.nuevos)} nuevas · {self.n_modificados} modificadas ({celdas} celdas) · "
+            f"{len(self.ids_borrados)} eliminadas"
+        )
+
+
+def valores_comparables(s: pd.Series, col: str) -> np.ndarray:
+    """Representación de texto para comparar valores (None/NaN/'' son lo mismo)."""
+    if col in COLUMNAS_FECHAS:
+        s = pd.to_datetime(s, errors='coerce').dt.strftime('%Y-%m-%d')
+    return s.astype(object).where(s.notna(), "").astype(str).str.strip().to_numpy()
+
+
+def calcular_diferencias(base: pd.DataFrame, editado: pd.DataFrame) -> Diferencias:
+    """Compara la salida de st.data_editor contra su snapshot de origen, por id.
+
+    - nuevos: filas sin id
+    - modificados: filas cuyo id está en base y alguna columna cambió
+    - ids_borrados: ids de base que ya no están en el editor
+    """
+    if 'id' in editado.columns:
+        ids = pd.to_numeric(editado['id'], errors='coerce')
+    else:
+        ids = pd.Series(np.nan, index=editado.index)
+
+    nuevos = editado[ids.isna()]
+    existentes = editado[ids.notna()].assign(id=ids[ids.notna()].astype('int64')).set_index('id')
+
+    ids_base = base['id'].astype('int64') if 'id' in base.columns else pd.Series([], dtype='int64')
+    ids_borrados = ids_base[~ids_base.isin(existentes.index)].tolist()
+
+    columnas = [c for c in existentes.columns if c in base.columns and c not in COLUMNAS_SISTEMA]
+    base_por_id = base.assign(id=ids_base).set_index('id')
+    previos = base_por_id.reindex(existentes.index)
+    cambios = pd.DataFrame(
+        {c: valores_comparables(previos[c], c) != valores_comparables(existentes[c], c) for c in columnas},
+        index=existentes.index,
+    )
+    cambios = cambios[cambios.any(axis=1)]
+
+    versiones = (
+        base_por_id[COLUMNA_MODIFICACION] if COLUMNA_MODIFICACION in base_por_id.columns
+        else pd.Series(dtype=object)
+    )
+    cargados = base_por_id.loc[cambios.index.append(pd.Index(ids_borrados, dtype='int64'))]
+
+    modificados = []
+    if not cambios.empty:
+        for patron, grupo in cambios.groupby(columnas):
+            cols = [c for c, cambio in zip(columnas, patron) if cambio]
+            modificados.append(existentes.loc[grupo.index, cols].reset_index())
+
+    return Diferencias(
+        nuevos=nuevos, modificados=modificados, ids_borrados=ids_borrados,
+        versiones=versiones, cargados=cargados,
+    )
+
+
+def en_lotes(elementos: list, tam_lote: int = TAM_LOTE):
+    """Parte una lista en trozos de a lo sumo tam_lote elementos."""
+    for i in range(0, len(elementos), tam_lote):
+        yield elementos[i:i + tam_lote]
+
+
+def _con_version(registros: list, versiones: pd.Series) -> list:
+    """Agrega a cada registro la versión con que se cargó ("_version")."""
+    for registro in registros:
+        version = versiones.get(registro["id"])
+        registro["_version"] = None if pd.isna(version) else str(version)
+    return registros
+
+
+def aplicar_diferencias(cliente, diferencias: Diferencias, tam_lote: int = TAM_LOTE,
+                        max_concurrencia: int = MAX_CONCURRENCIA, condicional: bool = True) -> InformeEscritura:
+    """Envía a Supabase solo los cambios, en lotes acotados y en paralelo.
+
+    Cada lote toca ids distintos, así que el orden entre lotes no importa.
+    Con condicional=True (y versiones cargadas) las modificaciones y bajas
+    van por las RPC de sql/006_guardado_condicional.sql: lo que otro usuario
+    cambió después de la carga no se pisa y queda en informe.rechazados.
+    No lanza si un lote falla: revisar informe.fallidos.
+    """
+    condicional = condicional and diferencias.versionado
+    with EjecutorEscrituras(cliente, max_concurrencia=max_concurrencia) as ejecutor:
+        # Actualizaciones parciales: cada grupo comparte las mismas columnas,
+        # así el upsert solo toca esas columnas de esas filas.
+        for grupo in diferencias.modificados:
+            registros = serializar_registros(grupo)
+            if condicional:
+                ejecutor.enviar_registros("actualizar", _con_version(registros, diferencias.versiones), max_filas=tam_lote)
+            else:
+                ejecutor.enviar_registros("upsert", registros, max_filas=tam_lote)
+
+        if not diferencias.nuevos.empty:
+            nuevos = serializar_registros(diferencias.nuevos, quitar_vacias=True)
+            ejecutor.enviar_registros("insert", nuevos, max_filas=tam_lote)
+
+        if condicional:
+            borrados = _con_version([{"id": int(i)} for i in diferencias.ids_borrados], diferencias.versiones)
+            ejecutor.enviar_registros("borrar", borrados, max_filas=tam_lote)
+        else:
+            for lote in en_lotes(diferencias.ids_borrados, tam_lote):
+                ejecutor.enviar("delete", lote)
+    return ejecutor.informe
@@ -0,0 +1,214 @@
+"""Importación masiva desde CSV/XLSX: lectura por trozos, validación e insert en lotes.
+
+Cada trozo pasa por las mismas reglas que la carga (normalizar_datos); las
+filas con valores fuera de catálogo o fechas ilegibles no se insertan y se
+devuelven como errores. Las filas importadas siempre se crean nuevas
+(cualquier columna id del archivo se ignora).
+"""
+import csv
+import time
+import unicodedata
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from escritura import MAX_CONCURRENCIA, MAX_FILAS_LOTE, EjecutorEscrituras, InformeEscritura
+from esquema import CATALOGOS, COLUMNAS_CARGA, COLUMNAS_FECHAS, COLUMNAS_SISTEMA
+from normalizacion import normalizar_datos
+from serializacion import CENTINELAS_NULOS, serializar_registros
+
+# Filas leídas del archivo por trozo
+TAM_TROZO_IMPORTACION = 5_000
+
+# Columnas que se aceptan del archivo (las de sistema las pone la base)
+COLUMNAS_IMPORTABLES = [c for c in COLUMNAS_CARGA if c not in COLUMNAS_SISTEMA]
+
+EXTENSIONES = ["csv", "xlsx"]
+
+
+@dataclass
+class ResultadoImportacion:
+    """Totales de una importación y detalle de las filas rechazadas."""
+    filas_leidas: int = 0
+    filas_enviadas: int = 0
+    filas_vacias: int = 0
+    segundos: float = 0.0
+    columnas_ignoradas: list = field(default_factory=list)
+    # Un dict por problema: fila (de la hoja, encabezado = 1), columna, valor, motivo
+    errores: list = field(default_factory=list)
+    # Lotes enviados a la base (latencias, reintentos, fallos)
+    informe: InformeEscritura = field(default_factory=InformeEscritura)
+
+    @property
+    def filas_insertadas(self) -> int:
+        return self.informe.filas_ok
+
+    @property
+    def filas_rechazadas(self) -> int:
+        return len({e["fila"] for e in self.errores})
+
+    def resumen(self) -> str:
+        return (
+            f"{self.filas_insertadas} insertadas · {self.filas_rechazadas} rechazadas · "
+            f"{self.filas_vacias} vacías · {len(self.informe.lotes)} lotes · {self.segundos:,.1f} s"
+        )
+
+    def errores_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.errores, columns=["fila", "columna", "valor", "motivo"])
+
+
+def _clave(nombre) -> str:
+    """Encabezado comparable: sin tildes, minúsculas y con '_' en lugar de espacios."""
+    texto = unicodedata.normalize("NFKD", str(nombre)).encode("ascii", "ignore").decode()
+    return "_".join(texto.strip().lower().replace("-", " ").split())
+
+
+_COLUMNA_POR_CLAVE = {_clave(c): c for c in COLUMNAS_IMPORTABLES}
+
+
+def leer_trozos(archivo, nombre: str, tam_trozo: int = TAM_TROZO_IMPORTACION):
+    """Itera el archivo en DataFrames de a lo sumo tam_trozo filas (todo como texto/valor crudo)."""
+    if nombre.lower().endswith(".xlsx"):
+        yield from _trozos_xlsx(archivo, tam_trozo)
+    else:
+        yield from pd.read_csv(
+            archivo, chunksize=tam_trozo, dtype=str, keep_default_na=False,
+            sep=_separador(archivo), encoding="utf-8-sig",
+        )
+
+
+def _separador(archivo) -> str:
+    """Detecta ',' o ';' (Excel en español exporta con ';') mirando el comienzo del archivo."""
+    posicion = archivo.tell()
+    muestra = archivo.read(64 * 1024)
+    archivo.seek(posicion)
+    if isinstance(muestra, bytes):
+        muestra = muestra.decode("utf-8-sig", errors="ignore")
+    try:
+        return csv.Sniffer().sniff(muestra, delimiters=",;\t").delimiter
+    except csv.Error:
+        return ","
+
+
+def _trozos_xlsx(archivo, tam_trozo: int):
+    # openpyxl es opcional: solo hace falta para importar Excel
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise RuntimeError("Para importar .xlsx instala openpyxl (pip install openpyxl), o usa CSV.") from e
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = [str(c) if c is not None else "" for c in next(filas, [])]
+        bloque = []
+        for fila in filas:
+            bloque.append(fila)
+            if len(bloque) == tam_trozo:
+                yield pd.DataFrame(bloque, columns=encabezado, dtype=object)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=encabezado, dtype=object)
+    finally:
+        libro.close()
+
+
+def _renombrar(trozo: pd.DataFrame):
+    """Lleva los encabezados del archivo a los nombres de la tabla; devuelve (trozo, ignoradas)."""
+    renombres = {}
+    for c in trozo.columns:
+        destino = _COLUMNA_POR_CLAVE.get(_clave(c))
+        if destino is not None and destino not in renombres.values():
+            renombres[c] = destino
+    ignoradas = [str(c) for c in trozo.columns if c not in renombres]
+    return trozo[list(renombres)].rename(columns=renombres), ignoradas
+
+
+def fechas_importadas(s: pd.Series) -> pd.Series:
+    """Parsea fechas ISO (aaaa-mm-dd, también celdas fecha de Excel) y, si no, dd/mm/aaaa.
+
+    Dos pasadas con formato fijo: vectorizado y sin ambigüedad día/mes.
+    """
+    fechas = pd.to_datetime(s, format="ISO8601", errors="coerce")
+    resto = fechas.isna() & s.notna()
+    if resto.any():
+        fechas[resto] = pd.to_datetime(s[resto].astype(str).str.strip(), format="%d/%m/%Y", errors="coerce")
+    return fechas
+
+
+def _vacios(trozo: pd.DataFrame) -> pd.DataFrame:
+    """Máscara de celdas vacías (None/NaN, '' o textos centinela)."""
+    texto = trozo.astype(object).where(trozo.notna(), "").astype(str)
+    return texto.apply(lambda s: s.str.strip().isin(CENTINELAS_NULOS))
+
+
+def validar_trozo(crudo: pd.DataFrame, normalizado: pd.DataFrame, primera_fila: int, vacios=None):
+    """Devuelve (máscara de filas válidas, lista de errores) comparando crudo vs normalizado."""
+    if vacios is None:
+        vacios = _vacios(crudo)
+    invalidas = pd.DataFrame(False, index=crudo.index, columns=crudo.columns)
+    motivos = {}
+
+    for col, catalogo in CATALOGOS.items():
+        if col in normalizado.columns:
+            invalidas[col] = ~normalizado[col].isin(catalogo) & ~vacios[col]
+            motivos[col] = "fuera de catálogo"
+    for col in COLUMNAS_FECHAS:
+        if col in normalizado.columns:
+            invalidas[col] = normalizado[col].isna() & ~vacios[col]
+            motivos[col] = "fecha no reconocida"
+
+    errores = []
+    filas, columnas = invalidas.to_numpy().nonzero()
+    for i, j in zip(filas, columnas):
+        col = crudo.columns[j]
+        errores.append({
+            "fila": primera_fila + int(i),
+            "columna": col,
+            "valor": str(crudo.iat[i, j]),
+            "motivo": motivos[col],
+        })
+    return ~invalidas.any(axis=1), errores
+
+
+def importar(cliente, archivo, nombre: str, tam_trozo: int = TAM_TROZO_IMPORTACION,
+             tam_lote: int = MAX_FILAS_LOTE, max_concurrencia: int = MAX_CONCURRENCIA,
+             al_avanzar=None) -> ResultadoImportacion:
+    """Lee, valida e inserta el archivo por trozos. `al_avanzar(resultado)` se llama tras cada trozo.
+
+    Los lotes se insertan en paralelo mientras se lee el trozo siguiente; si
+    alguno falla de forma definitiva queda en resultado.informe.fallidos y
+    el resto sigue.
+    """
+    inicio = time.perf_counter()
+    resultado = ResultadoImportacion()
+    primera_fila = 2  # la fila 1 de la hoja es el encabezado
+
+    with EjecutorEscrituras(cliente, max_concurrencia=max_concurrencia) as ejecutor:
+        resultado.informe = ejecutor.informe
+        for crudo in leer_trozos(archivo, nombre, tam_trozo):
+            crudo, ignoradas = _renombrar(crudo.reset_index(drop=True))
+            if not resultado.columnas_ignoradas:
+                resultado.columnas_ignoradas = ignoradas
+
+            vacios = _vacios(crudo)
+            vacias = vacios.all(axis=1)
+            normalizado = normalizar_datos(crudo.assign(**{
+                c: fechas_importadas(crudo[c]) for c in COLUMNAS_FECHAS if c in crudo.columns
+            }))
+            validas, errores = validar_trozo(crudo, normalizado, primera_fila, vacios)
+            resultado.errores.extend(errores)
+
+            registros = serializar_registros(normalizado[validas & ~vacias], quitar_vacias=True)
+            ejecutor.enviar_registros("insert", registros, max_filas=tam_lote)
+
+            resultado.filas_leidas += len(crudo)
+            resultado.filas_enviadas += len(registros)
+            resultado.filas_vacias += int(vacias.sum())
+            primera_fila += len(crudo)
+            resultado.segundos = time.perf_counter() - inicio
+            if al_avanzar is not None:
+                al_avanzar(resultado)
+
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
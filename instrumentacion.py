@@ -0,0 +1,211 @@
+"""Tiempos por rerun: tramos con nombre y contadores de llamadas a Supabase.
+
+Cada rerun crea un Medidor y lo activa; marcar() cierra el tramo en curso y
+abre otro (una marca por sección de app.py) y tramo() mide un bloque
+puntual desde cualquier módulo. Mientras hay un medidor activo, cada
+execute() que pasa por ClienteMedido registra recurso, filas, bytes (los
+de la respuesta HTTP, sin volver a serializar) y tiempo. Sin medidor
+activo el costo es leer una ContextVar.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger("prefacturas.tiempos")
+
+_medidor: ContextVar = ContextVar("medidor_tiempos", default=None)
+
+# Bytes y número de la última respuesta HTTP recibida en cada hilo (lo anota el hook de httpx)
+_ultima_respuesta = threading.local()
+
+
+@dataclass
+class Llamada:
+    """Un execute() contra Supabase."""
+    recurso: str
+    operacion: str
+    filas: int
+    bytes: int
+    segundos: float
+
+
+@dataclass
+class Medidor:
+    """Tramos (nombre -> segundos acumulados) y llamadas de un rerun."""
+    inicio: datetime = field(default_factory=datetime.now)
+    tramos: dict = field(default_factory=dict)
+    llamadas: list = field(default_factory=list)
+    _actual: str = None
+    _desde: float = 0.0
+
+    def sumar(self, nombre: str, segundos: float):
+        self.tramos[nombre] = self.tramos.get(nombre, 0.0) + segundos
+
+    def marcar(self, nombre: str):
+        """Cierra el tramo en curso (si hay) y empieza `nombre`."""
+        ahora = time.perf_counter()
+        if self._actual is not None:
+            self.sumar(self._actual, ahora - self._desde)
+        self._actual, self._desde = nombre, ahora
+
+    def terminar(self):
+        """Cierra el último tramo y agrega el total del rerun."""
+        self.marcar(None)
+        self.tramos["total"] = (datetime.now() - self.inicio).total_seconds()
+
+    def registrar(self, llamada: Llamada):
+        # list.append es atómico: los hilos del pool de escritura registran sin lock
+        self.llamadas.append(llamada)
+
+    def fila(self) -> dict:
+        """Resumen plano del rerun: una fila del panel o una línea de log."""
+        return {
+            "inicio": self.inicio.strftime("%H:%M:%S"),
+            **{f"{nombre} ms": round(seg * 1000, 1) for nombre, seg in self.tramos.items()},
+            "requests": len(self.llamadas),
+            "filas": sum(l.filas for l in self.llamadas),
+            "KB": round(sum(l.bytes for l in self.llamadas) / 1024, 1),
+            "supabase ms": round(sum(l.segundos for l in self.llamadas) * 1000, 1),
+        }
+
+    def llamadas_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame([vars(l) for l in self.llamadas], columns=list(Llamada.__dataclass_fields__))
+
+    def log(self):
+        """Una línea JSON por rerun en el logger prefacturas.tiempos."""
+        logger.info(json.dumps(self.fila(), ensure_ascii=False))
+
+
+def activar(medidor: Medidor):
+    """Las llamadas de este contexto (y de los hilos que lo copien) se registran en `medidor` (None = no medir)."""
+    _medidor.set(medidor)
+
+
+def medidor_activo():
+    return _medidor.get()
+
+
+@contextmanager
+def tramo(nombre: str):
+    """Mide un bloque en el medidor activo (no hace nada si no hay)."""
+    medidor = _medidor.get()
+    if medidor is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medidor.sumar(nombre, time.perf_counter() - inicio)
+
+
+def _anotar_respuesta(respuesta):
+    """Hook de httpx: tamaño de la respuesta (content-length o el cuerpo, que postgrest lee de todos modos)."""
+    largo = respuesta.headers.get("content-length")
+    _ultima_respuesta.bytes = int(largo) if largo else len(respuesta.read())
+    _ultima_respuesta.numero = numero_respuesta() + 1
+
+
+def numero_respuesta() -> int:
+    """Cuántas respuestas anotó el hook en este hilo; se toma antes del request (ver bytes_respuesta)."""
+    return getattr(_ultima_respuesta, "numero", 0)
+
+
+def escuchar_respuestas(cliente):
+    """Agrega el hook de tamaño a la sesión httpx de postgrest del cliente (si la tiene; una sola vez)."""
+    sesion = getattr(getattr(cliente, "postgrest", None), "session", None)
+    hooks = getattr(sesion, "event_hooks", None)
+    if hooks is not None and _anotar_respuesta not in hooks["response"]:
+        hooks["response"].append(_anotar_respuesta)
+
+
+def bytes_respuesta(respuesta, desde: int) -> int:
+    """Bytes de `respuesta`, recién recibida en este hilo.
+
+    Sale del hook HTTP (escuchar_respuestas, que lo pisa en cada respuesta del hilo)
+    o, si el objeto lo trae (ClienteLocal), de su atributo bytes; 0 si no se conoce.
+    `desde` es numero_respuesta() tomado antes del request: si el hook no anotó
+    nada después (sin hook, o respuesta que no pasó por httpx), el valor que
+    queda es de un request anterior y no se usa.
+    """
+    tamano = getattr(respuesta, "bytes", None)
+    if tamano is not None:
+        return tamano
+    return getattr(_ultima_respuesta, "bytes", 0) if numero_respuesta() != desde else 0
+
+
+def configurar_log(nivel: int = logging.INFO):
+    """Envía el log de tiempos a stderr si nadie le configuró un handler."""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(nivel)
+
+
+class _ConsultaMedida:
+    """Envuelve un request builder de postgrest: mide execute() y deja pasar el resto."""
+
+    _OPERACIONES = {"select", "insert", "upsert", "update", "delete"}
+
+    def __init__(self, consulta, recurso: str, operacion: str = "select"):
+        self._consulta = consulta
+        self._recurso = recurso
+        self._operacion = operacion
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._consulta, nombre)
+        if not callable(atributo):
+            return atributo
+
+        def encadenado(*args, **kwargs):
+            resultado = atributo(*args, **kwargs)
+            if not hasattr(resultado, "execute"):
+                return resultado
+            operacion = nombre if nombre in self._OPERACIONES else self._operacion
+            return _ConsultaMedida(resultado, self._recurso, operacion)
+        return encadenado
+
+    def execute(self):
+        medidor = _medidor.get()
+        if medidor is None:
+            return self._consulta.execute()
+        inicio, numero = time.perf_counter(), numero_respuesta()
+        respuesta = self._consulta.execute()
+        segundos = time.perf_counter() - inicio
+        datos = respuesta.data
+        medidor.registrar(Llamada(
+            recurso=self._recurso,
+            operacion=self._operacion,
+            filas=len(datos) if isinstance(datos, list) else int(datos is not None),
+            bytes=bytes_respuesta(respuesta, numero),
+            segundos=segundos,
+        ))
+        return respuesta
+
+
+class ClienteMedido:
+    """Proxy del cliente de Supabase que mide table(...)...execute() y rpc(...).execute()."""
+
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def table(self, nombre: str):
+        # El cliente de Supabase rearma postgrest (y su sesión) al cambiar la autenticación
+        escuchar_respuestas(self._cliente)
+        return _ConsultaMedida(self._cliente.table(nombre), nombre)
+
+    def rpc(self, funcion: str, params: dict = None):
+        escuchar_respuestas(self._cliente)
+        return _ConsultaMedida(self._cliente.rpc(funcion, params or {}), f"rpc:{funcion}", "rpc")
+
+    def __getattr__(self, nombre):
+        return getattr(self._cliente, nombre)
@@ -0,0 +1,63 @@
+"""Normalización del DataFrame crudo de Supabase al formato que usa la app."""
+import numpy as np
+import pandas as pd
+
+from esquema import CATALOGOS, COLUMNAS_FECHAS
+
+
+def categoria_catalogo(s: pd.Series, catalogo: list) -> pd.Series:
+    """Normaliza (strip/upper, vacíos a "") y devuelve una columna categórica.
+
+    El texto se limpia solo sobre los valores distintos, no celda por celda.
+    Las categorías son [""] + catálogo + valores fuera de catálogo (que se
+    conservan para no perder datos).
+    """
+    crudo = pd.Categorical(s)
+    limpios = pd.Index(crudo.categories.astype(str).str.strip().str.upper())
+    extra = sorted(set(limpios) - set(catalogo) - {""})
+    categorias = pd.Index([""] + list(catalogo) + extra)
+    # código crudo -> código final; -1 (nulo) cae en "" (código 0)
+    destino = np.append(categorias.get_indexer(limpios), 0)
+    return pd.Series(
+        pd.Categorical.from_codes(destino[crudo.codes], categories=categorias),
+        index=s.index,
+        name=s.name,
+    )
+
+
+def fechas_en_dias(fechas: pd.Series) -> np.ndarray:
+    """Columna de fechas (date, texto ISO o vacía) como datetime64[D]; cada fecha distinta se convierte una vez.
+
+    ISO8601 explícito: sin formato, pandas deduce uno del primer valor y
+    anula los demás ("2024-01-02 08:00" junto a "2024-01-02" daba NaT).
+    """
+    codigos, valores = pd.factorize(fechas)
+    dias = pd.to_datetime(pd.Series(valores, dtype=object), errors="coerce", format="ISO8601").to_numpy(
+        dtype="datetime64[D]"
+    )
+    return np.append(dias, np.datetime64("NaT", "D"))[codigos]
+
+
+def normalizar_datos(df: pd.DataFrame) -> pd.DataFrame:
+    """Renombra columnas heredadas, convierte hitos a fecha y normaliza catálogos.
+
+    Devuelve un DataFrame nuevo; el de entrada (snapshot compartido) no se toca.
+    """
+    # --- Normalizar nombres de columnas ---
+    rename_map = {}
+    if 'Sector' in df.columns and 'sector' not in df.columns:
+        rename_map['Sector'] = 'sector'
+    if 'Subsector' in df.columns and 'subsector' not in df.columns:
+        rename_map['Subsector'] = 'subsector'
+    df = df.rename(columns=rename_map)
+
+    # --- Convertir texto a fechas reales ---
+    for col in COLUMNAS_FECHAS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce').dt.date
+
+    # --- Normalizar columnas tipo catálogo para que calcen con los combobox ---
+    for col, catalogo in CATALOGOS.items():
+        if col in df.columns:
+            df[col] = categoria_catalogo(df[col], catalogo)
+    return df
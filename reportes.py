@@ -0,0 +1,324 @@
+"""Reportes por sector y subsector generados fuera de la app (HTML, PNG, XLSX), en paralelo.
+
+Cada reporte es lo que muestra el tablero con ese sector elegido: las
+tarjetas KPI del pipeline y el gráfico "Distribución de la Carga". Se
+arman con las mismas funciones que app.py (Sincronizador, preparar_datos,
+conteo_tablero, tarjetas, graficos) a partir de un único snapshot, sin
+pasar por el servidor de Streamlit.
+
+El proceso principal carga el snapshot una vez (Supabase, o el snapshot en
+disco de la app + el delta), lo escribe en un archivo Arrow temporal y
+cada proceso de un pool lo lee de ahí una vez (sin JSON ni otra consulta a
+la base) y dibuja sus reportes.
+
+Credenciales: SUPABASE_URL / SUPABASE_KEY del entorno o de
+.streamlit/secrets.toml (donde las lee la app). PNG requiere
+vl-convert-python y XLSX requiere openpyxl.
+
+Uso: python -m reportes [--salida DIR] [--formatos html png xlsx] [--procesos N]
+                        [--snapshot-disco RUTA] [--solo-disco] [--sin-subsectores] [--archivo]
+"""
+import argparse
+import html
+import multiprocessing
+import os
+import tempfile
+import time
+import tomllib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from agregacion import resumen_grafico, sumar_conteos
+from esquema import COLUMNA_MODIFICACION, COLUMNAS_CARGA
+from etapas import ETAPAS
+from tablero import conteo_tablero, kpis_etapas, preparar_datos
+
+FORMATOS = ["html", "png", "xlsx"]
+
+# Misma zona horaria que el encabezado de la app
+TZ_NIC = timezone(timedelta(hours=-6))
+
+# Snapshot de cada proceso del pool (una copia por proceso, leída del archivo Arrow)
+_df_trabajador = None
+
+
+@dataclass
+class Reporte:
+    """Un reporte a generar: todo el tablero, un sector o un subsector de un sector."""
+    nombre: str
+    sector: str = "Todos"
+    subsector: str = None
+
+    @property
+    def titulo(self) -> str:
+        if self.subsector is not None:
+            return f"{self.sector} · {self.subsector}"
+        return self.sector
+
+    @property
+    def archivo(self) -> str:
+        return self.nombre.lower().replace(" ", "_")
+
+
+def secretos(ruta: str = os.path.join(".streamlit", "secrets.toml")) -> dict:
+    """secrets.toml de la app (si existe) con las variables de entorno SUPABASE_* encima."""
+    valores = {}
+    if os.path.exists(ruta):
+        with open(ruta, "rb") as f:
+            valores = tomllib.load(f)
+    for clave in ("SUPABASE_URL", "SUPABASE_KEY"):
+        if os.environ.get(clave):
+            valores[clave] = os.environ[clave]
+    return valores
+
+
+def cargar_snapshot(cliente, ruta_disco: str = None) -> pd.DataFrame:
+    """Snapshot preparado como el de la app: desde el disco (+ delta) si hay ruta, si no completo."""
+    from sincronizacion import Sincronizador
+
+    return Sincronizador(cliente, preparar=preparar_datos, ruta_disco=ruta_disco).refrescar()
+
+
+def reportes_del_snapshot(df: pd.DataFrame, subsectores: bool = True) -> list:
+    """Todo el tablero, cada sector y, en sectores con más de un subsector, cada subsector."""
+    reportes = [Reporte("todos")]
+    pares = df.loc[df["sector"] != "", ["sector", "subsector"]].drop_duplicates()
+    for sector in sorted(pares["sector"].astype(str).unique()):
+        reportes.append(Reporte(f"sector {sector}", sector=sector))
+        propios = sorted(s for s in pares.loc[pares["sector"] == sector, "subsector"].astype(str) if s)
+        if subsectores and len(propios) > 1:
+            reportes += [Reporte(f"subsector {s}", sector=sector, subsector=s) for s in propios]
+    return reportes
+
+
+def conteo_reporte(df: pd.DataFrame, reporte: Reporte, resumen_archivo: pd.DataFrame = None) -> pd.DataFrame:
+    """Conteo (Categoria, etapa_codigo, Cantidad) del reporte, como el del tablero con ese sector elegido."""
+    from archivo import conteo_archivo
+
+    mascara = np.ones(len(df), dtype=bool)
+    if reporte.sector != "Todos":
+        mascara &= (df["sector"] == reporte.sector).to_numpy()
+    if reporte.subsector is not None:
+        mascara &= (df["subsector"] == reporte.subsector).to_numpy()
+    conteo = conteo_tablero(df[mascara], reporte.sector)
+    if resumen_archivo is None:
+        return conteo
+    if reporte.subsector is not None:
+        resumen_archivo = resumen_archivo[resumen_archivo["subsector"] == reporte.subsector]
+    sector = None if reporte.sector == "Todos" else reporte.sector
+    return sumar_conteos(conteo, conteo_archivo(resumen_archivo, sector=sector))
+
+
+def _pagina_html(reporte: Reporte, kpis: list, grafico, generado: str) -> str:
+    from tarjetas import CSS_PIPELINE, html_pipeline
+
+    titulo = html.escape(f"Tablero de Control: {reporte.titulo}")
+    return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>{titulo}</title>
+{CSS_PIPELINE}
+<style>body{{font-family:sans-serif; margin:24px 32px;}} .small-muted{{margin-bottom:16px;}}</style>
+</head>
+<body>
+<h1>⚡ PREFACTURAS</h1>
+<h2>{titulo}</h2>
+<div class="small-muted">Generado: {generado}</div>
+{html_pipeline(kpis)}
+<h3>📊 Distribución de la Carga</h3>
+{grafico.to_html(fullhtml=False)}
+</body>
+</html>
+"""
+
+
+def _hoja_distribucion(resumen: pd.DataFrame) -> pd.DataFrame:
+    """Categoría × etapa (columnas en el orden del pipeline) con total, para el XLSX."""
+    tabla = resumen.pivot_table(index="Categoria", columns="Etapa", values="Cantidad", aggfunc="sum", fill_value=0)
+    tabla = tabla.reindex(columns=[e for e in ETAPAS if e in tabla.columns])
+    return tabla.assign(Total=tabla.sum(axis=1)).sort_values("Total", ascending=False).reset_index()
+
+
+def escribir_reporte(df: pd.DataFrame, reporte: Reporte, salida: str, formatos: list,
+                     resumen_archivo: pd.DataFrame = None) -> dict:
+    """Escribe los archivos de un reporte; devuelve sus KPIs, archivos y tiempo."""
+    from graficos import grafico_distribucion, titulado
+
+    inicio = time.perf_counter()
+    conteo = conteo_reporte(df, reporte, resumen_archivo)
+    kpis = kpis_etapas(conteo)
+    resumen = resumen_grafico(conteo)
+    etiqueta = "Sector" if reporte.sector == "Todos" else "Subsector"
+    grafico = grafico_distribucion(resumen, etiqueta)
+    generado = datetime.now(TZ_NIC).strftime("%d/%m/%Y %H:%M")
+
+    archivos = []
+    base = os.path.join(salida, reporte.archivo)
+    if "html" in formatos:
+        with open(f"{base}.html", "w", encoding="utf-8") as f:
+            f.write(_pagina_html(reporte, kpis, grafico, generado))
+        archivos.append(f"{base}.html")
+    if "png" in formatos:
+        # "Sin clasificar" solo si hay filas así (como el aviso de la app)
+        etapas = ETAPAS if kpis[-1] else ETAPAS[:-1]
+        subtitulo = " · ".join(f"{etapa}: {n}" for etapa, n in zip(etapas, kpis))
+        titulado(grafico, f"Tablero de Control: {reporte.titulo}", [f"Total: {sum(kpis)}", subtitulo]) \
+            .save(f"{base}.png", format="png", scale_factor=2)
+        archivos.append(f"{base}.png")
+    if "xlsx" in formatos:
+        with pd.ExcelWriter(f"{base}.xlsx", engine="openpyxl") as escritor:
+            pd.DataFrame({"Etapa": ETAPAS, "Cantidad": kpis}).to_excel(escritor, sheet_name="KPIs", index=False)
+            _hoja_distribucion(resumen).to_excel(escritor, sheet_name="Distribución", index=False)
+        archivos.append(f"{base}.xlsx")
+
+    return {
+        "reporte": reporte.titulo,
+        "total": int(sum(kpis)),
+        "kpis": [int(k) for k in kpis],
+        "archivos": archivos,
+        "ms": round((time.perf_counter() - inicio) * 1000, 1),
+    }
+
+
+def _iniciar_trabajador(ruta_arrow: str, columnas: list):
+    """Cada proceso del pool lee el snapshot compartido una sola vez."""
+    global _df_trabajador
+    from snapshot_disco import leer_snapshot
+
+    _df_trabajador = leer_snapshot(ruta_arrow, columnas).df
+
+
+def _escribir_en_trabajador(reporte: Reporte, salida: str, formatos: list, resumen_archivo) -> dict:
+    return escribir_reporte(_df_trabajador, reporte, salida, formatos, resumen_archivo)
+
+
+def verificar_formatos(formatos: list):
+    """Falla antes de repartir trabajo si falta la dependencia opcional de algún formato."""
+    faltan = []
+    if "png" in formatos:
+        try:
+            import vl_convert  # noqa: F401 (lo usa Altair para exportar PNG)
+        except ImportError:
+            faltan.append("PNG requiere vl-convert-python (pip install vl-convert-python)")
+    if "xlsx" in formatos:
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            faltan.append("XLSX requiere openpyxl (pip install openpyxl)")
+    if faltan:
+        raise RuntimeError("; ".join(faltan) + ".")
+
+
+def generar_reportes(df: pd.DataFrame, salida: str, formatos=("html",), procesos: int = None,
+                     subsectores: bool = True, resumen_archivo: pd.DataFrame = None) -> list:
+    """Genera todos los reportes del snapshot en `salida` y un index.html que los enlaza.
+
+    Por defecto usa un proceso por CPU si hay PNG o XLSX, que es lo que pesa;
+    solo HTML sale en décimas por reporte y corre en este proceso (sin pool ni
+    archivo temporal), igual que con procesos=1.
+    """
+    from snapshot_disco import SnapshotDisco, guardar_snapshot
+
+    verificar_formatos(formatos)
+    os.makedirs(salida, exist_ok=True)
+    reportes = reportes_del_snapshot(df, subsectores)
+    if procesos is None:
+        procesos = 1 if set(formatos) == {"html"} else os.cpu_count() or 1
+    procesos = min(procesos, len(reportes))
+
+    if procesos == 1:
+        resultados = [escribir_reporte(df, r, salida, formatos, resumen_archivo) for r in reportes]
+    else:
+        with tempfile.TemporaryDirectory() as temporal:
+            ruta_arrow = os.path.join(temporal, "snapshot.arrow")
+            columnas = list(df.columns)
+            guardar_snapshot(ruta_arrow, SnapshotDisco(df=df, columnas=columnas, ultimo_id=0))
+            # spawn, no fork: el hijo heredaría locks tomados por hilos de este proceso
+            # (runtime de vl-convert, pools de pyarrow) y se podría colgar
+            contexto = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(procesos, mp_context=contexto, initializer=_iniciar_trabajador,
+                                     initargs=(ruta_arrow, columnas)) as pool:
+                resultados = list(pool.map(
+                    _escribir_en_trabajador, reportes,
+                    [salida] * len(reportes), [formatos] * len(reportes), [resumen_archivo] * len(reportes),
+                ))
+
+    escribir_indice(salida, resultados)
+    return resultados
+
+
+def escribir_indice(salida: str, resultados: list):
+    """index.html con una fila por reporte: KPIs y enlaces a sus archivos."""
+    encabezado = "".join(f"<th>{html.escape(e)}</th>" for e in ["Reporte", "Total"] + ETAPAS + ["Archivos"])
+    filas = []
+    for r in resultados:
+        enlaces = " ".join(
+            f'<a href="{html.escape(os.path.basename(a))}">{os.path.splitext(a)[1][1:].upper()}</a>'
+            for a in r["archivos"]
+        )
+        celdas = [html.escape(r["reporte"]), r["total"], *r["kpis"], enlaces]
+        filas.append("<tr>" + "".join(f"<td>{c}</td>" for c in celdas) + "</tr>")
+    generado = datetime.now(TZ_NIC).strftime("%d/%m/%Y %H:%M")
+    with open(os.path.join(salida, "index.html"), "w", encoding="utf-8") as f:
+        f.write(
+            '<!DOCTYPE html>\n<html lang="es">\n<head><meta charset="utf-8"><title>Reportes PREFACTURAS</title>\n'
+            "<style>body{font-family:sans-serif; margin:24px 32px;} td,th{padding:4px 10px; text-align:right;}"
+            " td:first-child,th:first-child{text-align:left;}</style></head>\n<body>\n"
+            f"<h1>⚡ PREFACTURAS · reportes</h1>\n<p>Generado: {generado}</p>\n"
+            f"<table>\n<tr>{encabezado}</tr>\n" + "\n".join(filas) + "\n</table>\n</body>\n</html>\n"
+        )
+
+
+def main(args):
+    inicio = time.perf_counter()
+    verificar_formatos(args.formatos)
+    if args.solo_disco:
+        from snapshot_disco import leer_snapshot
+
+        snapshot = leer_snapshot(args.snapshot_disco, COLUMNAS_CARGA + [COLUMNA_MODIFICACION])
+        if snapshot is None:
+            raise SystemExit(f"No hay un snapshot compatible en {args.snapshot_disco}.")
+        df, cliente = snapshot.df, None
+    else:
+        from supabase import create_client
+
+        valores = secretos()
+        cliente = create_client(valores["SUPABASE_URL"], valores["SUPABASE_KEY"])
+        df = cargar_snapshot(cliente, args.snapshot_disco)
+    carga_s = time.perf_counter() - inicio
+
+    resumen_archivo = None
+    if args.archivo and cliente is not None:
+        from archivo import leer_resumen
+
+        resumen_archivo = leer_resumen(cliente)
+
+    resultados = generar_reportes(
+        df, args.salida, args.formatos, args.procesos,
+        subsectores=not args.sin_subsectores, resumen_archivo=resumen_archivo,
+    )
+    total_s = time.perf_counter() - inicio
+    print(f"{len(resultados)} reportes en {args.salida} ({len(df):,} filas): "
+          f"carga {carga_s:.1f} s · total {total_s:.1f} s")
+    for r in resultados:
+        print(f"  {r['reporte']:<24} {r['total']:>7,}  {r['ms']:>8.0f} ms  {', '.join(map(os.path.basename, r['archivos']))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--salida", default=os.path.join("salida_reportes", datetime.now(TZ_NIC).strftime("%Y-%m-%d")))
+    parser.add_argument("--formatos", nargs="+", choices=FORMATOS, default=["html"])
+    parser.add_argument("--procesos", type=int, default=None, help="por defecto, uno por CPU (solo HTML: uno)")
+    parser.add_argument("--snapshot-disco", metavar="RUTA", help="snapshot en disco de la app (SNAPSHOT_DISCO)")
+    parser.add_argument("--solo-disco", action="store_true", help="usar solo el snapshot en disco, sin consultar Supabase")
+    parser.add_argument("--sin-subsectores", action="store_true")
+    parser.add_argument("--archivo", action="store_true", help="sumar lo archivado (como la app con ARCHIVO)")
+    args = parser.parse_args()
+    if args.solo_disco and not args.snapshot_disco:
+        parser.error("--solo-disco necesita --snapshot-disco RUTA")
+    main(args)
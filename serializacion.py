@@ -0,0 +1,50 @@
+"""Serialización vectorizada de DataFrames a registros JSON para Supabase."""
+import numpy as np
+import pandas as pd
+
+from esquema import COLUMNAS_FECHAS, COLUMNAS_SISTEMA
+
+# Textos que en la práctica significan "vacío"
+CENTINELAS_NULOS = ['nan', 'NaT', 'None', '<NA>', '']
+
+
+def _columna_json(s: pd.Series, col: str) -> np.ndarray:
+    """Convierte una columna completa a valores JSON (None en lugar de NaN/NaT/inf/centinelas)."""
+    if col == 'id':
+        ids = pd.to_numeric(s, errors='coerce').astype('Int64').astype(object)
+        return ids.where(ids.notna(), None).to_numpy()
+
+    if col in COLUMNAS_FECHAS:
+        # datetime_as_string es mucho más rápido que strftime
+        fechas = pd.to_datetime(s, dayfirst=True, errors='coerce').to_numpy().astype('datetime64[D]')
+        valores = np.datetime_as_string(fechas).astype(object)
+        valores[np.isnat(fechas)] = None
+        return valores
+
+    if pd.api.types.is_float_dtype(s.dtype):
+        s = s.where(np.isfinite(s))
+
+    valores = s.astype(object)
+    nulos = valores.isna() | valores.isin(CENTINELAS_NULOS)
+    return valores.where(~nulos, None).to_numpy()
+
+
+def serializar_registros(df: pd.DataFrame, quitar_vacias: bool = False) -> list:
+    """Devuelve registros listos para JSON, operando columna por columna.
+
+    - fechas a 'YYYY-MM-DD', NaN/NaT/inf y textos centinela a None, id a int
+    - created_at/updated_at nunca se envían (los pone la base)
+    - id se omite si la columna viene vacía (filas nuevas)
+    - con quitar_vacias=True se omiten las columnas sin ningún valor (inserts)
+    """
+    columnas = {}
+    for col in df.columns:
+        if col in COLUMNAS_SISTEMA and col != 'id':
+            continue
+        valores = _columna_json(df[col], col)
+        if (col == 'id' or quitar_vacias) and pd.isna(valores).all():
+            continue
+        columnas[col] = valores
+
+    nombres = list(columnas)
+    return [dict(zip(nombres, fila)) for fila in zip(*columnas.values())]
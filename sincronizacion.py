@@ -0,0 +1,248 @@
+"""Snapshot local de prefacturas_pedidos que se refresca solo con el delta."""
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from cargador import EstadisticasCarga, cargar_paginado, filas_dataframe
+from esquema import COLUMNA_MODIFICACION, COLUMNAS_CARGA, TABLA
+from instrumentacion import tramo
+from snapshot_disco import SnapshotDisco, guardar_snapshot, leer_snapshot
+
+logger = logging.getLogger("prefacturas.sincronizacion")
+
+# Segundos mínimos entre dos escrituras del snapshot en disco
+INTERVALO_DISCO = 60
+
+# Solape (segundos) del filtro del delta hacia atrás de la mayor marca vista: el trigger pone
+# updated_at = now(), la hora de INICIO de la transacción, así que una fila confirmada después
+# del último refresco puede traer una marca anterior a la máxima del snapshot
+SOLAPE_DELTA = 300
+
+
+def _alinear_categorias(base: pd.DataFrame, delta: pd.DataFrame):
+    """Iguala las categorías de las columnas categóricas para que concat no las vuelva object."""
+    for col in base.columns.intersection(delta.columns):
+        tipo_base, tipo_delta = base[col].dtype, delta[col].dtype
+        if (
+            isinstance(tipo_base, pd.CategoricalDtype)
+            and isinstance(tipo_delta, pd.CategoricalDtype)
+            and tipo_base != tipo_delta
+        ):
+            categorias = tipo_base.categories.append(
+                tipo_delta.categories.difference(tipo_base.categories)
+            )
+            base = base.assign(**{col: base[col].cat.set_categories(categorias)})
+            delta = delta.assign(**{col: delta[col].cat.set_categories(categorias)})
+    return base, delta
+
+
+def fusionar_por_id(base: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """Reemplaza/agrega en base las filas de delta (por id) y deja el resultado ordenado por id."""
+    if delta.empty:
+        return base
+    if base.empty:
+        return delta.sort_values("id", ignore_index=True)
+    base, delta = _alinear_categorias(base, delta)
+    resto = base[~base["id"].isin(delta["id"])]
+    return pd.concat([resto, delta], ignore_index=True).sort_values("id", ignore_index=True)
+
+
+class Sincronizador:
+    """Mantiene el último snapshot y en cada refresco trae solo lo nuevo o modificado.
+
+    Delta = filas con id > último id visto, o con marca de modificación
+    (updated_at; si la tabla aún no la tiene, created_at) desde la mayor
+    marca del snapshot menos `solape_delta` segundos. La marca sale de los
+    datos del servidor, no del reloj local; el solape cubre transacciones
+    que empezaron antes de esa marca y se confirmaron después (también sus
+    ids), y lo que el solape repite sin cambios (mismo id y marca) no se
+    vuelve a fusionar. Las bajas se detectan comparando el conteo exacto y,
+    solo si no cuadra, descargando la lista de ids.
+
+    `preparar` (df -> df) se aplica a cada carga antes de fusionarla, así
+    la normalización y la clasificación corren solo sobre filas nuevas o
+    modificadas.
+
+    Con `ruta_disco` el snapshot preparado y sus marcas se guardan en disco
+    (snapshot_disco.py, a lo sumo cada `intervalo_disco` segundos) y la
+    primera carga del proceso parte de ese archivo: tras un reinicio solo
+    se baja el delta.
+    """
+
+    def __init__(self, cliente, columnas=None, preparar=None, ruta_disco: str = None,
+                 intervalo_disco: float = INTERVALO_DISCO, solape_delta: float = SOLAPE_DELTA):
+        self.cliente = cliente
+        self.columnas = columnas or COLUMNAS_CARGA + [COLUMNA_MODIFICACION]
+        self.preparar = preparar or (lambda df: df)
+        # (df, versión) en una sola referencia: quien lee uno ve el otro que le corresponde
+        self._snapshot = (pd.DataFrame(), 0)
+        self.ultimo_id = None
+        self.marca = None
+        self.columna_marca = None
+        self.ultima_stats = EstadisticasCarga()
+        self.ruta_disco = ruta_disco
+        self.intervalo_disco = intervalo_disco
+        self.solape_delta = solape_delta
+        self.arranque = None  # "disco" o "red", según de dónde salió la primera carga
+        self._lock = threading.Lock()
+        self._df_en_disco = None
+        self._guardado_en = None
+
+    def refrescar(self) -> pd.DataFrame:
+        """Actualiza el snapshot y lo devuelve (compartido: no modificar in situ)."""
+        with self._lock:
+            if self.ultimo_id is None and self.arranque is None and self._leer_disco():
+                self.arranque = "disco"
+            if self.ultimo_id is None:
+                self.arranque = self.arranque or "red"
+                crudo, self.ultima_stats = cargar_paginado(self.cliente, self.columnas)
+                if not set(self.columnas) <= set(crudo.columns):
+                    # La proyección cayó a select("*"): seguir pidiendo lo que existe
+                    self.columnas = list(crudo.columns)
+                self.df = self.preparar(crudo)
+            else:
+                delta, self.ultima_stats = cargar_paginado(
+                    self.cliente, self.columnas, filtros=self._filtro_delta
+                )
+                delta = delta[~self._sin_cambios(delta)]
+                if not delta.empty:
+                    self.df = fusionar_por_id(self.df, self.preparar(delta))
+                self._quitar_borrados()
+            self._actualizar_marcas()
+            self._guardar_disco()
+            return self.df
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self._snapshot[0]
+
+    @df.setter
+    def df(self, df: pd.DataFrame):
+        # Cada DataFrame nuevo (carga, delta, bajas o eventos) es una versión nueva
+        actual, version = self._snapshot
+        if df is not actual:
+            self._snapshot = (df, version + 1)
+
+    @property
+    def version(self) -> int:
+        """Contador creciente del snapshot: cambia cada vez que se reemplaza el DataFrame."""
+        return self._snapshot[1]
+
+    def version_de(self, df: pd.DataFrame):
+        """Versión de `df` si sigue siendo el snapshot vigente; None si ya se reemplazó.
+
+        Sirve de clave para derivados en caché: a diferencia de id(df), no se
+        repite con otro DataFrame.
+        """
+        actual, version = self._snapshot
+        return version if actual is df else None
+
+    @property
+    def cargado(self) -> bool:
+        return self.ultimo_id is not None
+
+    def aplicar_cambios(self, altas: list, bajas) -> pd.DataFrame:
+        """Parcha el snapshot con filas recibidas por eventos (altas/modificaciones) y ids borrados.
+
+        No toca las marcas del delta: si se perdió algún evento, el próximo
+        refrescar() lo trae igual (volver a fusionar una fila es inocuo). Una
+        fila con marca de modificación anterior a la del snapshot se ignora
+        (el evento llegó después de que un refresco trajera algo más nuevo).
+        """
+        with self._lock:
+            if self.ultimo_id is None:
+                return self.df  # sin snapshot todavía: la primera carga trae todo
+            bajas = set(bajas)
+            if bajas:
+                self.df = self.df[~self.df["id"].isin(bajas)].reset_index(drop=True)
+            if altas:
+                delta = filas_dataframe([{c: fila.get(c) for c in self.columnas} for fila in altas])
+                delta = delta.drop_duplicates("id", keep="last")
+                delta = delta[self._mas_nuevas(delta)]
+                if not delta.empty:
+                    self.df = fusionar_por_id(self.df, self.preparar(delta))
+            return self.df
+
+    def _mas_nuevas(self, delta: pd.DataFrame) -> np.ndarray:
+        """Máscara de filas de delta que no son más viejas que su versión en el snapshot."""
+        if COLUMNA_MODIFICACION not in delta.columns or COLUMNA_MODIFICACION not in self.df.columns:
+            return np.ones(len(delta), dtype=bool)
+        actuales = self.df.set_index("id")[COLUMNA_MODIFICACION].reindex(delta["id"])
+        nuevas = pd.to_datetime(delta[COLUMNA_MODIFICACION], format="ISO8601", errors="coerce", utc=True).reset_index(drop=True)
+        viejas = pd.to_datetime(actuales, format="ISO8601", errors="coerce", utc=True).reset_index(drop=True)
+        return (viejas.isna() | nuevas.isna() | (nuevas >= viejas)).to_numpy()
+
+    def _sin_cambios(self, delta: pd.DataFrame) -> np.ndarray:
+        """Máscara de filas de delta que ya están en el snapshot con la misma marca (las repite el solape)."""
+        if delta.empty or self.df.empty or self.columna_marca not in delta.columns:
+            return np.zeros(len(delta), dtype=bool)
+        actuales = self.df.set_index("id")[self.columna_marca].reindex(delta["id"])
+        nuevas = pd.to_datetime(delta[self.columna_marca], format="ISO8601", errors="coerce", utc=True).to_numpy()
+        viejas = pd.to_datetime(actuales, format="ISO8601", errors="coerce", utc=True).to_numpy()
+        return nuevas == viejas  # NaT nunca es igual: sin marca se fusiona
+
+    def invalidar(self):
+        """Fuerza una recarga completa en el próximo refresco."""
+        with self._lock:
+            self.ultimo_id = None
+
+    def _leer_disco(self) -> bool:
+        """Parte del snapshot en disco (si hay uno compatible); el delta lo completa después."""
+        if not self.ruta_disco:
+            return False
+        with tramo("leer snapshot disco"):
+            snapshot = leer_snapshot(self.ruta_disco, self.columnas)
+        if snapshot is None:
+            return False
+        self.df = self._df_en_disco = snapshot.df
+        self.ultimo_id, self.marca, self.columna_marca = snapshot.ultimo_id, snapshot.marca, snapshot.columna_marca
+        self._guardado_en = time.monotonic()
+        return True
+
+    def _guardar_disco(self):
+        """Persiste el snapshot si cambió y pasó el intervalo; un error de disco no corta la carga."""
+        if not self.ruta_disco or self.df is self._df_en_disco:
+            return
+        if self._guardado_en is not None and time.monotonic() - self._guardado_en < self.intervalo_disco:
+            return
+        try:
+            with tramo("guardar snapshot disco"):
+                guardar_snapshot(self.ruta_disco, SnapshotDisco(
+                    df=self.df, columnas=self.columnas, ultimo_id=self.ultimo_id,
+                    marca=self.marca, columna_marca=self.columna_marca,
+                ))
+        except OSError:
+            logger.warning("No se pudo guardar el snapshot en disco: %s", self.ruta_disco, exc_info=True)
+        self._df_en_disco, self._guardado_en = self.df, time.monotonic()
+
+    def _filtro_delta(self, consulta):
+        condiciones = [f"id.gt.{self.ultimo_id}"]
+        if self.marca is not None:
+            # Con solape: la fusión por id es idempotente y _sin_cambios descarta lo repetido
+            desde = (pd.Timestamp(self.marca) - pd.Timedelta(seconds=self.solape_delta)).isoformat()
+            condiciones.append(f'{self.columna_marca}.gte."{desde}"')
+        return consulta.or_(",".join(condiciones))
+
+    def _actualizar_marcas(self):
+        if self.df.empty:
+            self.ultimo_id = 0
+            self.marca = None
+            return
+        self.ultimo_id = int(self.df["id"].max())
+        self.columna_marca = next(
+            (c for c in [COLUMNA_MODIFICACION, "created_at"] if c in self.df.columns), None
+        )
+        if self.columna_marca is not None:
+            marca = pd.to_datetime(self.df[self.columna_marca], format="ISO8601", errors="coerce", utc=True).max()
+            self.marca = None if pd.isna(marca) else marca.isoformat()
+
+    def _quitar_borrados(self):
+        respuesta = self.cliente.table(TABLA).select("id", count="exact").limit(1).execute()
+        if respuesta.count is None or respuesta.count == len(self.df):
+            return
+        ids, _ = cargar_paginado(self.cliente, ["id"])
+        vigentes = ids["id"] if not ids.empty else pd.Series([], dtype="int64")
+        self.df = self.df[self.df["id"].isin(vigentes)].reset_index(drop=True)
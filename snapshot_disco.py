@@ -0,0 +1,111 @@
+"""Snapshot normalizado en disco (Arrow IPC) para arrancar en tibio después de un reinicio.
+
+Guarda la tabla ya preparada (fechas, categorías, etapa) junto con las
+marcas del delta del Sincronizador. Al arrancar, el archivo se lee y se
+convierte una vez a pandas (con los mismos tipos que deja preparar_datos,
+así que el DataFrame vive en memoria como uno cargado de la red) y a
+Supabase solo se le pide lo cambiado desde esas marcas: sin descarga
+completa ni JSON que parsear. Un archivo de otra versión, con otras
+columnas o con catálogos distintos se ignora y se carga desde la red.
+"""
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+
+import pandas as pd
+
+from esquema import CATALOGOS, COLUMNAS_FECHAS
+
+# Subir si cambia lo que produce preparar_datos (columnas derivadas, tipos)
+VERSION = 1
+
+_CLAVE_METADATOS = b"prefacturas"
+
+logger = logging.getLogger("prefacturas.snapshot_disco")
+
+
+@dataclass
+class SnapshotDisco:
+    """DataFrame preparado y marcas del delta con que se guardó."""
+    df: pd.DataFrame
+    columnas: list
+    ultimo_id: int
+    marca: str = None
+    columna_marca: str = None
+    bytes: int = 0
+
+
+def _firma() -> str:
+    """Versión + catálogos: si cambian, las categorías guardadas ya no sirven."""
+    return hashlib.sha1(json.dumps([VERSION, CATALOGOS], sort_keys=True).encode()).hexdigest()
+
+
+def guardar_snapshot(ruta: str, snapshot: SnapshotDisco) -> int:
+    """Escribe el snapshot de forma atómica (archivo temporal + rename); devuelve los bytes escritos."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    tabla = pa.Table.from_pandas(snapshot.df, preserve_index=False)
+    metadatos = {
+        "firma": _firma(),
+        "columnas": snapshot.columnas,
+        "ultimo_id": snapshot.ultimo_id,
+        "marca": snapshot.marca,
+        "columna_marca": snapshot.columna_marca,
+    }
+    tabla = tabla.replace_schema_metadata({
+        **(tabla.schema.metadata or {}),
+        _CLAVE_METADATOS: json.dumps(metadatos).encode(),
+    })
+
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(temporal, "wb") as archivo:
+            with ipc.new_file(archivo, tabla.schema) as escritor:
+                escritor.write_table(tabla)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return os.path.getsize(ruta)
+
+
+def leer_snapshot(ruta: str, columnas: list) -> SnapshotDisco:
+    """Snapshot leído del archivo y convertido a pandas, o None si no hay archivo o no es compatible.
+
+    El memory map solo evita una copia intermedia al leer: to_pandas() copia
+    los datos y las fechas vuelven a ser objetos date, como en preparar_datos.
+    """
+    if not ruta or not os.path.exists(ruta):
+        return None
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    try:
+        with pa.memory_map(ruta) as mapa:
+            tabla = ipc.open_file(mapa).read_all()
+    except (OSError, pa.ArrowInvalid):
+        logger.warning("Snapshot en disco ilegible, se carga desde Supabase: %s", ruta, exc_info=True)
+        return None
+    metadatos = json.loads((tabla.schema.metadata or {}).get(_CLAVE_METADATOS, b"{}"))
+    if metadatos.get("firma") != _firma() or metadatos.get("columnas") != list(columnas):
+        return None
+
+    df = tabla.to_pandas(split_blocks=True)
+    # Arrow devuelve None en las fechas vacías; normalizar_datos deja NaT (así calzan con el delta)
+    for col in COLUMNAS_FECHAS:
+        if col in df.columns:
+            valores = df[col].to_numpy(dtype=object, copy=True)
+            valores[pd.isna(valores)] = pd.NaT
+            df[col] = valores
+    return SnapshotDisco(
+        df=df,
+        columnas=metadatos["columnas"],
+        ultimo_id=int(metadatos["ultimo_id"]),
+        marca=metadatos["marca"],
+        columna_marca=metadatos["columna_marca"],
+        bytes=os.path.getsize(ruta),
+    )
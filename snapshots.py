@@ -0,0 +1,218 @@
+"""Snapshots diarios de conteos por (día, sector, etapa) para la tendencia histórica.
+
+La historia se reconstruye una sola vez a partir de las fechas de hito y
+después solo se agrega (o rehace) el último día; el gráfico lee únicamente
+la tabla de snapshots, así su costo depende de días × sectores y no de la
+cantidad de prefacturas. La materialización corre en segundo plano
+(Materializador), nunca mientras se dibuja la página.
+"""
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from cargador import leer_paginas
+from escritura import lotes_acotados
+from esquema import TABLA_SNAPSHOTS
+from etapas import ETAPAS, serie_pedido_lleno
+
+COLUMNAS_SNAPSHOT = ["dia", "sector", "etapa_codigo", "cantidad"]
+
+# Clave de cada snapshot (unique de sql/004_snapshots_etapas.sql)
+CLAVE_SNAPSHOT = ["dia", "sector", "etapa_codigo"]
+
+# Hasta dónde se reconstruye la historia la primera vez
+DIAS_HISTORIA = 365
+
+# Segundos entre dos materializaciones en segundo plano (el día en curso se rehace)
+INTERVALO_MATERIALIZAR = 3600
+
+# Etapas con límite de tiempo (Sin clasificar no tiene fechas)
+_ETAPAS_CICLO = 4
+
+
+def _dias(df: pd.DataFrame, col: str, vacio: float) -> np.ndarray:
+    """Fecha a número de día (float); vacía -> `vacio` (±inf)."""
+    if col not in df.columns:
+        return np.full(len(df), vacio)
+    fechas = pd.to_datetime(df[col], errors="coerce", utc=True).dt.tz_localize(None)
+    dias = fechas.to_numpy().astype("datetime64[D]")
+    return np.where(np.isnat(dias), vacio, dias.astype(np.int64).astype(np.float64))
+
+
+def _numero_dia(dia: date) -> int:
+    return int(np.datetime64(dia, "D").astype(np.int64))
+
+
+def conteos_diarios(df: pd.DataFrame, desde: date, hasta: date) -> pd.DataFrame:
+    """Conteo por (día, sector, etapa) de cada día entre desde y hasta, sin recorrer la tabla por día.
+
+    Con las reglas de etapas.codigos_etapa() aplicadas a lo conocido cada día,
+    una fila pasa por las etapas en los instantes:
+        T1 = elaboración, T2 = max(T1, conciliación), T3 = max(T2, pedido)
+    y está en Por Elaborar [creación, T1), Por Conciliar [T1, T2),
+    Pendiente de Pedido [T2, T3) y Pedido Recibido [T3, ∞). Cada intervalo
+    suma +1/-1 en un arreglo de diferencias; la suma acumulada da los conteos.
+    """
+    inicio, n_dias = _numero_dia(desde), (hasta - desde).days + 1
+    if df.empty or n_dias <= 0:
+        return pd.DataFrame(columns=COLUMNAS_SNAPSHOT)
+
+    creado = _dias(df, "created_at", -np.inf)
+    t1 = _dias(df, "fecha_elaboracion", np.inf)
+    t2 = np.maximum(t1, _dias(df, "fecha_conciliacion", np.inf))
+    # Pedido sin fecha de edición: se toma como presente desde siempre
+    pedido = np.where(serie_pedido_lleno(df).to_numpy(), _dias(df, "fecha_edicion_pedido", -np.inf), np.inf)
+    t3 = np.maximum(t2, pedido)
+    limites = [creado, t1, t2, t3, np.full(len(df), np.inf)]
+
+    sectores = df["sector"] if "sector" in df.columns else pd.Series("", index=df.index)
+    # upper(btrim(coalesce(sector, ''))): sin el fillna, un sector vacío (código -1) caería en el último
+    codigos_sector, nombres_sector = pd.factorize(sectores.fillna("").astype(str).str.strip().str.upper())
+
+    diferencias = np.zeros((len(nombres_sector), _ETAPAS_CICLO, n_dias + 1), dtype=np.int64)
+    for etapa in range(_ETAPAS_CICLO):
+        entra = np.maximum(creado, limites[etapa])
+        sale = np.maximum(creado, limites[etapa + 1])
+        # Posición en el rango de días (antes del rango -> 0, nunca -> n_dias)
+        pos_entra = np.clip(entra - inicio, 0, n_dias).astype(np.int64)
+        pos_sale = np.clip(sale - inicio, 0, n_dias).astype(np.int64)
+        validos = pos_entra < pos_sale
+        np.add.at(diferencias[:, etapa], (codigos_sector[validos], pos_entra[validos]), 1)
+        np.add.at(diferencias[:, etapa], (codigos_sector[validos], pos_sale[validos]), -1)
+    conteos = diferencias.cumsum(axis=2)[:, :, :n_dias]
+
+    sector_idx, etapa_idx, dia_idx = np.nonzero(conteos)
+    return pd.DataFrame({
+        "dia": (np.datetime64(desde, "D") + dia_idx).astype(str),
+        "sector": np.asarray(nombres_sector, dtype=object)[sector_idx],
+        "etapa_codigo": etapa_idx.astype(np.int64),
+        "cantidad": conteos[sector_idx, etapa_idx, dia_idx],
+    }).sort_values(["dia", "sector", "etapa_codigo"], ignore_index=True)
+
+
+def ultimo_dia(cliente):
+    """Último día materializado (None si la tabla está vacía)."""
+    filas = cliente.table(TABLA_SNAPSHOTS).select("dia").order("dia", desc=True).limit(1).execute().data
+    return date.fromisoformat(filas[0]["dia"]) if filas else None
+
+
+def _desde_pendiente(cliente, hoy: date, dias_historia: int) -> date:
+    """Primer día a (re)materializar: el último guardado (pudo quedar a medias) o el inicio de la historia."""
+    ultimo = ultimo_dia(cliente)
+    return ultimo if ultimo is not None else hoy - timedelta(days=dias_historia)
+
+
+def _claves_guardadas(cliente, desde: date) -> pd.DataFrame:
+    """(día, sector, etapa) ya guardados desde un día."""
+    filas = [
+        fila
+        for pagina in leer_paginas(
+            cliente, ["id"] + CLAVE_SNAPSHOT, tabla=TABLA_SNAPSHOTS,
+            filtros=lambda consulta: consulta.gte("dia", desde.isoformat()),
+        )
+        for fila in pagina
+    ]
+    return pd.DataFrame(filas, columns=["id"] + CLAVE_SNAPSHOT).drop(columns="id")
+
+
+def materializar(cliente, df: pd.DataFrame, hoy: date = None, dias_historia: int = DIAS_HISTORIA) -> int:
+    """Completa con conteos de df los días que faltan hasta hoy.
+
+    Upsert por (día, sector, etapa), sin borrar antes: quien lee nunca ve
+    días vacíos y repetirlo no duplica filas. Lo ya guardado que df no
+    cuenta queda en 0. Los lotes van por día ascendente y el primero que
+    falla corta (la excepción sube): lo escrito es un prefijo de días, y el
+    próximo llamado retoma desde el último guardado sin dejar huecos.
+    """
+    hoy = hoy or date.today()
+    desde = _desde_pendiente(cliente, hoy, dias_historia)
+    nuevos = conteos_diarios(df, desde, hoy)
+    anulados = _claves_guardadas(cliente, desde).assign(cantidad=0)
+    registros = (
+        pd.concat([nuevos, anulados.astype({"etapa_codigo": "int64", "cantidad": "int64"})], ignore_index=True)
+        .drop_duplicates(CLAVE_SNAPSHOT)
+        .sort_values(CLAVE_SNAPSHOT, ignore_index=True)
+    )
+
+    for lote in lotes_acotados(registros.to_dict("records")):
+        cliente.table(TABLA_SNAPSHOTS).upsert(lote, on_conflict=",".join(CLAVE_SNAPSHOT)).execute()
+    return len(nuevos)
+
+
+def materializar_servidor(cliente, dias_historia: int = DIAS_HISTORIA) -> int:
+    """Lo mismo calculado en Postgres (sql/004_snapshots_etapas.sql), sin descargar la tabla."""
+    desde = _desde_pendiente(cliente, date.today(), dias_historia)
+    return cliente.rpc("materializar_snapshots", {"p_desde": desde.isoformat()}).execute().data
+
+
+class Materializador:
+    """Corre materializar()/materializar_servidor() en un hilo aparte, fuera del render.
+
+    pedir() la lanza si no hay una en curso y la última terminó hace más de
+    `intervalo` segundos; no espera. `version` sube cada vez que termina
+    bien (clave de caché de la tendencia leída); un error queda en `error`
+    y se reintenta pasado el intervalo.
+    """
+
+    def __init__(self, funcion, intervalo: float = INTERVALO_MATERIALIZAR):
+        self.funcion = funcion
+        self.intervalo = intervalo
+        self.version = 0
+        self.error = None
+        self._terminada = None  # time.monotonic() del último intento
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    @property
+    def en_curso(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def pedir(self) -> bool:
+        """Lanza una materialización si corresponde; True si la lanzó."""
+        with self._lock:
+            if self.en_curso:
+                return False
+            if self._terminada is not None and time.monotonic() - self._terminada < self.intervalo:
+                return False
+            self._hilo = threading.Thread(target=self._correr, name="materializar-snapshots", daemon=True)
+            self._hilo.start()
+            return True
+
+    def esperar(self, timeout: float = None):
+        hilo = self._hilo
+        if hilo is not None:
+            hilo.join(timeout)
+
+    def _correr(self):
+        try:
+            self.funcion()
+            error = None
+        except Exception as e:
+            error = e
+        with self._lock:
+            self.error = error
+            if error is None:
+                self.version += 1
+            self._terminada = time.monotonic()
+
+
+def leer_tendencia(cliente, desde: date = None) -> pd.DataFrame:
+    """Filas de snapshot desde un día (por defecto, toda la historia), con nombre de etapa."""
+    desde = desde or date.today() - timedelta(days=DIAS_HISTORIA)
+    filas = [
+        fila
+        for pagina in leer_paginas(
+            cliente, ["id"] + COLUMNAS_SNAPSHOT, tabla=TABLA_SNAPSHOTS,
+            filtros=lambda consulta: consulta.gte("dia", desde.isoformat()),
+        )
+        for fila in pagina
+    ]
+    tendencia = pd.DataFrame(filas, columns=["id"] + COLUMNAS_SNAPSHOT).drop(columns="id").astype(
+        {"etapa_codigo": "int64", "cantidad": "int64"}
+    )
+    tendencia["dia"] = pd.to_datetime(tendencia["dia"])
+    tendencia["Etapa"] = np.asarray(ETAPAS, dtype=object)[tendencia["etapa_codigo"].to_numpy(dtype=np.int64)]
+    return tendencia
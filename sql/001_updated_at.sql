@@ -0,0 +1,21 @@
+-- Marca de modificación para la sincronización incremental (sincronizacion.py)
+alter table public.prefacturas_pedidos
+    add column if not exists updated_at timestamptz not null default now();
+
+create or replace function public.tocar_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists prefacturas_pedidos_updated_at on public.prefacturas_pedidos;
+create trigger prefacturas_pedidos_updated_at
+    before update on public.prefacturas_pedidos
+    for each row execute function public.tocar_updated_at();
+
+create index if not exists prefacturas_pedidos_updated_at_idx
+    on public.prefacturas_pedidos (updated_at);
@@ -0,0 +1,40 @@
+-- Conteos por (categoría, etapa) calculados en la base (agregacion.conteo_etapas_servidor).
+-- Mismas reglas que etapas.codigos_etapa():
+--   0 Por Elaborar         fecha_elaboracion vacía
+--   1 Por Conciliar        elaborada y fecha_conciliacion vacía
+--   2 Pendiente de Pedido  conciliada y pedido vacío
+--   3 Pedido Recibido      conciliada y con pedido
+create or replace view public.prefacturas_etapas as
+select
+    id,
+    upper(btrim(coalesce(sector, ''))) as sector,
+    upper(btrim(coalesce(subsector, ''))) as subsector,
+    (case
+        when fecha_elaboracion is null then 0
+        when fecha_conciliacion is null then 1
+        when btrim(coalesce(pedido, '')) = '' then 2
+        else 3
+    end)::smallint as etapa_codigo
+from public.prefacturas_pedidos;
+
+-- Sin sector: categoría = sector (o 'Sin dato'). Con sector: categoría = subsector (o sector).
+create or replace function public.conteo_etapas(p_sector text default null, p_etapa smallint default null)
+returns table (categoria text, etapa_codigo smallint, cantidad bigint)
+language sql
+stable
+as $$
+    select
+        case
+            when p_sector is null then coalesce(nullif(sector, ''), 'Sin dato')
+            else coalesce(nullif(subsector, ''), sector)
+        end as categoria,
+        etapa_codigo,
+        count(*) as cantidad
+    from public.prefacturas_etapas
+    where (p_sector is null or sector = upper(btrim(p_sector)))
+      and (p_etapa is null or etapa_codigo = p_etapa)
+    group by 1, 2
+$$;
+
+create index if not exists prefacturas_pedidos_sector_idx
+    on public.prefacturas_pedidos (upper(btrim(coalesce(sector, ''))));
@@ -0,0 +1,25 @@
+-- Vista para el editor paginado (cargador.cargar_pagina): todas las columnas
+-- más sector normalizado y etapa, para filtrar en la base por sector y etapa.
+-- Misma expresión de etapa que sql/002_conteo_etapas.sql.
+create or replace view public.prefacturas_vista as
+select
+    p.*,
+    upper(btrim(coalesce(p.sector, ''))) as sector_norm,
+    (case
+        when p.fecha_elaboracion is null then 0
+        when p.fecha_conciliacion is null then 1
+        when btrim(coalesce(p.pedido, '')) = '' then 2
+        else 3
+    end)::smallint as etapa_codigo
+from public.prefacturas_pedidos p;
+
+-- Índice de expresión para filtrar por etapa (+ id para el orden de la página)
+create index if not exists prefacturas_pedidos_etapa_idx
+    on public.prefacturas_pedidos ((
+        (case
+            when fecha_elaboracion is null then 0
+            when fecha_conciliacion is null then 1
+            when btrim(coalesce(pedido, '')) = '' then 2
+            else 3
+        end)::smallint
+    ), id);
@@ -0,0 +1,47 @@
+-- Conteos diarios por (día, sector, etapa) para el gráfico de tendencia
+-- (snapshots.leer_tendencia lee solo esta tabla: días × sectores × etapas).
+-- Reglas de etapas.codigos_etapa() aplicadas a lo que se sabía ese día:
+-- una fecha posterior al día cuenta como vacía, y el pedido cuenta desde
+-- fecha_edicion_pedido (si no tiene fecha, desde siempre).
+create table if not exists public.prefacturas_snapshots (
+    id bigint generated always as identity primary key,
+    dia date not null,
+    sector text not null,
+    etapa_codigo smallint not null,
+    cantidad integer not null,
+    unique (dia, sector, etapa_codigo)
+);
+
+-- Recalcula desde p_desde hasta hoy (por defecto solo hoy). Los días
+-- anteriores no se tocan: la historia se materializa una sola vez.
+create or replace function public.materializar_snapshots(p_desde date default current_date)
+returns integer
+language plpgsql
+as $$
+declare
+    filas integer;
+begin
+    delete from public.prefacturas_snapshots where dia >= p_desde;
+
+    insert into public.prefacturas_snapshots (dia, sector, etapa_codigo, cantidad)
+    select
+        d.dia::date,
+        upper(btrim(coalesce(p.sector, ''))),
+        (case
+            when p.fecha_elaboracion is null or p.fecha_elaboracion > d.dia then 0
+            when p.fecha_conciliacion is null or p.fecha_conciliacion > d.dia then 1
+            when btrim(coalesce(p.pedido, '')) = '' or p.fecha_edicion_pedido > d.dia then 2
+            else 3
+        end)::smallint,
+        count(*)
+    from generate_series(p_desde, current_date, interval '1 day') as d(dia)
+    join public.prefacturas_pedidos p on p.created_at::date <= d.dia
+    group by 1, 2, 3;
+
+    get diagnostics filas = row_count;
+    return filas;
+end
+$$;
+
+-- Con pg_cron, un snapshot al cierre de cada día:
+-- select cron.schedule('snapshot-etapas', '55 23 * * *', 'select public.materializar_snapshots()');
@@ -0,0 +1,7 @@
+-- Eventos por fila para tiempo_real.Escucha (Supabase Realtime, postgres_changes).
+-- La tabla tiene que estar en la publicación que lee Realtime.
+alter publication supabase_realtime add table public.prefacturas_pedidos;
+
+-- Con la identidad por defecto un DELETE solo trae la clave (id), que es lo que
+-- usa la app. REPLICA IDENTITY FULL mandaría la fila completa a costa de más WAL:
+-- alter table public.prefacturas_pedidos replica identity full;
@@ -0,0 +1,43 @@
+-- Guardado con concurrencia optimista (guardado.aplicar_diferencias, escritura.CONDICIONALES).
+-- Cada fila trae su id, la versión que cargó el usuario ("_version" = updated_at
+-- leído) y solo las columnas que cambió. Se aplica únicamente si la fila sigue
+-- en esa versión; las demás no se tocan y la app relee solo esas para resolverlas.
+-- Requiere updated_at mantenido por trigger (sql/001_updated_at.sql).
+
+-- Actualización parcial: jsonb_populate_record(t, fila) toma de la fila JSON las
+-- columnas presentes y deja el resto como está en t. Devuelve las filas aplicadas.
+create or replace function public.actualizar_prefacturas(p_filas jsonb)
+returns table (id bigint, updated_at timestamptz)
+language sql
+as $$
+    update public.prefacturas_pedidos t
+    set (
+        sector, subsector, periodo, area, sub_area, pedido,
+        fecha_elaboracion, fecha_formato, fecha_solicitud_modificacion,
+        fecha_entrega_post_modificacion, fecha_conciliacion, fecha_firma_ingenica,
+        fecha_entrega_final_ingenica_central, fecha_firma_dnds, fecha_edicion_pedido
+    ) = (
+        select
+            r.sector, r.subsector, r.periodo, r.area, r.sub_area, r.pedido,
+            r.fecha_elaboracion, r.fecha_formato, r.fecha_solicitud_modificacion,
+            r.fecha_entrega_post_modificacion, r.fecha_conciliacion, r.fecha_firma_ingenica,
+            r.fecha_entrega_final_ingenica_central, r.fecha_firma_dnds, r.fecha_edicion_pedido
+        from jsonb_populate_record(t, f.fila) r
+    )
+    from jsonb_array_elements(p_filas) as f(fila)
+    where t.id = (f.fila->>'id')::bigint
+      and t.updated_at = (f.fila->>'_version')::timestamptz
+    returning t.id, t.updated_at
+$$;
+
+-- Borrado condicional: no borra lo que otro usuario modificó después de la carga.
+create or replace function public.borrar_prefacturas(p_filas jsonb)
+returns table (id bigint)
+language sql
+as $$
+    delete from public.prefacturas_pedidos t
+    using jsonb_array_elements(p_filas) as f(fila)
+    where t.id = (f.fila->>'id')::bigint
+      and t.updated_at = (f.fila->>'_version')::timestamptz
+    returning t.id
+$$;
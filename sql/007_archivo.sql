@@ -0,0 +1,199 @@
+-- Archivo de prefacturas cerradas (archivo.py): las filas en Pedido Recibido de
+-- periodos terminados salen de prefacturas_pedidos, así la carga, el editor y
+-- los KPIs trabajan solo con lo abierto. Los totales del tablero siguen
+-- sumándolas a través de prefacturas_archivo_resumen (pocas filas).
+-- Requiere sql/004_snapshots_etapas.sql (se redefine materializar_snapshots).
+
+-- Mismas columnas y en el mismo orden que prefacturas_pedidos (id sin identidad:
+-- conserva el original) + cuándo se archivó. Si se agregan columnas a
+-- prefacturas_pedidos, agregarlas acá antes de archivar_prefacturas.
+create table if not exists public.prefacturas_archivo (
+    like public.prefacturas_pedidos including defaults
+);
+alter table public.prefacturas_archivo
+    add column if not exists archivado_at timestamptz not null default now();
+create unique index if not exists prefacturas_archivo_id_idx
+    on public.prefacturas_archivo (id);
+create index if not exists prefacturas_archivo_periodo_idx
+    on public.prefacturas_archivo (upper(btrim(coalesce(periodo, ''))));
+
+-- Conteo de lo archivado por sector/subsector/periodo (todo es etapa 3, Pedido Recibido)
+create table if not exists public.prefacturas_archivo_resumen (
+    id bigint generated always as identity primary key,
+    sector text not null,
+    subsector text not null,
+    periodo text not null,
+    cantidad integer not null,
+    unique (sector, subsector, periodo)
+);
+
+-- Para el modo "ver archivo": filtros por sector y periodo normalizados, como prefacturas_vista
+create or replace view public.prefacturas_archivo_vista as
+select
+    a.*,
+    upper(btrim(coalesce(a.sector, ''))) as sector_norm,
+    upper(btrim(coalesce(a.periodo, ''))) as periodo_norm
+from public.prefacturas_archivo a;
+
+create or replace function public.recalcular_resumen_archivo(p_periodos text[])
+returns void
+language sql
+as $$
+    delete from public.prefacturas_archivo_resumen where periodo = any (p_periodos);
+
+    insert into public.prefacturas_archivo_resumen (sector, subsector, periodo, cantidad)
+    select
+        upper(btrim(coalesce(sector, ''))),
+        upper(btrim(coalesce(subsector, ''))),
+        upper(btrim(coalesce(periodo, ''))),
+        count(*)
+    from public.prefacturas_archivo
+    where upper(btrim(coalesce(periodo, ''))) = any (p_periodos)
+    group by 1, 2, 3;
+$$;
+
+-- Mes (1-12) de un periodo 'ENERO 1Q' (null si no es un periodo)
+create or replace function public.mes_periodo(p_periodo text)
+returns integer
+language sql
+immutable
+as $$
+    select array_position(
+        array['ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO', 'JULIO', 'AGOSTO', 'SEPTIEMBRE', 'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE'],
+        split_part(upper(btrim(p_periodo)), ' ', 1)
+    )
+$$;
+
+-- Último día del periodo: el 15 para la 1Q, fin de mes para la 2Q (archivo.fin_periodo)
+create or replace function public.fin_periodo(p_anio integer, p_periodo text)
+returns date
+language sql
+immutable
+as $$
+    select case
+        when split_part(upper(btrim(p_periodo)), ' ', 2) = '1Q' then make_date(p_anio, m, 15)
+        else (make_date(p_anio, m, 1) + interval '1 month' - interval '1 day')::date
+    end
+    from (select public.mes_periodo(p_periodo) as m) x
+$$;
+
+-- El periodo no trae año: el que deja su mes a menos de medio año de created_at (archivo.anios_periodo)
+create or replace function public.anio_periodo(p_creada timestamptz, p_periodo text)
+returns integer
+language sql
+immutable
+as $$
+    select extract(year from c)::integer + case
+        when m - extract(month from c) > 6 then -1
+        when m - extract(month from c) < -6 then 1
+        else 0
+    end
+    from (select p_creada at time zone 'UTC' as c, public.mes_periodo(p_periodo) as m) x
+$$;
+
+-- Mueve al archivo las filas cerradas (conciliadas y con pedido) de esos periodos,
+-- dados como [{"anio": 2025, "periodo": "ENERO 1Q"}, ...]. Solo periodos terminados
+-- (fin antes de hoy): los demás se ignoran aunque el cliente los mande.
+-- Las abiertas de un periodo terminado se quedan. Devuelve cuántas se movieron.
+drop function if exists public.archivar_prefacturas(text[]);
+create or replace function public.archivar_prefacturas(p_periodos jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    filas integer;
+    periodos text[];
+begin
+    with elegidos as (
+        select distinct (e->>'anio')::integer as anio, upper(btrim(e->>'periodo')) as periodo
+        from jsonb_array_elements(p_periodos) as e
+        where public.fin_periodo((e->>'anio')::integer, e->>'periodo') < current_date
+    ), movidas as (
+        delete from public.prefacturas_pedidos p
+        using elegidos e
+        where upper(btrim(coalesce(p.periodo, ''))) = e.periodo
+          and public.anio_periodo(p.created_at, p.periodo) = e.anio
+          and p.fecha_elaboracion is not null
+          and p.fecha_conciliacion is not null
+          and btrim(coalesce(p.pedido, '')) <> ''
+        returning p.*
+    )
+    insert into public.prefacturas_archivo
+    select movidas.*, now() from movidas;
+
+    get diagnostics filas = row_count;
+    -- El resumen se recuenta desde el archivo: rehacer también los no movidos es inocuo
+    select coalesce(array_agg(distinct upper(btrim(e->>'periodo'))), '{}')
+    into periodos
+    from jsonb_array_elements(p_periodos) as e;
+    perform public.recalcular_resumen_archivo(periodos);
+    return filas;
+end
+$$;
+
+-- Devuelve filas archivadas a prefacturas_pedidos (mismo id). updated_at pasa a
+-- now() para que la sincronización incremental las vea como modificadas.
+create or replace function public.restaurar_prefacturas(p_ids bigint[])
+returns integer
+language plpgsql
+as $$
+declare
+    filas integer;
+    periodos text[];
+begin
+    select array_agg(distinct upper(btrim(coalesce(periodo, ''))))
+    into periodos
+    from public.prefacturas_archivo
+    where id = any (p_ids);
+
+    with devueltas as (
+        delete from public.prefacturas_archivo where id = any (p_ids) returning *
+    )
+    insert into public.prefacturas_pedidos overriding system value
+    select (jsonb_populate_record(
+        null::public.prefacturas_pedidos,
+        (to_jsonb(d) - 'archivado_at') || jsonb_build_object('updated_at', now())
+    )).*
+    from devueltas d;
+
+    get diagnostics filas = row_count;
+    perform public.recalcular_resumen_archivo(coalesce(periodos, '{}'));
+    return filas;
+end
+$$;
+
+-- La tendencia diaria cuenta también lo archivado (misma lógica que 004)
+create or replace function public.materializar_snapshots(p_desde date default current_date)
+returns integer
+language plpgsql
+as $$
+declare
+    filas integer;
+begin
+    delete from public.prefacturas_snapshots where dia >= p_desde;
+
+    insert into public.prefacturas_snapshots (dia, sector, etapa_codigo, cantidad)
+    select
+        d.dia::date,
+        upper(btrim(coalesce(p.sector, ''))),
+        (case
+            when p.fecha_elaboracion is null or p.fecha_elaboracion > d.dia then 0
+            when p.fecha_conciliacion is null or p.fecha_conciliacion > d.dia then 1
+            when btrim(coalesce(p.pedido, '')) = '' or p.fecha_edicion_pedido > d.dia then 2
+            else 3
+        end)::smallint,
+        count(*)
+    from generate_series(p_desde, current_date, interval '1 day') as d(dia)
+    join (
+        select created_at, sector, fecha_elaboracion, fecha_conciliacion, pedido, fecha_edicion_pedido
+        from public.prefacturas_pedidos
+        union all
+        select created_at, sector, fecha_elaboracion, fecha_conciliacion, pedido, fecha_edicion_pedido
+        from public.prefacturas_archivo
+    ) p on p.created_at::date <= d.dia
+    group by 1, 2, 3;
+
+    get diagnostics filas = row_count;
+    return filas;
+end
+$$;
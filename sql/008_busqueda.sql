@@ -0,0 +1,77 @@
+-- Búsqueda y filtros de la tabla en modo servidor (busqueda.filtro_busqueda):
+-- texto por prefijo sobre pedido y sub_area, catálogos normalizados y rangos
+-- de fecha, cada uno cubierto por un índice de prefacturas_pedidos.
+-- Requiere sql/003_prefacturas_vista.sql (se agregan columnas al final de la vista).
+
+-- Texto de búsqueda normalizado como busqueda.normalizar_texto/palabras: sin
+-- acentos, en minúsculas y con cualquier signo ("-", ".", "_", "/") como
+-- espacio. Así el parser 'simple' solo ve palabras de letras y dígitos y
+-- separa igual que la app ("PED-1203" -> ped, 1203; sin esto daría '-1203').
+-- Las dos cadenas de translate() son busqueda.CON_ACENTO y busqueda.SIN_ACENTO.
+create or replace function public.texto_busqueda(pedido text, sub_area text)
+returns text
+language sql
+immutable
+as $$
+    select regexp_replace(
+        lower(translate(
+            coalesce(pedido, '') || ' ' || coalesce(sub_area, ''),
+            'ÁÀÂÄÃÉÈÊËÍÌÎÏÓÒÔÖÕÚÙÛÜÑÇáàâäãéèêëíìîïóòôöõúùûüñç',
+            'AAAAAEEEEIIIIOOOOOUUUUNCaaaaaeeeeiiiiooooouuuunc'
+        )),
+        '[^[:alnum:]]+', ' ', 'g'
+    )
+$$;
+
+-- Mismas columnas que 003 + catálogos normalizados + vector de búsqueda.
+-- Las expresiones son las de los índices de abajo: así el planificador los usa.
+create or replace view public.prefacturas_vista as
+select
+    p.*,
+    upper(btrim(coalesce(p.sector, ''))) as sector_norm,
+    (case
+        when p.fecha_elaboracion is null then 0
+        when p.fecha_conciliacion is null then 1
+        when btrim(coalesce(p.pedido, '')) = '' then 2
+        else 3
+    end)::smallint as etapa_codigo,
+    upper(btrim(coalesce(p.periodo, ''))) as periodo_norm,
+    upper(btrim(coalesce(p.subsector, ''))) as subsector_norm,
+    upper(btrim(coalesce(p.area, ''))) as area_norm,
+    to_tsvector('simple', public.texto_busqueda(p.pedido, p.sub_area)) as busqueda
+from public.prefacturas_pedidos p;
+
+-- Texto: busqueda=fts(simple).ped:*&12:* (GIN admite la búsqueda por prefijo).
+-- El índice anterior (sin normalizar) ya no coincide con la vista.
+drop index if exists public.prefacturas_pedidos_busqueda_idx;
+create index if not exists prefacturas_pedidos_busqueda_norm_idx
+    on public.prefacturas_pedidos
+    using gin (to_tsvector('simple', public.texto_busqueda(pedido, sub_area)));
+
+-- Catálogos: periodo_norm=in.(...) etc.
+create index if not exists prefacturas_pedidos_periodo_norm_idx
+    on public.prefacturas_pedidos (upper(btrim(coalesce(periodo, ''))));
+create index if not exists prefacturas_pedidos_subsector_norm_idx
+    on public.prefacturas_pedidos (upper(btrim(coalesce(subsector, ''))));
+create index if not exists prefacturas_pedidos_area_norm_idx
+    on public.prefacturas_pedidos (upper(btrim(coalesce(area, ''))));
+
+-- Rangos de fecha (gte/lte sobre cada hito)
+create index if not exists prefacturas_pedidos_fecha_elaboracion_idx
+    on public.prefacturas_pedidos (fecha_elaboracion);
+create index if not exists prefacturas_pedidos_fecha_formato_idx
+    on public.prefacturas_pedidos (fecha_formato);
+create index if not exists prefacturas_pedidos_fecha_solicitud_modificacion_idx
+    on public.prefacturas_pedidos (fecha_solicitud_modificacion);
+create index if not exists prefacturas_pedidos_fecha_entrega_post_modificacion_idx
+    on public.prefacturas_pedidos (fecha_entrega_post_modificacion);
+create index if not exists prefacturas_pedidos_fecha_conciliacion_idx
+    on public.prefacturas_pedidos (fecha_conciliacion);
+create index if not exists prefacturas_pedidos_fecha_firma_ingenica_idx
+    on public.prefacturas_pedidos (fecha_firma_ingenica);
+create index if not exists prefacturas_pedidos_fecha_entrega_final_ingenica_central_idx
+    on public.prefacturas_pedidos (fecha_entrega_final_ingenica_central);
+create index if not exists prefacturas_pedidos_fecha_firma_dnds_idx
+    on public.prefacturas_pedidos (fecha_firma_dnds);
+create index if not exists prefacturas_pedidos_fecha_edicion_pedido_idx
+    on public.prefacturas_pedidos (fecha_edicion_pedido);
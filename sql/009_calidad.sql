@@ -0,0 +1,25 @@
+-- Pedidos repetidos en modo servidor (calidad.pedidos_en_base): pedido
+-- normalizado en la vista, con índice de la misma expresión.
+-- Requiere sql/008_busqueda.sql (se agrega una columna al final de la vista).
+
+-- Mismas columnas que 008 + pedido normalizado.
+create or replace view public.prefacturas_vista as
+select
+    p.*,
+    upper(btrim(coalesce(p.sector, ''))) as sector_norm,
+    (case
+        when p.fecha_elaboracion is null then 0
+        when p.fecha_conciliacion is null then 1
+        when btrim(coalesce(p.pedido, '')) = '' then 2
+        else 3
+    end)::smallint as etapa_codigo,
+    upper(btrim(coalesce(p.periodo, ''))) as periodo_norm,
+    upper(btrim(coalesce(p.subsector, ''))) as subsector_norm,
+    upper(btrim(coalesce(p.area, ''))) as area_norm,
+    to_tsvector('simple', public.texto_busqueda(p.pedido, p.sub_area)) as busqueda,
+    upper(btrim(coalesce(p.pedido, ''))) as pedido_norm
+from public.prefacturas_pedidos p;
+
+-- pedido_norm=in.(...) con los pedidos de la página o de las filas editadas
+create index if not exists prefacturas_pedidos_pedido_norm_idx
+    on public.prefacturas_pedidos (upper(btrim(coalesce(pedido, ''))));
@@ -0,0 +1,59 @@
+"""Camino de datos de un rerun del tablero, sin Streamlit.
+
+app.py arma la interfaz con estas funciones; los benchmarks las llaman
+directamente para medir cada etapa sin un navegador ni Supabase.
+"""
+import numpy as np
+import pandas as pd
+
+from agregacion import conteo_etapas_local
+from esquema import COLUMNAS_CATALOGO
+from etapas import COLUMNAS_ETAPA, clasificar_etapas, contar_etapas
+from normalizacion import normalizar_datos
+
+# Opciones del radio "Mostrar solo" -> código de etapa
+CODIGO_POR_ESTADO = {
+    "Pendientes de Elaborar": 0,
+    "Pendientes de Conciliar": 1,
+    "Pendientes de Pedido": 2,
+    "Pedidos Recibidos": 3,
+}
+
+
+def preparar_datos(df_crudo: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza y clasifica lo recién cargado (carga completa o delta)."""
+    return clasificar_etapas(normalizar_datos(df_crudo))
+
+
+def codigo_estado(estado: str):
+    """Código de etapa de una opción del radio (None para "Ver Todo")."""
+    # Las opciones del radio vienen numeradas ("1. Pendientes de Elaborar")
+    return CODIGO_POR_ESTADO.get(estado.split(". ", 1)[-1])
+
+
+def filtrar_tablero(df: pd.DataFrame, sector: str, estado: str) -> pd.DataFrame:
+    """Filas del sector ("Todos" = sin filtro) y del estado elegido (selección por máscara, sin copiar)."""
+    mascara = np.ones(len(df), dtype=bool)
+    if sector != "Todos":
+        mascara &= (df["sector"] == sector).to_numpy()
+    codigo = codigo_estado(estado)
+    if codigo is not None and "etapa_codigo" in df.columns:
+        mascara &= df["etapa_codigo"].to_numpy() == codigo
+    return df if mascara.all() else df[mascara]
+
+
+def conteo_tablero(df_vista: pd.DataFrame, sector: str) -> pd.DataFrame:
+    """Conteo (Categoria, etapa_codigo, Cantidad) de KPIs y gráfico: por subsector si hay sector elegido."""
+    return conteo_etapas_local(df_vista, por_subsector=sector != "Todos" and "subsector" in df_vista.columns)
+
+
+def kpis_etapas(conteo: pd.DataFrame) -> list:
+    """Cantidad por etapa en el orden de ETAPAS."""
+    return contar_etapas(conteo["etapa_codigo"], conteo["Cantidad"]).tolist()
+
+
+def pagina_editor(df_pagina: pd.DataFrame) -> pd.DataFrame:
+    """DataFrame que recibe st.data_editor: sin columnas derivadas ni índice, con los catálogos presentes."""
+    df_editor = df_pagina.drop(columns=[c for c in COLUMNAS_ETAPA if c in df_pagina.columns]).reset_index(drop=True)
+    faltantes = {col: "" for col in COLUMNAS_CATALOGO if col not in df_editor.columns}
+    return df_editor.assign(**faltantes) if faltantes else df_editor
@@ -0,0 +1,89 @@
+"""Tarjetas KPI del pipeline (HTML + CSS), compartidas por app.py y los reportes offline."""
+
+# Estilos de las tarjetas; app.py los inyecta una vez con st.markdown
+CSS_PIPELINE = """
+<style>
+.pipe-wrap{display:flex; gap:14px; align-items:stretch; margin:12px 0 8px 0; flex-wrap:wrap;}
+.pipe-card{
+  flex:1; min-width:210px;
+  padding:16px 18px; border-radius:16px;
+  border:1px solid rgba(49,51,63,0.15);
+  background: rgba(255,255,255,0.70);
+  box-shadow: 0 1px 2px rgba(0,0,0,0.04);
+}
+.pipe-title{font-size:.85rem; color:#6b7280; font-weight:800; display:flex; gap:8px; align-items:center; flex-wrap:wrap;}
+.pipe-value{font-size:2.0rem; font-weight:900; color:#111827; line-height:1.05; margin-top:6px;}
+.pipe-sub{font-size:.82rem; color:#6b7280; margin-top:6px;}
+.pipe-bar{height:8px; background:rgba(15,23,42,0.08); border-radius:999px; overflow:hidden; margin-top:10px;}
+.pipe-bar span{display:block; height:100%; border-radius:999px;}
+.badge{display:inline-block; padding:2px 10px; border-radius:999px; font-size:.75rem; font-weight:900;}
+.small-muted{color:#6b7280; font-size:.82rem; margin-top:4px;}
+</style>
+"""
+
+
+def pct(n, d):
+    return (n / d) if d else 0
+
+
+def html_pipeline(kpis) -> str:
+    """Tarjetas Total + 4 etapas a partir de la cantidad por etapa (orden de ETAPAS, como kpis_etapas)."""
+    por_elaborar, por_conciliar, pendiente_pedido, pedido_recibido, sin_clasificar = kpis
+    kpi_total = por_elaborar + por_conciliar + pendiente_pedido + pedido_recibido + sin_clasificar
+    p1, p2, p3, p4 = (
+        pct(por_elaborar, kpi_total),
+        pct(por_conciliar, kpi_total),
+        pct(pendiente_pedido, kpi_total),
+        pct(pedido_recibido, kpi_total),
+    )
+    return f"""
+<div class="pipe-wrap">
+
+  <div class="pipe-card">
+    <div class="pipe-title">📦 Total Prefacturas
+      <span class="badge" style="background:rgba(37,99,235,0.12); color:rgb(37,99,235);">Base</span>
+    </div>
+    <div class="pipe-value">{kpi_total}</div>
+    <div class="pipe-sub">Registros (según filtros)</div>
+    <div class="pipe-bar"><span style="width:100%; background:rgb(37,99,235)"></span></div>
+  </div>
+
+  <div class="pipe-card">
+    <div class="pipe-title">🧾 Etapa 1 · Por Elaborar
+      <span class="badge" style="background:rgba(245,158,11,0.14); color:rgb(161,98,7);">{p1:.0%}</span>
+    </div>
+    <div class="pipe-value">{por_elaborar}</div>
+    <div class="pipe-sub">Sin Elaborar</div>
+    <div class="pipe-bar"><span style="width:{p1*100:.0f}%; background:rgb(245,158,11)"></span></div>
+  </div>
+
+  <div class="pipe-card">
+    <div class="pipe-title">✅ Etapa 2 · Por Conciliar
+      <span class="badge" style="background:rgba(59,130,246,0.14); color:rgb(29,78,216);">{p2:.0%}</span>
+    </div>
+    <div class="pipe-value">{por_conciliar}</div>
+    <div class="pipe-sub">Elaborada y sin Conciliar</div>
+    <div class="pipe-bar"><span style="width:{p2*100:.0f}%; background:rgb(59,130,246)"></span></div>
+  </div>
+
+  <div class="pipe-card">
+    <div class="pipe-title">🧩 Etapa 3 · Pendiente de Pedido
+      <span class="badge" style="background:rgba(168,85,247,0.14); color:rgb(126,34,206);">{p3:.0%}</span>
+    </div>
+    <div class="pipe-value">{pendiente_pedido}</div>
+    <div class="pipe-sub">Conciliada y sin <b>pedido</b></div>
+    <div class="pipe-bar"><span style="width:{p3*100:.0f}%; background:rgb(168,85,247)"></span></div>
+  </div>
+
+  <div class="pipe-card">
+    <div class="pipe-title">📩 Etapa 4 · Pedido Recibido (Final)
+      <span class="badge" style="background:rgba(16,185,129,0.14); color:rgb(4,120,87);">{p4:.0%}</span>
+    </div>
+    <div class="pipe-value">{pedido_recibido}</div>
+    <div class="pipe-sub">Conciliada y con <b>pedido</b></div>
+    <div class="pipe-bar"><span style="width:{p4*100:.0f}%; background:rgb(16,185,129)"></span></div>
+  </div>
+
+</div>
+
+"""
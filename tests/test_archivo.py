@@ -0,0 +1,111 @@
+"""Archivo de prefacturas cerradas (archivo.py, sql/007_archivo.sql) contra cliente_local.ClienteLocal.
+
+Se archiva por (año, periodo) y solo periodos terminados; archivar y
+restaurar no cambian los totales del tablero (snapshot + resumen archivado).
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from archivo import (
+    anios_periodo, archivar, cargar_archivo, conteo_archivo, fin_periodo, leer_resumen, periodos_archivables,
+    periodos_terminados, restaurar,
+)
+from benchmarks.sintetico import generar_prefacturas
+from cliente_local import ClienteLocal
+from esquema import TABLA
+from etapas import PEDIDO_RECIBIDO
+from tablero import conteo_tablero, preparar_datos
+
+
+@pytest.fixture
+def cliente():
+    return ClienteLocal(generar_prefacturas(1000))
+
+
+def _snapshot(cliente) -> pd.DataFrame:
+    return preparar_datos(pd.DataFrame(cliente.table(TABLA).select("*").order("id").execute().data))
+
+
+def _totales(cliente) -> pd.Series:
+    """Cantidad por etapa del tablero: lo abierto más el resumen archivado."""
+    conteo = pd.concat([conteo_tablero(_snapshot(cliente), "Todos"), conteo_archivo(leer_resumen(cliente))])
+    return conteo.astype({"etapa_codigo": "int64", "Cantidad": "int64"}).groupby("etapa_codigo")["Cantidad"].sum()
+
+
+def test_fin_periodo():
+    assert fin_periodo(2024, "ENERO 1Q") == date(2024, 1, 15)
+    assert fin_periodo(2024, "febrero 2q") == date(2024, 2, 29)
+    assert fin_periodo(2025, "FEBRERO 2Q") == date(2025, 2, 28)
+    assert fin_periodo(2024, "SIN PERIODO") is None
+
+
+def test_periodos_terminados():
+    hoy = date(2025, 3, 10)
+    assert periodos_terminados(2025, hoy) == [(2025, "ENERO 1Q"), (2025, "ENERO 2Q"), (2025, "FEBRERO 1Q"),
+                                              (2025, "FEBRERO 2Q")]
+    assert periodos_terminados(2026, hoy) == []
+
+
+def test_anios_periodo_cruza_el_cambio_de_anio():
+    df = pd.DataFrame({
+        "created_at": ["2025-01-05T10:00:00+00:00", "2024-12-20T10:00:00+00:00", "2024-06-01T10:00:00+00:00",
+                       "2024-06-01T10:00:00+00:00", None],
+        "periodo": ["DICIEMBRE 2Q", "ENERO 1Q", "JUNIO 1Q", None, "ENERO 1Q"],
+    })
+    anios = anios_periodo(df)
+    assert anios[:3].tolist() == [2024, 2025, 2024]
+    assert np.isnan(anios[3:]).all()
+
+
+def test_periodos_archivables_solo_terminados(cliente):
+    df = _snapshot(cliente)
+    hoy = date(2024, 8, 20)
+    archivables = periodos_archivables(df, hoy)
+
+    assert len(archivables) and all(fin_periodo(a, p) < hoy for a, p in archivables.index)
+    assert (2024, "AGOSTO 2Q") not in archivables.index
+    cerradas = df[(df["etapa_codigo"] == PEDIDO_RECIBIDO).to_numpy()]
+    anios = anios_periodo(cerradas)
+    a, p = archivables.index[0]
+    assert archivables.iloc[0] == ((anios == a) & (cerradas["periodo"].astype(str) == p).to_numpy()).sum()
+
+
+def test_archivar_rechaza_periodos_sin_terminar(cliente):
+    hoy = date.today()
+    with pytest.raises(ValueError, match="sin terminar"):
+        archivar(cliente, [(2024, "ENERO 1Q"), (hoy.year + 1, "ENERO 1Q")])
+    assert cliente._datos("prefacturas_archivo").empty
+
+
+def test_la_base_no_mueve_periodos_sin_terminar(cliente):
+    """La RPC comprueba por su cuenta: pedida directo, un periodo futuro no mueve nada."""
+    futuro = [{"anio": date.today().year + 1, "periodo": p} for p in ["ENERO 1Q", "JUNIO 2Q"]]
+    assert cliente.rpc("archivar_prefacturas", {"p_periodos": futuro}).execute().data == 0
+
+
+def test_archivar_y_restaurar_ida_y_vuelta(cliente):
+    antes = _snapshot(cliente)
+    totales = _totales(cliente)
+    elegidos = periodos_archivables(antes).index[:4].tolist()
+    esperado = periodos_archivables(antes)[elegidos].sum()
+
+    movidas = archivar(cliente, elegidos)
+
+    assert movidas == esperado > 0
+    despues = _snapshot(cliente)
+    archivadas = cargar_archivo(cliente)
+    assert len(despues) + len(archivadas) == len(antes)
+    assert not despues["id"].isin(archivadas["id"]).any()
+    assert leer_resumen(cliente)["cantidad"].sum() == movidas
+    # Un año distinto del mismo periodo no se toca
+    assert archivar(cliente, [(2010, p) for _, p in elegidos]) == 0
+    pd.testing.assert_series_equal(_totales(cliente), totales)
+
+    ids = archivadas["id"].tolist()
+    assert restaurar(cliente, ids) == len(ids)
+    assert sorted(_snapshot(cliente)["id"].tolist()) == sorted(antes["id"].tolist())
+    assert leer_resumen(cliente)["cantidad"].sum() == 0
+    pd.testing.assert_series_equal(_totales(cliente), totales)
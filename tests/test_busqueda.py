@@ -0,0 +1,88 @@
+"""Palabras de la búsqueda de texto (busqueda.py) y public.texto_busqueda de sql/008.
+
+Acentos, guiones y otros signos tienen que separar y normalizar igual en
+memoria (IndiceBusqueda), en el sustituto de Supabase y en el SQL.
+"""
+import re
+from pathlib import Path
+
+import pytest
+
+from benchmarks.sintetico import generar_prefacturas
+from busqueda import CON_ACENTO, SIN_ACENTO, FiltrosBusqueda, IndiceBusqueda, filtro_busqueda, palabras
+from cargador import cargar_pagina
+from cliente_local import ClienteLocal
+from tablero import preparar_datos
+
+SQL = Path(__file__).resolve().parent.parent / "sql"
+
+TEXTOS = ["PED-1203", "Campaña Río_2/b.3", "ÁÉÍÓÚÜÑÇ", "  sub--7  ", "año 2024-01", "N°5", ""]
+
+
+@pytest.mark.parametrize("texto,esperado", [
+    ("PED-1203", ["ped", "1203"]),
+    ("Campaña Río_2/b.3", ["campana", "rio", "2", "b", "3"]),
+    ("ÁÉÍÓÚÜÑÇ", ["aeiouunc"]),
+    ("  sub--7  ", ["sub", "7"]),
+    ("", []),
+])
+def test_palabras(texto, esperado):
+    assert palabras(texto) == esperado
+
+
+def _texto_busqueda_sql():
+    """translate() y regexp_replace() de public.texto_busqueda, leídos de sql/008."""
+    cuerpo = re.search(r"function public\.texto_busqueda.*?\$\$(.*?)\$\$", (SQL / "008_busqueda.sql").read_text(
+        encoding="utf-8"), re.S).group(1)
+    con, sin = re.search(r"coalesce\(sub_area, ''\),\s*'([^']*)',\s*'([^']*)'", cuerpo).groups()
+    separador = re.search(r"'(\[\^\[:alnum:\]\]\+)', ' ', 'g'", cuerpo).group(1)
+    return con, sin, separador
+
+
+def test_sql_normaliza_como_palabras():
+    con, sin, separador = _texto_busqueda_sql()
+    assert (con, sin) == (CON_ACENTO, SIN_ACENTO) and len(con) == len(sin)
+    assert separador == "[^[:alnum:]]+"
+
+    # El mismo cuerpo en Python: lower(translate(...)) y los signos como espacio
+    tabla = str.maketrans(con, sin)
+    for texto in TEXTOS:
+        assert re.sub(r"[\W_]+", " ", texto.translate(tabla).lower()).split() == palabras(texto)
+
+
+def test_vistas_e_indice_usan_texto_busqueda():
+    expresion = "to_tsvector('simple', public.texto_busqueda(p.pedido, p.sub_area)) as busqueda"
+    for archivo in ["008_busqueda.sql", "009_calidad.sql"]:
+        assert expresion in (SQL / archivo).read_text(encoding="utf-8")
+    assert "using gin (to_tsvector('simple', public.texto_busqueda(pedido, sub_area)))" in (
+        SQL / "008_busqueda.sql").read_text(encoding="utf-8")
+
+
+@pytest.fixture(scope="module")
+def crudo():
+    crudo = generar_prefacturas(6)
+    crudo["pedido"] = ["PED-1203", "CAMPAÑA-7", None, "ped_99", "Año/2024", "PED 12"]
+    crudo["sub_area"] = ["SUB-3", "Río Blanco", "RIO-CHICO", "", "Camp.", None]
+    return crudo
+
+
+@pytest.mark.parametrize("texto,ids", [
+    ("ped-12", [1, 6]),
+    ("12", [1, 6]),
+    ("-1203", [1]),
+    ("campaña", [2]),
+    ("CAMPANA 7", [2]),
+    ("camp", [2, 5]),
+    ("río", [2, 3]),
+    ("rio-ch", [3]),
+    ("ped 99", [4]),
+    ("ano 2024", [5]),
+    ("año", [5]),
+    ("ped_1203 sub", [1]),
+])
+def test_acentos_y_guiones_en_memoria_y_servidor(crudo, texto, ids):
+    filtros = FiltrosBusqueda(texto=texto)
+    local = IndiceBusqueda(preparar_datos(crudo)).filtrar(filtros)["id"].tolist()
+    pagina, _ = cargar_pagina(ClienteLocal(crudo), 0, 10, columnas=["id"], filtros=filtro_busqueda(filtros))
+
+    assert sorted(local) == pagina["id"].tolist() == ids
@@ -0,0 +1,163 @@
+"""Caché compartida de DataFrames (cache_datos.CacheDataFrames): TTL, LRU, invalidación y locks por clave."""
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import cache_datos
+from cache_datos import CacheDataFrames
+
+
+class Reloj:
+    """time.monotonic que avanza a mano."""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(cache_datos.time, "monotonic", reloj)
+    return reloj
+
+
+def _df(filas: int = 10) -> pd.DataFrame:
+    return pd.DataFrame({"x": range(filas)})
+
+
+def test_acierto_y_fallo():
+    cache = CacheDataFrames()
+    df = _df()
+    assert cache.obtener("a", lambda: df) is df
+    assert cache.obtener("a", lambda: pytest.fail("no debía construir")) is df
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+
+
+def test_ttl_vencido_se_reconstruye(reloj):
+    cache = CacheDataFrames(ttl_segundos=60)
+    viejo, nuevo = _df(), _df()
+    cache.obtener("a", lambda: viejo)
+    reloj.ahora += 59
+    assert cache.obtener("a", lambda: nuevo) is viejo
+    reloj.ahora += 2
+    assert cache.obtener("a", lambda: nuevo) is nuevo
+
+
+def test_lru_expulsa_la_menos_usada():
+    tam = int(_df(1000).memory_usage(deep=True).sum())
+    cache = CacheDataFrames(max_bytes=2 * tam)
+    for clave in "abc":
+        cache.obtener(clave, lambda: _df(1000))
+        if clave == "b":
+            cache.obtener("a", lambda: pytest.fail("a sigue en la caché"))
+
+    # "b" era la menos usada al llegar "c"
+    assert list(cache._entradas) == ["a", "c"]
+    assert cache.bytes_usados <= cache.max_bytes
+
+
+def test_entrada_mas_grande_que_el_tope_se_queda():
+    cache = CacheDataFrames(max_bytes=1)
+    df = _df()
+    cache.obtener("a", lambda: df)
+    assert list(cache._entradas) == ["a"]
+
+
+def test_invalidar_una_clave_o_todas():
+    cache = CacheDataFrames()
+    for clave in "abc":
+        cache.guardar(clave, _df())
+    cache.invalidar("a")
+    assert list(cache._entradas) == ["b", "c"]
+    cache.invalidar(conservar=("c",))
+    assert list(cache._entradas) == ["c"]
+
+
+@pytest.mark.parametrize("clave_invalidada", ["a", None])
+def test_invalidar_durante_la_construccion_no_guarda(clave_invalidada):
+    """construir() leyó datos viejos; el resultado se entrega pero no queda en la caché."""
+    cache = CacheDataFrames()
+    viejo, nuevo = _df(), _df()
+
+    def construir():
+        cache.invalidar(clave_invalidada)
+        return viejo
+
+    assert cache.obtener("a", construir) is viejo
+    assert "a" not in cache._entradas
+    assert cache.obtener("a", lambda: nuevo) is nuevo
+    assert cache.obtener("a", lambda: pytest.fail("ya está guardada")) is nuevo
+
+
+def test_invalidar_todo_respeta_conservar_durante_la_construccion():
+    cache = CacheDataFrames()
+    df = _df()
+
+    def construir():
+        cache.invalidar(conservar=("a",))
+        return df
+
+    cache.obtener("a", construir)
+    assert cache._entradas["a"][0] is df
+
+
+def test_invalidar_otra_clave_no_afecta():
+    cache = CacheDataFrames()
+    df = _df()
+
+    def construir():
+        cache.invalidar("b")
+        return df
+
+    cache.obtener("a", construir)
+    assert "a" in cache._entradas
+
+
+def test_una_sola_construccion_con_sesiones_concurrentes():
+    cache = CacheDataFrames()
+    dentro, seguir = threading.Event(), threading.Event()
+    construcciones = []
+    df = _df()
+
+    def construir():
+        construcciones.append(1)
+        dentro.set()
+        seguir.wait(5)
+        return df
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(cache.obtener("a", construir))) for _ in range(5)]
+    hilos[0].start()
+    dentro.wait(5)
+    for hilo in hilos[1:]:
+        hilo.start()
+    # Todas esperan el mismo lock de la clave
+    while cache._locks_clave["a"][1] < 5:
+        time.sleep(0.01)
+    seguir.set()
+    for hilo in hilos:
+        hilo.join(5)
+
+    assert len(construcciones) == 1
+    assert len(resultados) == 5 and all(r is df for r in resultados)
+    assert cache._locks_clave == {}
+
+
+def test_locks_por_clave_se_liberan():
+    """Los locks de cada clave se borran al terminar, también si construir() falla."""
+    def falla():
+        raise RuntimeError("sin red")
+
+    cache = CacheDataFrames()
+    for i in range(100):
+        cache.obtener(("pagina", i), _df)
+    with pytest.raises(RuntimeError):
+        cache.obtener("falla", falla)
+
+    assert cache._locks_clave == {}
+    assert "falla" not in cache._entradas
@@ -0,0 +1,197 @@
+"""Calidad de datos (calidad.py): cada regla sobre filas armadas a mano, revisión incremental y sql/009.
+
+Cada prueba de regla parte de una fila limpia (todos los hitos el mismo día,
+catálogos válidos, sin pedido) y rompe una sola cosa: debe encenderse
+exactamente el bit de esa regla.
+"""
+import re
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.sintetico import generar_prefacturas
+from calidad import REGLAS, RevisorCalidad, bits_filas, claves_pedido, pedidos_en_base
+from cliente_local import ClienteLocal
+from esquema import COLUMNA_MODIFICACION, COLUMNAS_FECHAS, TABLA
+from tablero import preparar_datos
+
+SQL = Path(__file__).resolve().parent.parent / "sql"
+
+DIA = "2024-05-10"
+ANTES = "2024-05-09"
+
+
+def _limpia(**cambios) -> dict:
+    fila = {
+        "id": 1, "sector": "MANAGUA", "subsector": "MANAGUA DN", "periodo": "MAYO 1Q", "area": "PSSEN",
+        "pedido": None, COLUMNA_MODIFICACION: "2024-05-10T00:00:00+00:00",
+        **{columna: DIA for columna in COLUMNAS_FECHAS},
+    }
+    return {**fila, **cambios}
+
+
+def _bit(codigo: str) -> int:
+    return 1 << [r.codigo for r in REGLAS].index(codigo)
+
+
+def _revisar(*filas) -> list:
+    df = pd.DataFrame([{**f, "id": i} for i, f in enumerate(filas, start=1)])
+    return RevisorCalidad().revisar(df).bits.tolist()
+
+
+def test_fila_limpia_y_hitos_vacios_no_cuentan():
+    vacios = _limpia(**{columna: None for columna in COLUMNAS_FECHAS})
+    assert _revisar(_limpia(), vacios, _limpia(pedido="  "), _limpia(pedido="  ")) == [0, 0, 0, 0]
+
+
+@pytest.mark.parametrize("regla", [r for r in REGLAS if r.tipo == "orden"], ids=lambda r: r.codigo)
+def test_regla_de_orden(regla):
+    assert _revisar(_limpia(**{regla.columnas[1]: ANTES})) == [_bit(regla.codigo)]
+    # Solo con el hito anterior vacío no hay con qué comparar
+    assert _revisar(_limpia(**{regla.columnas[1]: ANTES, regla.columnas[0]: None})) == [0]
+
+
+@pytest.mark.parametrize("regla", [r for r in REGLAS if r.tipo == "catalogo"], ids=lambda r: r.codigo)
+def test_regla_de_catalogo(regla):
+    columna = regla.columnas[0]
+    fuera = _limpia(**{columna: "NO EXISTE"})
+    # Minúsculas, espacios y vacío no son errores de catálogo
+    dentro = _limpia(**{columna: f"  {_limpia()[columna].lower()} "})
+    assert _revisar(fuera, dentro, _limpia(**{columna: ""})) == [_bit(regla.codigo), 0, 0]
+
+
+def test_regla_de_catalogo_con_categorias():
+    df = pd.DataFrame([_limpia(sector="MANAGUA"), _limpia(sector="OTRO"), _limpia(sector=None)])
+    df["sector"] = df["sector"].astype("category")
+    assert bits_filas(df).tolist() == [0, _bit("sector_fuera_de_catalogo"), 0]
+
+
+def test_pedido_repetido_normalizado():
+    filas = [_limpia(pedido="ped-7"), _limpia(pedido=" PED-7 "), _limpia(pedido="PED-8"), _limpia(pedido=None),
+             _limpia(pedido=None)]
+    repetido = _bit("pedido_repetido")
+    assert _revisar(*filas) == [repetido, repetido, 0, 0, 0]
+
+
+def test_varias_reglas_en_la_misma_fila():
+    fila = _limpia(fecha_formato=ANTES, area="X", pedido="R")
+    bits = _revisar(fila, _limpia(pedido="r"))
+    assert bits == [
+        _bit("formato_antes_de_elaboracion") | _bit("area_fuera_de_catalogo") | _bit("pedido_repetido"),
+        _bit("pedido_repetido"),
+    ]
+
+
+def _editar(df: pd.DataFrame) -> pd.DataFrame:
+    """Snapshot siguiente: filas cambiadas (con otro updated_at), una borrada y dos nuevas."""
+    nuevo = df.copy()
+    marca = "2030-01-01T00:00:00+00:00"
+    pedido_existente = df["pedido"].dropna().iloc[0]
+    nuevo.loc[nuevo.index[5], ["pedido", COLUMNA_MODIFICACION]] = [pedido_existente, marca]
+    nuevo.loc[nuevo.index[6], ["fecha_formato", "fecha_elaboracion", COLUMNA_MODIFICACION]] = [
+        "2020-01-01", "2020-02-01", marca,
+    ]
+    # El primero de los repetidos deja de serlo
+    repetidos = df[df["pedido"].duplicated(keep=False) & df["pedido"].notna()]
+    if len(repetidos):
+        nuevo.loc[repetidos.index[0], ["pedido", COLUMNA_MODIFICACION]] = ["UNICO-XYZ", marca]
+    nuevo = nuevo.drop(index=nuevo.index[10])
+    altas = preparar_datos(pd.DataFrame([
+        _limpia(id=90001, pedido=pedido_existente), _limpia(id=90002, sector="FUERA"),
+    ]))
+    return pd.concat([nuevo, altas], ignore_index=True)
+
+
+def test_revision_incremental_igual_a_completa():
+    crudo = generar_prefacturas(600)
+    crudo.loc[:20, "pedido"] = "PED-REPETIDO"
+    df = preparar_datos(crudo)
+    revisor = RevisorCalidad()
+    revisor.revisar(df)
+    assert revisor.evaluadas == len(df)
+
+    nuevo = _editar(df)
+    incremental = revisor.revisar(nuevo)
+    completo = RevisorCalidad().revisar(nuevo)
+
+    # 3 cambiadas + 2 altas
+    assert revisor.evaluadas == 5
+    np.testing.assert_array_equal(incremental.bits.to_numpy(), completo.bits.to_numpy())
+    assert revisor.revisar(nuevo) is incremental
+
+    # Y otra vez desde el nuevo: volver al primer snapshot también coincide
+    np.testing.assert_array_equal(revisor.revisar(df).bits.to_numpy(), RevisorCalidad().revisar(df).bits.to_numpy())
+
+
+def test_revisar_filas_cuenta_contra_el_snapshot_sin_las_mismas_filas():
+    df = pd.DataFrame([_limpia(pedido="A"), _limpia(pedido="B"), _limpia(pedido="C")]).assign(id=[1, 2, 3])
+    revisor = RevisorCalidad()
+    revisor.revisar(df)
+    repetido = _bit("pedido_repetido")
+
+    # La fila 1 conserva su pedido: no choca consigo misma; la 2 toma el de la 3
+    editadas = pd.DataFrame([_limpia(id=1, pedido="a"), _limpia(id=2, pedido="C")])
+    assert revisor.revisar_filas(editadas).bits.tolist() == [0, repetido]
+    # Dos filas nuevas con el mismo pedido chocan entre sí
+    nuevas = pd.DataFrame([_limpia(id=None, pedido="Z"), _limpia(id=None, pedido="z ")])
+    assert revisor.revisar_filas(nuevas).bits.tolist() == [repetido, repetido]
+
+
+def test_resumen_etiquetas_y_estilos():
+    resultado = RevisorCalidad().revisar(pd.DataFrame([
+        _limpia(id=1, fecha_formato=ANTES), _limpia(id=2, area="X", pedido="P"), _limpia(id=3, pedido="P"),
+    ]))
+    assert resultado.filas == 3
+    assert resultado.resumen().set_index("regla")["filas"].to_dict() == {
+        "Formato antes de elaboración": 1, "Área fuera de catálogo": 1, "Pedido repetido en otra fila": 2,
+    }
+    assert resultado.etiquetas().tolist() == [
+        "Formato antes de elaboración", "Área fuera de catálogo; Pedido repetido en otra fila",
+        "Pedido repetido en otra fila",
+    ]
+    estilos = resultado.estilos(["fecha_formato", "area", "pedido"])
+    assert (estilos != "").to_numpy().tolist() == [[True, False, False], [False, True, True], [False, False, True]]
+
+
+def _vista_009(crudo: pd.DataFrame) -> pd.DataFrame:
+    """prefacturas_vista de sql/009 en sqlite (sin la columna tsvector, que sqlite no tiene)."""
+    texto = (SQL / "009_calidad.sql").read_text(encoding="utf-8")
+    vista = re.search(r"(create or replace view .*?from public\.prefacturas_pedidos p);", texto, re.S).group(1)
+    vista = re.sub(r"\s*to_tsvector\(.*?\) as busqueda,", "", vista)
+    vista = re.sub(r"::\w+", "", vista.replace("public.", "").replace("btrim(", "trim("))
+    conexion = sqlite3.connect(":memory:")
+    crudo.astype(object).where(crudo.notna(), None).to_sql(TABLA, conexion, index=False)
+    conexion.execute(vista.replace("create or replace view", "create view"))
+    try:
+        return pd.read_sql("select id, pedido_norm from prefacturas_vista order by id", conexion)
+    finally:
+        conexion.close()
+
+
+def test_pedido_norm_de_sql_009_igual_que_claves_pedido():
+    crudo = generar_prefacturas(300)
+    crudo.loc[0:4, "pedido"] = ["  ped-1 ", "Ped-1", "", "   ", None]
+    vista = _vista_009(crudo)
+    assert vista["pedido_norm"].tolist() == claves_pedido(crudo["pedido"]).tolist()
+
+
+def test_pedidos_en_base_modo_servidor():
+    """pedidos_en_base (pedido_norm en ClienteLocal) = conteo contra el snapshot (RevisorCalidad)."""
+    crudo = generar_prefacturas(300)
+    crudo.loc[0:2, "pedido"] = ["DUP-1", " dup-1", "SOLO-1"]
+    cliente = ClienteLocal(crudo)
+    revisor = RevisorCalidad()
+    revisor.revisar(preparar_datos(crudo))
+
+    editadas = pd.DataFrame([
+        _limpia(id=1, pedido="DUP-1"), _limpia(id=3, pedido="solo-1"), _limpia(id=None, pedido="SOLO-1 "),
+        _limpia(id=None, pedido="NUEVO"),
+    ])
+    en_base = pedidos_en_base(cliente, editadas)
+    # SOLO-1 solo lo usa la fila 3, que está entre las editadas
+    assert en_base == {"DUP-1"}
+    assert (revisor.revisar_filas(editadas, en_base).bits.tolist()
+            == revisor.revisar_filas(editadas).bits.tolist())
@@ -0,0 +1,145 @@
+"""Carga por keyset (cargador._respuestas, leer_paginas, cargar_paginado) en los bordes de página.
+
+Un cliente con tope de filas por respuesta (max-rows de PostgREST) y
+páginas que terminan justo en el final de la tabla, en un hueco de ids o
+en medio de filas con la misma clave de negocio (mismo día, mismo sector).
+"""
+from datetime import date
+
+import pandas as pd
+import pytest
+from postgrest.exceptions import APIError
+
+from benchmarks.sintetico import generar_prefacturas
+from cargador import _respuestas, cargar_paginado, leer_paginas
+from cliente_local import ClienteLocal
+from esquema import COLUMNAS_CARGA, TABLA, TABLA_SNAPSHOTS
+from snapshots import leer_tendencia
+
+
+class ClienteConTope(ClienteLocal):
+    """ClienteLocal cuyas respuestas traen a lo sumo `max_filas` filas, pida lo que pida la consulta."""
+
+    def __init__(self, filas=None, max_filas: int = None):
+        super().__init__(filas)
+        self.max_filas = max_filas
+        self.consultas = 0
+
+    def table(self, nombre: str):
+        consulta = super().table(nombre)
+        limit = consulta.limit
+
+        def limit_con_tope(n):
+            self.consultas += 1
+            return limit(min(n, self.max_filas) if self.max_filas else n)
+
+        consulta.limit = limit_con_tope
+        return consulta
+
+
+def _ids(paginas) -> list:
+    return [f["id"] for filas in paginas for f in filas]
+
+
+@pytest.mark.parametrize("filas,tam_pagina", [(100, 10), (100, 7), (100, 100), (100, 1000), (1, 1)])
+def test_bordes_de_pagina(filas, tam_pagina):
+    cliente = ClienteConTope(generar_prefacturas(filas))
+    paginas = list(leer_paginas(cliente, ["id"], tam_pagina=tam_pagina))
+
+    assert _ids(paginas) == list(range(1, filas + 1))
+    assert all(len(p) == tam_pagina for p in paginas[:-1])
+    # Una consulta más que páginas: la vacía que cierra (también si la última vino llena)
+    assert cliente.consultas == len(paginas) + 1
+
+
+def test_tope_del_servidor_menor_que_la_pagina():
+    """max-rows recorta cada respuesta por debajo de tam_pagina: igual se recorre todo."""
+    cliente = ClienteConTope(generar_prefacturas(95), max_filas=10)
+    paginas = list(leer_paginas(cliente, ["id"], tam_pagina=1000))
+    assert [len(p) for p in paginas] == [10] * 9 + [5]
+    assert _ids(paginas) == list(range(1, 96))
+
+
+def test_ids_con_huecos_y_desde_id():
+    crudo = generar_prefacturas(60)
+    crudo = crudo[crudo["id"] % 3 != 0]
+    cliente = ClienteConTope(crudo)
+    esperado = crudo["id"].tolist()
+
+    assert _ids(leer_paginas(cliente, ["id"], tam_pagina=4)) == esperado
+    assert _ids(leer_paginas(cliente, ["id"], tam_pagina=4, desde_id=30)) == [i for i in esperado if i > 30]
+
+
+def test_filas_con_la_misma_clave_de_negocio_cruzan_paginas():
+    """Muchas filas iguales salvo el id (mismo sector, mismo todo): ninguna se pierde ni se repite."""
+    crudo = generar_prefacturas(50)
+    crudo.loc[:, [c for c in crudo.columns if c != "id"]] = crudo.iloc[0, 1:].to_numpy()
+    cliente = ClienteConTope(crudo, max_filas=7)
+
+    def filtros(consulta):
+        return consulta.eq("sector", crudo["sector"].iloc[0])
+
+    paginas = list(leer_paginas(cliente, ["id", "sector"], tam_pagina=5, filtros=filtros))
+
+    assert _ids(paginas) == list(range(1, 51))
+
+
+def test_tendencia_con_el_mismo_dia_en_varias_paginas():
+    """Snapshots de un mismo día repartidos en varias páginas (se pagina por id, no por día)."""
+    filas = [
+        {"dia": dia, "sector": f"S{s}", "etapa_codigo": e, "cantidad": s + e}
+        for dia in ["2024-01-01", "2024-01-02"] for s in range(20) for e in range(4)
+    ]
+    cliente = ClienteLocal()
+    cliente.table(TABLA_SNAPSHOTS).insert(filas).execute()
+
+    tendencia = leer_tendencia(cliente, desde=date(2024, 1, 2))
+    assert len(tendencia) == 80 and tendencia["dia"].nunique() == 1
+    assert not tendencia.duplicated(["dia", "sector", "etapa_codigo"]).any()
+
+
+def test_altas_y_bajas_durante_la_carga():
+    """El keyset no se corre con bajas; las altas (id mayor) llegan en las páginas siguientes."""
+    cliente = ClienteConTope(generar_prefacturas(30))
+    paginas = _respuestas(cliente, ["id"], 10, None, None, TABLA)
+    vistos = [f["id"] for f in next(paginas)[0]]
+    cliente.table(TABLA).delete().in_("id", [5, 11, 12]).execute()
+    cliente.table(TABLA).insert({"sector": "SUR"}).execute()
+    vistos += _ids(filas for filas, _ in paginas)
+
+    assert vistos == list(range(1, 11)) + list(range(13, 32))
+
+
+def test_cargar_paginado_arma_columnas_tipadas():
+    crudo = generar_prefacturas(55)
+    cliente = ClienteConTope(crudo, max_filas=20)
+    df, stats = cargar_paginado(cliente, tam_pagina=20)
+
+    assert (stats.filas, stats.paginas) == (55, 3) and stats.bytes > 0
+    assert df["id"].tolist() == crudo["id"].tolist()
+    assert list(df.columns) == COLUMNAS_CARGA
+    assert str(df["id"].dtype) == "int64" and str(df["fecha_elaboracion"].dtype).startswith("datetime64")
+
+
+class ClienteTablaVieja(ClienteConTope):
+    """Tabla antigua (columnas 'Sector'/'Subsector'): cualquier proyección de columnas falla."""
+
+    def table(self, nombre: str):
+        consulta = super().table(nombre)
+        select = consulta.select
+
+        def select_estricto(*columnas, **opciones):
+            if columnas and columnas[0] != "*":
+                raise APIError({"code": "42703", "message": "column does not exist", "hint": None, "details": None})
+            return select(*columnas, **opciones)
+
+        consulta.select = select_estricto
+        return consulta
+
+
+def test_cargar_paginado_vuelve_a_select_todo_si_falla_la_proyeccion():
+    cliente = ClienteTablaVieja(pd.DataFrame({"id": [1, 2, 3], "Sector": ["A", "B", "C"]}))
+    df, stats = cargar_paginado(cliente, tam_pagina=2)
+
+    assert df["id"].tolist() == [1, 2, 3] and "Sector" in df.columns
+    assert stats.paginas == 2
@@ -0,0 +1,209 @@
+"""Envío de escrituras (escritura.EjecutorEscrituras) contra un cliente falso.
+
+El cliente falso falla según un guion por operación y anota cada request,
+así se ven los reintentos, la espera exponencial, qué errores se reintentan
+(y cuáles no en un insert) y la contrapresión del semáforo.
+"""
+import threading
+import time
+
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+
+import escritura
+from escritura import EjecutorEscrituras, es_transitorio, lotes_acotados
+
+
+def _api(codigo: str) -> APIError:
+    return APIError({"code": codigo, "message": f"error {codigo}", "hint": None, "details": None})
+
+
+class Respuesta:
+    def __init__(self, data):
+        self.data = data
+
+
+class Request:
+    def __init__(self, cliente, operacion: str, lote):
+        self.cliente = cliente
+        self.operacion = operacion
+        self.lote = lote
+
+    def in_(self, columna, ids):
+        self.lote = ids
+        return self
+
+    def execute(self) -> Respuesta:
+        return self.cliente.responder(self.operacion, self.lote)
+
+
+class ClienteFalso:
+    """table()/rpc() que fallan con los errores de `guion[operacion]` (uno por intento) y después responden."""
+
+    def __init__(self, guion: dict = None, aplicados=None):
+        self.guion = {op: list(errores) for op, errores in (guion or {}).items()}
+        self.aplicados = aplicados
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def responder(self, operacion: str, lote) -> Respuesta:
+        with self._lock:
+            self.requests.append((operacion, lote))
+            errores = self.guion.get(operacion)
+            error = errores.pop(0) if errores else None
+        if error is not None:
+            raise error
+        if self.aplicados is not None:
+            return Respuesta([{"id": f["id"]} for f in lote if f["id"] in self.aplicados])
+        return Respuesta(lote)
+
+    def table(self, tabla):
+        cliente = self
+
+        class Tabla:
+            def upsert(self, lote, on_conflict=None):
+                return Request(cliente, "upsert", lote)
+
+            def insert(self, lote):
+                return Request(cliente, "insert", lote)
+
+            def delete(self):
+                return Request(cliente, "delete", None)
+
+        return Tabla()
+
+    def rpc(self, funcion, params):
+        operacion = {v: k for k, v in escritura.CONDICIONALES.items()}[funcion]
+        return Request(self, operacion, params["p_filas"])
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    """Segundos de cada espera entre reintentos (sin esperar de verdad)."""
+    esperas = []
+    monkeypatch.setattr(escritura.time, "sleep", esperas.append)
+    return esperas
+
+
+def _registros(n: int) -> list:
+    return [{"id": i, "pedido": f"P{i}"} for i in range(n)]
+
+
+def _enviar(cliente, operacion: str, lote, **opciones):
+    with EjecutorEscrituras(cliente, espera=0.5, **opciones) as ejecutor:
+        ejecutor.enviar(operacion, lote)
+    return ejecutor.informe
+
+
+@pytest.mark.parametrize("error", [_api("503"), _api("40001"), _api("08006"), httpx.ReadTimeout("lento")],
+                         ids=["503", "40001", "08006", "ReadTimeout"])
+def test_falla_n_veces_y_despues_sale(esperas, error):
+    cliente = ClienteFalso({"upsert": [error, error]})
+    informe = _enviar(cliente, "upsert", _registros(3))
+
+    assert not informe.fallidos and informe.filas_ok == 3
+    assert informe.lotes[0].intentos == 3 and informe.reintentos == 2
+    assert esperas == [0.5, 1.0]
+    assert len(cliente.requests) == 3
+
+
+def test_falla_siempre_agota_los_reintentos(esperas):
+    cliente = ClienteFalso({"upsert": [_api("504")] * 10})
+    informe = _enviar(cliente, "upsert", _registros(3), reintentos=3)
+
+    [lote] = informe.fallidos
+    assert lote.intentos == 4 and lote.error == "error 504"
+    assert esperas == [0.5, 1.0, 2.0]
+    assert informe.filas_ok == 0
+
+
+@pytest.mark.parametrize("error", [_api("23505"), _api("42501"), _api("PGRST204"), ValueError("dato malo")],
+                         ids=["23505", "42501", "PGRST204", "ValueError"])
+def test_error_permanente_no_se_reintenta(esperas, error):
+    cliente = ClienteFalso({"upsert": [error]})
+    informe = _enviar(cliente, "upsert", _registros(3))
+
+    assert informe.lotes[0].intentos == 1 and not informe.lotes[0].ok
+    assert esperas == [] and len(cliente.requests) == 1
+
+
+@pytest.mark.parametrize("error,transitorio", [
+    (_api("429"), True), (_api("500"), True), (_api("57014"), True), (_api("08001"), True),
+    (httpx.ConnectError("sin red"), True), (httpx.ReadTimeout("lento"), True),
+    (_api("23505"), False), (_api("22P02"), False), (_api(None), False), (RuntimeError("x"), False),
+])
+def test_clasificacion_de_errores(error, transitorio):
+    assert es_transitorio(error) is transitorio
+
+
+@pytest.mark.parametrize("error,reintenta", [
+    (httpx.ConnectError("sin red"), True),     # no salió: seguro
+    (_api("503"), True),                       # rechazado antes de llegar a la base
+    (_api("429"), True),
+    (httpx.ReadTimeout("lento"), False),       # pudo haberse aplicado: duplicaría filas
+    (_api("500"), False),
+    (_api("40001"), False),
+])
+@pytest.mark.parametrize("operacion", ["insert", "actualizar"])
+def test_insert_y_condicionales_solo_se_reintentan_si_no_llegaron(esperas, error, reintenta, operacion):
+    cliente = ClienteFalso({operacion: [error]})
+    informe = _enviar(cliente, operacion, [{"id": 1, "_version": "v"}])
+
+    assert informe.lotes[0].ok is reintenta
+    assert len(cliente.requests) == (2 if reintenta else 1)
+
+
+def test_condicional_informa_rechazados():
+    cliente = ClienteFalso(aplicados={1, 3})
+    informe = _enviar(cliente, "borrar", [{"id": i, "_version": "v"} for i in (1, 2, 3, 4)])
+
+    assert informe.rechazados == [2, 4] and informe.filas_ok == 2
+    assert "2 en conflicto" in informe.resumen()
+
+
+def test_delete_manda_ids():
+    cliente = ClienteFalso()
+    _enviar(cliente, "delete", [5, 6])
+    assert cliente.requests == [("delete", [5, 6])]
+
+
+def test_lotes_acotados_por_filas_y_bytes():
+    registros = _registros(10)
+    assert [len(lote) for lote in lotes_acotados(registros, max_filas=4)] == [4, 4, 2]
+    # Un registro pesa ~30 bytes JSON: caben 2 por lote
+    assert [len(lote) for lote in lotes_acotados(registros, max_bytes=70)] == [2] * 5
+    # Un registro más grande que el tope va solo, no se pierde
+    assert [len(lote) for lote in lotes_acotados([{"x": "y" * 100}], max_bytes=10)] == [1]
+
+
+def test_contrapresion_limita_lotes_en_espera():
+    """Con todos los hilos ocupados, enviar() se bloquea al llegar a 2 lotes por hilo."""
+    liberar = threading.Event()
+    cliente = ClienteFalso()
+    responder = cliente.responder
+
+    def lento(operacion, lote):
+        liberar.wait(5)
+        return responder(operacion, lote)
+
+    cliente.responder = lento
+    encolados = []
+    ejecutor = EjecutorEscrituras(cliente, max_concurrencia=2)
+
+    def encolar():
+        for i in range(10):
+            ejecutor.enviar("upsert", [{"id": i}])
+            encolados.append(i)
+
+    hilo = threading.Thread(target=encolar)
+    hilo.start()
+    time.sleep(0.3)
+    # 2 hilos x 2 cupos: el quinto enviar() espera
+    assert len(encolados) == 4
+
+    liberar.set()
+    hilo.join(5)
+    informe = ejecutor.esperar()
+    assert len(encolados) == 10
+    assert len(informe.lotes) == 10 and not informe.fallidos
@@ -0,0 +1,93 @@
+"""Exportación en streaming (exportacion.py): el archivo se lee de vuelta con las mismas columnas y valores.
+
+Columnas de texto de pandas 3 (dtype str), categorías, fechas vacías y
+trozos de distinto largo, en CSV, CSV gzip y Parquet.
+"""
+import gzip
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from benchmarks.sintetico import generar_prefacturas
+from esquema import COLUMNAS_FECHAS
+from etapas import COLUMNAS_ETAPA
+from exportacion import exportar, trozos_dataframe
+from tablero import preparar_datos
+
+
+@pytest.fixture(scope="module")
+def df():
+    df = preparar_datos(generar_prefacturas(500))
+    # Un trozo entero sin sub_area ni pedido: el esquema no puede cambiar entre trozos
+    df.loc[df.index[:150], ["sub_area", "pedido"]] = np.nan
+    return df
+
+
+def _texto(df: pd.DataFrame) -> pd.DataFrame:
+    """Lo que se exporta, como texto comparable (vacío = None)."""
+    esperado = df.drop(columns=COLUMNAS_ETAPA)
+    for columna in COLUMNAS_FECHAS:
+        esperado[columna] = pd.to_datetime(esperado[columna]).dt.strftime("%Y-%m-%d")
+    esperado = esperado.astype({c: str for c in esperado.columns if c != "id"})
+    return esperado.astype(object).where(esperado.notna() & (esperado != "nan") & (esperado != ""), None)
+
+
+def _leer_csv(archivo, comprimido: bool = False) -> pd.DataFrame:
+    leido = pd.read_csv(gzip.GzipFile(fileobj=archivo, mode="rb") if comprimido else archivo, dtype=str, keep_default_na=False)
+    leido["id"] = leido["id"].astype("int64")
+    return leido.astype(object).where(leido != "", None)
+
+
+@pytest.mark.parametrize("formato", ["CSV", "CSV comprimido (gzip)"])
+def test_csv_ida_y_vuelta(df, formato):
+    leido = _leer_csv(exportar(trozos_dataframe(df, 150), formato), comprimido="gzip" in formato)
+    pd.testing.assert_frame_equal(leido, _texto(df).reset_index(drop=True), check_dtype=False)
+
+
+def test_parquet_esquema_y_valores(df):
+    archivo = exportar(trozos_dataframe(df, 150), "Parquet")
+    tabla = pq.read_table(archivo)
+
+    tipos = {campo.name: str(campo.type) for campo in tabla.schema}
+    assert tipos["id"] == "int64"
+    assert {tipos[c] for c in COLUMNAS_FECHAS} == {"date32[day]"}
+    assert {t for c, t in tipos.items() if c != "id" and c not in COLUMNAS_FECHAS} == {"string"}
+    assert list(tipos) == [c for c in df.columns if c not in COLUMNAS_ETAPA]
+    assert pq.ParquetFile(archivo).num_row_groups == 4
+
+    leido = tabla.to_pandas()
+    for columna in COLUMNAS_FECHAS:
+        leido[columna] = pd.to_datetime(leido[columna]).dt.strftime("%Y-%m-%d")
+    leido = leido.astype(object).where(leido.notna(), None)
+    pd.testing.assert_frame_equal(leido, _texto(df).reset_index(drop=True), check_dtype=False)
+
+
+def test_columnas_str_de_pandas_3_y_categorias():
+    df = pd.DataFrame({
+        "id": [1, 2, 3],
+        "sector": pd.Categorical(["NORTE", "", "SUR"]),
+        "pedido": pd.array(["PED-1", None, "PED-3"], dtype="str"),
+        "fecha_elaboracion": pd.to_datetime(["2024-01-02", None, "2024-03-04"]),
+    })
+    assert str(df["pedido"].dtype) == "str"
+
+    leido = pq.read_table(exportar(trozos_dataframe(df), "Parquet")).to_pandas()
+    assert leido["sector"].tolist() == ["NORTE", "", "SUR"]
+    assert leido["pedido"].isna().tolist() == [False, True, False]
+    assert leido["fecha_elaboracion"].astype(str).tolist()[::2] == ["2024-01-02", "2024-03-04"]
+
+    csv = _leer_csv(exportar(trozos_dataframe(df), "CSV"))
+    assert csv["pedido"].tolist() == ["PED-1", None, "PED-3"]
+
+
+@pytest.mark.parametrize("formato", ["CSV", "Parquet"])
+def test_sin_filas_sale_con_encabezado(df, formato):
+    archivo = exportar(trozos_dataframe(df.iloc[:0]), formato)
+    columnas = [c for c in df.columns if c not in COLUMNAS_ETAPA]
+    if formato == "Parquet":
+        tabla = pq.read_table(archivo)
+        assert tabla.num_rows == 0 and tabla.column_names == columnas
+    else:
+        assert archivo.read().decode("utf-8").strip() == ",".join(columnas)
@@ -0,0 +1,221 @@
+"""Guardado condicional (sql/006_guardado_condicional.sql, guardado.py, conflictos.py) sobre cliente_local.ClienteLocal.
+
+Primero las RPC actualizar_prefacturas/borrar_prefacturas solas; después el
+guardado completo: cada prueba arma el editor como app.py (snapshot
+preparado -> pagina_editor), otro "usuario" escribe directo en la base
+entre la carga y el guardado, y se guardan las diferencias del editor.
+"""
+import pandas as pd
+import pytest
+
+from benchmarks.sintetico import generar_prefacturas
+from cliente_local import ClienteLocal
+from conflictos import BORRAR, COLUMNAS_CONFLICTO, guardar_resolviendo, resolver
+from esquema import COLUMNA_MODIFICACION, COLUMNAS_CARGA, TABLA
+from guardado import aplicar_diferencias, calcular_diferencias
+from tablero import pagina_editor, preparar_datos
+
+
+@pytest.fixture
+def cliente():
+    return ClienteLocal(generar_prefacturas(200))
+
+
+@pytest.fixture
+def editor(cliente):
+    """DataFrame del editor tal como se cargó (con updated_at: el guardado va condicionado)."""
+    filas = cliente.table(TABLA).select(",".join(COLUMNAS_CARGA + [COLUMNA_MODIFICACION])).order("id").execute().data
+    return pagina_editor(preparar_datos(pd.DataFrame(filas)))
+
+
+def _editar(editor: pd.DataFrame, cambios: dict) -> pd.DataFrame:
+    """Copia del editor con {id: {columna: valor}} aplicados (lo que devuelve st.data_editor)."""
+    editado = editor.copy()
+    for id_, valores in cambios.items():
+        for columna, valor in valores.items():
+            editado.loc[editado["id"] == id_, columna] = valor
+    return editado
+
+
+def _otro_usuario(cliente, id_: int, valores: dict):
+    cliente.table(TABLA).update(valores).eq("id", id_).execute()
+
+
+def _fila(cliente, id_: int) -> dict:
+    filas = cliente.table(TABLA).select("*").eq("id", id_).execute().data
+    return filas[0] if filas else None
+
+
+def _actualizar(cliente, filas: list) -> list:
+    return cliente.rpc("actualizar_prefacturas", {"p_filas": filas}).execute().data
+
+
+def _borrar(cliente, filas: list) -> list:
+    return cliente.rpc("borrar_prefacturas", {"p_filas": filas}).execute().data
+
+
+def test_rpc_actualiza_solo_con_la_version_cargada(cliente):
+    fila = _fila(cliente, 3)
+    aplicadas = _actualizar(cliente, [{"id": 3, "_version": fila[COLUMNA_MODIFICACION], "pedido": "NUEVO"}])
+
+    actual = _fila(cliente, 3)
+    assert aplicadas == [{"id": 3, COLUMNA_MODIFICACION: actual[COLUMNA_MODIFICACION]}]
+    assert pd.Timestamp(actual[COLUMNA_MODIFICACION]) > pd.Timestamp(fila[COLUMNA_MODIFICACION])
+    # Solo cambian las columnas enviadas
+    assert actual["pedido"] == "NUEVO"
+    assert {k: v for k, v in actual.items() if k not in ("pedido", COLUMNA_MODIFICACION)} == {
+        k: v for k, v in fila.items() if k not in ("pedido", COLUMNA_MODIFICACION)
+    }
+
+    # La misma versión ya no es la vigente: no se aplica
+    assert _actualizar(cliente, [{"id": 3, "_version": fila[COLUMNA_MODIFICACION], "pedido": "OTRO"}]) == []
+    assert _fila(cliente, 3)["pedido"] == "NUEVO"
+
+
+def test_rpc_version_en_otro_formato_es_la_misma(cliente):
+    """La versión se compara como instante, no como texto."""
+    version = pd.Timestamp(_fila(cliente, 4)[COLUMNA_MODIFICACION]).tz_convert("America/Managua").isoformat()
+    assert [f["id"] for f in _actualizar(cliente, [{"id": 4, "_version": version, "pedido": "X"}])] == [4]
+
+
+def test_rpc_lote_mixto_aplica_solo_las_vigentes(cliente):
+    versiones = {i: _fila(cliente, i)[COLUMNA_MODIFICACION] for i in (5, 6, 7)}
+    _otro_usuario(cliente, 6, {"area": "PSSEN"})
+    filas = [{"id": i, "_version": v, "pedido": f"P{i}"} for i, v in versiones.items()]
+    filas += [{"id": 9999, "_version": versiones[5], "pedido": "NO EXISTE"}, {"id": 8, "_version": None, "pedido": "X"}]
+
+    assert sorted(f["id"] for f in _actualizar(cliente, filas)) == [5, 7]
+    assert [_fila(cliente, i)["pedido"] for i in (5, 7)] == ["P5", "P7"]
+    assert _fila(cliente, 6)["pedido"] != "P6" and _fila(cliente, 8)["pedido"] != "X"
+
+
+def test_rpc_borra_solo_con_la_version_cargada(cliente):
+    versiones = {i: _fila(cliente, i)[COLUMNA_MODIFICACION] for i in (10, 11)}
+    _otro_usuario(cliente, 11, {"pedido": "DE OTRO"})
+
+    borradas = _borrar(cliente, [{"id": i, "_version": v} for i, v in versiones.items()])
+
+    assert borradas == [{"id": 10}]
+    assert _fila(cliente, 10) is None and _fila(cliente, 11) is not None
+
+
+def test_informe_marca_rechazadas(cliente, editor):
+    """aplicar_diferencias: las filas con versión vieja quedan en informe.rechazados, sin fallar."""
+    editado = _editar(editor, {20: {"pedido": "A"}, 21: {"pedido": "B"}})
+    editado = editado[editado["id"] != 22]
+    _otro_usuario(cliente, 21, {"area": "PNESER"})
+    _otro_usuario(cliente, 22, {"area": "PNESER"})
+
+    informe = aplicar_diferencias(cliente, calcular_diferencias(editor, editado))
+
+    assert not informe.fallidos and informe.rechazados == [21, 22]
+    assert _fila(cliente, 20)["pedido"] == "A" and _fila(cliente, 21)["pedido"] != "B"
+    assert _fila(cliente, 22) is not None
+
+
+def test_sin_otros_usuarios_se_guarda_en_una_ronda(cliente, editor):
+    editado = _editar(editor, {3: {"pedido": "PED-A"}, 4: {"area": "PSSEN", "pedido": "PED-B"}})
+    resultado = guardar_resolviendo(cliente, calcular_diferencias(editor, editado))
+
+    assert len(resultado.informes) == 1 and not resultado.fallidos
+    assert resultado.conflictos.empty and resultado.borradas == []
+    assert _fila(cliente, 3)["pedido"] == "PED-A"
+    assert (_fila(cliente, 4)["area"], _fila(cliente, 4)["pedido"]) == ("PSSEN", "PED-B")
+
+
+def test_otra_columna_cambiada_se_reaplica_sola(cliente, editor):
+    """El otro usuario tocó otra columna: la fila se rechaza, se relee y se reaplica con la versión nueva."""
+    editado = _editar(editor, {5: {"pedido": "MIO"}, 6: {"pedido": "LIBRE"}})
+    _otro_usuario(cliente, 5, {"area": "PNESER"})
+
+    resultado = guardar_resolviendo(cliente, calcular_diferencias(editor, editado))
+
+    assert len(resultado.informes) == 2
+    assert resultado.informes[0].rechazados == [5]
+    assert resultado.conflictos.empty and resultado.borradas == []
+    assert (_fila(cliente, 5)["pedido"], _fila(cliente, 5)["area"]) == ("MIO", "PNESER")
+    assert _fila(cliente, 6)["pedido"] == "LIBRE"
+
+
+def test_mismo_valor_que_el_otro_usuario_no_es_conflicto(cliente, editor):
+    editado = _editar(editor, {7: {"pedido": "IGUAL"}})
+    _otro_usuario(cliente, 7, {"pedido": "IGUAL"})
+
+    resultado = guardar_resolviendo(cliente, calcular_diferencias(editor, editado))
+
+    assert resultado.conflictos.empty and resultado.borradas == []
+    assert resultado.informes[0].rechazados == [7] and len(resultado.informes) == 1
+
+
+def test_misma_celda_queda_en_conflicto_y_se_resuelve(cliente, editor):
+    """Ambos cambiaron pedido: nada se pisa; la fila va entera a resolución y "mía" gana al resolver."""
+    cargado = editor.loc[editor["id"] == 8, "pedido"].iloc[0]
+    editado = _editar(editor, {8: {"pedido": "MIO", "area": "PSSEN"}})
+    _otro_usuario(cliente, 8, {"pedido": "DE OTRO"})
+    version = _fila(cliente, 8)[COLUMNA_MODIFICACION]
+
+    resultado = guardar_resolviendo(cliente, calcular_diferencias(editor, editado))
+
+    assert _fila(cliente, 8)["pedido"] == "DE OTRO"
+    conflictos = resultado.conflictos.set_index("columna")
+    assert list(resultado.conflictos.columns) == COLUMNAS_CONFLICTO
+    assert conflictos.loc["pedido", ["cargado", "actual", "mio", "usar"]].tolist() == [
+        "" if pd.isna(cargado) else cargado, "DE OTRO", "MIO", "base",
+    ]
+    # La celda que el otro no tocó también se muestra, ya marcada "mía"
+    assert conflictos.loc["area", "usar"] == "mía"
+    assert set(resultado.conflictos["version"]) == {version}
+
+    eleccion = resultado.conflictos.assign(usar="mía")
+    final = guardar_resolviendo(cliente, resolver(eleccion))
+    assert final.conflictos.empty and not final.fallidos
+    assert (_fila(cliente, 8)["pedido"], _fila(cliente, 8)["area"]) == ("MIO", "PSSEN")
+
+
+def test_resolucion_vieja_vuelve_a_chocar(cliente, editor):
+    """Si la fila cambia otra vez mientras se elige, la resolución tampoco pisa nada."""
+    editado = _editar(editor, {9: {"pedido": "MIO"}})
+    _otro_usuario(cliente, 9, {"pedido": "DE OTRO"})
+    resultado = guardar_resolviendo(cliente, calcular_diferencias(editor, editado))
+    _otro_usuario(cliente, 9, {"pedido": "TERCERO"})
+
+    final = guardar_resolviendo(cliente, resolver(resultado.conflictos.assign(usar="mía")))
+
+    assert _fila(cliente, 9)["pedido"] == "TERCERO"
+    assert final.conflictos.set_index("columna").loc["pedido", "actual"] == "TERCERO"
+
+
+def test_fila_editada_que_otro_borro(cliente, editor):
+    editado = _editar(editor, {10: {"pedido": "MIO"}, 11: {"pedido": "OK"}})
+    cliente.table(TABLA).delete().eq("id", 10).execute()
+
+    resultado = guardar_resolviendo(cliente, calcular_diferencias(editor, editado))
+
+    assert resultado.borradas == [10] and resultado.conflictos.empty
+    assert _fila(cliente, 10) is None
+    assert _fila(cliente, 11)["pedido"] == "OK"
+
+
+def test_borrado_de_fila_modificada_por_otro(cliente, editor):
+    """Borrar una fila que otro cambió queda para resolver; no se borra sola."""
+    editado = editor[editor["id"] != 12]
+    _otro_usuario(cliente, 12, {"pedido": "DE OTRO"})
+
+    resultado = guardar_resolviendo(cliente, calcular_diferencias(editor, editado))
+
+    assert _fila(cliente, 12) is not None
+    assert resultado.conflictos[["id", "columna"]].values.tolist() == [[12, BORRAR]]
+
+    guardar_resolviendo(cliente, resolver(resultado.conflictos.assign(usar="mía")))
+    assert _fila(cliente, 12) is None
+
+
+def test_sin_condicional_se_pisa(cliente, editor):
+    """condicional=False (GUARDADO_CONDICIONAL) es el upsert de antes: gana el último."""
+    editado = _editar(editor, {13: {"pedido": "MIO"}})
+    _otro_usuario(cliente, 13, {"pedido": "DE OTRO"})
+
+    resultado = guardar_resolviendo(cliente, calcular_diferencias(editor, editado), condicional=False)
+
+    assert resultado.conflictos.empty
+    assert _fila(cliente, 13)["pedido"] == "MIO"
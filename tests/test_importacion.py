@@ -0,0 +1,120 @@
+"""Importación masiva (importacion.importar) de CSV contra cliente_local.ClienteLocal.
+
+Filas rechazadas (catálogo, fechas), encabezados raros o repetidos, columnas
+de texto de pandas 3 y una importación limpia que llega igual a la base.
+"""
+import io
+
+import pandas as pd
+import pytest
+
+from cliente_local import ClienteLocal
+from esquema import TABLA
+from importacion import _vacios, fechas_importadas, importar, validar_trozo
+from normalizacion import normalizar_datos
+
+ENCABEZADO = "Sector;Subsector;Periodo;Área;Pedido;Fecha Elaboración;fecha_conciliacion"
+
+
+@pytest.fixture
+def cliente():
+    return ClienteLocal(pd.DataFrame({"id": pd.Series([], dtype="int64")}))
+
+
+def _csv(*lineas, encabezado: str = ENCABEZADO) -> io.BytesIO:
+    return io.BytesIO("\n".join([encabezado, *lineas]).encode("utf-8-sig"))
+
+
+def _tabla(cliente) -> pd.DataFrame:
+    return pd.DataFrame(cliente.table(TABLA).select("*").order("id").execute().data)
+
+
+def test_importacion_limpia_llega_igual(cliente):
+    archivo = _csv(
+        "managua ;MANAGUA DN;enero 1q;PSSEN;PED-1;2024-01-05;15/01/2024",
+        "NORTE;NORTE;FEBRERO 2Q;CAMPAÑA;;05/02/2024;",
+        ";;;;;;",
+    )
+    resultado = importar(cliente, archivo, "prefacturas.csv", tam_trozo=2, tam_lote=1)
+
+    assert (resultado.filas_leidas, resultado.filas_insertadas, resultado.filas_vacias) == (3, 2, 1)
+    assert resultado.errores == [] and resultado.columnas_ignoradas == []
+    assert len(resultado.informe.lotes) == 2 and not resultado.informe.fallidos
+    tabla = _tabla(cliente)
+    tabla = tabla.astype(object).where(tabla.notna(), None)
+    assert tabla[["sector", "subsector", "periodo", "area", "pedido"]].to_numpy().tolist() == [
+        ["MANAGUA", "MANAGUA DN", "ENERO 1Q", "PSSEN", "PED-1"],
+        ["NORTE", "NORTE", "FEBRERO 2Q", "CAMPAÑA", None],
+    ]
+    assert tabla["fecha_elaboracion"].tolist() == ["2024-01-05", "2024-02-05"]
+    assert tabla["fecha_conciliacion"].tolist() == ["2024-01-15", None]
+
+
+def test_filas_con_errores_no_se_insertan(cliente):
+    archivo = _csv(
+        "MANAGUA;MANAGUA DN;ENERO 1Q;PSSEN;OK;2024-01-05;",
+        "MARTE;MANAGUA DN;ENERO 1Q;PSSEN;MAL-SECTOR;2024-01-05;",
+        "MANAGUA;MANAGUA DN;TRECEAVO;PSSEN;MAL-PERIODO;2024-01-05;",
+        "MANAGUA;MANAGUA DN;ENERO 1Q;PSSEN;MAL-FECHAS;31/02/2024;ayer",
+        "MANAGUA;MANAGUA DN;ENERO 1Q;PSSEN;FECHA-AMBIGUA;01/02/2024;",
+    )
+    resultado = importar(cliente, archivo, "p.csv")
+
+    errores = resultado.errores_dataframe()
+    assert errores[["fila", "columna", "motivo"]].to_numpy().tolist() == [
+        [3, "sector", "fuera de catálogo"],
+        [4, "periodo", "fuera de catálogo"],
+        [5, "fecha_elaboracion", "fecha no reconocida"],
+        [5, "fecha_conciliacion", "fecha no reconocida"],
+    ]
+    assert errores["valor"].tolist() == ["MARTE", "TRECEAVO", "31/02/2024", "ayer"]
+    assert resultado.filas_rechazadas == 3 and resultado.filas_insertadas == 2
+    tabla = _tabla(cliente)
+    assert tabla["pedido"].tolist() == ["OK", "FECHA-AMBIGUA"]
+    # dd/mm/aaaa: 01/02 es 1 de febrero
+    assert tabla["fecha_elaboracion"].tolist() == ["2024-01-05", "2024-02-01"]
+
+
+def test_columnas_desconocidas_repetidas_e_id_se_ignoran(cliente):
+    """Un id del archivo no pisa filas (siempre se crean nuevas); un encabezado repetido usa el primero."""
+    ClienteLocal.__init__(cliente, pd.DataFrame([{"id": 1, "sector": "NORTE", "pedido": "EXISTENTE"}]))
+    archivo = _csv("1;MANAGUA;SUR;X;NUEVO", encabezado="id;Sector;sector;Comentario;pedido")
+
+    resultado = importar(cliente, archivo, "p.csv")
+
+    assert set(resultado.columnas_ignoradas) == {"id", "sector", "Comentario"}
+    tabla = _tabla(cliente)
+    assert tabla["pedido"].tolist() == ["EXISTENTE", "NUEVO"]
+    assert tabla["sector"].tolist() == ["NORTE", "MANAGUA"]
+    assert tabla["id"].nunique() == 2
+
+
+def test_separador_coma_y_columnas_faltantes(cliente):
+    archivo = _csv("NORTE,PED-9", encabezado="SECTOR,Pedido")
+    resultado = importar(cliente, archivo, "p.csv")
+    assert resultado.filas_insertadas == 1
+    assert _tabla(cliente)[["sector", "pedido"]].to_numpy().tolist() == [["NORTE", "PED-9"]]
+
+
+def test_validar_trozo_con_columnas_str_de_pandas_3():
+    """Columnas de texto (dtype str, con faltantes NaN) como las que da read_csv en pandas 3."""
+    crudo = pd.DataFrame({
+        "sector": pd.array(["MANAGUA", None, "MARTE", "  "], dtype="str"),
+        "fecha_elaboracion": pd.array(["2024-01-05", None, "nunca", "nan"], dtype="str"),
+    })
+    assert str(crudo["sector"].dtype) == "str"
+    normalizado = normalizar_datos(crudo.assign(fecha_elaboracion=fechas_importadas(crudo["fecha_elaboracion"])))
+
+    validas, errores = validar_trozo(crudo, normalizado, primera_fila=2)
+
+    assert validas.tolist() == [True, True, False, True]
+    assert [(e["fila"], e["columna"], e["valor"]) for e in errores] == [
+        (4, "sector", "MARTE"), (4, "fecha_elaboracion", "nunca"),
+    ]
+    assert _vacios(crudo).all(axis=1).tolist() == [False, True, False, True]
+
+
+def test_fechas_importadas():
+    fechas = fechas_importadas(pd.Series(["2024-03-04", "04/03/2024", " 4/3/2024 ", "2024-13-01", None], dtype=object))
+    assert fechas.dt.strftime("%Y-%m-%d").tolist()[:3] == ["2024-03-04"] * 3
+    assert fechas.iloc[3:].isna().all()
@@ -0,0 +1,132 @@
+"""Tiempos por rerun (instrumentacion.py): tramos, llamadas medidas y bytes tomados de la respuesta HTTP."""
+import threading
+
+import httpx
+import pytest
+
+from benchmarks.sintetico import generar_prefacturas
+from cliente_local import ClienteLocal
+from escritura import EjecutorEscrituras
+from esquema import TABLA
+from instrumentacion import (
+    ClienteMedido, Medidor, _anotar_respuesta, activar, bytes_respuesta, medidor_activo, numero_respuesta, tramo,
+)
+
+
+@pytest.fixture
+def medidor():
+    medidor = Medidor()
+    activar(medidor)
+    yield medidor
+    activar(None)
+
+
+def _http(cuerpo: bytes, largo: bool = True) -> httpx.Response:
+    cabeceras = {"content-length": str(len(cuerpo))} if largo else {}
+    return httpx.Response(200, headers=cabeceras, content=cuerpo)
+
+
+class Respuesta:
+    """Respuesta de postgrest (sin atributo bytes, como la real)."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class ClienteHttp:
+    """Cliente cuyo execute() pasa (o no) por el hook de httpx, como postgrest con escuchar_respuestas."""
+
+    def __init__(self):
+        self.cuerpos = []
+
+    def table(self, nombre):
+        return self
+
+    def select(self, *columnas):
+        return self
+
+    def execute(self):
+        cuerpo = self.cuerpos.pop(0)
+        if cuerpo is not None:
+            _anotar_respuesta(_http(cuerpo))
+        return Respuesta([{"id": 1}])
+
+
+def test_bytes_de_la_respuesta_de_este_request():
+    numero = numero_respuesta()
+    _anotar_respuesta(_http(b'[{"id": 1}]'))
+    assert bytes_respuesta(Respuesta([]), numero) == 11
+
+    # Sin content-length se cuenta el cuerpo
+    numero = numero_respuesta()
+    _anotar_respuesta(_http(b"[]", largo=False))
+    assert bytes_respuesta(Respuesta([]), numero) == 2
+
+
+def test_sin_respuesta_nueva_no_se_reporta_la_anterior():
+    """El valor del hilo es de otro request si el hook no anotó nada desde la entrada."""
+    _anotar_respuesta(_http(b"x" * 500))
+    numero = numero_respuesta()
+    assert bytes_respuesta(Respuesta([]), numero) == 0
+
+
+def test_respuesta_con_bytes_propios():
+    """ClienteLocal trae el tamaño en la respuesta: no se mira el hilo."""
+    respuesta = ClienteLocal(generar_prefacturas(5)).table(TABLA).select("id").execute()
+    assert bytes_respuesta(respuesta, numero_respuesta()) == respuesta.bytes > 0
+
+
+def test_cliente_medido_registra_cada_llamada(medidor):
+    cliente = ClienteHttp()
+    cliente.cuerpos = [b"x" * 120, None, b"y" * 7]
+    medido = ClienteMedido(cliente)
+    for _ in range(3):
+        medido.table("prefacturas").select("id").execute()
+
+    assert [l.bytes for l in medidor.llamadas] == [120, 0, 7]
+    assert [(l.recurso, l.operacion, l.filas) for l in medidor.llamadas] == [("prefacturas", "select", 1)] * 3
+
+
+def test_hook_de_otro_hilo_no_cuenta():
+    numero = numero_respuesta()
+    hilo = threading.Thread(target=_anotar_respuesta, args=(_http(b"z" * 50),))
+    hilo.start()
+    hilo.join()
+    assert numero_respuesta() == numero
+    assert bytes_respuesta(Respuesta([]), numero) == 0
+
+
+def test_sin_medidor_no_registra():
+    assert medidor_activo() is None
+    cliente = ClienteLocal(generar_prefacturas(5))
+    assert len(ClienteMedido(cliente).table(TABLA).select("id").execute().data) == 5
+    with tramo("nada"):
+        pass
+
+
+def test_tramos_y_fila(medidor):
+    medidor.marcar("carga")
+    with tramo("busqueda"):
+        pass
+    with tramo("busqueda"):
+        pass
+    medidor.marcar("tabla")
+    medidor.terminar()
+
+    assert set(medidor.tramos) == {"carga", "busqueda", "tabla", "total"}
+    fila = medidor.fila()
+    assert {"carga ms", "busqueda ms", "tabla ms", "total ms"} <= set(fila)
+    assert fila["requests"] == 0
+
+
+def test_llamadas_de_los_hilos_de_escritura(medidor):
+    """El pool de escritura copia el contexto: sus requests cuentan en el medidor del rerun."""
+    cliente = ClienteMedido(ClienteLocal(generar_prefacturas(20)))
+    with EjecutorEscrituras(cliente, max_concurrencia=2) as ejecutor:
+        for i in range(1, 7):
+            ejecutor.enviar("upsert", [{"id": i, "pedido": f"P{i}"}])
+        ejecutor.enviar("delete", [19, 20])
+
+    operaciones = sorted(l.operacion for l in medidor.llamadas)
+    assert operaciones == ["delete"] + ["upsert"] * 6
+    assert len(medidor.llamadas_dataframe()) == 7
@@ -0,0 +1,66 @@
+"""Normalización (normalizacion.py): catálogos con valores desconocidos y fechas vacías."""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from esquema import SECTORES
+from normalizacion import categoria_catalogo, fechas_en_dias, normalizar_datos
+
+CATALOGO = ["NORTE", "SUR"]
+
+
+@pytest.mark.parametrize("dtype", [object, "str", "category"])
+def test_categoria_catalogo_limpia_y_conserva_desconocidos(dtype):
+    s = pd.Series([" sur", "norte ", "marte", "MARTE ", None, "", "  ", "Luna"], dtype=dtype, index=range(10, 18),
+                  name="sector")
+    resultado = categoria_catalogo(s, CATALOGO)
+
+    # "" primero, después el catálogo en su orden y los desconocidos (ordenados, sin repetir)
+    assert resultado.cat.categories.tolist() == ["", "NORTE", "SUR", "LUNA", "MARTE"]
+    assert resultado.astype(str).tolist() == ["SUR", "NORTE", "MARTE", "MARTE", "", "", "", "LUNA"]
+    assert resultado.index.equals(s.index) and resultado.name == "sector"
+
+
+def test_categoria_catalogo_sin_valores():
+    assert categoria_catalogo(pd.Series([None, None], dtype=object), CATALOGO).tolist() == ["", ""]
+    vacia = categoria_catalogo(pd.Series([], dtype=object), CATALOGO)
+    assert vacia.empty and vacia.cat.categories.tolist() == [""] + CATALOGO
+
+
+def test_categoria_catalogo_de_una_categorica_con_categorias_sin_uso():
+    s = pd.Series(pd.Categorical(["sur"], categories=["sur", "otro", "norte"]))
+    assert categoria_catalogo(s, CATALOGO).cat.categories.tolist() == ["", "NORTE", "SUR", "OTRO"]
+
+
+def test_fechas_en_dias_con_nulos():
+    fechas = pd.Series([None, "2024-01-02", np.nan, pd.NaT, "", "no es fecha", date(2024, 3, 1),
+                        "2024-01-02 23:59", pd.Timestamp("2024-05-01 10:00")], dtype=object)
+    dias = fechas_en_dias(fechas)
+
+    assert dias.dtype == np.dtype("datetime64[D]")
+    assert np.isnat(dias[[0, 2, 3, 4, 5]]).all()
+    assert dias[[1, 6, 7, 8]].astype(str).tolist() == ["2024-01-02", "2024-03-01", "2024-01-02", "2024-05-01"]
+
+
+@pytest.mark.parametrize("fechas", [
+    pd.Series([None, None], dtype=object),
+    pd.Series([], dtype=object),
+    pd.Series([pd.NaT, pd.NaT]),
+    pd.Series(pd.to_datetime([None, "2024-02-03"])),
+], ids=["todas_nulas", "vacia", "nat", "datetime64"])
+def test_fechas_en_dias_columnas_enteras(fechas):
+    dias = fechas_en_dias(fechas)
+    assert len(dias) == len(fechas) and dias.dtype == np.dtype("datetime64[D]")
+    assert np.isnat(dias).tolist() == fechas.isna().tolist()
+
+
+def test_normalizar_datos_no_toca_la_entrada():
+    crudo = pd.DataFrame({"Sector": [" managua", None], "fecha_elaboracion": ["2024-01-02", None]})
+    copia = crudo.copy()
+    df = normalizar_datos(crudo)
+
+    pd.testing.assert_frame_equal(crudo, copia)
+    assert df["sector"].tolist() == ["MANAGUA", ""] and list(df["sector"].cat.categories[1:]) == SECTORES
+    assert df["fecha_elaboracion"].tolist()[0] == date(2024, 1, 2) and pd.isna(df["fecha_elaboracion"].iloc[1])
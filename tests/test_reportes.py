@@ -0,0 +1,65 @@
+"""Reportes fuera de la app (reportes.py): que salgan y cuenten lo mismo que el tablero."""
+import os
+
+import pandas as pd
+import pytest
+
+from archivo import archivar, leer_resumen, periodos_archivables
+from benchmarks.sintetico import generar_prefacturas
+from cliente_local import ClienteLocal
+from esquema import TABLA
+from reportes import Reporte, conteo_reporte, generar_reportes, reportes_del_snapshot
+from tablero import kpis_etapas, preparar_datos
+
+
+@pytest.fixture(scope="module")
+def df():
+    return preparar_datos(generar_prefacturas(400))
+
+
+def test_reportes_html_e_indice(df, tmp_path):
+    resultados = generar_reportes(df, str(tmp_path), ("html",), procesos=1)
+
+    reportes = reportes_del_snapshot(df)
+    assert [r["reporte"] for r in resultados] == [r.titulo for r in reportes]
+    todos = resultados[0]
+    assert todos["reporte"] == "Todos" and todos["total"] == len(df)
+    por_sector = [r for r, rep in zip(resultados, reportes) if rep.sector != "Todos" and rep.subsector is None]
+    assert sum(r["total"] for r in por_sector) == len(df)
+
+    pagina = (tmp_path / "todos.html").read_text(encoding="utf-8")
+    assert "Tablero de Control: Todos" in pagina and "vega" in pagina.lower()
+    indice = (tmp_path / "index.html").read_text(encoding="utf-8")
+    assert all(os.path.basename(a) in indice for r in resultados for a in r["archivos"])
+
+
+def test_reportes_en_procesos(df, tmp_path):
+    """El pool (spawn) lee el snapshot del archivo Arrow y da los mismos KPIs que en este proceso."""
+    en_pool = generar_reportes(df, str(tmp_path / "pool"), ("html",), procesos=2, subsectores=False)
+    local = generar_reportes(df, str(tmp_path / "local"), ("html",), procesos=1, subsectores=False)
+    assert [r["kpis"] for r in en_pool] == [r["kpis"] for r in local]
+
+
+def test_reporte_xlsx(df, tmp_path):
+    pytest.importorskip("openpyxl")
+    [resultado] = [
+        r for r in generar_reportes(df, str(tmp_path), ("xlsx",), procesos=1, subsectores=False)
+        if r["reporte"] == "Todos"
+    ]
+    kpis = pd.read_excel(tmp_path / "todos.xlsx", sheet_name="KPIs")
+    assert kpis["Cantidad"].tolist() == resultado["kpis"]
+    distribucion = pd.read_excel(tmp_path / "todos.xlsx", sheet_name="Distribución")
+    assert distribucion["Total"].sum() == len(df)
+
+
+def test_conteo_con_lo_archivado():
+    """Con el resumen archivado los totales son los de antes de archivar."""
+    cliente = ClienteLocal(generar_prefacturas(400))
+    antes = preparar_datos(pd.DataFrame(cliente.table(TABLA).select("*").execute().data))
+    archivar(cliente, periodos_archivables(antes).index[:5].tolist())
+    despues = preparar_datos(pd.DataFrame(cliente.table(TABLA).select("*").execute().data))
+    assert len(despues) < len(antes)
+
+    for reporte in [Reporte("todos"), Reporte("sector NORTE", sector="NORTE")]:
+        con_archivo = kpis_etapas(conteo_reporte(despues, reporte, leer_resumen(cliente)))
+        assert con_archivo == kpis_etapas(conteo_reporte(antes, reporte))
@@ -0,0 +1,99 @@
+"""Serialización vectorizada (serializacion.serializar_registros) contra el bucle celda por celda anterior.
+
+La referencia es la copia del guardado original que usa
+benchmarks/bench_serializacion.py. Las únicas diferencias a propósito:
+created_at/updated_at ya no se envían y un id vacío no va en el registro.
+"""
+import json
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.bench_serializacion import _preparar_registros_anterior
+from benchmarks.sintetico import generar_prefacturas
+from esquema import COLUMNAS_SISTEMA
+from serializacion import serializar_registros
+from tablero import preparar_datos
+
+
+def _referencia(df: pd.DataFrame) -> list:
+    registros = _preparar_registros_anterior(df.copy())
+    return [
+        {k: v for k, v in r.items() if (k not in COLUMNAS_SISTEMA or k == "id") and not (k == "id" and v is None)}
+        for r in registros
+    ]
+
+
+def _con_casos_borde(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["sub_area"] = df["sub_area"].astype(object)
+    df.loc[df.index[:4], "sub_area"] = ["nan", "None", "<NA>", ""]
+    df.loc[df.index[4], "sub_area"] = np.nan
+    df["monto"] = np.linspace(0, 1, len(df))
+    df.loc[df.index[:3], "monto"] = [np.nan, np.inf, -np.inf]
+    df.loc[df.index[5], "fecha_elaboracion"] = "03/04/2024"   # dd/mm/aaaa
+    df.loc[df.index[6], "fecha_formato"] = pd.NaT
+    df["fecha_edicion_pedido"] = pd.to_datetime(df["fecha_edicion_pedido"], errors="coerce")
+    df.loc[df.index[7], "fecha_edicion_pedido"] = pd.Timestamp("2024-05-06 17:45")
+    return df
+
+
+@pytest.fixture(scope="module")
+def df():
+    return _con_casos_borde(preparar_datos(generar_prefacturas(400)))
+
+
+def test_igual_que_celda_por_celda(df):
+    assert serializar_registros(df) == _referencia(df)
+
+
+def test_tipos_listos_para_json(df):
+    registros = serializar_registros(df)
+    json.dumps(registros)
+    primero = registros[0]
+    # int8 (etapa_codigo), int64 (id) y bool salen como tipos de Python
+    assert type(primero["etapa_codigo"]) is int and type(primero["id"]) is int
+    assert type(primero["pedido_lleno"]) is bool
+    assert [r["sub_area"] for r in registros[:5]] == [None] * 5
+    assert [r["monto"] for r in registros[:3]] == [None] * 3
+    assert registros[5]["fecha_elaboracion"] == "2024-04-03"
+    assert registros[6]["fecha_formato"] is None
+    assert registros[7]["fecha_edicion_pedido"] == "2024-05-06"
+
+
+def test_categoricas_con_faltantes():
+    df = pd.DataFrame({
+        "id": [1, 2, 3],
+        "sector": pd.Categorical(["NORTE", None, ""], categories=["", "NORTE"]),
+        "etapa_codigo": np.array([0, 3, 1], dtype=np.int8),
+    })
+    assert serializar_registros(df) == _referencia(df) == [
+        {"id": 1, "sector": "NORTE", "etapa_codigo": 0},
+        {"id": 2, "sector": None, "etapa_codigo": 3},
+        {"id": 3, "sector": None, "etapa_codigo": 1},
+    ]
+
+
+def test_filas_nuevas_sin_id_y_columnas_vacias():
+    df = pd.DataFrame({
+        "id": [np.nan, np.nan],
+        "sector": ["SUR", None],
+        "pedido": [None, ""],
+        "fecha_elaboracion": [date(2024, 1, 2), None],
+        "created_at": ["2024-01-01", "2024-01-01"],
+    })
+    assert serializar_registros(df) == [
+        {"sector": "SUR", "pedido": None, "fecha_elaboracion": "2024-01-02"},
+        {"sector": None, "pedido": None, "fecha_elaboracion": None},
+    ]
+    assert serializar_registros(df, quitar_vacias=True) == [
+        {"sector": "SUR", "fecha_elaboracion": "2024-01-02"},
+        {"sector": None, "fecha_elaboracion": None},
+    ]
+
+
+def test_ids_flotantes_y_texto():
+    df = pd.DataFrame({"id": [1.0, "2", None], "pedido": ["A", "B", "C"]})
+    assert [r.get("id") for r in serializar_registros(df)] == [1, 2, None]
@@ -0,0 +1,197 @@
+"""Modo servidor contra modo local: mismos conteos y mismas filas.
+
+Las reglas de etapa viven dos veces: en pandas (etapas.codigos_etapa) y en
+el CASE de las vistas de sql/. Aquí el SQL de sql/002 y sql/003 se ejecuta
+tal cual en sqlite (solo se traducen btrim y los casts de Postgres) y los
+filtros de PostgREST que arma la app (filtro_vista, filtro_busqueda) pasan
+por cliente_local.ClienteLocal, el sustituto de Supabase de los benchmarks.
+
+Solo el camino sqlite prueba la lógica del servidor: la RPC conteo_etapas de
+ClienteLocal cuenta con pandas (agregacion.conteo_etapas_local), así que
+compararla con conteo_tablero no dice nada del SQL de sql/002.
+"""
+import re
+import sqlite3
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregacion import conteo_etapas_servidor
+from benchmarks.sintetico import generar_prefacturas
+from busqueda import FiltrosBusqueda, IndiceBusqueda, filtro_busqueda
+from cargador import cargar_pagina, contar_filas, filtro_vista
+from cliente_local import ClienteLocal
+from esquema import COLUMNAS_CARGA, TABLA
+from tablero import CODIGO_POR_ESTADO, conteo_tablero, filtrar_tablero, preparar_datos
+
+SQL = Path(__file__).resolve().parent.parent / "sql"
+
+FILAS = 1500
+
+ESTADOS = ["Ver Todo"] + list(CODIGO_POR_ESTADO)
+SECTORES = ["Todos", "MANAGUA", "NORTE", "SIN CATALOGO", ""]
+
+
+def _crudo() -> pd.DataFrame:
+    """Tabla sintética más los casos que separan las dos implementaciones (espacios, minúsculas, vacíos)."""
+    crudo = generar_prefacturas(FILAS)
+    crudo.loc[0:9, "sector"] = "  managua "
+    crudo.loc[10:14, "sector"] = None
+    crudo.loc[15:19, "sector"] = "Sin Catalogo"
+    crudo.loc[20:29, "pedido"] = "   "
+    crudo.loc[20:29, "fecha_conciliacion"] = "2024-03-01"
+    crudo.loc[20:29, "fecha_elaboracion"] = "2024-02-01"
+    crudo.loc[30:34, "subsector"] = ""
+    return crudo
+
+
+@pytest.fixture(scope="module")
+def crudo():
+    return _crudo()
+
+
+@pytest.fixture(scope="module")
+def cliente(crudo):
+    return ClienteLocal(crudo)
+
+
+@pytest.fixture(scope="module")
+def df(crudo):
+    return preparar_datos(crudo)
+
+
+def _a_sqlite(sql: str) -> str:
+    """Dialecto de Postgres usado en sql/ -> sqlite."""
+    sql = sql.replace("public.", "").replace("btrim(", "trim(")
+    return re.sub(r"::\w+", "", sql)
+
+
+def _bloque(archivo: str, patron: str) -> str:
+    texto = (SQL / archivo).read_text(encoding="utf-8")
+    return re.search(patron, texto, re.S).group(1)
+
+
+@pytest.fixture(scope="module")
+def base(crudo):
+    """sqlite con prefacturas_pedidos y las vistas de sql/002 y sql/003."""
+    conexion = sqlite3.connect(":memory:")
+    crudo.astype(object).where(crudo.notna(), None).to_sql(TABLA, conexion, index=False)
+    for archivo in ["002_conteo_etapas.sql", "003_prefacturas_vista.sql"]:
+        vista = _bloque(archivo, r"(create or replace view .*?\sfrom public\.prefacturas_pedidos(?: p)?);")
+        conexion.execute(_a_sqlite(vista).replace("create or replace view", "create view"))
+    yield conexion
+    conexion.close()
+
+
+class ClienteSqlite:
+    """Responde rpc("conteo_etapas") con la función de sql/002 ejecutada en sqlite."""
+
+    def __init__(self, base):
+        self.base = base
+
+    def rpc(self, funcion, params):
+        assert funcion == "conteo_etapas"
+        cuerpo = _a_sqlite(_bloque("002_conteo_etapas.sql", r"\$\$(.*?)\$\$"))
+        cuerpo = re.sub(r"\b(p_sector|p_etapa)\b", r":\1", cuerpo)
+        cursor = self.base.execute(cuerpo, params)
+        columnas = [c[0] for c in cursor.description]
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=[dict(zip(columnas, f)) for f in cursor]))
+
+
+def _ordenado(conteo: pd.DataFrame) -> pd.DataFrame:
+    conteo = conteo[["Categoria", "etapa_codigo", "Cantidad"]].astype(
+        {"Categoria": str, "etapa_codigo": "int64", "Cantidad": "int64"}
+    )
+    return conteo.sort_values(["Categoria", "etapa_codigo"], ignore_index=True)
+
+
+def test_case_de_etapa_igual_en_todo_sql():
+    """Las vistas e índices de sql/ repiten el mismo CASE de etapa (sin prefijo de tabla)."""
+    patron = re.compile(r"\(case\s+when (?:p\.)?fecha_elaboracion is null then 0.*?end\)", re.S)
+    casos = {
+        re.sub(r"\s+", " ", caso.replace("p.", ""))
+        for archivo in SQL.glob("*.sql")
+        for caso in patron.findall(archivo.read_text(encoding="utf-8"))
+    }
+    assert len(casos) == 1
+
+
+def test_etapa_y_sector_de_las_vistas(base, df):
+    """etapa_codigo y sector normalizado por fila: sql/002, sql/003 y etapas.codigos_etapa."""
+    esperado = pd.DataFrame({
+        "id": df["id"].to_numpy(dtype=np.int64),
+        "sector": df["sector"].astype(str).to_numpy(),
+        "etapa_codigo": df["etapa_codigo"].to_numpy(dtype=np.int64),
+    })
+    for consulta in [
+        "select id, sector, etapa_codigo from prefacturas_etapas order by id",
+        "select id, sector_norm as sector, etapa_codigo from prefacturas_vista order by id",
+    ]:
+        obtenido = pd.read_sql(consulta, base).astype({"id": "int64", "etapa_codigo": "int64", "sector": str})
+        pd.testing.assert_frame_equal(obtenido, esperado)
+
+
+@pytest.mark.parametrize("estado", ESTADOS)
+@pytest.mark.parametrize("sector", SECTORES)
+def test_conteo_etapas(base, cliente, df, sector, estado):
+    """KPIs/gráfico: conteo_tablero sobre el snapshot = RPC conteo_etapas de sql/002 (en sqlite).
+
+    La comparación con ClienteLocal solo asegura que el sustituto de los
+    benchmarks responde lo mismo que el servidor; no prueba el SQL.
+    """
+    etapa = CODIGO_POR_ESTADO.get(estado)
+    parametro = None if sector == "Todos" else sector
+    local = _ordenado(conteo_tablero(filtrar_tablero(df, sector, estado), sector))
+    servidor = _ordenado(conteo_etapas_servidor(ClienteSqlite(base), parametro, etapa))
+
+    pd.testing.assert_frame_equal(servidor, local)
+    pd.testing.assert_frame_equal(_ordenado(conteo_etapas_servidor(cliente, parametro, etapa)), servidor)
+
+
+FILTROS = [
+    FiltrosBusqueda(),
+    FiltrosBusqueda(texto="ped 12"),
+    FiltrosBusqueda(texto="sub"),
+    FiltrosBusqueda(texto="noexiste"),
+    FiltrosBusqueda(periodos=("ENERO 1Q", "JULIO 2Q")),
+    FiltrosBusqueda(areas=("CAMPAÑA",), subsectores=("MANAGUA DN",)),
+    FiltrosBusqueda(subsectores=("MANAGUA DS", "NORTE")),
+    FiltrosBusqueda(fecha_columna="fecha_conciliacion", fecha_desde=date(2024, 3, 1), fecha_hasta=date(2024, 6, 30)),
+    FiltrosBusqueda(fecha_columna="fecha_elaboracion", fecha_hasta=date(2024, 2, 1)),
+    FiltrosBusqueda(texto="sub 3", periodos=("MARZO 1Q",), fecha_columna="fecha_elaboracion",
+                    fecha_desde=date(2024, 5, 1)),
+]
+
+
+@pytest.mark.parametrize("filtros", FILTROS, ids=lambda f: f.clave())
+@pytest.mark.parametrize("sector,estado", [("Todos", "Ver Todo"), ("MANAGUA", "Ver Todo"),
+                                           ("Todos", "Pendientes de Pedido"), ("NORTE", "Pedidos Recibidos")])
+def test_filtros_servidor_igual_que_local(cliente, df, filtros, sector, estado):
+    """Tabla: filtros de PostgREST sobre prefacturas_vista = IndiceBusqueda + filtrar_tablero."""
+    local = filtrar_tablero(IndiceBusqueda(df).filtrar(filtros), sector, estado)
+
+    filtros_pagina = filtro_busqueda(filtros, base=filtro_vista(
+        sector=None if sector == "Todos" else sector,
+        etapa_codigo=CODIGO_POR_ESTADO.get(estado),
+    ))
+    pagina, total = cargar_pagina(cliente, 0, FILAS, columnas=COLUMNAS_CARGA, filtros=filtros_pagina, contar=True)
+
+    assert total == len(local) == contar_filas(cliente, filtros=filtros_pagina)
+    # Sin filas, la página llega sin columnas
+    assert (pagina["id"].tolist() if len(pagina) else []) == sorted(local["id"].tolist())
+
+
+def test_paginas_del_servidor_recorren_lo_mismo(cliente, df):
+    """Las páginas (range por id) juntas son las filas del filtro local, sin huecos ni repetidas."""
+    filtros = FiltrosBusqueda(periodos=("ENERO 1Q", "ENERO 2Q", "FEBRERO 1Q"))
+    local = sorted(filtrar_tablero(IndiceBusqueda(df).filtrar(filtros), "Todos", "Ver Todo")["id"].tolist())
+    ids = []
+    for pagina in range(-(-len(local) // 25)):
+        filas, total = cargar_pagina(cliente, pagina, 25, columnas=["id"], filtros=filtro_busqueda(filtros))
+        assert total is None
+        ids += filas["id"].tolist()
+    assert ids == local
@@ -0,0 +1,152 @@
+"""Snapshot compartido (sincronizacion.Sincronizador) contra cliente_local.ClienteLocal.
+
+Después de cada refresco o evento el snapshot tiene que ser lo mismo que
+una carga completa de la base en ese momento.
+"""
+import pandas as pd
+import pytest
+
+from benchmarks.sintetico import generar_prefacturas
+from cliente_local import ClienteLocal
+from esquema import COLUMNA_MODIFICACION, TABLA
+from sincronizacion import Sincronizador
+from tablero import preparar_datos
+from tiempo_real import Escucha
+
+
+@pytest.fixture
+def cliente():
+    return ClienteLocal(generar_prefacturas(500))
+
+
+class PrepararContando:
+    """preparar_datos que anota cuántas filas recibe en cada llamada."""
+
+    def __init__(self):
+        self.llamadas = []
+
+    def __call__(self, df: pd.DataFrame) -> pd.DataFrame:
+        self.llamadas.append(len(df))
+        return preparar_datos(df)
+
+
+@pytest.fixture
+def preparar():
+    return PrepararContando()
+
+
+@pytest.fixture
+def sincronizador(cliente, preparar):
+    sincronizador = Sincronizador(cliente, preparar=preparar)
+    sincronizador.refrescar()
+    return sincronizador
+
+
+def _base(cliente) -> pd.DataFrame:
+    """Lo que hay en la base, con las mismas columnas y el mismo orden que el snapshot."""
+    return pd.DataFrame(cliente.table(TABLA).select("*").order("id").execute().data)
+
+
+def _igual_a_la_base(cliente, df: pd.DataFrame):
+    base = _base(cliente)
+    assert df["id"].tolist() == base["id"].tolist()
+    for columna in ["pedido", "area", COLUMNA_MODIFICACION]:
+        esperado = base[columna].astype(object).where(base[columna].notna(), None).tolist()
+        obtenido = df[columna].astype(object).where(df[columna].notna(), None)
+        if columna == "area":
+            obtenido = obtenido.replace("", None)
+        assert obtenido.tolist() == esperado, columna
+
+
+def test_primera_carga(cliente, sincronizador, preparar):
+    assert sincronizador.cargado and sincronizador.arranque == "red"
+    assert preparar.llamadas == [500]
+    assert sincronizador.version == 1
+    _igual_a_la_base(cliente, sincronizador.df)
+
+
+def test_refresco_sin_cambios_conserva_el_snapshot(sincronizador, preparar):
+    df, version = sincronizador.df, sincronizador.version
+    assert sincronizador.refrescar() is df
+    assert sincronizador.version == version
+    assert preparar.llamadas == [500]
+
+
+def test_delta_trae_altas_y_modificaciones(cliente, sincronizador, preparar):
+    cliente.table(TABLA).update({"pedido": "CAMBIADO"}).eq("id", 20).execute()
+    cliente.table(TABLA).insert([{"sector": "SUR", "pedido": "NUEVO-1"}, {"sector": "NORTE"}]).execute()
+
+    df = sincronizador.refrescar()
+
+    # Solo se preparan las filas del delta
+    assert preparar.llamadas == [500, 3]
+    assert sincronizador.version == 2 and sincronizador.version_de(df) == 2
+    assert df.loc[df["id"] == 20, "pedido"].item() == "CAMBIADO"
+    _igual_a_la_base(cliente, df)
+
+
+def test_delta_con_marca_anterior_a_la_del_snapshot(cliente, sincronizador):
+    """Una transacción confirmada tarde trae updated_at < marca del snapshot: el solape la recoge."""
+    cliente.table(TABLA).update({"pedido": "RECIENTE"}).eq("id", 30).execute()
+    sincronizador.refrescar()
+    tabla = cliente._datos(TABLA)
+    tarde = (pd.Timestamp(sincronizador.marca) - pd.Timedelta(seconds=60)).isoformat()
+    tabla.loc[tabla["id"] == 31, ["pedido", COLUMNA_MODIFICACION]] = ["TARDE", tarde]
+
+    df = sincronizador.refrescar()
+
+    assert df.loc[df["id"] == 31, "pedido"].item() == "TARDE"
+    _igual_a_la_base(cliente, df)
+
+
+def test_bajas_detectadas_por_conteo(cliente, sincronizador):
+    cliente.table(TABLA).delete().in_("id", [1, 2, 250]).execute()
+
+    df = sincronizador.refrescar()
+
+    assert not df["id"].isin([1, 2, 250]).any()
+    _igual_a_la_base(cliente, df)
+
+
+def test_bajas_y_altas_que_empatan_el_conteo(cliente, sincronizador):
+    """Una baja y una alta dejan el conteo igual que el snapshot viejo: se comparan después del delta."""
+    cliente.table(TABLA).delete().eq("id", 40).execute()
+    cliente.table(TABLA).insert({"sector": "SUR"}).execute()
+
+    df = sincronizador.refrescar()
+
+    assert 40 not in df["id"].tolist()
+    _igual_a_la_base(cliente, df)
+
+
+def test_aplicar_cambios_de_eventos(cliente, sincronizador, preparar):
+    escucha = Escucha.iniciar(cliente)
+    cliente.table(TABLA).update({"pedido": "EVENTO"}).eq("id", 50).execute()
+    cliente.table(TABLA).insert({"sector": "OCCIDENTE", "pedido": "ALTA"}).execute()
+    cliente.table(TABLA).delete().eq("id", 51).execute()
+
+    assert escucha.aplicar(sincronizador) == 3
+    df = sincronizador.df
+    assert preparar.llamadas == [500, 2]
+    _igual_a_la_base(cliente, df)
+
+    # El refresco siguiente ya no encuentra nada que fusionar
+    version = sincronizador.version
+    assert sincronizador.refrescar() is df and sincronizador.version == version
+
+
+def test_aplicar_cambios_ignora_eventos_viejos(cliente, sincronizador):
+    """Un evento que llega después de que un refresco trajo una versión más nueva no la pisa."""
+    viejo = cliente.table(TABLA).update({"pedido": "VIEJO"}).eq("id", 60).execute().data[0]
+    cliente.table(TABLA).update({"pedido": "NUEVO"}).eq("id", 60).execute()
+    sincronizador.refrescar()
+
+    df = sincronizador.aplicar_cambios([viejo], [])
+
+    assert df.loc[df["id"] == 60, "pedido"].item() == "NUEVO"
+
+
+def test_aplicar_cambios_antes_de_la_primera_carga(cliente):
+    sincronizador = Sincronizador(cliente, preparar=preparar_datos)
+    assert sincronizador.aplicar_cambios([{"id": 1, "pedido": "X"}], [2]).empty
+    assert not sincronizador.cargado
@@ -0,0 +1,98 @@
+"""Snapshot en disco (snapshot_disco.py, Arrow IPC) y el arranque tibio del Sincronizador.
+
+Lo leído tiene que ser el mismo DataFrame que dejó preparar_datos (tipos
+incluidos); un archivo de otra versión, con otras columnas o roto se ignora.
+"""
+import pandas as pd
+import pytest
+
+import snapshot_disco
+from benchmarks.sintetico import generar_prefacturas
+from cliente_local import ClienteLocal
+from esquema import COLUMNA_MODIFICACION, COLUMNAS_CARGA, TABLA
+from sincronizacion import Sincronizador
+from snapshot_disco import SnapshotDisco, guardar_snapshot, leer_snapshot
+from tablero import preparar_datos
+
+COLUMNAS = COLUMNAS_CARGA + [COLUMNA_MODIFICACION]
+
+
+@pytest.fixture
+def df():
+    return preparar_datos(generar_prefacturas(300))
+
+
+@pytest.fixture
+def ruta(tmp_path):
+    return str(tmp_path / "cache" / "prefacturas.arrow")
+
+
+def _guardar(ruta, df, columnas=COLUMNAS) -> int:
+    return guardar_snapshot(ruta, SnapshotDisco(
+        df=df, columnas=columnas, ultimo_id=int(df["id"].max()),
+        marca="2025-01-01T00:00:00+00:00", columna_marca=COLUMNA_MODIFICACION,
+    ))
+
+
+def test_ida_y_vuelta_con_los_mismos_tipos(df, ruta):
+    tamano = _guardar(ruta, df)
+    leido = leer_snapshot(ruta, COLUMNAS)
+
+    assert leido.bytes == tamano > 0
+    assert (leido.ultimo_id, leido.marca, leido.columna_marca) == (
+        300, "2025-01-01T00:00:00+00:00", COLUMNA_MODIFICACION,
+    )
+    assert leido.columnas == COLUMNAS
+    pd.testing.assert_frame_equal(leido.df, df)
+
+
+def test_escritura_atomica_sin_temporales(df, ruta, tmp_path):
+    _guardar(ruta, df)
+    _guardar(ruta, df.iloc[:10])
+    assert [p.name for p in (tmp_path / "cache").iterdir()] == ["prefacturas.arrow"]
+    assert len(leer_snapshot(ruta, COLUMNAS).df) == 10
+
+
+@pytest.mark.parametrize("cambio", ["version", "catalogo"])
+def test_firma_distinta_se_ignora(df, ruta, monkeypatch, cambio):
+    _guardar(ruta, df)
+    if cambio == "version":
+        monkeypatch.setattr(snapshot_disco, "VERSION", snapshot_disco.VERSION + 1)
+    else:
+        monkeypatch.setitem(snapshot_disco.CATALOGOS, "area", snapshot_disco.CATALOGOS["area"] + ["NUEVA"])
+    assert leer_snapshot(ruta, COLUMNAS) is None
+
+
+def test_otras_columnas_se_ignora(df, ruta):
+    _guardar(ruta, df)
+    assert leer_snapshot(ruta, COLUMNAS[:-1]) is None
+
+
+def test_sin_archivo_o_ilegible(ruta, tmp_path):
+    assert leer_snapshot(None, COLUMNAS) is None
+    assert leer_snapshot(ruta, COLUMNAS) is None
+    roto = tmp_path / "roto.arrow"
+    roto.write_bytes(b"no es arrow")
+    assert leer_snapshot(str(roto), COLUMNAS) is None
+
+
+def test_arranque_tibio_del_sincronizador(ruta):
+    """Primer proceso carga de la red y guarda; el siguiente parte del disco y solo trae el delta."""
+    cliente = ClienteLocal(generar_prefacturas(300))
+    primero = Sincronizador(cliente, preparar=preparar_datos, ruta_disco=ruta, intervalo_disco=0)
+    primero.refrescar()
+    assert primero.arranque == "red"
+
+    cliente.table(TABLA).update({"pedido": "DESPUES"}).eq("id", 7).execute()
+    cliente.table(TABLA).insert({"sector": "SUR"}).execute()
+    segundo = Sincronizador(cliente, preparar=preparar_datos, ruta_disco=ruta)
+    df = segundo.refrescar()
+
+    assert segundo.arranque == "disco"
+    assert len(df) == 301 and df.loc[df["id"] == 7, "pedido"].item() == "DESPUES"
+    red = Sincronizador(cliente, preparar=preparar_datos).refrescar()
+    pd.testing.assert_frame_equal(
+        df.sort_values("id", ignore_index=True)[["id", "pedido", "sector", "etapa_codigo"]],
+        red.sort_values("id", ignore_index=True)[["id", "pedido", "sector", "etapa_codigo"]],
+        check_categorical=False,
+    )
@@ -0,0 +1,152 @@
+"""Snapshots diarios (snapshots.py) contra un recálculo día por día y contra cliente_local.ClienteLocal.
+
+El recálculo de referencia aplica el CASE de sql/004_snapshots_etapas.sql a
+cada día por separado; conteos_diarios tiene que dar lo mismo sin recorrer
+la tabla por día. materializar() repetido el mismo día deja una fila por
+(día, sector, etapa) con el último conteo.
+"""
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.sintetico import generar_prefacturas
+from cliente_local import ClienteLocal
+from esquema import TABLA, TABLA_SNAPSHOTS
+from snapshots import CLAVE_SNAPSHOT, COLUMNAS_SNAPSHOT, Materializador, conteos_diarios, materializar
+
+HOY = date(2024, 9, 1)
+
+
+def _crudo() -> pd.DataFrame:
+    crudo = generar_prefacturas(1500)
+    crudo.loc[0:9, "sector"] = None
+    crudo.loc[10:19, "sector"] = "  norte "
+    # Pedidos con fecha de edición (cuentan desde ese día) y sin ella (desde siempre)
+    crudo.loc[20:199, "fecha_edicion_pedido"] = pd.to_datetime(crudo.loc[20:199, "fecha_conciliacion"]).add(
+        pd.Timedelta(days=20)).dt.strftime("%Y-%m-%d")
+    return crudo
+
+
+def _dia_a_dia(crudo: pd.DataFrame, desde: date, hasta: date) -> pd.DataFrame:
+    """CASE de sql/004 evaluado para cada día (lo que se sabía ese día)."""
+    creado = pd.to_datetime(crudo["created_at"], utc=True).dt.tz_localize(None).dt.normalize()
+    fechas = {
+        c: pd.to_datetime(crudo[c], errors="coerce")
+        for c in ["fecha_elaboracion", "fecha_conciliacion", "fecha_edicion_pedido"]
+    }
+    sin_pedido = crudo["pedido"].fillna("").astype(str).str.strip().eq("")
+    sector = crudo["sector"].fillna("").astype(str).str.strip().str.upper()
+    partes = []
+    for dia in pd.date_range(desde, hasta):
+        etapa = np.select(
+            [
+                fechas["fecha_elaboracion"].isna() | (fechas["fecha_elaboracion"] > dia),
+                fechas["fecha_conciliacion"].isna() | (fechas["fecha_conciliacion"] > dia),
+                sin_pedido | (fechas["fecha_edicion_pedido"] > dia),
+            ],
+            [0, 1, 2],
+            3,
+        )
+        vivas = (creado <= dia).to_numpy()
+        conteo = (
+            pd.DataFrame({"sector": sector[vivas].to_numpy(), "etapa_codigo": etapa[vivas]})
+            .value_counts().rename("cantidad").reset_index()
+        )
+        partes.append(conteo.assign(dia=dia.strftime("%Y-%m-%d")))
+    return (
+        pd.concat(partes, ignore_index=True)[COLUMNAS_SNAPSHOT]
+        .astype({"etapa_codigo": "int64", "cantidad": "int64"})
+        .sort_values(CLAVE_SNAPSHOT, ignore_index=True)
+    )
+
+
+@pytest.mark.parametrize("desde,hasta", [(date(2024, 1, 1), date(2024, 3, 31)), (date(2025, 5, 1), date(2025, 7, 15))])
+def test_conteos_diarios_igual_que_dia_por_dia(desde, hasta):
+    crudo = _crudo()
+    obtenido = conteos_diarios(crudo, desde, hasta)
+    pd.testing.assert_frame_equal(obtenido.astype({"sector": str}), _dia_a_dia(crudo, desde, hasta).astype({"sector": str}))
+
+
+def test_conteos_diarios_sin_filas_o_sin_dias():
+    assert list(conteos_diarios(pd.DataFrame(), HOY, HOY).columns) == COLUMNAS_SNAPSHOT
+    assert conteos_diarios(_crudo(), HOY, HOY - timedelta(days=1)).empty
+
+
+def _snapshots(cliente) -> pd.DataFrame:
+    filas = cliente.table(TABLA_SNAPSHOTS).select(",".join(COLUMNAS_SNAPSHOT)).execute().data
+    return pd.DataFrame(filas, columns=COLUMNAS_SNAPSHOT).astype({"etapa_codigo": "int64", "cantidad": "int64"})
+
+
+def test_materializar_dos_veces_el_mismo_dia():
+    crudo = _crudo()
+    cliente = ClienteLocal(crudo)
+    materializar(cliente, crudo, hoy=HOY, dias_historia=30)
+    primera = _snapshots(cliente)
+    assert not primera.duplicated(CLAVE_SNAPSHOT).any()
+    assert primera["dia"].min() == (HOY - timedelta(days=30)).isoformat()
+
+    # Durante el día: todo NORTE se borra y entra una fila nueva en SUR
+    cambiado = pd.concat([
+        crudo[crudo["sector"].fillna("").str.strip().str.upper() != "NORTE"],
+        pd.DataFrame([{"id": 99999, "sector": "SUR", "created_at": "2024-08-31T12:00:00+00:00"}]),
+    ], ignore_index=True)
+    materializar(cliente, cambiado, hoy=HOY, dias_historia=30)
+    segunda = _snapshots(cliente)
+
+    # Una fila por clave; los días anteriores al último guardado no se tocan
+    assert not segunda.duplicated(CLAVE_SNAPSHOT).any()
+    claves = segunda.set_index(CLAVE_SNAPSHOT)["cantidad"]
+    anteriores = primera[primera["dia"] < HOY.isoformat()].set_index(CLAVE_SNAPSHOT)["cantidad"]
+    pd.testing.assert_series_equal(claves.loc[anteriores.index], anteriores)
+    # El día rehecho tiene los conteos nuevos; lo que ya no existe queda en 0
+    hoy = segunda[segunda["dia"] == HOY.isoformat()].set_index(["sector", "etapa_codigo"])["cantidad"]
+    esperado = conteos_diarios(cambiado, HOY, HOY).set_index(["sector", "etapa_codigo"])["cantidad"]
+    assert (hoy.loc[esperado.index] == esperado).all()
+    assert (hoy.loc["NORTE"] == 0).all() and len(hoy.loc["NORTE"])
+    assert hoy.loc[("SUR", 0)] == primera.set_index(CLAVE_SNAPSHOT)["cantidad"].loc[(HOY.isoformat(), "SUR", 0)] + 1
+
+
+def test_materializar_servidor_cuenta_tambien_lo_archivado():
+    crudo = _crudo()
+    cliente = ClienteLocal(crudo)
+    desde = date.today() - timedelta(days=3)
+    cliente.rpc("materializar_snapshots", {"p_desde": desde.isoformat()}).execute()
+    antes = _snapshots(cliente).groupby("dia")["cantidad"].sum()
+
+    movidas = cliente.rpc("archivar_prefacturas", {"p_periodos": [
+        {"anio": anio, "periodo": "ENERO 1Q"} for anio in (2024, 2025)
+    ]}).execute().data
+    assert movidas > 0 and len(cliente._datos(TABLA)) == len(crudo) - movidas
+    cliente.rpc("materializar_snapshots", {"p_desde": desde.isoformat()}).execute()
+
+    pd.testing.assert_series_equal(_snapshots(cliente).groupby("dia")["cantidad"].sum(), antes)
+
+
+def test_materializador_en_segundo_plano():
+    seguir = threading.Event()
+    llamadas = []
+
+    def funcion():
+        llamadas.append(1)
+        seguir.wait(5)
+        if len(llamadas) == 2:
+            raise RuntimeError("sin red")
+
+    materializador = Materializador(funcion, intervalo=0)
+    assert materializador.pedir()
+    # Una sola a la vez
+    assert not materializador.pedir() and materializador.en_curso
+    seguir.set()
+    materializador.esperar(5)
+    assert materializador.version == 1 and materializador.error is None
+
+    assert materializador.pedir()
+    materializador.esperar(5)
+    assert materializador.version == 1 and isinstance(materializador.error, RuntimeError)
+
+    # Dentro del intervalo no se relanza
+    materializador.intervalo = 3600
+    assert not materializador.pedir() and len(llamadas) == 2
@@ -0,0 +1,65 @@
+"""Tiempos de ciclo (tiempos.py): tramos por fila y percentiles, también sin datos."""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.sintetico import generar_prefacturas
+from tablero import preparar_datos
+from tiempos import PERCENTILES, TRAMOS, cuello_de_botella, percentiles_tramos, tiempos_ciclo
+
+COLUMNAS_GLOBAL = ["tramo", "n"] + [f"p{p}" for p in PERCENTILES]
+
+
+@pytest.fixture(scope="module")
+def df():
+    return preparar_datos(generar_prefacturas(800))
+
+
+@pytest.fixture(scope="module")
+def tiempos(df):
+    return tiempos_ciclo(df, hoy=date(2026, 1, 1))
+
+
+def test_tramo_salta_hitos_vacios_y_descarta_negativos():
+    crudo = pd.DataFrame({
+        "id": [1, 2],
+        "fecha_elaboracion": ["2024-01-01", "2024-01-10"],
+        "fecha_formato": [None, "2024-01-05"],
+        "fecha_solicitud_modificacion": ["2024-01-11", None],
+    })
+    tiempos = tiempos_ciclo(preparar_datos(crudo), hoy=date(2024, 2, 1))
+
+    # Fila 1: sin formato, el tramo siguiente cuenta desde la elaboración
+    assert np.isnan(tiempos.loc[0, "formato"]) and tiempos.loc[0, "solicitud_modificacion"] == 10
+    # Fila 2: formato antes de la elaboración (fechas invertidas) no cuenta
+    assert np.isnan(tiempos.loc[1, "formato"])
+
+
+def test_percentiles_global_y_por_grupo(df, tiempos):
+    global_tramos = percentiles_tramos(tiempos)
+    assert list(global_tramos.columns) == COLUMNAS_GLOBAL
+    fila = global_tramos.set_index("tramo").loc["formato"]
+    assert fila["n"] == tiempos["formato"].notna().sum()
+    assert fila["p50"] == pytest.approx(tiempos["formato"].median())
+
+    por_grupo = percentiles_tramos(tiempos, df["sector"])
+    assert list(por_grupo.columns) == ["grupo"] + COLUMNAS_GLOBAL
+    assert por_grupo.groupby("tramo", observed=True)["n"].sum().to_dict() == global_tramos.set_index("tramo")["n"].to_dict()
+
+
+@pytest.mark.parametrize("filtro", ["vacio", "sin_tramos"])
+def test_percentiles_sin_datos(df, tiempos, filtro):
+    """Un filtro sin filas, o solo con filas sin ningún par de hitos (Por Elaborar), no rompe."""
+    vista = tiempos.iloc[:0] if filtro == "vacio" else tiempos[df["etapa_codigo"].to_numpy() == 0]
+    assert filtro == "vacio" or (len(vista) and vista[TRAMOS].isna().all().all())
+
+    global_tramos = percentiles_tramos(vista)
+    por_grupo = percentiles_tramos(vista, df.loc[vista.index, "sector"])
+
+    assert global_tramos.empty and list(global_tramos.columns) == COLUMNAS_GLOBAL
+    assert por_grupo.empty and list(por_grupo.columns) == ["grupo"] + COLUMNAS_GLOBAL
+    assert cuello_de_botella(global_tramos) is None
+    # Lo que hace app.py con el resumen por grupo
+    assert por_grupo.pivot(index="grupo", columns="tramo", values="p50").empty
@@ -0,0 +1,119 @@
+"""Cambios por fila empujados por la base (Supabase Realtime) para parchar el snapshot.
+
+Una Escucha por proceso recibe los eventos INSERT/UPDATE/DELETE de
+prefacturas_pedidos y los acumula; cada rerun los aplica de una vez al
+Sincronizador compartido (sin consultar la base) y usa `version` para saber
+si llegó algo desde el rerun anterior. Con el cliente local los eventos los
+emite el propio ClienteLocal al escribir.
+"""
+import asyncio
+import logging
+import threading
+
+from realtime import AsyncRealtimeClient, RealtimeSubscribeStates
+
+from esquema import TABLA
+
+logger = logging.getLogger("prefacturas.tiempo_real")
+
+CANAL = "prefacturas-cambios"
+
+
+class Escucha:
+    """Cola de eventos de cambio por fila, alimentada desde otro hilo."""
+
+    def __init__(self):
+        self.estado = "desconectada"
+        self.error = None
+        self.version = 0  # sube con cada evento recibido
+        self.eventos = 0
+        self._pendientes = []
+        self._lock = threading.Lock()
+        self._lock_aplicar = threading.Lock()
+        self._perdio_eventos = False
+        self._suscrita_antes = False
+
+    # --- origen de eventos ---
+    @classmethod
+    def iniciar(cls, cliente, url: str = None, key: str = None) -> "Escucha":
+        """Escucha con el cliente local (si sabe emitir eventos) o con Realtime en un hilo aparte."""
+        escucha = cls()
+        if hasattr(cliente, "suscribir"):
+            cliente.suscribir(TABLA, escucha.recibir)
+            escucha.estado = "conectada"
+        else:
+            threading.Thread(
+                target=lambda: asyncio.run(escucha._escuchar_realtime(url, key)),
+                name="tiempo-real", daemon=True,
+            ).start()
+        return escucha
+
+    async def _escuchar_realtime(self, url: str, key: str):
+        try:
+            cliente = AsyncRealtimeClient(f"{url.rstrip('/')}/realtime/v1", token=key, auto_reconnect=True)
+            await cliente.connect()
+            canal = cliente.channel(CANAL)
+            canal.on_postgres_changes("*", callback=self.recibir, table=TABLA, schema="public")
+            await canal.subscribe(self._al_cambiar_estado)
+            while True:
+                await asyncio.sleep(3600)
+        except Exception as e:
+            logger.exception("Realtime detenido")
+            self.estado, self.error = "caída", str(e)
+            self._perdio_eventos = True
+
+    def _al_cambiar_estado(self, estado, error=None):
+        if estado == RealtimeSubscribeStates.SUBSCRIBED:
+            # Tras una reconexión pudieron perderse eventos: que el próximo rerun traiga el delta
+            self._perdio_eventos = self._perdio_eventos or self._suscrita_antes
+            self._suscrita_antes = True
+            self.estado, self.error = "conectada", None
+        else:
+            self.estado, self.error = "reconectando", str(error) if error else None
+
+    def recibir(self, payload: dict):
+        """Callback de postgres_changes: {"data": {"type", "record", "old_record"}, ...}."""
+        datos = payload.get("data", payload)
+        with self._lock:
+            self._pendientes.append((datos["type"], datos.get("record") or {}, datos.get("old_record") or {}))
+            self.version += 1
+            self.eventos += 1
+
+    # --- consumo desde los reruns ---
+    def requiere_refresco(self) -> bool:
+        """True (una sola vez) si hubo un corte y el snapshot pudo quedar atrasado."""
+        with self._lock:
+            perdio, self._perdio_eventos = self._perdio_eventos, False
+        return perdio
+
+    def tomar(self) -> list:
+        """Saca los eventos pendientes: lista de (tipo, registro, registro_anterior)."""
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, []
+        return pendientes
+
+    def aplicar(self, sincronizador) -> int:
+        """Aplica los eventos pendientes al snapshot del sincronizador; devuelve cuántos eran.
+
+        Tomar y aplicar van juntos bajo un lock: dos sesiones no aplican
+        tandas en desorden.
+        """
+        with self._lock_aplicar:
+            cambios = self.tomar()
+            if not cambios or not sincronizador.cargado:
+                return 0  # sin snapshot todavía: la primera carga ya los trae
+            altas, bajas = {}, {}
+            for tipo, registro, anterior in cambios:
+                if tipo == "DELETE":
+                    id_ = anterior.get("id")
+                    altas.pop(id_, None)
+                    bajas[id_] = True
+                else:
+                    altas[registro["id"]] = registro
+                    bajas.pop(registro["id"], None)
+            sincronizador.aplicar_cambios(list(altas.values()), [i for i in bajas if i is not None])
+            return len(cambios)
+
+    def resumen(self) -> str:
+        texto = f"{self.estado} · {self.eventos} eventos"
+        return f"{texto} · {self.error}" if self.error else texto
@@ -0,0 +1,112 @@
+"""Tiempos de ciclo: días entre hitos, percentiles por grupo y antigüedad por etapa.
+
+Todo se calcula con aritmética de fechas de NumPy sobre la tabla completa
+en una pasada (una matriz filas × hitos en días); los resúmenes por grupo
+salen de esa matriz sin volver a leer fechas.
+"""
+import numpy as np
+import pandas as pd
+
+from esquema import COLUMNAS_FECHAS
+from etapas import ETAPAS
+
+# Un tramo por hito (salvo el primero): días desde el hito anterior registrado
+TRAMOS = [c.removeprefix("fecha_") for c in COLUMNAS_FECHAS[1:]]
+
+PERCENTILES = [50, 90, 99]
+
+# Dónde empieza cada etapa abierta (código de etapa -> columna); Pedido Recibido ya cerró
+INICIO_ETAPA = {0: "created_at", 1: "fecha_elaboracion", 2: "fecha_conciliacion"}
+
+# Cortes (días) para la antigüedad de lo que sigue abierto
+RANGOS_ANTIGUEDAD = [0, 15, 30, 60, 90, np.inf]
+ETIQUETAS_ANTIGUEDAD = ["0-15", "16-30", "31-60", "61-90", "+90"]
+
+GRUPOS = ["sector", "subsector", "area", "periodo"]
+
+
+def _dias(s: pd.Series) -> np.ndarray:
+    """Columna de fechas (date, texto ISO o timestamp) a días desde epoch en float (NaN si vacía)."""
+    fechas = pd.to_datetime(s, errors="coerce", utc=True).dt.tz_localize(None)
+    dias = fechas.to_numpy().astype("datetime64[D]")
+    return np.where(np.isnat(dias), np.nan, dias.astype(np.int64).astype(np.float64))
+
+
+def tiempos_ciclo(df: pd.DataFrame, hoy=None) -> pd.DataFrame:
+    """Por fila: días de cada tramo (columnas TRAMOS) y dias_en_etapa (antigüedad en la etapa actual).
+
+    Un tramo va desde el último hito anterior con fecha (los hitos opcionales
+    vacíos no cortan la cadena). Tramos negativos (fechas invertidas) quedan
+    en NaN para no contaminar los percentiles.
+    """
+    presentes = [c for c in COLUMNAS_FECHAS if c in df.columns]
+    hitos = np.column_stack([_dias(df[c]) for c in presentes]) if presentes else np.empty((len(df), 0))
+
+    # Último hito registrado antes de cada columna (forward fill por fila)
+    previos = pd.DataFrame(hitos).ffill(axis=1).shift(1, axis=1).to_numpy()
+    tramos = hitos - previos
+    tramos[tramos < 0] = np.nan
+
+    resultado = pd.DataFrame(index=df.index)
+    for j, col in enumerate(presentes[1:], start=1):
+        resultado[col.removeprefix("fecha_")] = tramos[:, j].astype(np.float32)
+
+    # Antigüedad: hoy menos el inicio de la etapa en que está la fila
+    hoy = np.datetime64(hoy or pd.Timestamp.now().date(), "D").astype(np.int64)
+    codigos = df["etapa_codigo"].to_numpy() if "etapa_codigo" in df.columns else np.full(len(df), -1)
+    antiguedad = np.full(len(df), np.nan)
+    for codigo, col in INICIO_ETAPA.items():
+        if col in df.columns:
+            en_etapa = codigos == codigo
+            antiguedad[en_etapa] = hoy - _dias(df.loc[en_etapa, col])
+    resultado["dias_en_etapa"] = antiguedad.astype(np.float32)
+    return resultado
+
+
+def percentiles_tramos(tiempos: pd.DataFrame, grupos: pd.Series = None) -> pd.DataFrame:
+    """Filas (grupo, tramo) con n, p50, p90, p99 en días; sin grupos, un resumen global.
+
+    Sin ningún tramo con dato (p. ej. solo filas Por Elaborar) devuelve las
+    mismas columnas, sin filas.
+    """
+    tramos = [t for t in TRAMOS if t in tiempos.columns]
+    largo = tiempos[tramos].melt(var_name="tramo", value_name="dias", ignore_index=False).dropna()
+    claves = ["tramo"] if grupos is None else ["grupo", "tramo"]
+    if largo.empty:
+        vacio = pd.DataFrame(columns=claves + ["n"] + [f"p{p}" for p in PERCENTILES])
+        vacio["tramo"] = pd.Categorical([], categories=TRAMOS, ordered=True)
+        return vacio.astype({"n": "int64", **{f"p{p}": "float64" for p in PERCENTILES}})
+    if grupos is not None:
+        largo["grupo"] = grupos.reindex(largo.index).to_numpy()
+    agrupado = largo.groupby(claves, observed=True, sort=False)["dias"]
+    resumen = agrupado.quantile([p / 100 for p in PERCENTILES]).unstack()
+    resumen.columns = [f"p{p}" for p in PERCENTILES]
+    resumen.insert(0, "n", agrupado.size())
+    resumen = resumen.reset_index()
+    # Tramos en el orden del ciclo
+    resumen["tramo"] = pd.Categorical(resumen["tramo"], categories=TRAMOS, ordered=True)
+    return resumen.sort_values(claves, ignore_index=True)
+
+
+def antiguedad_por_etapa(tiempos: pd.DataFrame, etapa_codigo) -> pd.DataFrame:
+    """Por etapa abierta: cantidad, p50/p90/máx de días en la etapa y conteo por rango de antigüedad."""
+    codigos = np.asarray(etapa_codigo)
+    dias = tiempos["dias_en_etapa"].to_numpy()
+    filas = []
+    for codigo in INICIO_ETAPA:
+        valores = dias[(codigos == codigo) & ~np.isnan(dias)]
+        fila = {"Etapa": ETAPAS[codigo], "n": int(np.sum(codigos == codigo))}
+        if len(valores):
+            p50, p90 = np.percentile(valores, [50, 90])
+            fila.update(p50=p50, p90=p90, max=float(valores.max()))
+        rangos = np.histogram(valores, bins=RANGOS_ANTIGUEDAD)[0]
+        fila.update(dict(zip(ETIQUETAS_ANTIGUEDAD, rangos.tolist())))
+        filas.append(fila)
+    return pd.DataFrame(filas, columns=["Etapa", "n", "p50", "p90", "max"] + ETIQUETAS_ANTIGUEDAD)
+
+
+def cuello_de_botella(resumen_global: pd.DataFrame):
+    """Tramo con la mayor mediana (None si no hay datos)."""
+    if resumen_global.empty:
+        return None
+    return resumen_global.loc[resumen_global["p50"].idxmax()]